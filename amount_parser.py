@@ -0,0 +1,251 @@
+"""
+Moduł do parsowania kwot w formatach PL/EU (np. "1 234,56 zł", "1.234,56", "-12,5 PLN")
+
+Obsługiwane formaty:
+- separator dziesiętny ',' lub '.' z 1-2 cyframi po nim ("12,5", "12.50", "12.")
+- separatory tysięcy: spacja, NBSP, wąska NBSP, '.', ',', apostrof - grupy po 3 cyfry,
+  separator dziesiętny musi być inny niż separator tysięcy ("1.234,56", "1,234.56")
+- pojedynczy separator z dokładnie 3 cyframi po nim to separator tysięcy ("1.234" = 1234 zł)
+- waluta przed lub po kwocie (zł, PLN, EUR, €, $)
+- kwoty ujemne: "-12,50", "−12,50", "(12,50)", "12,50-"
+
+Wynikiem są grosze jako liczby całkowite (Int64), bez błędów zaokrągleń float.
+"""
+import numpy as np
+import pandas as pd
+
+# Dłuższe wartości nie są kwotami - oznaczane jako błędne (chroni przed szeroką macierzą znaków)
+MAX_AMOUNT_LENGTH = 40
+
+# Maksymalna liczba cyfr kwoty mieszcząca się bezpiecznie w int64 po przeliczeniu na grosze
+MAX_AMOUNT_DIGITS = 15
+
+# Liczba wartości parsowanych w jednym bloku - ogranicza pamięć macierzy znaków
+# i utrzymuje wektory stanu automatu w pamięci podręcznej procesora
+PARSE_CHUNK_SIZE = 16384
+
+# Maksymalna liczba przykładowych błędnych wartości w raporcie
+MAX_REPORT_SAMPLES = 50
+
+# Klasy znaków automatu parsującego
+_INVALID, _DIGIT, _SPACE, _DECIMAL_SEP, _GROUP_SEP, _MINUS, _OPEN, _CLOSE, _PLUS, _CURRENCY, _PAD = range(11)
+_SPACE_CODE = ord(' ')
+
+
+def _build_char_classes():
+    """Buduje tablicę kod znaku -> klasa znaku (znaki spoza tablicy są błędne)"""
+    classes = {
+        _DIGIT: '0123456789',
+        _SPACE: ' \u00a0\u202f\t',
+        _DECIMAL_SEP: '.,',
+        _GROUP_SEP: "'\u2019",
+        _MINUS: '-\u2212\u2013',
+        _OPEN: '(',
+        _CLOSE: ')',
+        _PLUS: '+',
+        _CURRENCY: 'plnzłeurPLNZŁEUR€$',
+        _PAD: '\0'
+    }
+    table = np.full(max(ord(ch) for chars in classes.values() for ch in chars) + 2, _INVALID, dtype=np.uint8)
+    for char_class, chars in classes.items():
+        table[[ord(ch) for ch in chars]] = char_class
+    return table
+
+
+_CHAR_CLASSES = _build_char_classes()
+
+
+def parse_amounts(values):
+    """Parsuje kolumnę kwot do groszy (Int64) i zwraca (grosze, raport).
+
+    Każda unikalna wartość jest parsowana raz (pd.factorize), a parsowanie tekstu
+    odbywa się w jednym przebiegu po macierzy znaków numpy - bez pośrednich
+    kopii kolumny jako tekstu. Puste komórki dają <NA> i nie są liczone jako błędne.
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    total = len(series)
+
+    if pd.api.types.is_bool_dtype(series.dtype):
+        series = series.astype(object)
+
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        grosze = _numeric_to_grosze(series.to_numpy(dtype='float64', na_value=np.nan))
+        empty_mask = series.isna().to_numpy()
+    else:
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        unique_grosze, unique_empty = _parse_unique_values(np.asarray(uniques, dtype=object))
+
+        # Rozwiń wyniki z wartości unikalnych na wszystkie wiersze
+        valid_codes = codes >= 0
+        safe_codes = np.where(valid_codes, codes, 0)
+        grosze = np.full(total, np.nan)
+        empty_mask = ~valid_codes
+        if len(unique_grosze):
+            grosze = np.where(valid_codes, unique_grosze[safe_codes], np.nan)
+            empty_mask |= valid_codes & unique_empty[safe_codes]
+
+    result = pd.Series(_float_grosze_to_array(grosze), index=series.index, dtype='Int64')
+    return result, _build_report(series, result, empty_mask, total)
+
+
+def _numeric_to_grosze(values):
+    """Zamienia tablicę float (złote) na tablicę float groszy (NaN = brak)"""
+    with np.errstate(invalid='ignore', over='ignore'):
+        return np.round(values * 100)
+
+
+def _float_grosze_to_array(grosze):
+    """Zamienia tablicę float groszy (NaN = brak) na tablicę Int64"""
+    finite = np.isfinite(grosze)
+    values = np.zeros(len(grosze), dtype='int64')
+    values[finite] = grosze[finite].astype('int64')
+    return pd.arrays.IntegerArray(values, ~finite)
+
+
+def _parse_unique_values(uniques):
+    """Parsuje unikalne wartości - zwraca (grosze float z NaN, maska pustych)"""
+    count = len(uniques)
+    grosze = np.full(count, np.nan)
+    empty = np.zeros(count, dtype=bool)
+    if count == 0:
+        return grosze, empty
+
+    if pd.api.types.infer_dtype(uniques, skipna=False) == 'string':
+        is_text = np.ones(count, dtype=bool)
+    else:
+        is_text = np.fromiter((isinstance(v, str) for v in uniques), dtype=bool, count=count)
+
+    # Wartości liczbowe (np. z Excela) - bez konwersji na tekst
+    if (~is_text).any():
+        numeric = pd.to_numeric(pd.Series(uniques[~is_text], dtype=object), errors='coerce')
+        grosze[~is_text] = _numeric_to_grosze(numeric.to_numpy(dtype='float64', na_value=np.nan))
+
+    text_positions = np.flatnonzero(is_text)
+    for start in range(0, len(text_positions), PARSE_CHUNK_SIZE):
+        positions = text_positions[start:start + PARSE_CHUNK_SIZE]
+        grosze[positions], empty[positions] = _parse_text_values(uniques[positions].tolist())
+
+    return grosze, empty
+
+
+def _parse_text_values(texts):
+    """Parsuje listę tekstów kwot skanując macierz kodów znaków kolumna po kolumnie.
+
+    Każda kolumna macierzy to jeden krok automatu wykonywany jednocześnie dla
+    wszystkich wartości, więc koszt to O(długość najdłuższej wartości) operacji numpy.
+    """
+    count = len(texts)
+    chars = np.array(texts, dtype=str)
+    too_long = np.zeros(count, dtype=bool)
+    if chars.dtype.itemsize // 4 > MAX_AMOUNT_LENGTH:
+        lengths = np.fromiter(map(len, texts), dtype=np.int64, count=count)
+        too_long = lengths > MAX_AMOUNT_LENGTH
+        chars = np.array(['' if is_long else text for text, is_long in zip(texts, too_long)], dtype=str)
+    width = max(chars.dtype.itemsize // 4, 1)
+    codes = chars.astype(f'U{width}').view(np.uint32).reshape(count, width)
+    classes = _CHAR_CLASSES[np.minimum(codes, len(_CHAR_CLASSES) - 1)]
+
+    acc = np.zeros(count, dtype=np.int64)
+    digit_count = np.zeros(count, dtype=np.int16)
+    digits_since_sep = np.zeros(count, dtype=np.int16)
+    digits_before_first_sep = np.zeros(count, dtype=np.int16)
+    sep_count = np.zeros(count, dtype=np.int16)
+    first_sep = np.zeros(count, dtype=np.uint32)
+    last_sep = np.zeros(count, dtype=np.uint32)
+    leading_zero = np.zeros(count, dtype=bool)
+    started = np.zeros(count, dtype=bool)
+    ended = np.zeros(count, dtype=bool)
+    pending_space = np.zeros(count, dtype=bool)
+    negative = np.zeros(count, dtype=bool)
+    bad = too_long.copy()
+    non_blank = np.zeros(count, dtype=bool)
+
+    for column in range(width):
+        c = codes[:, column]
+        cls = classes[:, column]
+        is_digit = cls == _DIGIT
+        is_space = cls == _SPACE
+        is_sep_char = (cls == _DECIMAL_SEP) | (cls == _GROUP_SEP)
+        is_minus = cls == _MINUS
+        is_open = cls == _OPEN
+        is_close = cls == _CLOSE
+        is_plus = cls == _PLUS
+        is_currency = cls == _CURRENCY
+        is_pad = cls == _PAD
+
+        non_blank |= ~(is_space | is_pad)
+        bad |= cls == _INVALID
+        bad |= started & (is_open | is_plus)
+        bad |= is_digit & ended
+
+        # Separator: jawny znak albo spacja między cyframi (rejestrowana przy następnej cyfrze)
+        explicit_sep = is_sep_char & ~ended
+        space_sep = is_digit & pending_space
+        register = explicit_sep | space_sep
+        sep_char = np.where(explicit_sep, c, _SPACE_CODE).astype(np.uint32)
+
+        # Poprzedni separator staje się separatorem tysięcy - grupa musi mieć 3 cyfry
+        has_previous = register & (sep_count > 0)
+        bad |= has_previous & ((digits_since_sep != 3) | (last_sep != first_sep))
+        is_first = register & (sep_count == 0)
+        digits_before_first_sep = np.where(is_first, digit_count, digits_before_first_sep)
+        first_sep = np.where(is_first, sep_char, first_sep)
+        last_sep = np.where(register, sep_char, last_sep)
+        sep_count += register
+        digits_since_sep = np.where(register, 0, digits_since_sep).astype(np.int16)
+
+        # Cyfra
+        leading_zero = np.where(is_digit & ~started, c == 48, leading_zero)
+        acc = np.where(is_digit, acc * 10 + (c.astype(np.int64) - 48), acc)
+        digit_count += is_digit
+        digits_since_sep += is_digit
+        started |= is_digit
+
+        # Znaki przed i po kwocie
+        negative |= (is_minus | is_open) & ~started
+        trailing = started & ~is_digit & (is_currency | is_minus | is_close)
+        negative |= trailing & (is_minus | is_close)
+        ended |= trailing
+        pending_space = np.where(is_digit | trailing | explicit_sep, False, pending_space)
+        pending_space |= is_space & started & ~ended
+
+    # Ostatni separator jest dziesiętny gdy to '.' lub ',' z 0-2 cyframi po nim
+    last_is_decimal_char = (last_sep == ord('.')) | (last_sep == ord(','))
+    decimal = (sep_count > 0) & last_is_decimal_char & (digits_since_sep <= 2)
+    group_count = sep_count - decimal
+    bad |= (sep_count > 0) & ~decimal & ((digits_since_sep != 3) | (last_sep != first_sep))
+    bad |= decimal & (sep_count > 1) & (last_sep == first_sep)
+    bad |= (group_count > 0) & ((digits_before_first_sep < 1) | (digits_before_first_sep > 3) | leading_zero)
+    bad |= (digit_count == 0) | (digit_count > MAX_AMOUNT_DIGITS)
+
+    frac_digits = np.where(decimal, digits_since_sep, 0)
+    grosze = np.where(frac_digits == 0, acc * 100, np.where(frac_digits == 1, acc * 10, acc))
+    grosze = np.where(negative, -grosze, grosze).astype('float64')
+
+    empty = ~non_blank & ~too_long
+    grosze[bad | empty] = np.nan
+    return grosze, empty
+
+
+def _build_report(series, grosze, empty_mask, total):
+    """Buduje raport z parsowania - liczniki i przykłady błędnych komórek"""
+    missing = grosze.isna().to_numpy()
+    invalid_mask = missing & ~empty_mask
+    invalid_positions = np.flatnonzero(invalid_mask)[:MAX_REPORT_SAMPLES]
+    return {
+        'total': total,
+        'parsed': int(total - missing.sum()),
+        'empty': int(empty_mask.sum()),
+        'invalid': int(invalid_mask.sum()),
+        'invalid_rows': series.index[invalid_positions].tolist(),
+        'invalid_samples': [str(v) for v in series.iloc[invalid_positions].tolist()]
+    }
+
+
+def format_grosze(grosze):
+    """Formatuje kwotę w groszach w stylu PL, np. 123456 -> '1 234,56'"""
+    if grosze is None or pd.isna(grosze):
+        return ''
+    sign = '-' if grosze < 0 else ''
+    zlote, gr = divmod(abs(int(grosze)), 100)
+    return f"{sign}{zlote:,}".replace(',', ' ') + f",{gr:02d}"
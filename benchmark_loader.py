@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark wczytywania plików z należnościami
+
+Generuje powtarzalne (seed) pliki w formatach z ERP (UTF-16-LE TSV, CP1250 CSV
+ze średnikiem, UTF-8 CSV, xlsx) i mierzy czas oraz szczytową pamięć etapów
+DataProcessor: load_excel_file, clean_data, mapowanie, filter_zero_amount_rows
+i get_mapped_data. Wyniki są zapisywane jako JSON; z --compare porównuje je
+z poprzednim wynikiem i kończy się kodem 1, jeśli któryś etap zwolnił.
+
+Przykład:
+    python benchmark_loader.py --rows 1000,100000 --output wyniki.json
+    python benchmark_loader.py --rows 100000 --compare wyniki.json
+"""
+
+import sys
+import os
+import argparse
+import json
+import logging
+import platform
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+
+from data_processor import DataProcessor
+from mapping_profiles import MappingProfileStore
+from example_data import generate_receivables, write_receivables_file, RECEIVABLES_FILE_FORMATS
+
+# Pliki xlsx większe od tego limitu nie są generowane (zapis przez openpyxl trwa zbyt długo)
+DEFAULT_MAX_XLSX_ROWS = 200000
+
+# Etap jest uznawany za wolniejszy, gdy czas wzrośnie ponad ten mnożnik
+DEFAULT_REGRESSION_THRESHOLD = 1.25
+
+FILE_EXTENSIONS = {'utf16_tsv': 'tsv', 'cp1250_csv': 'csv', 'utf8_csv': 'csv', 'xlsx': 'xlsx'}
+
+
+def run_stages(file_path):
+    """Wykonuje etapy przetwarzania pliku - zwraca listę (nazwa etapu, funkcja)"""
+    processor = DataProcessor()
+    # Pusty magazyn profili - zapisane profile nie mogą skracać ścieżki wczytywania
+    processor.profile_store = MappingProfileStore(os.path.join(os.path.dirname(file_path), 'profiles.json'))
+
+    def load():
+        if not processor.load_excel_file(file_path):
+            raise RuntimeError(f"Nie udało się wczytać pliku {file_path}")
+
+    def mapping():
+        processor.column_mapping = {}
+        processor.apply_smart_mapping()
+
+    return [
+        ('load_excel_file', load),
+        ('clean_data', processor.clean_data),
+        ('mapping', mapping),
+        ('filter_zero_amount_rows', processor.filter_zero_amount_rows),
+        ('get_mapped_data', processor.get_mapped_data)
+    ], processor
+
+
+def measure_file(file_path, measure_memory=True):
+    """Mierzy czas (oraz osobnym przebiegiem pamięć) każdego etapu dla pliku"""
+    results = {}
+
+    stages, processor = run_stages(file_path)
+    for name, stage in stages:
+        start = time.perf_counter()
+        stage()
+        results[name] = {'seconds': round(time.perf_counter() - start, 4)}
+    results['_rows_after_filter'] = len(processor.excel_data)
+
+    # Pamięć mierzona osobno - tracemalloc wyraźnie spowalnia wykonanie
+    if measure_memory:
+        stages, _ = run_stages(file_path)
+        tracemalloc.start()
+        try:
+            for name, stage in stages:
+                # Szczyt ponad pamięć zajętą przed etapem (np. przez wczytane już dane)
+                before, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                stage()
+                peak = tracemalloc.get_traced_memory()[1] - before
+                results[name]['peak_mb'] = round(peak / 1024 / 1024, 2)
+        finally:
+            tracemalloc.stop()
+
+    return results
+
+
+def run_benchmark(row_counts, formats, seed=42, measure_memory=True, max_xlsx_rows=DEFAULT_MAX_XLSX_ROWS,
+                  work_dir=None):
+    """Uruchamia benchmark dla wszystkich liczb wierszy i formatów - zwraca słownik wyników"""
+    results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'seed': seed,
+        'cases': []
+    }
+
+    with tempfile.TemporaryDirectory(dir=work_dir) as directory:
+        for rows in row_counts:
+            data = generate_receivables(rows, seed=seed)
+            for file_format in formats:
+                case = {'format': file_format, 'rows': rows}
+                if file_format == 'xlsx' and rows > max_xlsx_rows:
+                    case['skipped'] = f"xlsx powyżej {max_xlsx_rows} wierszy"
+                    results['cases'].append(case)
+                    print(f"⏭️ {file_format:>10} {rows:>9} wierszy: pominięto ({case['skipped']})")
+                    continue
+
+                file_path = os.path.join(directory, f"naleznosci_{rows}.{FILE_EXTENSIONS[file_format]}")
+                write_receivables_file(data, file_path, file_format)
+                case['file_mb'] = round(os.path.getsize(file_path) / 1024 / 1024, 2)
+
+                stages = measure_file(file_path, measure_memory)
+                case['rows_after_filter'] = stages.pop('_rows_after_filter')
+                case['stages'] = stages
+                results['cases'].append(case)
+                os.remove(file_path)
+
+                summary = ', '.join(f"{name} {stage['seconds']:.2f}s" for name, stage in stages.items())
+                print(f"📊 {file_format:>10} {rows:>9} wierszy ({case['file_mb']} MB): {summary}")
+
+    return results
+
+
+def compare_results(current, previous, threshold=DEFAULT_REGRESSION_THRESHOLD):
+    """Porównuje wyniki z poprzednimi - zwraca listę opisów etapów, które zwolniły"""
+    previous_cases = {(case['format'], case['rows']): case for case in previous.get('cases', [])}
+    regressions = []
+    for case in current['cases']:
+        before = previous_cases.get((case['format'], case['rows']))
+        if not before or 'stages' not in case or 'stages' not in before:
+            continue
+        for name, stage in case['stages'].items():
+            old_seconds = before['stages'].get(name, {}).get('seconds')
+            # Bardzo krótkie etapy są zbyt zaszumione, by je porównywać
+            if not old_seconds or old_seconds < 0.01:
+                continue
+            ratio = stage['seconds'] / old_seconds
+            if ratio > threshold:
+                regressions.append(f"{case['format']} {case['rows']} wierszy, {name}: "
+                                   f"{old_seconds:.3f}s -> {stage['seconds']:.3f}s (x{ratio:.2f})")
+    return regressions
+
+
+def main():
+    """Uruchamia benchmark z wiersza poleceń"""
+    parser = argparse.ArgumentParser(description="Benchmark wczytywania plików z należnościami")
+    parser.add_argument('--rows', default='1000,10000,100000',
+                        help="liczby wierszy oddzielone przecinkami (np. 1000,100000,5000000)")
+    parser.add_argument('--formats', default=','.join(RECEIVABLES_FILE_FORMATS),
+                        help=f"formaty plików: {', '.join(RECEIVABLES_FILE_FORMATS)}")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='benchmark_loader.json', help="plik wyników JSON")
+    parser.add_argument('--compare', help="poprzedni plik wyników do porównania")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                        help="dopuszczalny mnożnik czasu etapu względem poprzedniego wyniku")
+    parser.add_argument('--no-memory', action='store_true', help="pomiń pomiar pamięci (szybciej)")
+    parser.add_argument('--max-xlsx-rows', type=int, default=DEFAULT_MAX_XLSX_ROWS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    row_counts = [int(value) for value in args.rows.split(',') if value]
+    formats = [value for value in args.formats.split(',') if value]
+    unknown = set(formats) - set(RECEIVABLES_FILE_FORMATS)
+    if unknown:
+        parser.error(f"nieznane formaty: {', '.join(sorted(unknown))}")
+
+    print("🚀 Benchmark wczytywania")
+    print("=" * 60)
+    results = run_benchmark(row_counts, formats, seed=args.seed, measure_memory=not args.no_memory,
+                            max_xlsx_rows=args.max_xlsx_rows)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"💾 Wyniki zapisane: {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        regressions = compare_results(results, previous, args.threshold)
+        if regressions:
+            print("❌ Wykryto spowolnienia:")
+            for regression in regressions:
+                print(f"   {regression}")
+            return 1
+        print("✅ Brak spowolnień względem poprzedniego wyniku")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
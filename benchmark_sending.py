@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark przepustowości kampanii wysyłki na lokalnych atrapach dostawców
+
+Uruchamia (w osobnym procesie) atrapy SMSAPI (/sms.do) i Microsoft Graph
+(/v1.0/me/sendMail) z konfigurowalnym opóźnieniem, odsetkiem błędów i odpowiedzi
+429, a następnie przepuszcza wygenerowaną kampanię przez SendingEngine - ten sam
+kod, którego używają /api/real_sending i WindykatorApp._send_reminders_with_delays.
+Raportuje wiadomości/s, opóźnienia p50/p95/p99, liczbę ponowień i czas CPU
+na wiadomość. Z --compare porównuje wynik z poprzednim i kończy się kodem 1,
+jeśli wysyłka zwolniła.
+
+Przykład:
+    python benchmark_sending.py --rows 1000 --latency-ms 50 --error-rate 0.01 --throttle-rate 0.02
+    python benchmark_sending.py --rows 1000 --compare benchmark_sending.json
+    python benchmark_sending.py --rows 1000 --accounts 4 --account-rate 5
+"""
+
+import sys
+import os
+import argparse
+import json
+import multiprocessing
+import platform
+import random
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+
+from data_processor import DataProcessor
+from email_sender import EmailSender
+from sms_sender import SMSSender
+from sending_engine import SendingEngine
+from sending_control import SendingControl, MAX_CONCURRENCY
+from sender_pool import SenderPool, PoolMember
+from send_retry import RetryPolicy, http_failure, exception_failure
+from example_data import generate_receivables
+from metrics import metrics, PROVIDER_REQUEST_SECONDS
+from logging_setup import setup_logging
+
+# Przepustowość jest uznawana za gorszą, gdy spadnie poniżej poprzedniej podzielonej przez ten mnożnik
+DEFAULT_REGRESSION_THRESHOLD = 1.25
+
+DEFAULT_EMAIL_TEMPLATE = "<p>Szanowni Państwo, {kontrahent}</p><p>Faktura {nr_faktury} na kwotę {kwota} zł " \
+                         "jest przeterminowana o {dni_po_terminie} dni.</p>"
+DEFAULT_SMS_TEMPLATE = "Przypominamy o platnosci faktury {nr_faktury} na kwote {kwota} zl ({dni_po_terminie} dni po terminie)."
+
+
+class MockProviderServer(ThreadingHTTPServer):
+    """Serwer HTTP atrapy dostawcy z opóźnieniem, błędami i odpowiedziami 429"""
+
+    daemon_threads = True
+
+    def __init__(self, provider, settings):
+        super().__init__(('127.0.0.1', 0), MockProviderHandler)
+        self.provider = provider
+        self.settings = settings
+        self.random = random.Random(settings.get('seed', 42))
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'ok': 0, 'errors': 0, 'throttled': 0}
+
+    def draw_response(self):
+        """Losuje opóźnienie (s) i rodzaj odpowiedzi: 'ok', 'error' lub 'throttled'"""
+        with self.lock:
+            latency = max(0.0, self.random.gauss(self.settings['latency_ms'], self.settings['jitter_ms'])) / 1000
+            draw = self.random.random()
+        if draw < self.settings['throttle_rate']:
+            return latency, 'throttled'
+        if draw < self.settings['throttle_rate'] + self.settings['error_rate']:
+            return latency, 'error'
+        return latency, 'ok'
+
+    def count(self, outcome):
+        """Zlicza obsłużone żądanie"""
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats[outcome] += 1
+
+
+class MockProviderHandler(BaseHTTPRequestHandler):
+    """Obsługa żądań atrapy SMSAPI (/sms.do) i Microsoft Graph (/v1.0/me/sendMail)"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        """Wyłącza logowanie każdego żądania na stderr"""
+
+    def _reply(self, status, body=b'', headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/_stats':
+            with self.server.lock:
+                body = json.dumps(self.server.stats).encode('utf-8')
+            self._reply(200, body, {'Content-Type': 'application/json'})
+        else:
+            self._reply(404)
+
+    def do_POST(self):
+        payload = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        latency, outcome = self.server.draw_response()
+        time.sleep(latency)
+        self.server.count({'ok': 'ok', 'error': 'errors', 'throttled': 'throttled'}[outcome])
+
+        if outcome == 'throttled':
+            self._reply(429, b'{"error":429,"message":"Too many requests"}',
+                        {'Content-Type': 'application/json', 'Retry-After': str(self.server.settings['retry_after'])})
+        elif outcome == 'error':
+            self._reply(503, b'{"error":503,"message":"Service unavailable"}', {'Content-Type': 'application/json'})
+        elif self.server.provider == 'smsapi':
+            number = parse_qs(payload.decode('utf-8')).get('to', [''])[0]
+            body = json.dumps({'count': 1, 'list': [{'id': f'{random.getrandbits(48):x}', 'points': 0.16,
+                                                     'number': number, 'status': 'QUEUE'}]})
+            self._reply(200, body.encode('utf-8'), {'Content-Type': 'application/json'})
+        else:
+            # Graph odpowiada na sendMail 202 Accepted bez treści
+            self._reply(202)
+
+
+def _serve_mock_providers(settings, ports_queue):
+    """Uruchamia atrapy SMSAPI i Graph (funkcja procesu potomnego)"""
+    servers = [MockProviderServer('smsapi', settings), MockProviderServer('graph', settings)]
+    for server in servers[1:]:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    ports_queue.put([server.server_address[1] for server in servers])
+    servers[0].serve_forever()
+
+
+def start_mock_providers(latency_ms=50.0, jitter_ms=10.0, error_rate=0.0, throttle_rate=0.0, retry_after=1, seed=42):
+    """Uruchamia atrapy dostawców w osobnym procesie (ich CPU nie wlicza się do pomiaru).
+
+    Zwraca (proces, adres SMSAPI, adres Graph).
+    """
+    settings = {
+        'latency_ms': latency_ms, 'jitter_ms': jitter_ms, 'error_rate': error_rate,
+        'throttle_rate': throttle_rate, 'retry_after': retry_after, 'seed': seed
+    }
+    ports_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve_mock_providers, args=(settings, ports_queue), daemon=True)
+    process.start()
+    sms_port, graph_port = ports_queue.get(timeout=30)
+    return process, f'http://127.0.0.1:{sms_port}', f'http://127.0.0.1:{graph_port}'
+
+
+def get_mock_stats(base_url):
+    """Pobiera liczniki żądań atrapy dostawcy"""
+    return requests.get(f'{base_url}/_stats', timeout=5).json()
+
+
+class GraphMockEmailSender(EmailSender):
+    """EmailSender wysyłający przez atrapę Microsoft Graph.
+
+    Autoryzacja O365 (przepływ z przeglądarką) nie da się wykonać bez udziału
+    użytkownika, więc send_email wysyła bezpośrednio żądanie sendMail w formacie
+    Graph; przygotowanie treści (send_reminder_email) pozostaje bez zmian.
+    """
+
+    def __init__(self, graph_url):
+        super().__init__(None, None)
+        self.graph_url = graph_url
+
+    def send_email(self, to_email, subject, html_content, from_name="Dział Windykacji"):
+        """Wysyła email przez atrapę Graph (/v1.0/me/sendMail)"""
+        try:
+            message = {
+                'subject': subject,
+                'body': {'contentType': 'HTML', 'content': html_content},
+                'toRecipients': [{'emailAddress': {'address': to_email}}]
+            }
+            with metrics.timer(PROVIDER_REQUEST_SECONDS, provider='graph'):
+                response = requests.post(f'{self.graph_url}/v1.0/me/sendMail',
+                                         json={'message': message, 'saveToSentItems': False}, timeout=30)
+            if response.status_code == 202:
+                return True, "Email wysłany pomyślnie"
+            return False, http_failure(f"Błąd HTTP: {response.status_code}", response.status_code, response.headers)
+        except requests.exceptions.RequestException as e:
+            return False, exception_failure(f"Błąd wysyłania email: {str(e)}", e)
+
+
+def prepare_items(rows, seed=42):
+    """Generuje pozycje kampanii w formacie podglądu aplikacji webowej (session['preview_data'])"""
+    processor = DataProcessor()
+    processor.excel_data = generate_receivables(rows, seed=seed, settled_ratio=0)
+    processor.apply_smart_mapping()
+    processor.apply_date_stage()
+    return processor.get_preview_data_mapped(max_rows=rows)
+
+
+def percentile(values, pct):
+    """Zwraca percentyl (interpolacja liniowa) z listy wartości"""
+    if not values:
+        return None
+    values = sorted(values)
+    position = (len(values) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def summarize_latencies(seconds):
+    """Zwraca statystyki opóźnień w milisekundach"""
+    return {
+        'count': len(seconds),
+        'p50_ms': round(percentile(seconds, 50) * 1000, 2) if seconds else None,
+        'p95_ms': round(percentile(seconds, 95) * 1000, 2) if seconds else None,
+        'p99_ms': round(percentile(seconds, 99) * 1000, 2) if seconds else None
+    }
+
+
+def run_campaign(items, sms_url, graph_url, send_email=True, send_sms=True, delay=0, max_attempts=1,
+                 accounts=1, account_rate=None):
+    """Przepuszcza kampanię przez SendingEngine i mierzy ją - zwraca słownik wyników.
+
+    max_attempts > 1 włącza ponowienia błędów przejściowych (RetryPolicy).
+    accounts > 1 lub account_rate wysyła przez pulę kont (sender_pool) z tempem
+    account_rate na konto i równoległością równą liczbie kont.
+    """
+    email_sender = GraphMockEmailSender(graph_url) if send_email else None
+    sms_sender = SMSSender('benchmark-token', None, f'{sms_url}/sms.do') if send_sms else None
+    control = None
+    if accounts > 1 or account_rate:
+        if send_email:
+            email_sender = SenderPool([PoolMember(f'graph-{i + 1}', GraphMockEmailSender(graph_url), account_rate)
+                                       for i in range(accounts)], provider='graph')
+        if send_sms:
+            sms_sender = SenderPool([PoolMember(f'smsapi-{i + 1}', SMSSender(f'benchmark-token-{i + 1}', None,
+                                                                              f'{sms_url}/sms.do'), account_rate)
+                                     for i in range(accounts)], provider='smsapi')
+        control = SendingControl(concurrency=min(MAX_CONCURRENCY, accounts))
+    engine = SendingEngine(
+        email_sender, sms_sender, DEFAULT_EMAIL_TEMPLATE, DEFAULT_SMS_TEMPLATE, delay=delay, control=control,
+        retry_policy=RetryPolicy(max_attempts, base_delay=0.05) if max_attempts > 1 else None
+    )
+
+    requests_before = {name: get_mock_stats(url)['requests'] for name, url in (('sms', sms_url), ('email', graph_url))}
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    results = engine.run(items, send_email, send_sms)
+    elapsed = time.perf_counter() - start
+    cpu_seconds = time.process_time() - cpu_start
+
+    channels = {}
+    messages = 0
+    for name, url in (('email', graph_url), ('sms', sms_url)):
+        statuses = [result[f'{name}_status'] for result in results if result[f'{name}_status']]
+        server_stats = get_mock_stats(url)
+        server_requests = server_stats['requests'] - requests_before[name]
+        channels[name] = {
+            'messages': len(statuses),
+            'sent': sum(1 for status in statuses if status['success']),
+            'failed': sum(1 for status in statuses if not status['success']),
+            # Każde żądanie ponad liczbę wiadomości to ponowienie
+            'retries': max(0, server_requests - len(statuses)),
+            'latency': summarize_latencies([status['seconds'] for status in statuses if 'seconds' in status])
+        }
+        messages += len(statuses)
+
+    return {
+        'items': len(results),
+        'messages': messages,
+        'seconds': round(elapsed, 3),
+        'messages_per_second': round(messages / elapsed, 2) if elapsed else None,
+        'cpu_ms_per_message': round(cpu_seconds * 1000 / messages, 3) if messages else None,
+        'retries': sum(channel['retries'] for channel in channels.values()),
+        'channels': channels
+    }
+
+
+def compare_results(current, previous, threshold=DEFAULT_REGRESSION_THRESHOLD):
+    """Porównuje wynik z poprzednim - zwraca listę opisów pogorszeń"""
+    regressions = []
+    old_rate = previous.get('campaign', {}).get('messages_per_second')
+    new_rate = current['campaign']['messages_per_second']
+    if old_rate and new_rate and old_rate / new_rate > threshold:
+        regressions.append(f"wiadomości/s: {old_rate} -> {new_rate}")
+    old_cpu = previous.get('campaign', {}).get('cpu_ms_per_message')
+    new_cpu = current['campaign']['cpu_ms_per_message']
+    if old_cpu and new_cpu and new_cpu / old_cpu > threshold:
+        regressions.append(f"CPU ms/wiadomość: {old_cpu} -> {new_cpu}")
+    return regressions
+
+
+def main():
+    """Uruchamia benchmark z wiersza poleceń"""
+    parser = argparse.ArgumentParser(description="Benchmark przepustowości kampanii wysyłki")
+    parser.add_argument('--rows', type=int, default=1000, help="liczba pozycji kampanii")
+    parser.add_argument('--channels', default='email,sms', help="kanały: email, sms lub email,sms")
+    parser.add_argument('--latency-ms', type=float, default=50.0, help="średnie opóźnienie odpowiedzi atrap")
+    parser.add_argument('--jitter-ms', type=float, default=10.0, help="odchylenie standardowe opóźnienia")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="odsetek odpowiedzi 503")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="odsetek odpowiedzi 429")
+    parser.add_argument('--retry-after', type=int, default=1, help="wartość nagłówka Retry-After przy 429")
+    parser.add_argument('--delay', type=float, default=0, help="przerwa między pozycjami (aplikacja używa 2 s)")
+    parser.add_argument('--max-attempts', type=int, default=1, help="liczba prób wiadomości (ponowienia 429/5xx)")
+    parser.add_argument('--accounts', type=int, default=1, help="liczba kont nadawczych w puli (sender_pool)")
+    parser.add_argument('--account-rate', type=float, help="tempo jednego konta puli (wiadomości/s)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--log-level', default='WARNING', help="poziom logowania podczas pomiaru")
+    parser.add_argument('--output', default='benchmark_sending.json', help="plik wyników JSON")
+    parser.add_argument('--compare', help="poprzedni plik wyników do porównania")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    setup_logging(level=args.log_level)
+
+    channels = {value.strip() for value in args.channels.split(',') if value.strip()}
+    unknown = channels - {'email', 'sms'}
+    if unknown or not channels:
+        parser.error(f"nieznane kanały: {', '.join(sorted(unknown))}")
+
+    print("🚀 Benchmark wysyłki")
+    print("=" * 60)
+    items = prepare_items(args.rows, seed=args.seed)
+    print(f"📋 Przygotowano {len(items)} pozycji")
+
+    process, sms_url, graph_url = start_mock_providers(args.latency_ms, args.jitter_ms, args.error_rate,
+                                                       args.throttle_rate, args.retry_after, args.seed)
+    try:
+        campaign = run_campaign(items, sms_url, graph_url, 'email' in channels, 'sms' in channels, args.delay,
+                                args.max_attempts, args.accounts, args.account_rate)
+    finally:
+        process.terminate()
+        process.join()
+
+    results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'settings': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'campaign': campaign
+    }
+
+    print(f"📊 {campaign['messages']} wiadomości w {campaign['seconds']} s: "
+          f"{campaign['messages_per_second']} wiad./s, CPU {campaign['cpu_ms_per_message']} ms/wiad., "
+          f"ponowienia {campaign['retries']}")
+    for name, channel in campaign['channels'].items():
+        latency = channel['latency']
+        print(f"   {name:>5}: wysłano {channel['sent']}, błędy {channel['failed']}, "
+              f"p50 {latency['p50_ms']} ms, p95 {latency['p95_ms']} ms, p99 {latency['p99_ms']} ms")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"💾 Wyniki zapisane: {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        regressions = compare_results(results, previous, args.threshold)
+        if regressions:
+            print("❌ Wykryto spowolnienia:")
+            for regression in regressions:
+                print(f"   {regression}")
+            return 1
+        print("✅ Brak spowolnień względem poprzedniego wyniku")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""
+Moduł wyłącznika obwodu dostawców wysyłki (Graph, SMSAPI)
+
+Gdy dostawca nie odpowiada, każda wiadomość czekałaby na timeout żądania
+(do 30 s), więc kampania na 1000 pozycji traciłaby godziny. CircuitBreaker
+liczy wyniki ostatnich wywołań dostawcy i po przekroczeniu progu błędów
+otwiera obwód: kolejne wiadomości są od razu pomijane ze statusem 'skipped'
+(silnik odkłada je do DeadLetterStore z powodem 'circuit_open', harmonogram
+przesuwa ich termin). Po open_seconds obwód przechodzi w stan półotwarty
+i przepuszcza próbne wywołania - ich sukces zamyka obwód, błąd otwiera go ponownie.
+
+Za błąd dostawcy uznawane są tylko błędy przejściowe (timeout, błąd połączenia,
+HTTP 429/5xx - zob. send_retry) - odrzucenie pojedynczej wiadomości (np. błędny
+numer) oznacza, że dostawca działa.
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+from metrics import metrics, CIRCUIT_STATE
+
+# Stany obwodu
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+# Wartość metryki CIRCUIT_STATE dla stanu
+STATE_VALUES = {STATE_CLOSED: 0, STATE_HALF_OPEN: 1, STATE_OPEN: 2}
+
+# Domyślne parametry: udział błędów wśród ostatnich wywołań, po którym obwód się otwiera
+DEFAULT_FAILURE_RATE = 0.5
+DEFAULT_MIN_CALLS = 5
+DEFAULT_WINDOW_SIZE = 20
+DEFAULT_OPEN_SECONDS = 30.0
+DEFAULT_HALF_OPEN_PROBES = 1
+
+# Najkrótszy czas do kolejnej próby pominiętej wiadomości (gdy trwa wywołanie próbne)
+PROBE_WAIT_SECONDS = 1.0
+
+# Powód w DeadLetterStore dla wiadomości pominiętych przy otwartym obwodzie
+SKIPPED_REASON = 'circuit_open'
+
+
+class CircuitBreaker:
+    """Klasa wyłącznika obwodu jednego dostawcy - bezpieczna dla wielu wątków"""
+
+    def __init__(self, provider, failure_rate=DEFAULT_FAILURE_RATE, min_calls=DEFAULT_MIN_CALLS,
+                 window_size=DEFAULT_WINDOW_SIZE, open_seconds=DEFAULT_OPEN_SECONDS,
+                 half_open_probes=DEFAULT_HALF_OPEN_PROBES, clock=time.monotonic):
+        """Inicjalizuje wyłącznik.
+
+        Obwód otwiera się, gdy wśród ostatnich window_size wywołań (co najmniej
+        min_calls) udział błędów osiągnie failure_rate. half_open_probes - liczba
+        udanych wywołań próbnych potrzebnych do zamknięcia obwodu.
+        """
+        self.provider = provider
+        self.failure_rate = float(failure_rate)
+        self.min_calls = int(min_calls)
+        self.window_size = int(window_size)
+        self.open_seconds = float(open_seconds)
+        self.half_open_probes = int(half_open_probes)
+        if not 0 < self.failure_rate <= 1:
+            raise ValueError("Próg błędów obwodu musi być z zakresu (0, 1]")
+        if self.min_calls < 1 or self.window_size < self.min_calls:
+            raise ValueError("Okno obwodu musi obejmować co najmniej min_calls >= 1 wywołań")
+        if self.open_seconds < 0 or self.half_open_probes < 1:
+            raise ValueError("Błędne parametry otwarcia obwodu")
+        self.logger = logging.getLogger(__name__)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._calls = deque(maxlen=self.window_size)
+        self._state = STATE_CLOSED
+        self._opened_at = None
+        self._probes = 0
+        self._probe_successes = 0
+
+    def _set_state(self, state):
+        self._state = state
+        metrics.set(CIRCUIT_STATE, STATE_VALUES[state], provider=self.provider)
+
+    def _open(self, reason):
+        self._set_state(STATE_OPEN)
+        self._opened_at = self._clock()
+        self._calls.clear()
+        self._probes = self._probe_successes = 0
+        self.logger.warning(f"🔌 Obwód dostawcy {self.provider} otwarty ({reason}) - "
+                            f"wiadomości pomijane przez {self.open_seconds:.0f} s")
+
+    @property
+    def state(self):
+        """Aktualny stan obwodu (otwarty przechodzi w półotwarty po open_seconds)"""
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def _refresh(self):
+        if self._state == STATE_OPEN and self._clock() - self._opened_at >= self.open_seconds:
+            self._set_state(STATE_HALF_OPEN)
+            self.logger.info(f"🔌 Obwód dostawcy {self.provider} półotwarty - wywołanie próbne")
+
+    def allow(self):
+        """Czy wywołać dostawcę - False, gdy obwód jest otwarty lub trwają już wywołania próbne.
+
+        Każde dopuszczone wywołanie musi zakończyć się record() albo release().
+        """
+        with self._lock:
+            self._refresh()
+            if self._state == STATE_CLOSED:
+                return True
+            if self._state == STATE_HALF_OPEN and self._probes < self.half_open_probes - self._probe_successes:
+                self._probes += 1
+                return True
+            return False
+
+    def release(self):
+        """Zwalnia dopuszczone wywołanie, do którego nie doszło (np. anulowano kampanię)"""
+        with self._lock:
+            if self._state == STATE_HALF_OPEN and self._probes:
+                self._probes -= 1
+
+    def record(self, success):
+        """Zapisuje wynik wywołania dostawcy (success - dostawca odpowiedział poprawnie)"""
+        with self._lock:
+            if self._state == STATE_HALF_OPEN:
+                if self._probes:
+                    self._probes -= 1
+                if not success:
+                    self._open("nieudane wywołanie próbne")
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_probes:
+                    self._set_state(STATE_CLOSED)
+                    self._calls.clear()
+                    self._probe_successes = 0
+                    self.logger.info(f"🔌 Obwód dostawcy {self.provider} zamknięty - dostawca odpowiada")
+                return
+            if self._state == STATE_OPEN:
+                # Wynik wywołania rozpoczętego przed otwarciem obwodu
+                return
+            self._calls.append(bool(success))
+            if len(self._calls) >= self.min_calls:
+                failures = self._calls.count(False)
+                if failures / len(self._calls) >= self.failure_rate:
+                    self._open(f"{failures} z {len(self._calls)} ostatnich wywołań nieudanych")
+
+    def retry_in(self):
+        """Sekundy do kolejnej możliwej próby wywołania (0 - obwód zamknięty)"""
+        with self._lock:
+            self._refresh()
+            if self._state == STATE_CLOSED:
+                return 0.0
+            if self._state == STATE_OPEN:
+                return max(PROBE_WAIT_SECONDS, self.open_seconds - (self._clock() - self._opened_at))
+            return PROBE_WAIT_SECONDS
+
+    def skipped_status(self):
+        """Status kanału dla wiadomości pominiętej przy otwartym obwodzie"""
+        retry_in = self.retry_in()
+        return {'success': False, 'seconds': 0.0, 'skipped': True, 'retry_after': retry_in,
+                'message': f"Pominięto: dostawca {self.provider} niedostępny (obwód otwarty), "
+                           f"kolejna próba za {retry_in:.0f} s"}
+
+    def snapshot(self):
+        """Zwraca stan wyłącznika jako słownik"""
+        state = self.state
+        with self._lock:
+            calls = len(self._calls)
+            return {
+                'provider': self.provider,
+                'state': state,
+                'calls': calls,
+                'failures': self._calls.count(False),
+                'retry_in': None if state == STATE_CLOSED else round(
+                    max(0.0, self.open_seconds - (self._clock() - self._opened_at)), 1)
+            }
+
+
+class CircuitBreakers:
+    """Klasa przechowująca wyłączniki dostawców (tworzone przy pierwszym użyciu)"""
+
+    def __init__(self, settings=None, clock=time.monotonic):
+        """Inicjalizuje zestaw wyłączników z parametrami settings (argumenty CircuitBreaker)"""
+        self.settings = dict(settings or {})
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._breakers = {}
+        # Sprawdzenie parametrów od razu, a nie przy pierwszej wysyłce
+        CircuitBreaker('config', clock=clock, **self.settings)
+
+    @classmethod
+    def from_config(cls, settings):
+        """Tworzy wyłączniki ze słownika ustawień (None - bez wyłączników)"""
+        if settings is None:
+            return None
+        return cls(settings)
+
+    def get(self, provider):
+        """Zwraca wyłącznik dostawcy"""
+        with self._lock:
+            breaker = self._breakers.get(provider)
+            if breaker is None:
+                breaker = CircuitBreaker(provider, clock=self._clock, **self.settings)
+                self._breakers[provider] = breaker
+                metrics.set(CIRCUIT_STATE, STATE_VALUES[STATE_CLOSED], provider=provider)
+            return breaker
+
+    def snapshot(self):
+        """Zwraca stan wszystkich wyłączników"""
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return [breaker.snapshot() for breaker in breakers]
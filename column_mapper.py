@@ -0,0 +1,302 @@
+"""
+Moduł automatycznego mapowania kolumn pliku na pola aplikacji
+
+Nagłówki są normalizowane raz (bez polskich znaków, małe litery, podział na słowa)
+i indeksowane odwrotnie: słowo -> pola docelowe. Każda para pole-kolumna dostaje
+ocenę z nagłówka oraz z próbki wartości (suma kontrolna NIP, email, kształt numeru
+telefonu, kwoty, daty), a przypisanie jest wybierane globalnie (algorytm węgierski),
+więc jedna kolumna nie zostanie "zabrana" przez pierwsze pasujące pole.
+"""
+import re
+import unicodedata
+import logging
+
+import numpy as np
+import pandas as pd
+
+from amount_parser import parse_amounts
+
+# Słowa kluczowe pól: całe frazy (po normalizacji) oraz pojedyncze słowa z wagami
+TARGET_KEYWORDS = {
+    'kontrahent': {
+        'phrases': ['kontrahent', 'nazwa kontrahenta', 'nabywca', 'nazwa nabywcy', 'klient', 'nazwa klienta',
+                    'firma', 'nazwa firmy', 'odbiorca', 'dluznik', 'company', 'customer', 'customer name'],
+        'tokens': {'kontrahent': 1.0, 'kontrahenta': 1.0, 'nabywca': 0.9, 'nabywcy': 0.9, 'klient': 0.9,
+                   'klienta': 0.9, 'firma': 0.8, 'firmy': 0.8, 'odbiorca': 0.8, 'dluznik': 0.9,
+                   'company': 0.8, 'customer': 0.8, 'nazwa': 0.6, 'name': 0.5}
+    },
+    'nip': {
+        'phrases': ['nip', 'nip nabywcy', 'nip kontrahenta', 'tax id', 'vat id'],
+        'tokens': {'nip': 1.0, 'taxid': 0.8, 'vat': 0.4, 'tax': 0.4}
+    },
+    'nr_faktury': {
+        'phrases': ['numer faktury', 'nr faktury', 'numer', 'nr', 'nr dokumentu', 'numer dokumentu',
+                    'invoice number', 'invoice no', 'faktura'],
+        'tokens': {'faktura': 0.8, 'faktury': 0.8, 'invoice': 0.8, 'dokument': 0.6, 'dokumentu': 0.6,
+                   'numer': 0.6, 'nr': 0.5, 'number': 0.5, 'no': 0.3}
+    },
+    'email': {
+        'phrases': ['email', 'e mail', 'mail', 'adres email', 'adres e mail'],
+        'tokens': {'email': 1.0, 'mail': 1.0, 'adres': 0.3}
+    },
+    'telefon': {
+        'phrases': ['telefon', 'telefon komorkowy', 'tel', 'nr telefonu', 'numer telefonu', 'phone', 'mobile', 'gsm'],
+        'tokens': {'telefon': 1.0, 'telefonu': 1.0, 'tel': 0.9, 'phone': 1.0, 'komorkowy': 0.8,
+                   'komorka': 0.8, 'gsm': 0.8, 'mobile': 0.8}
+    },
+    'kwota': {
+        'phrases': ['kwota', 'netto', 'do zaplaty', 'kwota do zaplaty', 'saldo', 'amount', 'pozostalo do zaplaty'],
+        'tokens': {'kwota': 1.0, 'netto': 0.9, 'brutto': 0.85, 'saldo': 0.85, 'naleznosc': 0.85,
+                   'zaleglosc': 0.8, 'amount': 1.0, 'wartosc': 0.7, 'zaplaty': 0.6, 'pozostalo': 0.6}
+    },
+    'data_faktury': {
+        'phrases': ['data', 'data faktury', 'data wystawienia', 'data dokumentu', 'invoice date', 'date'],
+        'tokens': {'data': 0.6, 'date': 0.6, 'wystawienia': 0.9, 'issue': 0.6}
+    },
+    'termin_platnosci': {
+        'phrases': ['termin', 'termin platnosci', 'termin zaplaty', 'platnosc do', 'due date', 'data platnosci'],
+        'tokens': {'termin': 0.8, 'platnosci': 0.7, 'platnosc': 0.6, 'due': 0.8, 'zaplaty': 0.3}
+    },
+    'dni_po_terminie': {
+        'phrases': ['dni po terminie', 'dni przeterminowania', 'days overdue', 'overdue days', 'opoznienie'],
+        'tokens': {'dni': 0.6, 'terminie': 0.6, 'overdue': 1.0, 'przeterminowania': 1.0, 'opoznienie': 0.9,
+                   'days': 0.6}
+    }
+}
+
+# Pola, które można rozpoznać po samych wartościach (bez pasującego nagłówka)
+STRONG_VALUE_TARGETS = {'nip', 'email', 'telefon'}
+
+# Wagi oceny nagłówka i oceny wartości w ocenie łącznej
+HEADER_WEIGHT = 0.7
+VALUE_WEIGHT = 0.3
+
+# Minimalna ocena łączna, przy której kolumna jest mapowana
+MIN_MATCH_SCORE = 0.35
+
+# Długość prefiksu dla dopasowania odmian słów (np. 'faktury' ~ 'faktura')
+FUZZY_PREFIX_LENGTH = 5
+
+# Liczba wierszy próbki do rozpoznawania wartości
+VALUE_SAMPLE_SIZE = 50
+
+_NIP_WEIGHTS = np.array([6, 5, 7, 2, 3, 4, 5, 6, 7])
+_EMAIL_PATTERN = r'[^@\s]+@[^@\s]+\.[a-zA-Z]{2,}'
+_DATE_PATTERN = r'\d{1,4}[-./]\d{1,2}[-./]\d{1,4}(?:[ T]\d{1,2}:\d{2}(?::\d{2})?)?'
+_INVOICE_PATTERN = r'.*[A-Za-z].*\d.*|.*\d.*[/\-].*'
+_TOKEN_SPLIT = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_header(name):
+    """Normalizuje nagłówek: małe litery, bez polskich znaków, słowa rozdzielone spacją"""
+    text = str(name).lower().replace('ł', 'l')
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(token for token in _TOKEN_SPLIT.split(text) if token)
+
+
+class ColumnMapper:
+    """Klasa wybierająca najlepsze mapowanie kolumn na pola aplikacji"""
+
+    def __init__(self, keywords=None):
+        """Inicjalizuje ColumnMapper i buduje indeks słów kluczowych"""
+        self.keywords = keywords or TARGET_KEYWORDS
+        self.targets = list(self.keywords)
+        self.logger = logging.getLogger(__name__)
+        self._header_index = {}  # nagłówek -> znormalizowane słowa
+        self._build_keyword_index()
+
+    def _build_keyword_index(self):
+        """Buduje indeksy odwrotne: fraza/słowo/prefiks -> [(pole, waga)]"""
+        self._phrase_index = {}
+        self._token_index = {}
+        self._prefix_index = {}
+        for target, keywords in self.keywords.items():
+            for phrase in keywords['phrases']:
+                self._phrase_index.setdefault(normalize_header(phrase), []).append(target)
+            for token, weight in keywords['tokens'].items():
+                self._token_index.setdefault(token, []).append((target, weight))
+                if len(token) >= FUZZY_PREFIX_LENGTH:
+                    self._prefix_index.setdefault(token[:FUZZY_PREFIX_LENGTH], []).append((target, weight * 0.8))
+
+    def _normalized_tokens(self, column):
+        """Zwraca znormalizowaną nazwę i słowa nagłówka (z pamięci podręcznej)"""
+        if column not in self._header_index:
+            normalized = normalize_header(column)
+            self._header_index[column] = (normalized, normalized.split())
+        return self._header_index[column]
+
+    def score_header(self, column):
+        """Ocenia nagłówek względem wszystkich pól - zwraca {pole: ocena 0-1}"""
+        normalized, tokens = self._normalized_tokens(column)
+        scores = {}
+        if not tokens:
+            return scores
+
+        # Dokładna fraza (także w wersji sklejonej, np. 'e-mail' -> 'email')
+        for phrase in (normalized, normalized.replace(' ', '')):
+            for target in self._phrase_index.get(phrase, []):
+                scores[target] = 1.0
+
+        matched = {}
+        for token in tokens:
+            hits = self._token_index.get(token)
+            if hits is None and len(token) >= FUZZY_PREFIX_LENGTH:
+                hits = self._prefix_index.get(token[:FUZZY_PREFIX_LENGTH], [])
+            for target, weight in hits or []:
+                matched.setdefault(target, []).append(weight)
+
+        for target, weights in matched.items():
+            if scores.get(target) == 1.0:
+                continue
+            weights.sort(reverse=True)
+            coverage = len(weights) / len(tokens)
+            score = min(1.0, weights[0] + 0.2 * sum(weights[1:])) * (0.6 + 0.4 * coverage)
+            scores[target] = round(score, 4)
+        return scores
+
+    def score_values(self, sample, columns):
+        """Ocenia próbki wartości kolumn - zwraca {pole: tablica odsetków pasujących wartości}.
+
+        Próbki wszystkich kolumn są sklejane w jedną serię, więc każdy wzorzec jest
+        sprawdzany jednym wywołaniem niezależnie od liczby kolumn.
+        """
+        count = len(columns)
+        column_ids = np.repeat(np.arange(count), len(sample))
+        values = pd.Series(np.concatenate([sample[column].to_numpy(dtype=object) for column in columns])
+                           if count else [], dtype=object)
+        text = values.astype(str).str.strip()
+        present = (values.notna() & (text != '')).to_numpy()
+        column_ids, values, text = column_ids[present], values[present], text[present]
+        totals = np.bincount(column_ids, minlength=count)
+
+        def ratio(matches):
+            matches = np.asarray(matches, dtype=bool)
+            return np.bincount(column_ids[matches], minlength=count) / np.maximum(totals, 1)
+
+        scores = {}
+        digits = text.str.replace(r'^PL|[\s\-]', '', regex=True)
+        scores['nip'] = ratio(self._is_nip(digits))
+        is_email = text.str.fullmatch(_EMAIL_PATTERN).to_numpy(dtype=bool)
+        scores['email'] = ratio(is_email)
+
+        phone_digits = text.str.replace(r'[\s\-()+]', '', regex=True)
+        is_phone = phone_digits.str.fullmatch(r'(?:48)?\d{9}') & ~text.str.contains(r'[.,]\d{2}$', regex=True)
+        scores['telefon'] = ratio(is_phone.to_numpy(dtype=bool))
+
+        is_date = text.str.fullmatch(_DATE_PATTERN).to_numpy(dtype=bool)
+        is_datetime_column = np.array([pd.api.types.is_datetime64_any_dtype(sample[column].dtype) for column in columns],
+                                      dtype=bool)
+        date_ratio = np.where(is_datetime_column, 1.0, ratio(is_date))
+        scores['data_faktury'] = scores['termin_platnosci'] = date_ratio
+
+        grosze, report = parse_amounts(values.reset_index(drop=True))
+        scores['kwota'] = ratio(grosze.notna().to_numpy()) * (1 - date_ratio) * (1 - scores['telefon'])
+
+        numbers = pd.to_numeric(values, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+        is_numeric_column = np.array([pd.api.types.is_numeric_dtype(sample[column].dtype) for column in columns],
+                                     dtype=bool)
+        with np.errstate(invalid='ignore'):
+            is_days = (numbers == np.round(numbers)) & (np.abs(numbers) <= 3650)
+        scores['dni_po_terminie'] = np.where(is_numeric_column, ratio(is_days), 0.0)
+
+        not_email = 1 - scores['email']
+        has_words = text.str.contains(r'[^\W\d_]{3,}', regex=True).to_numpy(dtype=bool)
+        scores['kontrahent'] = np.where(is_numeric_column, 0.0, ratio(has_words) * not_email)
+        is_invoice = text.str.fullmatch(_INVOICE_PATTERN).to_numpy(dtype=bool)
+        scores['nr_faktury'] = np.where(is_numeric_column, 0.0, ratio(is_invoice) * (1 - date_ratio) * not_email)
+        return scores
+
+    def _is_nip(self, digits):
+        """Zwraca maskę wartości będących poprawnym NIP (10 cyfr z sumą kontrolną)"""
+        is_nip = digits.str.fullmatch(r'\d{10}').to_numpy(dtype=bool, copy=True)
+        if is_nip.any():
+            matrix = np.array([list(value) for value in digits[is_nip]], dtype=np.int64)
+            checksum = (matrix[:, :9] @ _NIP_WEIGHTS) % 11
+            is_nip[is_nip] = checksum == matrix[:, 9]
+        return is_nip
+
+    def score_matrix(self, data, columns=None, targets=None):
+        """Buduje macierz ocen [pole x kolumna] łącząc nagłówek i próbkę wartości"""
+        columns = list(data.columns if columns is None else columns)
+        targets = list(self.targets if targets is None else targets)
+        target_positions = {target: i for i, target in enumerate(targets)}
+        scores = np.zeros((len(targets), len(columns)))
+        value_scores = self.score_values(data.head(VALUE_SAMPLE_SIZE), columns)
+
+        for j, column in enumerate(columns):
+            header_scores = self.score_header(column)
+            for target, i in target_positions.items():
+                header_score = header_scores.get(target, 0.0)
+                value_score = value_scores[target][j] if target in value_scores else 0.0
+                if header_score > 0:
+                    scores[i, j] = HEADER_WEIGHT * header_score + VALUE_WEIGHT * value_score
+                elif target in STRONG_VALUE_TARGETS and value_score >= 0.8:
+                    scores[i, j] = 0.5 * value_score
+        return scores
+
+    def suggest_mapping(self, data, exclude=None):
+        """Proponuje mapowanie {pole: kolumna} dla pól i kolumn jeszcze nie zmapowanych"""
+        exclude = exclude or {}
+        used_columns = {column for column in exclude.values() if column in data.columns}
+        targets = [target for target in self.targets if exclude.get(target) not in data.columns]
+        columns = [column for column in data.columns if column not in used_columns]
+        if not targets or not columns:
+            return {}
+
+        scores = self.score_matrix(data, columns, targets)
+        mapping = {}
+        for i, j in assign_max_score(scores):
+            if scores[i, j] >= MIN_MATCH_SCORE:
+                mapping[targets[i]] = columns[j]
+                self.logger.debug("Mapowanie '%s' -> '%s' (ocena %.2f)", columns[j], targets[i], scores[i, j])
+        return mapping
+
+
+def assign_max_score(scores):
+    """Wybiera przypisanie wierszy do kolumn o maksymalnej sumie ocen (algorytm węgierski).
+
+    Zwraca listę par (wiersz, kolumna); każda kolumna jest użyta najwyżej raz.
+    """
+    rows, cols = scores.shape
+    if rows == 0 or cols == 0:
+        return []
+    transposed = rows > cols
+    cost = -(scores.T if transposed else scores)
+    n, m = cost.shape
+
+    # Wersja O(n^2 * m) z potencjałami - n (pola) jest małe, m (kolumny) może być duże
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    match = np.zeros(m + 1, dtype=np.int64)  # match[kolumna] = wiersz (1-indeksowane, 0 = wolna)
+    way = np.zeros(m + 1, dtype=np.int64)
+    for row in range(1, n + 1):
+        match[0] = row
+        col0 = 0
+        min_slack = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[col0] = True
+            row0 = match[col0]
+            slack = cost[row0 - 1] - u[row0] - v[1:]
+            free = ~used[1:]
+            improve = free & (slack < min_slack[1:])
+            min_slack[1:][improve] = slack[improve]
+            way[1:][improve] = col0
+            candidates = np.where(free, min_slack[1:], np.inf)
+            col1 = int(np.argmin(candidates)) + 1
+            delta = candidates[col1 - 1]
+            u[match[used]] += delta
+            v[used] -= delta
+            min_slack[1:][free] -= delta
+            col0 = col1
+            if match[col0] == 0:
+                break
+        while col0:
+            col1 = way[col0]
+            match[col0] = match[col1]
+            col0 = col1
+
+    pairs = [(int(match[j]) - 1, j - 1) for j in range(1, m + 1) if match[j]]
+    if transposed:
+        pairs = [(j, i) for i, j in pairs]
+    return sorted(pairs)
@@ -61,6 +61,105 @@ class Config:
             "sms_test_number": "48500123456"
         }
     
+    def load_priority_weights(self):
+        """Zwraca wagi przedziałów zaległości dla kolejności wysyłki (klucz 'priority_weights' w api_config.json).
+
+        Wartość null wyłącza kolejność według priorytetu (wysyłka w kolejności pliku).
+        """
+        from dispatch_queue import normalize_weights
+        api_config = self.load_api_config()
+        if 'priority_weights' in api_config and api_config['priority_weights'] is None:
+            return None
+        try:
+            return normalize_weights(api_config.get('priority_weights'))
+        except (TypeError, ValueError, AttributeError) as e:
+            print(f"⚠️ Błędne wagi priorytetu wysyłki: {str(e)} - używam domyślnych")
+            return normalize_weights()
+    
+    def load_schedule_settings(self):
+        """Zwraca ustawienia harmonogramu wysyłki (klucz 'schedule' w api_config.json: okna doręczeń, limity domen)"""
+        from sending_scheduler import normalize_settings
+        try:
+            return normalize_settings(self.load_api_config().get('schedule'))
+        except (TypeError, ValueError, AttributeError) as e:
+            print(f"⚠️ Błędne ustawienia harmonogramu wysyłki: {str(e)} - używam domyślnych")
+            return normalize_settings()
+    
+    def load_filter_zero_amounts_on_load(self):
+        """Czy usuwać pozycje z kwotą ≤ 0 już przy wczytywaniu pliku (klucz 'filter_zero_amounts_on_load', domyślnie nie)"""
+        return bool(self.load_api_config().get('filter_zero_amounts_on_load', False))
+    
+    def load_retry_settings(self):
+        """Zwraca ustawienia ponowień wysyłki (klucz 'retry' w api_config.json, null - bez ponowień)"""
+        from send_retry import DEFAULT_MAX_ATTEMPTS, DEFAULT_BASE_DELAY, DEFAULT_MAX_DELAY
+        settings = {'max_attempts': DEFAULT_MAX_ATTEMPTS, 'base_delay': DEFAULT_BASE_DELAY,
+                    'max_delay': DEFAULT_MAX_DELAY}
+        api_config = self.load_api_config()
+        if 'retry' in api_config and api_config['retry'] is None:
+            return None
+        if isinstance(api_config.get('retry'), dict):
+            settings.update(api_config['retry'])
+        return settings
+    
+    def load_circuit_breaker_settings(self):
+        """Zwraca ustawienia wyłączników obwodu dostawców (klucz 'circuit_breaker' w api_config.json, null - bez wyłączników)"""
+        from circuit_breaker import (DEFAULT_FAILURE_RATE, DEFAULT_MIN_CALLS, DEFAULT_WINDOW_SIZE,
+                                     DEFAULT_OPEN_SECONDS, DEFAULT_HALF_OPEN_PROBES)
+        settings = {'failure_rate': DEFAULT_FAILURE_RATE, 'min_calls': DEFAULT_MIN_CALLS,
+                    'window_size': DEFAULT_WINDOW_SIZE, 'open_seconds': DEFAULT_OPEN_SECONDS,
+                    'half_open_probes': DEFAULT_HALF_OPEN_PROBES}
+        api_config = self.load_api_config()
+        if 'circuit_breaker' in api_config and api_config['circuit_breaker'] is None:
+            return None
+        if isinstance(api_config.get('circuit_breaker'), dict):
+            settings.update(api_config['circuit_breaker'])
+        return settings
+    
+    def load_sender_accounts(self, channel, defaults=None):
+        """Zwraca konta nadawcze kanału ('email' lub 'sms') dla puli senderów (sender_pool).
+
+        Lista 'email_accounts' / 'sms_accounts' w api_config.json; brakujące pola kont
+        są uzupełniane z ustawień podstawowych (defaults - np. wartości z formularza).
+        Bez listy zwraca jedno konto z ustawień podstawowych, a bez konfiguracji - pustą listę.
+        """
+        if channel == 'email':
+            base_fields, required = ('client_id', 'client_secret'), ('client_id', 'client_secret')
+        else:
+            base_fields, required = ('sms_token', 'sms_sender', 'sms_url'), ('sms_token',)
+        api_config = self.load_api_config()
+        base = {field: api_config.get(field) for field in base_fields}
+        base.update({field: value for field, value in (defaults or {}).items() if value})
+        
+        accounts = []
+        for account in api_config.get(f'{channel}_accounts') or [{}]:
+            merged = dict(base)
+            merged.update({field: value for field, value in account.items() if value not in (None, '')})
+            if all(merged.get(field) for field in required):
+                accounts.append(merged)
+            else:
+                print(f"⚠️ Pominięto niekompletne konto {channel}: {account.get('name', '(bez nazwy)')}")
+        return accounts
+    
+    def load_sender_pool_strategy(self):
+        """Zwraca strategię wyboru konta puli senderów (klucz 'sender_pool' w api_config.json)"""
+        from sender_pool import normalize_strategy, DEFAULT_STRATEGY
+        settings = self.load_api_config().get('sender_pool') or {}
+        try:
+            return normalize_strategy(settings.get('strategy'))
+        except (ValueError, AttributeError) as e:
+            print(f"⚠️ Błędna strategia puli senderów: {str(e)} - używam domyślnej")
+            return DEFAULT_STRATEGY
+    
+    def get_token_store_file(self):
+        """Zwraca ścieżkę bazy tokenów Microsoft 365 (token_store.py)"""
+        from token_store import TOKEN_STORE_FILE
+        return os.path.join(self.config_dir, TOKEN_STORE_FILE)
+    
+    def get_dead_letters_file(self):
+        """Zwraca ścieżkę pliku wiadomości, których nie udało się wysłać"""
+        from send_retry import DEAD_LETTERS_FILE
+        return os.path.join(self.config_dir, DEAD_LETTERS_FILE)
+    
     def load_mapping(self):
         """Wczytuje mapowanie kolumn z pliku"""
         try:
@@ -82,10 +181,16 @@ class Config:
         except Exception as e:
             print(f"❌ Błąd zapisywania mapowania: {str(e)}")
     
-    def load_template(self, template_type):
-        """Wczytuje szablon email lub SMS z pliku"""
+    def load_template(self, template_type, bucket=None):
+        """Wczytuje szablon email lub SMS z pliku.
+        
+        Dla podanego przedziału zaległości (np. '31-60', '90+') najpierw szuka
+        szablonu dedykowanego, np. email_template_31-60.txt lub email_template_90plus.txt.
+        """
         try:
             filename = self.email_template_file if template_type == 'email' else self.sms_template_file
+            if bucket and os.path.exists(self._bucket_template_file(template_type, bucket)):
+                filename = self._bucket_template_file(template_type, bucket)
             if os.path.exists(filename):
                 with open(filename, 'r', encoding='utf-8') as f:
                     return f.read()
@@ -95,6 +200,25 @@ class Config:
             print(f"⚠️ Błąd wczytywania szablonu {template_type}: {str(e)}")
             return self.get_default_template(template_type)
     
+    def _bucket_template_file(self, template_type, bucket):
+        filename = self.email_template_file if template_type == 'email' else self.sms_template_file
+        base, ext = os.path.splitext(filename)
+        return f"{base}_{bucket.replace('+', 'plus')}{ext}"
+    
+    def load_bucket_templates(self, template_types, buckets):
+        """Wczytuje istniejące szablony dedykowane przedziałom zaległości - słownik {(typ, przedział): treść}"""
+        templates = {}
+        for template_type in template_types:
+            for bucket in buckets:
+                filename = self._bucket_template_file(template_type, bucket)
+                if os.path.exists(filename):
+                    try:
+                        with open(filename, 'r', encoding='utf-8') as f:
+                            templates[(template_type, bucket)] = f.read()
+                    except Exception as e:
+                        print(f"⚠️ Błąd wczytywania szablonu {template_type} ({bucket}): {str(e)}")
+        return templates
+    
     def save_template(self, template_type, content):
         """Zapisuje szablon email lub SMS do pliku"""
         try:
@@ -134,7 +258,8 @@ Dział Windykacji"""
             ('email', 'Email'),
             ('telefon', 'Telefon'),
             ('kwota', 'Kwota'),
-            ('data_faktury', 'Data Faktury')
+            ('data_faktury', 'Data Faktury'),
+            ('termin_platnosci', 'Termin Płatności')
         ]
     
     def get_required_fields(self):
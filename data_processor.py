@@ -1,92 +1,218 @@
 """
 Moduł do przetwarzania danych Excel/CSV/TSV
 """
+import os
 import pandas as pd
 from datetime import datetime
 import logging
 
+from amount_parser import parse_amounts
+from column_mapper import ColumnMapper
+from excel_reader import detect_file_format, read_excel_file, iter_xlsx_batches, open_with_progress, STREAM_MIN_FILE_SIZE
+from mapping_profiles import MappingProfileStore, header_fingerprint, raw_header_fingerprint
+from metrics import metrics, STAGE_SECONDS
+
+# Formaty dat sprawdzane przy automatycznym wykrywaniu (kolejność = priorytet)
+DATE_FORMATS = [
+    '%Y-%m-%d', '%d.%m.%Y', '%d-%m-%Y', '%Y/%m/%d', '%d/%m/%Y', '%Y.%m.%d',
+    '%Y-%m-%d %H:%M:%S', '%d.%m.%Y %H:%M:%S', '%d.%m.%Y %H:%M'
+]
+
+# Przedziały zaległości (etykieta, od dni, do dni) - do filtrowania i wyboru szablonu
+OVERDUE_BUCKETS = [
+    ('0-30', 0, 30),
+    ('31-60', 31, 60),
+    ('61-90', 61, 90),
+    ('90+', 91, None)
+]
+
+# Pola zmapowanego podglądu (w tej kolejności)
+PREVIEW_FIELDS = ['kontrahent', 'nip', 'nr_faktury', 'email', 'telefon', 'kwota', 'data_faktury',
+                  'termin_platnosci', 'dni_po_terminie', 'przedzial_zaleglosci']
+
+def overdue_buckets(days):
+    """Zwraca przedziały zaległości (OVERDUE_BUCKETS) dla serii dni po terminie (<NA> - brak)"""
+    days = pd.Series(days)
+    buckets = pd.Series(pd.NA, index=days.index, dtype='string')
+    for label, start, end in OVERDUE_BUCKETS:
+        in_bucket = days >= start
+        if end is not None:
+            in_bucket &= days <= end
+        buckets[in_bucket.fillna(False).to_numpy(dtype=bool)] = label
+    return buckets
+
+class LoadCancelled(BaseException):
+    """Wczytywanie pliku zostało anulowane.
+
+    Dziedziczy po BaseException (jak asyncio.CancelledError), żeby przejść przez
+    bloki except Exception kaskady prób wczytania CSV i przerwać ją od razu.
+    """
+
+
 class DataProcessor:
-    """Klasa do przetwarzania danych z plików Excel/CSV/TSV"""
+    """Klasa do przetwarzania danych z plików Excel/CSV/TSV
+
+    Indeks excel_data jest stabilnym identyfikatorem wiersza: numeracja jest
+    nadawana przy czyszczeniu danych po wczytaniu, a filtry (rozliczone pozycje,
+    przedziały zaległości) usuwają wiersze bez przenumerowania pozostałych.
+    """
     
     def __init__(self):
         """Inicjalizuje DataProcessor"""
         self.excel_data = None
         self.column_mapping = {}  # Inicjalizuj mapowanie kolumn
+        self.amount_report = None  # Raport z ostatniego parsowania kwot
+        self.file_path = None
+        self.reference_date = None  # Data odniesienia dla dni po terminie (None = dziś)
+        self.payment_terms_days = 0  # Termin płatności liczony od daty faktury
+        self.computed_columns = set()  # Kolumny wyliczone przez aplikację
+        self.column_mapper = ColumnMapper()
+        self.profile_store = MappingProfileStore()
+        self.load_params = {}  # Parametry wczytania pliku (kodowanie, separator, odcisk nagłówka)
+        self.active_profile = None  # Profil mapowania zastosowany przy wczytaniu
+        self.sheet_name = None  # Arkusz do wczytania z pliku Excel (None = pierwszy)
+        self.sheet_names = []  # Arkusze ostatnio wczytanego pliku Excel
+        self.filter_zero_amounts_on_load = False  # Usuwaj pozycje z kwotą ≤ 0 już przy wczytywaniu
+        self.removed_on_load = 0  # Pozycje z kwotą ≤ 0 usunięte przy ostatnim wczytywaniu
+        self._date_format_cache = {}  # (plik, kolumna) -> wykryty format daty
+        self._progress_callback = None  # Postęp bieżącego wczytywania (etap, bieżący, całość)
+        self._cancel_event = None  # threading.Event anulowania bieżącego wczytywania
         self.logger = logging.getLogger(__name__)
     
-    def load_excel_file(self, file_path):
-        """Wczytuje plik Excel/CSV/TSV - maksymalnie elastycznie"""
+    def spawn(self):
+        """Zwraca nowy DataProcessor z ustawieniami wczytywania tego procesora.
+
+        Plik wczytywany w tle trafia do nowego procesora, który zastępuje bieżący
+        dopiero po udanym wczytaniu - przerwane wczytanie nie zmienia danych.
+        """
+        processor = DataProcessor()
+        for attribute in ('reference_date', 'payment_terms_days', 'sheet_name', 'filter_zero_amounts_on_load'):
+            setattr(processor, attribute, getattr(self, attribute))
+        processor.column_mapper = self.column_mapper
+        processor.profile_store = self.profile_store
+        return processor
+    
+    def _report_progress(self, stage, current=0, total=None):
+        """Zgłasza postęp wczytywania i przerywa je, jeśli zostało anulowane"""
+        if self._cancel_event is not None and self._cancel_event.is_set():
+            raise LoadCancelled()
+        if self._progress_callback:
+            self._progress_callback(stage, current, total)
+    
+    @metrics.timed(STAGE_SECONDS, stage='load')
+    def load_excel_file(self, file_path, progress_callback=None, cancel_event=None):
+        """Wczytuje plik Excel/CSV/TSV - maksymalnie elastycznie.
+        
+        progress_callback(etap, bieżący, całość) otrzymuje etapy wczytywania ('detection',
+        'read', 'cleaning', 'mapping', 'dates'); dla etapu 'read' bieżący/całość to bajty
+        pliku CSV lub wiersze strumieniowanego xlsx. Ustawienie cancel_event
+        (threading.Event) przerywa wczytywanie wyjątkiem LoadCancelled.
+        """
+        self._progress_callback = progress_callback
+        self._cancel_event = cancel_event
         try:
-            if file_path.endswith(('.xlsx', '.xls')):
-                # Excel - próbuj różne opcje
+            self._report_progress('detection')
+            self.file_path = file_path
+            self.computed_columns = set()
+            self.load_params = {}
+            self.active_profile = None
+            self.removed_on_load = 0
+            
+            # Rozszerzenie Excela, ale treść tekstowa (np. eksport CSV zapisany jako .xls)
+            is_excel = file_path.lower().endswith(('.xlsx', '.xls'))
+            if is_excel and detect_file_format(file_path) == 'text':
+                self.logger.info("Plik z rozszerzeniem Excela jest plikiem tekstowym - wczytuję jako CSV")
+                is_excel = False
+            
+            if is_excel and detect_file_format(file_path) == 'xlsx' and os.path.getsize(file_path) >= STREAM_MIN_FILE_SIZE:
+                # Duży xlsx - wczytywanie strumieniowe (pamięć zależna od wielkości paczki)
                 try:
-                    # Najpierw spróbuj z openpyxl (nowsze pliki)
-                    self.excel_data = pd.read_excel(file_path, engine='openpyxl')
-                    self.logger.info("Wczytano Excel z silnikiem openpyxl")
+                    if not self._load_xlsx_streaming(file_path, self._report_progress):
+                        self.logger.error("Plik został wczytany, ale nie zawiera danych")
+                        return False
                 except Exception as e:
-                    self.logger.debug(f"openpyxl nie zadziałał: {e}")
-                    try:
-                        # Spróbuj z xlrd (starsze pliki)
-                        self.excel_data = pd.read_excel(file_path, engine='xlrd')
-                        self.logger.info("Wczytano Excel z silnikiem xlrd")
-                    except Exception as e:
-                        self.logger.debug(f"xlrd nie zadziałał: {e}")
-                        try:
-                            # Spróbuj bez określania engine
-                            self.excel_data = pd.read_excel(file_path)
-                            self.logger.info("Wczytano Excel z domyślnym silnikiem")
-                        except Exception as e:
-                            self.logger.debug(f"Domyślny silnik nie zadziałał: {e}")
-                            
-                            # Ostateczna próba - wczytaj pierwszy arkusz
-                            try:
-                                excel_file = pd.ExcelFile(file_path)
-                                sheet_names = excel_file.sheet_names
-                                if sheet_names:
-                                    self.excel_data = pd.read_excel(file_path, sheet_name=sheet_names[0])
-                                    self.logger.info(f"Wczytano Excel z arkusza: {sheet_names[0]}")
-                                else:
-                                    raise Exception("Brak arkuszy w pliku Excel")
-                            except Exception as e:
-                                self.logger.error(f"Wszystkie próby wczytania Excel nie powiodły się: {e}")
-                                return False
-                        
+                    self.logger.error(f"Nie udało się wczytać pliku Excel: {e}")
+                    return False
+                self._report_load_filter()
+                
+                # Wylicz dni po terminie z dat, jeśli plik ich nie zawiera
+                self._report_progress('dates')
+                self.apply_date_stage()
+                
+                return True
+            
+            elif is_excel:
+                # Excel - silnik dobrany do sygnatury pliku, wczytywany tylko wybrany arkusz
+                self._report_progress('read')
+                try:
+                    self.excel_data, read_info = read_excel_file(file_path, sheet_name=self.sheet_name)
+                    self.sheet_names = read_info['sheets']
+                    self.logger.info(f"Wczytano Excel silnikiem {read_info['engine']} (arkusz: {read_info['sheet']})")
+                except Exception as e:
+                    self.logger.error(f"Nie udało się wczytać pliku Excel: {e}")
+                    return False
+                
+                self.load_params = {
+                    'file_type': 'excel',
+                    'fingerprint': header_fingerprint(self.excel_data.columns),
+                    'skiprows': 0
+                }
+                
                 # Wyczyść dane po wczytaniu
+                self._report_progress('cleaning')
                 self.clean_data()
                 
-                # Wymuś inteligentne mapowanie kolumn
-                self.force_smart_mapping_for_specific_data()
+                # Znany układ pliku - zastosuj zapisany profil, w przeciwnym razie mapuj automatycznie
+                self._report_progress('mapping')
+                if not self._apply_profile(self.profile_store.get(self.load_params['fingerprint'])):
+                    self.force_smart_mapping_for_specific_data()
+                
+                # Pozycje rozliczone (kwota ≤ 0) - po mapowaniu kolumny kwoty
+                self.excel_data = self._filter_on_load(self.excel_data)
+                self._report_load_filter()
+                
+                # Wylicz dni po terminie z dat, jeśli plik ich nie zawiera
+                self._report_progress('dates')
+                self.apply_date_stage()
                 
                 return True
             
-            elif file_path.endswith(('.csv', '.tsv')):
+            elif file_path.lower().endswith(('.csv', '.tsv', '.xlsx', '.xls')):
                 # CSV/TSV - maksymalnie elastyczne wczytywanie z automatycznym wykrywaniem separatorów
                 success = False
                 
-                # Najpierw spróbuj automatycznie wykryć separator i kodowanie
-                detected_sep = self._detect_file_separator(file_path)
-                detected_encoding = self._detect_file_encoding(file_path)
-                
-                self.logger.info(f"Wykryto separator: '{repr(detected_sep)}', kodowanie: {detected_encoding}")
+                # Znany układ pliku - wczytaj z parametrami z profilu, bez wykrywania
+                _, profile = self.profile_store.find_csv_profile(file_path)
+                if profile:
+                    success = self._load_csv_with_profile(file_path, profile)
+                loaded_from_profile = success
                 
-                # Próba 1: Z wykrytymi parametrami
-                try:
-                    self.excel_data = pd.read_csv(
-                        file_path, 
-                        encoding=detected_encoding, 
-                        sep=detected_sep,
-                        on_bad_lines='skip',
-                        engine='python'
-                    )
-                    success = True
-                    self.logger.info(f"Wczytano plik z wykrytymi parametrami: separator='{detected_sep}', kodowanie={detected_encoding}")
-                except Exception as e:
-                    self.logger.debug(f"Wczytywanie z wykrytymi parametrami nie zadziałało: {e}")
+                detected_sep = detected_encoding = None
+                if not success:
+                    # Najpierw spróbuj automatycznie wykryć separator i kodowanie
+                    detected_sep = self._detect_file_separator(file_path)
+                    detected_encoding = self._detect_file_encoding(file_path)
+                    
+                    self.logger.info(f"Wykryto separator: '{repr(detected_sep)}', kodowanie: {detected_encoding}")
+                    
+                    # Próba 1: Z wykrytymi parametrami
+                    try:
+                        self.excel_data = self._read_csv(
+                            file_path, 
+                            encoding=detected_encoding, 
+                            sep=detected_sep,
+                            on_bad_lines='skip',
+                            engine='python'
+                        )
+                        success = True
+                        self.logger.info(f"Wczytano plik z wykrytymi parametrami: separator='{detected_sep}', kodowanie={detected_encoding}")
+                    except Exception as e:
+                        self.logger.debug(f"Wczytywanie z wykrytymi parametrami nie zadziałało: {e}")
                 
                 # Próba 1b: Z wykrytymi parametrami i obsługą BOM
-                if not success and detected_encoding.startswith('utf-16'):
+                if not success and detected_encoding and detected_encoding.startswith('utf-16'):
                     try:
-                        self.excel_data = pd.read_csv(
+                        self.excel_data = self._read_csv(
                             file_path, 
                             encoding=detected_encoding, 
                             sep=detected_sep,
@@ -104,7 +230,7 @@ class DataProcessor:
                     encodings_to_try = ['utf-16-le', 'utf-16-be', 'utf-8', 'windows-1250', 'iso-8859-2', 'latin-1', 'cp1250']
                     for encoding in encodings_to_try:
                         try:
-                            self.excel_data = pd.read_csv(
+                            self.excel_data = self._read_csv(
                                 file_path, 
                                 encoding=encoding, 
                                 sep=detected_sep,
@@ -122,7 +248,7 @@ class DataProcessor:
                     separators_to_try = [';', ',', '\t', '|']
                     for sep in separators_to_try:
                         try:
-                            self.excel_data = pd.read_csv(
+                            self.excel_data = self._read_csv(
                                 file_path, 
                                 encoding='utf-8', 
                                 sep=sep,
@@ -138,7 +264,7 @@ class DataProcessor:
                 # Próba 4: Ostateczna próba z automatycznym wykrywaniem
                 if not success:
                     try:
-                        self.excel_data = pd.read_csv(
+                        self.excel_data = self._read_csv(
                             file_path, 
                             encoding=None,  # Automatyczne wykrywanie kodowania
                             sep=None,       # Automatyczne wykrywanie separatora
@@ -153,7 +279,7 @@ class DataProcessor:
                 # Próba 5: Z ignorowaniem cudzysłowów
                 if not success:
                     try:
-                        self.excel_data = pd.read_csv(
+                        self.excel_data = self._read_csv(
                             file_path, 
                             encoding='utf-8', 
                             sep=detected_sep,
@@ -171,11 +297,25 @@ class DataProcessor:
                     self.logger.error("Wszystkie próby wczytania pliku CSV/TSV nie powiodły się")
                     return False
                 
+                self.load_params['file_type'] = 'csv'
+                self.load_params['fingerprint'] = raw_header_fingerprint(file_path, self.load_params.get('skiprows', 0))
+                
                 # Wyczyść dane po wczytaniu
+                self._report_progress('cleaning')
                 self.clean_data()
                 
-                # Wymuś inteligentne mapowanie kolumn
-                self.force_smart_mapping_for_specific_data()
+                # Znany układ pliku - zastosuj zapisany profil, w przeciwnym razie mapuj automatycznie
+                self._report_progress('mapping')
+                if not (loaded_from_profile and self._apply_profile(profile)):
+                    self.force_smart_mapping_for_specific_data()
+                
+                # Pozycje rozliczone (kwota ≤ 0) - po mapowaniu kolumny kwoty
+                self.excel_data = self._filter_on_load(self.excel_data)
+                self._report_load_filter()
+                
+                # Wylicz dni po terminie z dat, jeśli plik ich nie zawiera
+                self._report_progress('dates')
+                self.apply_date_stage()
                 
                 return True
             
@@ -213,12 +353,181 @@ class DataProcessor:
         except Exception as e:
             self.logger.error(f"Błąd wczytywania pliku: {e}")
             return False
+        finally:
+            self._progress_callback = None
+            self._cancel_event = None
+    
+    def _load_xlsx_streaming(self, file_path, progress_callback=None):
+        """Wczytuje arkusz xlsx paczkami - każda paczka jest czyszczona i filtrowana przed dołączeniem.
+
+        Mapowanie jest ustalane na pierwszej paczce. Paczki są przechowywane jako
+        kolumny i składane kolumna po kolumnie, więc poza wynikowymi danymi
+        (bez pustych wierszy i - przy filter_zero_amounts_on_load - bez pozycji
+        z kwotą ≤ 0) w pamięci jest naraz tylko jedna paczka i jedna składana kolumna.
+        """
+        columns = None
+        chunks = {}  # kolumna -> wartości z kolejnych paczek
+        non_empty = set()  # kolumny z co najmniej jedną wartością
+        empty_rows = 0
+        kept_rows = 0  # wiersze dołączone z poprzednich paczek
+        
+        for batch in iter_xlsx_batches(file_path, self.sheet_name, progress_callback=progress_callback):
+            if columns is None:
+                columns = list(batch.columns)
+                chunks = {col: [] for col in columns}
+                self.excel_data = batch
+                self.load_params = {
+                    'file_type': 'excel',
+                    'fingerprint': header_fingerprint(batch.columns),
+                    'skiprows': 0
+                }
+                if not self._apply_profile(self.profile_store.get(self.load_params['fingerprint'])):
+                    self.force_smart_mapping_for_specific_data()
+                self.excel_data = None
+            
+            # Kolumny spoza nagłówka z dalszej części arkusza - puste dla wcześniejszych wierszy
+            for col in batch.columns:
+                if col not in chunks:
+                    chunks[col] = [pd.Series([None] * kept_rows, dtype=object)] if kept_rows else []
+                    columns.append(col)
+            
+            # Czyszczenie i filtrowanie paczki przed dołączeniem
+            initial_count = len(batch)
+            batch = batch.dropna(how='all')
+            empty_rows += initial_count - len(batch)
+            batch = self._filter_on_load(batch)
+            kept_rows += len(batch)
+            
+            non_empty.update(batch.columns[batch.notna().any().to_numpy()])
+            # Kopia kolumny - fragment nie trzyma w pamięci całej paczki
+            for col in columns:
+                chunks[col].append(batch[col].copy())
+            del batch
+        
+        if columns is None:
+            return False
+        
+        # Składanie kolumn (bez całkowicie pustych) - fragmenty kolumny zwalniane zaraz po złożeniu
+        data = {}
+        for col in columns:
+            parts = chunks.pop(col)
+            if col in non_empty:
+                data[col] = pd.concat(parts, ignore_index=True)
+            del parts
+        self.excel_data = pd.DataFrame(data, copy=False)
+        del data
+        
+        if empty_rows:
+            self.logger.info(f"Usunięto {empty_rows} pustych wierszy")
+        if len(non_empty) < len(columns):
+            self.logger.info(f"Usunięto {len(columns) - len(non_empty)} pustych kolumn")
+        
+        # Usuń mapowania kolumn, które okazały się całkowicie puste
+        for target, col in list(self.column_mapping.items()):
+            if col not in self.excel_data.columns:
+                del self.column_mapping[target]
+        
+        self.logger.info(f"Wczytano strumieniowo {len(self.excel_data)} wierszy z pliku Excel")
+        return len(self.excel_data) > 0
+    
+    def _filter_on_load(self, data):
+        """Filtr wczytywania wspólny dla CSV, xlsx i paczek strumieniowanego xlsx.
+
+        Przy filter_zero_amounts_on_load zwraca dane bez wierszy z kwotą ≤ 0 lub
+        nieczytelną (wg zmapowanej kolumny kwoty) i dolicza je do removed_on_load.
+        """
+        kwota_column = self.column_mapping.get('kwota')
+        if not self.filter_zero_amounts_on_load or data is None or kwota_column not in data.columns:
+            return data
+        grosze, _ = parse_amounts(data[kwota_column])
+        filtered = data[(grosze > 0).fillna(False).to_numpy()]
+        self.removed_on_load += len(data) - len(filtered)
+        return filtered
+    
+    def _report_load_filter(self):
+        if self.removed_on_load:
+            self.logger.info(f"🗑️ Usunięto {self.removed_on_load} pozycji z kwotą ≤ 0 lub nieczytelną podczas wczytywania")
+    
+    def _read_csv(self, file_path, **kwargs):
+        """Wczytuje CSV i zapamiętuje użyte parametry (do zapisu w profilu mapowania)"""
+        if self._progress_callback or self._cancel_event:
+            # Wczytywanie w tle - postęp w bajtach i możliwość przerwania w trakcie parsowania
+            with open_with_progress(file_path, lambda current, total: self._report_progress('read', current, total)) as f:
+                data = pd.read_csv(f, **kwargs)
+        else:
+            data = pd.read_csv(file_path, **kwargs)
+        read_options = {key: kwargs[key] for key in ('quoting', 'quotechar') if key in kwargs}
+        self.load_params = {
+            'encoding': kwargs.get('encoding'),
+            'separator': kwargs.get('sep'),
+            'skiprows': kwargs.get('skiprows') or 0,
+            'read_options': read_options
+        }
+        return data
+    
+    def _load_csv_with_profile(self, file_path, profile):
+        """Wczytuje CSV z parametrami zapisanymi w profilu - zwraca True jeśli się udało"""
+        try:
+            self.excel_data = self._read_csv(
+                file_path,
+                encoding=profile.get('encoding'),
+                sep=profile.get('separator'),
+                skiprows=profile.get('skiprows') or 0,
+                on_bad_lines='skip',
+                engine='python',
+                **profile.get('read_options', {})
+            )
+            self.logger.info(f"⚡ Wczytano plik według zapisanego profilu: separator='{profile.get('separator')}', kodowanie={profile.get('encoding')}")
+            return True
+        except Exception as e:
+            self.logger.warning(f"⚠️ Wczytanie według profilu nie powiodło się - wykrywam parametry: {e}")
+            return False
+    
+    def _apply_profile(self, profile):
+        """Ustawia mapowanie z profilu (tylko kolumny obecne w pliku) - zwraca True jeśli zastosowano"""
+        if not profile:
+            return False
+        
+        mapping = {target: col for target, col in profile.get('mapping', {}).items() if col in self.excel_data.columns}
+        if not mapping:
+            return False
+        
+        self.column_mapping = mapping
+        self.active_profile = profile
+        self.logger.info(f"⚡ Zastosowano zapisany profil mapowania ({len(mapping)} pól)")
+        return True
+    
+    def save_current_profile(self):
+        """Zapisuje bieżące mapowanie i parametry wczytania jako profil układu pliku - zwraca (sukces, komunikat)"""
+        if self.excel_data is None or not self.load_params.get('fingerprint'):
+            return False, "Brak wczytanego pliku"
+        
+        mapping = {
+            target: col for target, col in self.column_mapping.items()
+            if col and col not in self.computed_columns
+        }
+        success, message = self.profile_store.save_profile(
+            self.load_params['fingerprint'],
+            mapping,
+            self.load_params.get('file_type'),
+            encoding=self.load_params.get('encoding'),
+            separator=self.load_params.get('separator'),
+            skiprows=self.load_params.get('skiprows', 0),
+            columns=self.get_columns(),
+            **self.load_params.get('read_options', {})
+        )
+        if success:
+            self.active_profile = self.profile_store.get(self.load_params['fingerprint'])
+        return success, message
     
+    @metrics.timed(STAGE_SECONDS, stage='detection')
     def _detect_file_separator(self, file_path):
         """Wykrywa separator używany w pliku CSV/TSV"""
         try:
             # Najpierw spróbuj UTF-16 (Little Endian) - najczęstsze kodowanie UTF-16
             try:
+                if not self._looks_like_utf16(file_path):
+                    raise ValueError("brak znaczników UTF-16 (BOM lub bajtów zerowych)")
                 with open(file_path, 'r', encoding='utf-16-le') as f:
                     first_line = f.readline()
                     if first_line and len(first_line.strip()) > 0:
@@ -284,15 +593,28 @@ class DataProcessor:
             self.logger.debug(f"Błąd podczas wykrywania separatora: {e}")
             return ';'  # Domyślny separator
     
+    def _looks_like_utf16(self, file_path):
+        """Sprawdza, czy plik może być w UTF-16 (BOM lub bajty zerowe w pierwszych 4 KB).
+        
+        Każdy plik ASCII o parzystej długości "dekoduje się" jako UTF-16, więc samo
+        udane dekodowanie nie wystarcza.
+        """
+        with open(file_path, 'rb') as f:
+            head = f.read(4096)
+        return head.startswith((b'\xff\xfe', b'\xfe\xff')) or b'\x00' in head
+    
+    @metrics.timed(STAGE_SECONDS, stage='detection')
     def _detect_file_encoding(self, file_path):
         """Wykrywa kodowanie pliku CSV/TSV"""
         try:
+            is_utf16 = self._looks_like_utf16(file_path)
+            
             # Najpierw spróbuj UTF-16 (Little Endian) - najczęstsze kodowanie UTF-16
             try:
                 with open(file_path, 'r', encoding='utf-16-le') as f:
                     first_line = f.readline()
                     # Sprawdź czy linia ma sens (nie zawiera tylko \x00)
-                    if first_line and len(first_line.strip()) > 0:
+                    if is_utf16 and first_line and len(first_line.strip()) > 0:
                         self.logger.info("Wykryto kodowanie: utf-16-le")
                         return 'utf-16-le'
             except Exception as e:
@@ -302,7 +624,7 @@ class DataProcessor:
             try:
                 with open(file_path, 'r', encoding='utf-16-be') as f:
                     first_line = f.readline()
-                    if first_line and len(first_line.strip()) > 0:
+                    if is_utf16 and first_line and len(first_line.strip()) > 0:
                         self.logger.info("Wykryto kodowanie: utf-16-be")
                         return 'utf-16-be'
             except Exception as e:
@@ -327,6 +649,7 @@ class DataProcessor:
             self.logger.debug(f"Błąd podczas wykrywania kodowania: {e}")
             return 'utf-8'  # Domyślne kodowanie
     
+    @metrics.timed(STAGE_SECONDS, stage='cleaning')
     def clean_data(self):
         """Czyści dane - usuwa puste wiersze i kolumny"""
         if self.excel_data is None:
@@ -381,26 +704,22 @@ class DataProcessor:
                 sample_values = self.excel_data[kwota_column].head(5).tolist()
                 self.logger.info(f"📊 Przykładowe wartości z kolumny '{kwota_column}': {sample_values}")
                 
-                # Przygotuj dane do filtrowania - usuń białe znaki i zamień przecinki na kropki
-                cleaned_values = self.excel_data[kwota_column].astype(str).str.strip().str.replace(',', '.')
-                
-                # Usuń wiersze z kwotą ≤ 0
-                # Najpierw spróbuj przekonwertować na liczby
-                numeric_values = pd.to_numeric(cleaned_values, errors='coerce')
+                # Sparsuj kwoty (formaty PL/EU, separatory tysięcy, waluta) do groszy
+                grosze, self.amount_report = parse_amounts(self.excel_data[kwota_column])
+                if self.amount_report['invalid'] > 0:
+                    self.logger.warning(
+                        f"⚠️ Nie udało się odczytać {self.amount_report['invalid']} kwot, "
+                        f"np.: {self.amount_report['invalid_samples'][:5]}"
+                    )
                 
                 # Pokaż statystyki przed filtrowaniem
-                zero_count = (numeric_values <= 0).sum()
-                nan_count = numeric_values.isna().sum()
-                positive_count = (numeric_values > 0).sum()
+                zero_count = (grosze <= 0).sum()
+                nan_count = grosze.isna().sum()
+                positive_count = (grosze > 0).sum()
                 self.logger.info(f"📈 Statystyki kwot: ≤0: {zero_count}, NaN: {nan_count}, >0: {positive_count}")
                 
-                # Filtruj wiersze gdzie kwota > 0 (nie NaN i > 0)
-                self.excel_data = self.excel_data[
-                    (numeric_values > 0) & (numeric_values.notna())
-                ]
-                
-                # Resetuj indeksy
-                self.excel_data = self.excel_data.reset_index(drop=True)
+                # Filtruj wiersze gdzie kwota > 0 (nie NaN i > 0) - indeksy (id wierszy) pozostają
+                self.excel_data = self.excel_data[(grosze > 0).fillna(False).to_numpy()]
                 
                 removed_count = initial_count - len(self.excel_data)
                 if removed_count > 0:
@@ -418,48 +737,22 @@ class DataProcessor:
             self.logger.error(f"❌ Błąd podczas usuwania pozycji rozliczonych: {e}")
             return 0
     
+    def remove_settled_items(self):
+        """Usuwa pozycje rozliczone (kwota ≤ 0) - zwraca liczbę usuniętych"""
+        return self.filter_zero_amount_rows() or 0
+    
     def force_smart_mapping_for_specific_data(self):
-        """Wymusza mapowanie kolumn dla konkretnych danych"""
+        """Uzupełnia mapowanie kolumn po wczytaniu pliku (silnik ColumnMapper)"""
         try:
             if self.excel_data is None:
                 return False
             
-            # Sprawdź czy kolumna 'Kontrahent' jest zmapowana
-            if 'Kontrahent' in self.excel_data.columns and 'kontrahent' not in self.column_mapping:
-                self.force_column_mapping('kontrahent', 'Kontrahent')
-                self.logger.info("Zmapowano kolumnę 'Kontrahent' jako 'kontrahent'")
-            
-            # Sprawdź czy kolumna 'NIP' jest zmapowana
-            if 'NIP' in self.excel_data.columns and 'nip' not in self.column_mapping:
-                self.force_column_mapping('nip', 'NIP')
-                self.logger.info("Zmapowano kolumnę 'NIP' jako 'nip'")
-            
-            # Sprawdź czy kolumna 'EMAIL' jest zmapowana jako 'email'
-            if 'EMAIL' in self.excel_data.columns and 'email' not in self.column_mapping:
-                self.force_column_mapping('email', 'EMAIL')
-                self.logger.info("Zmapowano kolumnę 'EMAIL' jako 'email'")
-            
-            # Sprawdź czy kolumna 'Telefon komorkowy' jest zmapowana jako 'telefon'
-            if 'Telefon komorkowy' in self.excel_data.columns and 'telefon' not in self.column_mapping:
-                self.force_column_mapping('telefon', 'Telefon komorkowy')
-                self.logger.info("Zmapowano kolumnę 'Telefon komorkowy' jako 'telefon'")
-            
-            # Sprawdź czy kolumna 'Data' jest zmapowana jako 'data_faktury'
-            if 'Data' in self.excel_data.columns and 'data_faktury' not in self.column_mapping:
-                self.force_column_mapping('data_faktury', 'Data')
-                self.logger.info("Zmapowano kolumnę 'Data' jako 'data_faktury'")
-            
-            # Sprawdź czy kolumna 'Netto' jest zmapowana jako 'kwota'
-            if 'Netto' in self.excel_data.columns and 'kwota' not in self.column_mapping:
-                self.force_column_mapping('kwota', 'Netto')
-                self.logger.info("Zmapowano kolumnę 'Netto' jako 'kwota'")
-            
-            # Sprawdź czy kolumna 'Numer' jest zmapowana jako 'nr_faktury'
-            if 'Numer' in self.excel_data.columns and 'nr_faktury' not in self.column_mapping:
-                self.force_column_mapping('nr_faktury', 'Numer')
-                self.logger.info("Zmapowano kolumnę 'Numer' jako 'nr_faktury'")
+            # Usuń mapowania wskazujące na kolumny, których nie ma w nowym pliku
+            for target, column in list(self.column_mapping.items()):
+                if column not in self.excel_data.columns:
+                    del self.column_mapping[target]
             
-            return True
+            return self.apply_smart_mapping()
             
         except Exception as e:
             self.logger.error(f"Błąd podczas sprawdzania i poprawiania mapowania: {e}")
@@ -472,31 +765,17 @@ class DataProcessor:
             return True
         return False
     
+    @metrics.timed(STAGE_SECONDS, stage='mapping')
     def apply_smart_mapping(self):
-        """Automatycznie mapuje kolumny na podstawie nazw"""
+        """Automatycznie mapuje niezmapowane pola na podstawie nazw kolumn i próbki wartości"""
         try:
             if self.excel_data is None:
                 return False
             
-            # Mapowanie na podstawie słów kluczowych
-            mappings = {
-                'kontrahent': ['kontrahent', 'nazwa', 'firma', 'company'],
-                'nip': ['nip', 'tax_id', 'regon'],
-                'nr_faktury': ['numer', 'nr', 'faktura', 'invoice'],
-                'email': ['email', 'e-mail', 'mail'],
-                'telefon': ['telefon', 'phone', 'tel', 'komórkowy'],
-                'kwota': ['kwota', 'netto', 'brutto', 'wartość', 'amount'],
-                'data_faktury': ['data', 'date', 'termin'],
-                'dni_po_terminie': ['dni', 'po', 'terminie', 'overdue']
-            }
-            
-            for target, keywords in mappings.items():
-                if target not in self.column_mapping:
-                    for col in self.excel_data.columns:
-                        if any(keyword.lower() in col.lower() for keyword in keywords):
-                            self.column_mapping[target] = col
-                            self.logger.info(f"Automatycznie zmapowano '{col}' -> '{target}'")
-                            break
+            suggested = self.column_mapper.suggest_mapping(self.excel_data, exclude=self.column_mapping)
+            for target, col in suggested.items():
+                self.column_mapping[target] = col
+                self.logger.info(f"Automatycznie zmapowano '{col}' -> '{target}'")
             
             return len(self.column_mapping) > 0
             
@@ -522,11 +801,120 @@ class DataProcessor:
         except Exception as e:
             self.logger.error(f"Błąd podczas normalizacji danych: {e}")
     
+    def parse_date_column(self, column, date_format=None):
+        """Parsuje kolumnę z datami wektorowo - format jawny lub wykryty (zapamiętany dla pliku)"""
+        values = self.excel_data[column]
+        
+        if pd.api.types.is_datetime64_any_dtype(values.dtype):
+            return values
+        
+        # Daty Excela zapisane jako liczby (dni od 1899-12-30)
+        if pd.api.types.is_numeric_dtype(values.dtype):
+            return pd.to_datetime(values, unit='D', origin='1899-12-30', errors='coerce')
+        
+        cache_key = (self.file_path, column)
+        if date_format is None:
+            date_format = self._date_format_cache.get(cache_key)
+        if date_format is None:
+            date_format = self._infer_date_format(values)
+            self._date_format_cache[cache_key] = date_format
+            self.logger.info(f"📅 Wykryto format daty w kolumnie '{column}': {date_format}")
+        
+        text = values.astype(str).str.strip()
+        if date_format == 'mixed':
+            return pd.to_datetime(text, format='mixed', dayfirst=True, errors='coerce')
+        return pd.to_datetime(text, format=date_format, errors='coerce')
+    
+    def _infer_date_format(self, values, sample_size=200):
+        """Wykrywa format daty na próbce niepustych wartości"""
+        sample = values.dropna().astype(str).str.strip()
+        sample = sample[sample != ''].head(sample_size)
+        if sample.empty:
+            return 'mixed'
+        
+        best_format, best_parsed = 'mixed', 0
+        for date_format in DATE_FORMATS:
+            parsed = pd.to_datetime(sample, format=date_format, errors='coerce').notna().sum()
+            if parsed > best_parsed:
+                best_format, best_parsed = date_format, parsed
+            if parsed == len(sample):
+                break
+        
+        # Żaden format nie pasuje do większości - pozwól pandas rozpoznawać każdą wartość
+        if best_parsed < len(sample) * 0.8:
+            return 'mixed'
+        return best_format
+    
+    def compute_overdue_days(self, reference_date=None):
+        """Wylicza dni po terminie i przedział zaległości z zmapowanej kolumny daty.
+        
+        Preferuje termin płatności, a przy jego braku używa daty faktury
+        powiększonej o payment_terms_days. Zwraca True jeśli wyliczono.
+        """
+        if self.excel_data is None:
+            return False
+        
+        if self.column_mapping.get('termin_platnosci') in self.excel_data.columns:
+            date_column = self.column_mapping['termin_platnosci']
+            terms_days = 0
+        elif self.column_mapping.get('data_faktury') in self.excel_data.columns:
+            date_column = self.column_mapping['data_faktury']
+            terms_days = self.payment_terms_days
+        else:
+            return False
+        
+        reference = pd.Timestamp(reference_date or self.reference_date or datetime.now()).normalize()
+        due_dates = self.parse_date_column(date_column) + pd.Timedelta(days=terms_days)
+        days = (reference - due_dates.dt.normalize()).dt.days.astype('Int64')
+        
+        unparsed = int(days.isna().sum() - self.excel_data[date_column].isna().sum())
+        if unparsed > 0:
+            self.logger.warning(f"⚠️ Nie udało się odczytać {unparsed} dat w kolumnie '{date_column}'")
+        
+        self.excel_data['dni_po_terminie'] = days
+        self.excel_data['przedzial_zaleglosci'] = self.get_overdue_buckets(days)
+        self.computed_columns.update(['dni_po_terminie', 'przedzial_zaleglosci'])
+        self.column_mapping['dni_po_terminie'] = 'dni_po_terminie'
+        self.column_mapping['przedzial_zaleglosci'] = 'przedzial_zaleglosci'
+        
+        self.logger.info(f"📅 Wyliczono dni po terminie z kolumny '{date_column}' (data odniesienia: {reference.date()})")
+        return True
+    
+    @metrics.timed(STAGE_SECONDS, stage='dates')
+    def apply_date_stage(self):
+        """Wylicza dni po terminie, jeśli nie są zmapowane na kolumnę z pliku"""
+        if self.excel_data is None:
+            return False
+        try:
+            mapped = self.column_mapping.get('dni_po_terminie')
+            if mapped and mapped not in self.computed_columns and mapped in self.excel_data.columns:
+                return False
+            return self.compute_overdue_days()
+        except Exception as e:
+            self.logger.error(f"Błąd podczas wyliczania dni po terminie: {e}")
+            return False
+    
+    def get_overdue_buckets(self, days):
+        """Zwraca przedziały zaległości ('0-30', '31-60', '61-90', '90+') dla dni po terminie"""
+        return overdue_buckets(days)
+    
+    def filter_by_overdue_buckets(self, buckets):
+        """Zostawia tylko wiersze z podanych przedziałów zaległości - zwraca liczbę usuniętych"""
+        if self.excel_data is None or 'przedzial_zaleglosci' not in self.excel_data.columns:
+            return 0
+        
+        initial_count = len(self.excel_data)
+        keep = self.excel_data['przedzial_zaleglosci'].isin(list(buckets)).fillna(False)
+        self.excel_data = self.excel_data[keep.to_numpy(dtype=bool)]
+        removed_count = initial_count - len(self.excel_data)
+        self.logger.info(f"🔍 Filtr przedziałów {list(buckets)}: usunięto {removed_count} pozycji")
+        return removed_count
+    
     def get_columns(self):
-        """Zwraca listę dostępnych kolumn"""
+        """Zwraca listę dostępnych kolumn (bez kolumn wyliczonych)"""
         if self.excel_data is None:
             return []
-        return list(self.excel_data.columns)
+        return [col for col in self.excel_data.columns if col not in self.computed_columns]
     
     def get_row_count(self):
         """Zwraca liczbę wierszy"""
@@ -559,38 +947,47 @@ class DataProcessor:
         
         try:
             preview_data = []
-            self.logger.info(f"Generuję zmapowany podgląd dla {min(max_rows, len(self.excel_data))} wierszy")
-            self.logger.info(f"Mapowanie kolumn: {self.column_mapping}")
+            self.logger.debug("Generuję zmapowany podgląd dla %d wierszy, mapowanie: %s",
+                              min(max_rows, len(self.excel_data)), self.column_mapping)
             
             for idx, row in self.excel_data.head(max_rows).iterrows():
                 item = {}
                 # Dodaj wszystkie wymagane pola z mapowania
-                required_fields = ['kontrahent', 'nip', 'nr_faktury', 'email', 'telefon', 'kwota', 'data_faktury', 'dni_po_terminie']
-                
-                for field in required_fields:
+                for field in PREVIEW_FIELDS:
                     if field in self.column_mapping and self.column_mapping[field] in self.excel_data.columns:
                         # Pobierz wartość z zmapowanej kolumny
                         source_col = self.column_mapping[field]
                         value = str(row[source_col]) if pd.notna(row[source_col]) else ''
                         item[field] = value
-                        
-                        # Debug: loguj pierwsze kilka wierszy
-                        if idx < 3:
-                            self.logger.debug(f"Wiersz {idx}, pole {field}: '{source_col}' -> '{value}'")
                     else:
                         # Pole nie jest zmapowane
                         item[field] = ''
-                        if idx < 3:
-                            self.logger.debug(f"Wiersz {idx}, pole {field}: NIE ZMAPOWANE")
                 
+                item['row_id'] = idx
                 preview_data.append(item)
             
-            self.logger.info(f"Wygenerowano zmapowany podgląd: {len(preview_data)} wierszy")
+            self.logger.debug("Wygenerowano zmapowany podgląd: %d wierszy", len(preview_data))
             return preview_data
         except Exception as e:
             self.logger.error(f"Błąd podczas generowania zmapowanego podglądu: {e}")
             return []
     
+    def process_row(self, row_id):
+        """Zwraca zmapowane pola wiersza o podanym id (jak w podglądzie) lub None"""
+        if self.excel_data is None or row_id not in self.excel_data.index:
+            return None
+        
+        row = self.excel_data.loc[row_id]
+        item = {}
+        for field in PREVIEW_FIELDS:
+            source_col = self.column_mapping.get(field)
+            if source_col in self.excel_data.columns and pd.notna(row[source_col]):
+                item[field] = str(row[source_col])
+            else:
+                item[field] = ''
+        item['row_id'] = row_id
+        return item
+    
     def get_mapped_data(self):
         """Zwraca dane z zmapowanymi kolumnami"""
         if self.excel_data is None:
@@ -615,6 +1012,8 @@ class DataProcessor:
     def set_column_mapping(self, mapping):
         """Ustawia mapowanie kolumn"""
         self.column_mapping = mapping
+        if self.excel_data is not None:
+            self.apply_date_stage()
     
     def validate_mapping(self, required_fields):
         """Sprawdza czy wszystkie wymagane pola są zmapowane"""
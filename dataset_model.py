@@ -0,0 +1,251 @@
+"""
+Moduł wspólnego modelu danych aplikacji desktopowej
+
+DatasetModel przechowuje pozycje podglądu (klucz wiersza -> rekord pól
+zmapowanych i statusy wysyłki) w kolejności wyświetlania. Podgląd, okno
+wysyłki i eksport CSV korzystają z tego samego modelu: widoki Tk tylko
+wyświetlają zmiany zgłaszane obserwatorom, wątki wysyłki czytają kopie
+rekordów z modelu (a nie wartości z widżetów), a eksport jest zapisywany
+strumieniowo wprost z modelu.
+
+Klucze: 'row<id wiersza>' dla pozycji z wczytanego pliku (stabilne id
+DataProcessor) i 'manual<n>' dla pozycji dodanych ręcznie.
+"""
+import csv
+import threading
+
+from sending_engine import build_template_data
+
+# Pola rekordu wyświetlane w podglądzie (kolejność kolumn Treeview)
+DISPLAY_FIELDS = ('kontrahent', 'nip', 'nr_faktury', 'email', 'telefon', 'kwota', 'dni_po_terminie')
+
+# Status kanału przed wysyłką
+STATUS_PENDING = 'Oczekuje'
+
+# Nagłówki eksportu statusu wysyłki (pola DISPLAY_FIELDS i statusy kanałów)
+EXPORT_HEADERS = ('Kontrahent', 'NIP', 'Nr Faktury', 'Email', 'Telefon', 'Kwota', 'Dni Po Terminie',
+                  'Email Status', 'SMS Status')
+
+
+def row_key(row_id):
+    """Zwraca klucz modelu dla wiersza wczytanego pliku"""
+    return f"row{row_id}"
+
+
+class DatasetModel:
+    """Klasa przechowująca pozycje podglądu ze statusami i powiadamiająca obserwatorów.
+
+    Obserwator observer(zmiana, klucze) dostaje zmiany: 'insert' (klucze w kolejności
+    pozycji - pozycja z position()), 'update', 'delete', 'status' i 'clear'. Zmiany
+    należy wprowadzać z wątku Tk (wątki robocze - przez root.after), odczyty są
+    bezpieczne z dowolnego wątku.
+    """
+
+    def __init__(self):
+        """Inicjalizuje pusty model"""
+        self._records = {}
+        self._order = []
+        self._positions = {}
+        self._observers = []
+        self._manual_counter = 0
+        self._lock = threading.RLock()
+
+    # --- obserwatorzy ---
+
+    def subscribe(self, observer):
+        """Dodaje obserwatora zmian"""
+        self._observers.append(observer)
+
+    def unsubscribe(self, observer):
+        """Usuwa obserwatora (np. po zamknięciu okna wysyłki)"""
+        if observer in self._observers:
+            self._observers.remove(observer)
+
+    def _notify(self, change, keys):
+        if not keys and change != 'clear':
+            return
+        for observer in list(self._observers):
+            observer(change, keys)
+
+    def _reindex(self):
+        self._positions = {key: position for position, key in enumerate(self._order)}
+
+    # --- odczyt ---
+
+    def __len__(self):
+        return len(self._order)
+
+    def __contains__(self, key):
+        return key in self._records
+
+    def keys(self):
+        """Zwraca klucze pozycji w kolejności wyświetlania"""
+        with self._lock:
+            return list(self._order)
+
+    def position(self, key):
+        """Zwraca pozycję klucza w kolejności wyświetlania"""
+        return self._positions[key]
+
+    def get(self, key):
+        """Zwraca kopię rekordu (pola i statusy) lub None"""
+        with self._lock:
+            record = self._records.get(key)
+            return dict(record) if record is not None else None
+
+    def values(self, key, with_status=False):
+        """Zwraca krotkę wartości wiersza w kolejności kolumn (opcjonalnie ze statusami)"""
+        record = self._records[key]
+        values = tuple(record.get(field, '') for field in DISPLAY_FIELDS)
+        if with_status:
+            values += (record['email_status'], record['sms_status'])
+        return values
+
+    def find(self, field, value):
+        """Zwraca klucz pierwszej pozycji z polem równym value lub None"""
+        with self._lock:
+            for key in self._order:
+                if str(self._records[key].get(field, '')) == str(value):
+                    return key
+        return None
+
+    def template_data(self, key):
+        """Zwraca pozycję w formacie silnika wysyłki (pola szablonów)"""
+        with self._lock:
+            return build_template_data(self._records[key])
+
+    def count_status(self, text):
+        """Liczy pozycje, w których status dowolnego kanału zawiera text"""
+        with self._lock:
+            return sum(1 for record in self._records.values()
+                       if text in str(record['email_status']) or text in str(record['sms_status']))
+
+    # --- zmiany ---
+
+    def sync(self, rows):
+        """Synchronizuje pozycje z pliku z listą wierszy (słowniki z 'row_id').
+
+        Zmieniane są tylko różniące się pozycje; pozycje dodane ręcznie zostają na
+        końcu. Zwraca krotkę (usunięte, dodane, zmienione) z liczbą pozycji.
+        """
+        with self._lock:
+            new_keys = [row_key(row['row_id']) for row in rows]
+            wanted = set(new_keys)
+            removed = [key for key in self._order if key.startswith('row') and key not in wanted]
+            for key in removed:
+                del self._records[key]
+
+            inserted, updated = [], []
+            for key, row in zip(new_keys, rows):
+                current = self._records.get(key)
+                if current is None:
+                    self._records[key] = self._new_record(row)
+                    inserted.append(key)
+                elif any(current.get(field, '') != row.get(field, '') for field in row):
+                    current.update(row)
+                    updated.append(key)
+
+            manual = [key for key in self._order if not key.startswith('row')]
+            self._order = new_keys + manual
+            self._reindex()
+
+        self._notify('delete', removed)
+        self._notify('insert', inserted)
+        self._notify('update', updated)
+        return len(removed), len(inserted), len(updated)
+
+    def add(self, row, key=None):
+        """Dodaje pozycję na końcu - zwraca jej klucz lub None, gdy klucz już istnieje.
+
+        Bez klucza pozycja z 'row_id' dostaje klucz wiersza pliku, a pozostałe
+        (dodane ręcznie) kolejny klucz 'manual<n>'.
+        """
+        with self._lock:
+            if key is None:
+                if row.get('row_id') is not None and row['row_id'] >= 0:
+                    key = row_key(row['row_id'])
+                else:
+                    self._manual_counter += 1
+                    key = f"manual{self._manual_counter}"
+            if key in self._records:
+                return None
+            self._records[key] = self._new_record(row)
+            self._order.append(key)
+            self._positions[key] = len(self._order) - 1
+        self._notify('insert', [key])
+        return key
+
+    def update(self, key, fields):
+        """Aktualizuje pola pozycji"""
+        with self._lock:
+            self._records[key].update(fields)
+        self._notify('update', [key])
+
+    def remove(self, *keys):
+        """Usuwa pozycje o podanych kluczach"""
+        with self._lock:
+            keys = [key for key in keys if key in self._records]
+            for key in keys:
+                del self._records[key]
+            if keys:
+                removed = set(keys)
+                self._order = [key for key in self._order if key not in removed]
+                self._reindex()
+        self._notify('delete', keys)
+
+    def clear(self):
+        """Usuwa wszystkie pozycje (np. po wczytaniu nowego pliku)"""
+        with self._lock:
+            self._records.clear()
+            self._order = []
+            self._positions = {}
+        self._notify('clear', [])
+
+    def set_status(self, key, email_status=None, sms_status=None):
+        """Ustawia status wysyłki pozycji (None - pozostaw dotychczasowy status kanału)"""
+        with self._lock:
+            record = self._records.get(key)
+            if record is None:
+                return
+            if email_status is not None:
+                record['email_status'] = email_status
+            if sms_status is not None:
+                record['sms_status'] = sms_status
+        self._notify('status', [key])
+
+    def reset_statuses(self):
+        """Ustawia status 'Oczekuje' dla wszystkich pozycji (przed nową wysyłką)"""
+        with self._lock:
+            for record in self._records.values():
+                record['email_status'] = STATUS_PENDING
+                record['sms_status'] = STATUS_PENDING
+            keys = list(self._order)
+        self._notify('status', keys)
+
+    @staticmethod
+    def _new_record(row):
+        record = dict(row)
+        record['email_status'] = STATUS_PENDING
+        record['sms_status'] = STATUS_PENDING
+        return record
+
+    # --- eksport ---
+
+    def export_rows(self):
+        """Generator wierszy eksportu statusu (bez kopiowania całego zbioru)"""
+        for key in self.keys():
+            with self._lock:
+                if key not in self._records:
+                    continue
+                values = self.values(key, with_status=True)
+            yield values
+
+    def write_csv(self, file):
+        """Zapisuje status wysyłki do otwartego pliku CSV - zwraca liczbę wierszy"""
+        writer = csv.writer(file)
+        writer.writerow(EXPORT_HEADERS)
+        count = 0
+        for values in self.export_rows():
+            writer.writerow(values)
+            count += 1
+        return count
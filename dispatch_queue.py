@@ -0,0 +1,121 @@
+"""
+Moduł kolejki wysyłki według priorytetu (kwota i przedział zaległości)
+
+Gdy tempo kanałów lub przerwanie kampanii nie pozwala wysłać wszystkich
+przypomnień, najpierw powinny wyjść te o największej wartości. Priorytet
+pozycji to kwota (w złotych) pomnożona przez wagę przedziału zaległości:
+
+    priorytet = kwota × waga[przedział]
+
+Priorytety całej kampanii są liczone jednym przebiegiem na kolumnach
+(parse_amounts, przedziały z dni po terminie), a DispatchQueue wydaje pozycje
+z kopca - od najwyższego priorytetu, przy równych w kolejności z pliku.
+"""
+import heapq
+import threading
+
+import numpy as np
+import pandas as pd
+
+from amount_parser import parse_amounts
+from data_processor import overdue_buckets
+
+# Domyślne wagi przedziałów zaległości (starsze długi mają pierwszeństwo)
+DEFAULT_BUCKET_WEIGHTS = {'0-30': 1.0, '31-60': 2.0, '61-90': 3.0, '90+': 4.0}
+
+# Waga pozycji bez przedziału (brak lub błędna liczba dni po terminie)
+DEFAULT_WEIGHT = 1.0
+
+# Pola pozycji używane do wyliczenia priorytetu
+PRIORITY_FIELDS = ['kwota', 'dni_po_terminie', 'przedzial_zaleglosci']
+
+
+def normalize_weights(weights=None):
+    """Zwraca wagi przedziałów - domyślne uzupełnione o podane (waga musi być nieujemna)"""
+    result = dict(DEFAULT_BUCKET_WEIGHTS)
+    for bucket, weight in (weights or {}).items():
+        weight = float(weight)
+        if weight < 0:
+            raise ValueError(f"Waga przedziału {bucket} nie może być ujemna")
+        result[str(bucket)] = weight
+    return result
+
+
+def priority_scores(items, weights=None):
+    """Zwraca tablicę priorytetów pozycji (float64, w kolejności pozycji).
+
+    Kwota jest parsowana jak w pliku (grosze, formaty PL/EU); brak kwoty lub kwota
+    ujemna (korekta) daje priorytet 0. Przedział jest brany z pola
+    'przedzial_zaleglosci', a gdy go brak - wyliczany z 'dni_po_terminie'.
+    """
+    if not len(items):
+        return np.zeros(0)
+    weights = normalize_weights(weights)
+    frame = pd.DataFrame.from_records(items, columns=PRIORITY_FIELDS)
+
+    grosze, _ = parse_amounts(frame['kwota'].astype(object))
+    amounts = grosze.to_numpy(dtype='float64', na_value=0.0).clip(min=0) / 100
+
+    buckets = frame['przedzial_zaleglosci'].astype('string').replace('', pd.NA)
+    days = pd.to_numeric(frame['dni_po_terminie'], errors='coerce')
+    buckets = buckets.fillna(overdue_buckets(days))
+    bucket_weights = buckets.map(weights).astype('float64').fillna(DEFAULT_WEIGHT).to_numpy()
+    return amounts * bucket_weights
+
+
+def dispatch_order(items, weights=None):
+    """Zwraca indeksy pozycji w kolejności wysyłki (malejący priorytet, stabilnie)"""
+    scores = priority_scores(items, weights)
+    return np.argsort(-scores, kind='stable').tolist()
+
+
+class DispatchQueue:
+    """Kolejka pozycji do wysyłki na kopcu - zwraca najpierw pozycje o najwyższym priorytecie.
+
+    Bezpieczna dla wielu wątków; pozycje można dokładać w trakcie kampanii
+    (np. ponowienia), a przy równym priorytecie decyduje kolejność dodania.
+    """
+
+    def __init__(self, weights=None):
+        """Inicjalizuje pustą kolejkę z wagami przedziałów"""
+        self.weights = normalize_weights(weights)
+        self._heap = []
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def push_many(self, items, indexes=None, scores=None):
+        """Dodaje pozycje (indeksy domyślnie 0..n-1, priorytety wyliczane wektorowo)"""
+        if scores is None:
+            scores = priority_scores(items, self.weights)
+        if indexes is None:
+            indexes = range(len(items))
+        with self._lock:
+            for index, item, score in zip(indexes, items, scores):
+                self._heap.append((-float(score), self._counter, index, item))
+                self._counter += 1
+            heapq.heapify(self._heap)
+
+    def push(self, index, item, score=None):
+        """Dodaje jedną pozycję"""
+        if score is None:
+            score = priority_scores([item], self.weights)[0]
+        with self._lock:
+            heapq.heappush(self._heap, (-float(score), self._counter, index, item))
+            self._counter += 1
+
+    def pop(self):
+        """Zwraca (indeks, pozycja) o najwyższym priorytecie lub None, gdy kolejka jest pusta"""
+        with self._lock:
+            if not self._heap:
+                return None
+            _, _, index, item = heapq.heappop(self._heap)
+            return index, item
+
+    def peek_score(self):
+        """Zwraca priorytet następnej pozycji (None dla pustej kolejki)"""
+        with self._lock:
+            return -self._heap[0][0] if self._heap else None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._heap)
@@ -0,0 +1,223 @@
+"""
+Moduł historii edycji (cofnij/ponów) edytora szablonu email
+
+Historia przechowuje różnice zamiast kopii całego dokumentu: każda zmiana to
+pozycja, usunięty i wstawiony fragment. Kolejne znaki wpisywane (lub usuwane)
+w jednym miejscu są łączone w jedną operację, a łączny rozmiar historii jest
+ograniczony budżetem bajtów - najstarsze operacje są usuwane jako pierwsze.
+Moduł nie zależy od tkinter; funkcje *_edits zwracają zmiany punktowe
+(początek, koniec, nowy tekst) do zastosowania w edytorze.
+"""
+import re
+import time
+
+# Domyślny budżet historii (bajty UTF-8 przechowywanych fragmentów)
+DEFAULT_BYTE_BUDGET = 1024 * 1024
+
+# Zmiany w odstępie krótszym niż COALESCE_SECONDS mogą zostać połączone
+COALESCE_SECONDS = 1.0
+
+# Linie rozpoznawane jako stopka (clear_footer)
+FOOTER_MARKERS = ('---', '©', 'windykacja@kpj.pl', 'Wiadomość wygenerowana automatycznie')
+
+
+class TextEdit:
+    """Pojedyncza zmiana tekstu: na pozycji offset fragment removed zastąpiono inserted"""
+
+    __slots__ = ('offset', 'removed', 'inserted', 'timestamp', 'size')
+
+    def __init__(self, offset, removed, inserted, timestamp=None):
+        self.offset = offset
+        self.removed = removed
+        self.inserted = inserted
+        self.timestamp = time.monotonic() if timestamp is None else timestamp
+        self.size = len(removed.encode('utf-8')) + len(inserted.encode('utf-8'))
+
+    def apply(self, text):
+        """Zwraca tekst po zastosowaniu zmiany"""
+        return text[:self.offset] + self.inserted + text[self.offset + len(self.removed):]
+
+    def inverse(self):
+        """Zwraca zmianę odwrotną (do cofnięcia)"""
+        return TextEdit(self.offset, self.inserted, self.removed, self.timestamp)
+
+    def __repr__(self):
+        return f"TextEdit({self.offset}, {self.removed!r}, {self.inserted!r})"
+
+
+def _common_prefix_length(a, b):
+    """Długość wspólnego prefiksu (wyszukiwanie binarne na porównaniach wycinków)"""
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[low:middle] == b[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _common_suffix_length(a, b, limit):
+    """Długość wspólnego sufiksu nie dłuższego niż limit"""
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[len(a) - middle:len(a) - low] == b[len(b) - middle:len(b) - low]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def diff_text(old_text, new_text):
+    """Zwraca TextEdit zamieniający old_text w new_text lub None, gdy teksty są równe"""
+    if old_text == new_text:
+        return None
+    prefix = _common_prefix_length(old_text, new_text)
+    suffix = _common_suffix_length(old_text, new_text, min(len(old_text), len(new_text)) - prefix)
+    return TextEdit(prefix, old_text[prefix:len(old_text) - suffix], new_text[prefix:len(new_text) - suffix])
+
+
+def text_index(text, offset):
+    """Zamienia pozycję znaku w tekście na indeks tk.Text ('linia.kolumna')"""
+    line = text.count('\n', 0, offset) + 1
+    column = offset - (text.rfind('\n', 0, offset) + 1)
+    return f"{line}.{column}"
+
+
+def style_edits(text, css_property, value):
+    """Zmiany punktowe ustawiające właściwość CSS w całym szablonie.
+
+    Istniejące deklaracje 'właściwość: ...;' są zastępowane, a gdy ich nie ma,
+    styl jest dodawany do znacznika <body.
+    """
+    declaration = f'{css_property}: {value};'
+    pattern = re.compile(re.escape(css_property) + r':\s*[^;]+;')
+    edits = [(match.start(), match.end(), declaration)
+             for match in pattern.finditer(text) if match.group(0) != declaration]
+    if edits or pattern.search(text):
+        return edits
+    body = text.find('<body')
+    if body == -1:
+        return []
+    position = body + len('<body')
+    return [(position, position, f' style="{declaration}"')]
+
+
+def _strip_trailing_lines(text, position, predicate):
+    """Cofa pozycję końca tekstu o kolejne końcowe linie spełniające predicate"""
+    while position > 0:
+        line_start = text.rfind('\n', 0, position) + 1
+        if not predicate(text[line_start:position]):
+            break
+        position = max(line_start - 1, 0)
+    return position
+
+
+def footer_edits(text):
+    """Zmiana punktowa usuwająca stopkę (końcowe linie stopki i puste linie)"""
+    is_blank = lambda line: not line.strip()
+    position = _strip_trailing_lines(text, len(text), is_blank)
+    position = _strip_trailing_lines(text, position, lambda line: any(marker in line for marker in FOOTER_MARKERS))
+    position = _strip_trailing_lines(text, position, is_blank)
+    if position == len(text):
+        return []
+    return [(position, len(text), '')]
+
+
+class EditHistory:
+    """Klasa przechowująca historię edycji jako różnice z łączeniem operacji"""
+
+    def __init__(self, text='', byte_budget=DEFAULT_BYTE_BUDGET, coalesce_seconds=COALESCE_SECONDS):
+        """Inicjalizuje historię dla tekstu początkowego"""
+        self.byte_budget = byte_budget
+        self.coalesce_seconds = coalesce_seconds
+        self.reset(text)
+
+    def reset(self, text=''):
+        """Czyści historię i ustawia bieżący tekst (np. po wczytaniu szablonu)"""
+        self.text = text
+        self.undo_stack = []
+        self.redo_stack = []
+        self.size = 0
+        self._can_coalesce = False
+
+    def record(self, new_text, timestamp=None):
+        """Zapisuje zmianę względem bieżącego tekstu - zwraca True, jeśli tekst się zmienił"""
+        edit = diff_text(self.text, new_text)
+        if edit is None:
+            return False
+        if timestamp is not None:
+            edit.timestamp = timestamp
+        self.text = new_text
+        self.redo_stack = []
+
+        last = self.undo_stack[-1] if self.undo_stack and self._can_coalesce else None
+        if last is not None and self._coalesce(last, edit):
+            return True
+        self._push(edit)
+        return True
+
+    def break_coalescing(self):
+        """Kończy bieżącą operację - następna zmiana nie zostanie z nią połączona"""
+        self._can_coalesce = False
+
+    def _coalesce(self, last, edit):
+        """Łączy zmianę z poprzednią (pisanie lub usuwanie w jednym miejscu)"""
+        if edit.timestamp - last.timestamp > self.coalesce_seconds:
+            return False
+        # Pisanie: wstawienie bezpośrednio za poprzednio wstawionym tekstem, bez przejścia słowa
+        if (not edit.removed and not last.removed and
+                edit.offset == last.offset + len(last.inserted) and
+                not (last.inserted[-1:].isspace() and not edit.inserted.isspace())):
+            merged = TextEdit(last.offset, '', last.inserted + edit.inserted, edit.timestamp)
+        # Backspace: usunięcie tuż przed poprzednio usuniętym fragmentem
+        elif (not edit.inserted and not last.inserted and
+                edit.offset + len(edit.removed) == last.offset):
+            merged = TextEdit(edit.offset, edit.removed + last.removed, '', edit.timestamp)
+        # Delete: usunięcie w tym samym miejscu
+        elif not edit.inserted and not last.inserted and edit.offset == last.offset:
+            merged = TextEdit(last.offset, last.removed + edit.removed, '', edit.timestamp)
+        else:
+            return False
+        self.undo_stack.pop()
+        self.size -= last.size
+        self._push(merged)
+        return True
+
+    def _push(self, edit):
+        """Dodaje zmianę na stos cofania i pilnuje budżetu bajtów"""
+        self.undo_stack.append(edit)
+        self.size += edit.size
+        self._can_coalesce = True
+        while self.size > self.byte_budget and len(self.undo_stack) > 1:
+            self.size -= self.undo_stack.pop(0).size
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def undo(self):
+        """Cofa ostatnią operację - zwraca TextEdit do zastosowania w edytorze lub None"""
+        if not self.undo_stack:
+            return None
+        edit = self.undo_stack.pop()
+        self.size -= edit.size
+        self.redo_stack.append(edit)
+        inverse = edit.inverse()
+        self.text = inverse.apply(self.text)
+        self._can_coalesce = False
+        return inverse
+
+    def redo(self):
+        """Ponawia ostatnio cofniętą operację - zwraca TextEdit do zastosowania lub None"""
+        if not self.redo_stack:
+            return None
+        edit = self.redo_stack.pop()
+        self.undo_stack.append(edit)
+        self.size += edit.size
+        self.text = edit.apply(self.text)
+        self._can_coalesce = False
+        return edit
@@ -5,17 +5,30 @@ from O365 import Account
 import logging
 from datetime import datetime
 
+from metrics import metrics, TEMPLATE_RENDER_SECONDS, PROVIDER_REQUEST_SECONDS
+from logging_setup import mask_recipient
+from placeholders import render_message
+from send_retry import SendFailure, exception_failure
+from token_store import get_token_backend, TOKEN_STORE_FILE
+
 class EmailSender:
     """Klasa do wysyłania emaili przez Microsoft 365"""
     
-    def __init__(self, client_id, client_secret):
+    def __init__(self, client_id, client_secret, token_store=TOKEN_STORE_FILE, mailbox=None):
+        """Inicjalizuje sender - token_store: plik bazy tokenów (token_store.py) wspólnej dla instancji i procesów.
+
+        mailbox - skrzynka nadawcy, gdy jedna aplikacja wysyła z kilku skrzynek (sender_pool).
+        """
         self.client_id = client_id
         self.client_secret = client_secret
+        self.mailbox = mailbox
         self.account = None
         self.logger = logging.getLogger(__name__)
         
         if client_id and client_secret:
-            self.account = Account((client_id, client_secret))
+            # Zapisany token wczytywany z zaszyfrowanej bazy - bez ponownej autoryzacji po restarcie
+            self.account = Account((client_id, client_secret), username=mailbox,
+                                   token_backend=get_token_backend(client_id, token_store, mailbox=mailbox))
     
     def authenticate(self):
         """Autoryzacja z Microsoft 365"""
@@ -23,8 +36,11 @@ class EmailSender:
             return False, "Brak konfiguracji Microsoft 365"
         
         try:
+            # Zapisany token (np. z poprzedniej autoryzacji) - bez ponownego logowania
+            if self.account.is_authenticated:
+                return True, "Autoryzacja udana"
             if self.account.authenticate(scopes=['Mail.Send']):
-                self.logger.info("Autoryzacja Microsoft 365 udana")
+                self.logger.debug("Autoryzacja Microsoft 365 udana")
                 return True, "Autoryzacja udana"
             else:
                 return False, "Błąd autoryzacji Microsoft 365"
@@ -54,21 +70,26 @@ class EmailSender:
             message.body_type = 'HTML'
             
             # Wyślij wiadomość
-            message.send()
+            with metrics.timer(PROVIDER_REQUEST_SECONDS, provider='graph'):
+                sent = message.send()
+            if sent is False:
+                self.logger.error("Microsoft 365 nie przyjął wiadomości do %s", mask_recipient(to_email))
+                return False, SendFailure("Błąd wysyłania email: Microsoft 365 nie przyjął wiadomości")
             
-            self.logger.info(f"Email wysłany do: {to_email}")
+            self.logger.info("📧 Email wysłany do: %s", mask_recipient(to_email), extra={'event': 'email.sent'})
             return True, "Email wysłany pomyślnie"
             
         except Exception as e:
             self.logger.error(f"Błąd wysyłania email do {to_email}: {e}")
-            return False, f"Błąd wysyłania email: {str(e)}"
+            return False, exception_failure(f"Błąd wysyłania email: {str(e)}", e)
     
     def send_reminder_email(self, to_email, template_data, email_template):
         """Wysyła email przypomnienia"""
         try:
             # Przygotuj treść emaila
             subject = "Przypomnienie o płatności"
-            html_content = email_template.format(**template_data)
+            with metrics.timer(TEMPLATE_RENDER_SECONDS, channel='email'):
+                html_content = render_message(email_template, template_data)
             
             # Wyślij email
             success, message = self.send_email(to_email, subject, html_content)
@@ -1,7 +1,17 @@
 import pandas as pd
+import numpy as np
 import random
+import unicodedata
 from datetime import datetime, timedelta
 
+# Formaty plików generowanych do testów wydajności: (separator, kodowanie)
+RECEIVABLES_FILE_FORMATS = {
+    'utf16_tsv': ('\t', 'utf-16'),      # eksport "Tekst Unicode" z ERP/Excela
+    'cp1250_csv': (';', 'cp1250'),      # CSV z polskiego Excela
+    'utf8_csv': (',', 'utf-8'),
+    'xlsx': (None, None)
+}
+
 def generate_sample_data():
     """Generuje przykładowe dane windykacyjne do testowania aplikacji"""
     
@@ -74,5 +84,107 @@ def generate_sample_data():
     
     return filename_excel, filename_csv
 
+def _ascii_fold(values):
+    """Usuwa polskie znaki z tekstów (do adresów email)"""
+    return [unicodedata.normalize('NFKD', value.replace('ł', 'l').replace('Ł', 'L')).encode('ascii', 'ignore').decode('ascii')
+            for value in values]
+
+def _random_nips(rng, count):
+    """Generuje poprawne numery NIP (z sumą kontrolną)"""
+    weights = np.array([6, 5, 7, 2, 3, 4, 5, 6, 7])
+    digits = rng.integers(0, 10, size=(count, 9))
+    digits[:, 0] = rng.integers(1, 10, size=count)
+    checksum = (digits @ weights) % 11
+    # Suma kontrolna 10 jest niedozwolona - popraw ostatnią cyfrę
+    while (checksum == 10).any():
+        invalid = checksum == 10
+        digits[invalid, 8] = (digits[invalid, 8] + 1) % 10
+        checksum = (digits @ weights) % 11
+    all_digits = np.column_stack([digits, checksum])
+    return [''.join(map(str, row)) for row in all_digits]
+
+def _format_pl_amounts(grosze):
+    """Formatuje kwoty w groszach w stylu PL ('1 234,56')"""
+    zlote = (np.abs(grosze) // 100).tolist()
+    gr = (np.abs(grosze) % 100).tolist()
+    signs = np.where(grosze < 0, '-', '').tolist()
+    return [f"{sign}{z:,}".replace(',', ' ') + f",{r:02d}" for sign, z, r in zip(signs, zlote, gr)]
+
+def generate_receivables(rows, seed=42, settled_ratio=0.2, reference_date=None):
+    """Generuje powtarzalny (seed) zbiór należności w układzie eksportu z ERP.
+    
+    Kontrahenci mają po kilka faktur, część pozycji jest rozliczona (kwota 0,00
+    lub nadpłata), a części kontrahentów brakuje emaila lub telefonu.
+    """
+    rng = np.random.default_rng(seed)
+    reference_date = pd.Timestamp(reference_date or '2024-06-30')
+    
+    first_names = np.array(['Jan', 'Anna', 'Piotr', 'Maria', 'Andrzej', 'Katarzyna', 'Tomasz', 'Agnieszka',
+                            'Marek', 'Barbara', 'Grzegorz', 'Ewa', 'Michał', 'Elżbieta', 'Krzysztof', 'Małgorzata',
+                            'Łukasz', 'Żaneta', 'Paweł', 'Józef'])
+    last_names = np.array(['Kowalski', 'Nowak', 'Wiśniewski', 'Wójcik', 'Kowalczyk', 'Kamiński', 'Lewandowski',
+                           'Zieliński', 'Szymański', 'Woźniak', 'Dąbrowski', 'Kozłowski', 'Jankowski', 'Mazur',
+                           'Gołębiowski', 'Król', 'Żak', 'Pietrzak'])
+    trades = np.array(['Usługi Budowlane', 'Transport', 'Handel', 'Serwis', 'Ogrodnictwo', 'Elektro', 'Meble',
+                       'Piekarnia', 'Auto Części', 'Biuro Rachunkowe'])
+    forms = np.array(['Sp. z o.o.', 'S.A.', 'Sp. j.', 's.c.', 'Sp. k.', ''])
+    domains = np.array(['example.com', 'firma.pl', 'poczta.pl', 'biuro.com.pl'])
+    
+    # Kontrahenci - średnio 3 faktury na kontrahenta
+    debtors = max(rows // 3, 1)
+    first = rng.choice(first_names, debtors)
+    last = rng.choice(last_names, debtors)
+    trade = rng.choice(trades, debtors)
+    form = rng.choice(forms, debtors)
+    names = [f"{t} {f} {l} {o}".strip() for t, f, l, o in zip(trade, first, last, form)]
+    emails = [f"{f}.{l}{i}@{d}".lower() for i, (f, l, d) in
+              enumerate(zip(_ascii_fold(first), _ascii_fold(last), rng.choice(domains, debtors)))]
+    phone_numbers = rng.integers(500000000, 899999999, debtors)
+    phone_styles = rng.integers(0, 3, debtors)
+    phones = [f"+48 {str(n)[:3]} {str(n)[3:6]} {str(n)[6:]}" if style == 0 else
+              (f"48{n}" if style == 1 else str(n)) for n, style in zip(phone_numbers, phone_styles)]
+    email_missing = rng.random(debtors) < 0.05
+    phone_missing = rng.random(debtors) < 0.1
+    emails = [None if missing else email for email, missing in zip(emails, email_missing)]
+    phones = [None if missing else phone for phone, missing in zip(phones, phone_missing)]
+    nips = _random_nips(rng, debtors)
+    
+    debtor = rng.integers(0, debtors, rows)
+    
+    # Daty formatowane raz dla każdego dnia zakresu i wybierane indeksem (strftime na milionach wierszy jest wolne)
+    days = pd.date_range(reference_date - pd.Timedelta(days=364), reference_date + pd.Timedelta(days=60))
+    invoice_day = rng.integers(0, 365, rows)
+    due_day = invoice_day + rng.choice([7, 14, 30, 60], rows)
+    
+    grosze = rng.integers(5000, 5000000, rows)
+    settled = rng.random(rows) < settled_ratio
+    overpaid = settled & (rng.random(rows) < 0.2)
+    grosze = np.where(settled, 0, grosze)
+    grosze = np.where(overpaid, -rng.integers(100, 50000, rows), grosze)
+    
+    months = days.month.to_numpy()[invoice_day].tolist()
+    years = days.year.to_numpy()[invoice_day].tolist()
+    
+    return pd.DataFrame({
+        'Kontrahent': np.array(names, dtype=object)[debtor],
+        'NIP': np.array(nips, dtype=object)[debtor],
+        'Numer': [f"FV/{i + 1}/{m:02d}/{y}" for i, (m, y) in enumerate(zip(months, years))],
+        'Data': np.array(days.strftime('%Y-%m-%d'), dtype=object)[invoice_day],
+        'Termin płatności': np.array(days.strftime('%d.%m.%Y'), dtype=object)[due_day],
+        'Netto': _format_pl_amounts(grosze),
+        'EMAIL': np.array(emails, dtype=object)[debtor],
+        'Telefon komorkowy': np.array(phones, dtype=object)[debtor],
+        'Oddział': rng.choice(np.array(['Warszawa', 'Kraków', 'Gdańsk', 'Łódź', 'Poznań']), rows)
+    })
+
+def write_receivables_file(data, file_path, file_format):
+    """Zapisuje dane w jednym z formatów RECEIVABLES_FILE_FORMATS"""
+    separator, encoding = RECEIVABLES_FILE_FORMATS[file_format]
+    if file_format == 'xlsx':
+        data.to_excel(file_path, index=False)
+    else:
+        data.to_csv(file_path, sep=separator, encoding=encoding, index=False)
+    return file_path
+
 if __name__ == "__main__":
     generate_sample_data() 
\ No newline at end of file
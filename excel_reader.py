@@ -0,0 +1,275 @@
+"""
+Moduł szybkiego wczytywania plików Excel
+
+Silnik jest wybierany na podstawie sygnatury pliku (magic bytes), a nie rozszerzenia:
+- ZIP (PK\\x03\\x04) - .xlsx: python-calamine (jeśli zainstalowany) lub openpyxl w trybie read-only
+- OLE2 (D0 CF 11 E0) - .xls: python-calamine (jeśli zainstalowany) lub xlrd
+- inne - plik tekstowy z rozszerzeniem Excela (np. eksport CSV zapisany jako .xls)
+
+Lista arkuszy jest odczytywana bez wczytywania ich zawartości, a wczytywany jest
+tylko wybrany arkusz.
+"""
+import io
+import logging
+import os
+
+import pandas as pd
+
+try:
+    from python_calamine import CalamineWorkbook
+    CALAMINE_AVAILABLE = True
+except ImportError:
+    CalamineWorkbook = None
+    CALAMINE_AVAILABLE = False
+
+XLSX_SIGNATURE = b'PK\x03\x04'
+XLS_SIGNATURE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+
+# Liczba wierszy w jednej paczce przy wczytywaniu strumieniowym
+STREAM_BATCH_SIZE = 20000
+
+# Pliki xlsx od tego rozmiaru są wczytywane strumieniowo (pamięć zależna od paczki, nie od pliku)
+STREAM_MIN_FILE_SIZE = 10 * 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressReader(io.RawIOBase):
+    """Plik binarny zgłaszający liczbę odczytanych bajtów (postęp wczytywania CSV).
+
+    callback(odczytane_bajty, rozmiar) jest wywoływany po każdym odczycie; wyjątek
+    zgłoszony w callbacku (np. anulowanie) przerywa parsowanie pliku.
+    """
+
+    def __init__(self, file_path, callback):
+        self.raw = open(file_path, 'rb')
+        self.size = os.fstat(self.raw.fileno()).st_size
+        self.callback = callback
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self.raw.readinto(buffer)
+        self.callback(self.raw.tell(), self.size)
+        return count
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self.raw.seek(offset, whence)
+
+    def tell(self):
+        return self.raw.tell()
+
+    def close(self):
+        self.raw.close()
+        super().close()
+
+
+def open_with_progress(file_path, callback):
+    """Otwiera plik do odczytu binarnego (buforowanego) z raportowaniem postępu"""
+    return io.BufferedReader(ProgressReader(file_path, callback))
+
+
+def detect_file_format(file_path):
+    """Rozpoznaje format pliku po sygnaturze - zwraca 'xlsx', 'xls' lub 'text'"""
+    with open(file_path, 'rb') as f:
+        signature = f.read(len(XLS_SIGNATURE))
+    if signature.startswith(XLSX_SIGNATURE):
+        return 'xlsx'
+    if signature == XLS_SIGNATURE:
+        return 'xls'
+    return 'text'
+
+
+def list_sheets(file_path, file_format=None):
+    """Zwraca nazwy arkuszy bez wczytywania ich zawartości"""
+    file_format = file_format or detect_file_format(file_path)
+    if CALAMINE_AVAILABLE:
+        return list(CalamineWorkbook.from_path(file_path).sheet_names)
+    if file_format == 'xlsx':
+        from openpyxl import load_workbook
+        workbook = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+        try:
+            return list(workbook.sheetnames)
+        finally:
+            workbook.close()
+    if file_format == 'xls':
+        import xlrd
+        workbook = xlrd.open_workbook(file_path, on_demand=True)
+        try:
+            return workbook.sheet_names()
+        finally:
+            workbook.release_resources()
+    return []
+
+
+def choose_sheet(sheets, sheet_name=None):
+    """Wybiera arkusz: podany po nazwie lub numerze, w przeciwnym razie pierwszy"""
+    if not sheets:
+        raise ValueError("Brak arkuszy w pliku Excel")
+    if sheet_name is None or sheet_name == '':
+        return sheets[0]
+    if isinstance(sheet_name, int):
+        return sheets[sheet_name]
+    if sheet_name not in sheets:
+        raise ValueError(f"Brak arkusza '{sheet_name}' w pliku (dostępne: {', '.join(sheets)})")
+    return sheet_name
+
+
+def rows_to_dataframe(rows):
+    """Buduje DataFrame z iteratora wierszy (pierwszy niepusty wiersz to nagłówek)"""
+    rows = iter(rows)
+    header = None
+    for row in rows:
+        if any(value is not None and value != '' for value in row):
+            header = row
+            break
+    if header is None:
+        return pd.DataFrame()
+
+    columns = make_column_names(header)
+    width = len(columns)
+    data = []
+    for row in rows:
+        row = tuple(row)
+        if len(row) > width:
+            # Wartości poza nagłówkiem - dodaj kolumny bez nazwy
+            columns += [f'Unnamed: {i}' for i in range(width, len(row))]
+            width = len(row)
+            data = [r + (None,) * (width - len(r)) for r in data]
+        data.append(row + (None,) * (width - len(row)))
+
+    # Obetnij końcowe puste wiersze (jak pd.read_excel)
+    while data and all(value is None for value in data[-1]):
+        data.pop()
+    return pd.DataFrame.from_records(data, columns=columns) if data else pd.DataFrame(columns=columns)
+
+
+def make_column_names(header):
+    """Zamienia komórki nagłówka na unikalne nazwy kolumn (jak pandas: 'Unnamed: 3', 'Kwota.1')"""
+    columns = []
+    seen = {}
+    for i, value in enumerate(header):
+        name = f'Unnamed: {i}' if value is None or value == '' else str(value).strip()
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
+
+def _read_xlsx_openpyxl(file_path, sheet):
+    """Wczytuje arkusz xlsx przez openpyxl read-only (same wartości, bez obiektów komórek)"""
+    from openpyxl import load_workbook
+    workbook = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+    try:
+        worksheet = workbook[sheet]
+        # Eksporty z ERP często mają błędny wymiar arkusza - licz go z danych
+        worksheet.reset_dimensions()
+        return rows_to_dataframe(worksheet.iter_rows(values_only=True))
+    finally:
+        workbook.close()
+
+
+def read_excel_file(file_path, sheet_name=None, file_format=None):
+    """Wczytuje wybrany arkusz pliku Excel silnikiem dobranym do sygnatury.
+
+    Zwraca (DataFrame, info), gdzie info zawiera format, silnik, arkusz i listę arkuszy.
+    """
+    file_format = file_format or detect_file_format(file_path)
+    if file_format == 'text':
+        raise ValueError("Plik nie jest skoroszytem Excel (brak sygnatury ZIP/OLE2)")
+
+    sheets = list_sheets(file_path, file_format)
+    sheet = choose_sheet(sheets, sheet_name)
+
+    if CALAMINE_AVAILABLE:
+        engine = 'calamine'
+        data = pd.read_excel(file_path, sheet_name=sheet, engine='calamine')
+    elif file_format == 'xlsx':
+        engine = 'openpyxl'
+        data = _read_xlsx_openpyxl(file_path, sheet)
+    else:
+        engine = 'xlrd'
+        data = pd.read_excel(file_path, sheet_name=sheet, engine='xlrd')
+
+    logger.info(f"Wczytano arkusz '{sheet}' ({len(data)} wierszy) silnikiem {engine}")
+    return data, {'format': file_format, 'engine': engine, 'sheet': sheet, 'sheets': sheets}
+
+
+def _is_empty_row(row):
+    """Sprawdza, czy wiersz nie zawiera żadnej wartości"""
+    for value in row:
+        if value is not None and value != '':
+            return False
+    return True
+
+
+def iter_xlsx_batches(file_path, sheet_name=None, batch_size=STREAM_BATCH_SIZE, progress_callback=None):
+    """Czyta arkusz xlsx strumieniowo i zwraca paczki danych jako DataFrame.
+
+    Wiersze są pobierane przez openpyxl read-only (iter_rows(values_only=True)),
+    puste wiersze są pomijane w locie, a każda paczka jest budowana bezpośrednio
+    z kolumn - w pamięci jest naraz tylko jedna paczka wierszy. Wiersz szerszy
+    od nagłówka dodaje kolumny 'Unnamed: n' (jak rows_to_dataframe), więc
+    kolejne paczki mogą mieć więcej kolumn niż pierwsza.
+    progress_callback(etap, bieżący, całość) jest wywoływany po każdej paczce;
+    całość to liczba wierszy z wymiaru arkusza (None, jeśli nieznana).
+    """
+    from openpyxl import load_workbook
+    workbook = load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+    try:
+        worksheet = workbook[choose_sheet(workbook.sheetnames, sheet_name)]
+        # Wymiar arkusza służy tylko do postępu - wiersze są czytane do końca danych
+        total_rows = worksheet.max_row
+        worksheet.reset_dimensions()
+        rows = worksheet.iter_rows(values_only=True)
+
+        rows_read = 0
+        header = None
+        for row in rows:
+            rows_read += 1
+            if not _is_empty_row(row):
+                header = row
+                break
+        if header is None:
+            return
+        columns = make_column_names(header)
+        width = len(columns)
+
+        batch = []
+        for row in rows:
+            rows_read += 1
+            if _is_empty_row(row):
+                continue
+            row = tuple(row)
+            if len(row) > width:
+                # Wartości poza nagłówkiem - kolumny bez nazwy jak w rows_to_dataframe
+                # (wcześniejsze wiersze paczki są uzupełniane, kolejne paczki mają już te kolumny)
+                columns = columns + [f'Unnamed: {i}' for i in range(width, len(row))]
+                width = len(row)
+                batch = [r + (None,) * (width - len(r)) for r in batch]
+            batch.append(row + (None,) * (width - len(row)))
+            if len(batch) >= batch_size:
+                yield _batch_to_dataframe(batch, columns)
+                batch = []
+                if progress_callback:
+                    progress_callback('read', rows_read, total_rows)
+
+        if batch:
+            yield _batch_to_dataframe(batch, columns)
+        if progress_callback:
+            progress_callback('read', rows_read, rows_read)
+    finally:
+        workbook.close()
+
+
+def _batch_to_dataframe(batch, columns):
+    """Buduje DataFrame z paczki wierszy przez transpozycję na kolumny"""
+    column_values = zip(*batch)
+    return pd.DataFrame({name: pd.Series(values) for name, values in zip(columns, column_values)})
@@ -0,0 +1,95 @@
+"""
+Moduł blokady pliku między procesami
+
+Pliki zapisywane przez kilka procesów naraz (workery gunicorn, proces wysyłki
+aplikacji desktopowej) są chronione blokadą systemową na osobnym pliku
+blokady: fcntl.flock w systemach POSIX, msvcrt.locking w Windows. Blokada
+jest zwalniana przez system, gdy proces, który ją trzyma, zakończy się.
+"""
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Odstęp kolejnych prób założenia blokady (sekundy)
+LOCK_POLL_SECONDS = 0.05
+
+
+def _try_lock(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+
+
+def _unlock(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+class FileLock:
+    """Wyłączna blokada pliku path - między procesami i między wątkami procesu"""
+
+    def __init__(self, path):
+        """Inicjalizuje blokadę (plik blokady jest tworzony przy pierwszym założeniu)"""
+        self.path = path
+        self._lock = threading.Lock()
+        self._fd = None
+
+    @property
+    def locked(self):
+        """Czy ta instancja trzyma blokadę"""
+        return self._fd is not None
+
+    def acquire(self, blocking=True, timeout=None):
+        """Zakłada blokadę - zwraca False, gdy trzyma ją inny proces lub wątek (blocking=False lub po timeout)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if not self._lock.acquire(blocking, -1 if timeout is None or not blocking else timeout):
+            return False
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            while True:
+                try:
+                    _try_lock(fd)
+                    break
+                except OSError:
+                    if not blocking or (deadline is not None and time.monotonic() >= deadline):
+                        os.close(fd)
+                        self._lock.release()
+                        return False
+                    time.sleep(LOCK_POLL_SECONDS)
+        except BaseException:
+            self._lock.release()
+            raise
+        self._fd = fd
+        return True
+
+    def release(self):
+        """Zwalnia blokadę"""
+        fd, self._fd = self._fd, None
+        if fd is None:
+            return
+        try:
+            _unlock(fd)
+        finally:
+            os.close(fd)
+            self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
@@ -0,0 +1,16 @@
+"""
+Konfiguracja gunicorn dla aplikacji webowej Windykator
+
+gunicorn wczytuje ten plik z katalogu roboczego:
+gunicorn -w 4 -b 0.0.0.0:5000 web_app:app
+
+Każdy worker po starcie wznawia zapisane harmonogramy kampanii - harmonogram
+wysyła ten worker, który założy jego blokadę (pozostałe go pomijają), a po
+awarii workera wznawia go worker uruchomiony w jego miejsce.
+"""
+
+
+def post_worker_init(worker):
+    """Wznawia harmonogramy kampanii w nowym workerze"""
+    from web_app import resume_scheduled_campaigns
+    resume_scheduled_campaigns()
@@ -0,0 +1,89 @@
+"""
+Moduł wczytywania pliku w tle (aplikacja desktopowa)
+
+LoadJob wczytuje plik w wątku roboczym do osobnego DataProcessor (zob.
+DataProcessor.spawn). Wątek roboczy nie dotyka Tk: ostatni zgłoszony postęp
+jest zapisywany w zadaniu, a okno odczytuje go co POLL_INTERVAL_MS przez
+root.after. Po zakończeniu wątek Tk podmienia procesor aplikacji na wczytany
+w jednym przypisaniu, więc interfejs nigdy nie widzi danych w połowie
+wczytywania, a anulowane zadanie nie zmienia bieżących danych.
+"""
+import logging
+import threading
+import time
+
+from data_processor import LoadCancelled
+
+# Co ile milisekund okno odczytuje postęp zadania
+POLL_INTERVAL_MS = 100
+
+# Opisy etapów wczytywania wyświetlane w oknie postępu
+STAGE_LABELS = {
+    'detection': '🔍 Rozpoznawanie formatu pliku...',
+    'read': '📖 Wczytywanie danych...',
+    'cleaning': '🧹 Czyszczenie danych...',
+    'mapping': '🗺️ Mapowanie kolumn...',
+    'dates': '📅 Wyliczanie dni po terminie...'
+}
+
+
+class LoadJob:
+    """Klasa wczytująca plik w wątku roboczym z możliwością anulowania"""
+
+    def __init__(self, processor, file_path):
+        """Inicjalizuje zadanie dla procesora (nowego, np. z DataProcessor.spawn)"""
+        self.processor = processor
+        self.file_path = file_path
+        self.progress = ('detection', 0, None)  # (etap, bieżący, całość)
+        self.success = False
+        self.cancelled = False
+        self.error = None
+        self.seconds = None
+        self.done = threading.Event()
+        self.logger = logging.getLogger(__name__)
+        self._cancel_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Uruchamia wczytywanie w wątku roboczym"""
+        self._thread = threading.Thread(target=self._run, name='file-load', daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        """Zgłasza anulowanie - wczytywanie przerywa się przy najbliższym odczycie lub etapie"""
+        self._cancel_event.set()
+
+    @property
+    def cancel_requested(self):
+        return self._cancel_event.is_set()
+
+    def is_running(self):
+        return self._thread is not None and not self.done.is_set()
+
+    def wait(self, timeout=None):
+        """Czeka na zakończenie zadania - zwraca True, jeśli się zakończyło"""
+        return self.done.wait(timeout)
+
+    def _on_progress(self, stage, current, total):
+        # Jedno przypisanie krotki - wątek Tk zawsze odczytuje spójny stan
+        self.progress = (stage, current, total)
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            self.success = bool(self.processor.load_excel_file(
+                self.file_path, progress_callback=self._on_progress, cancel_event=self._cancel_event
+            ))
+            if self._cancel_event.is_set():
+                # Anulowano na ostatnim etapie - wynik nie jest przekazywany
+                raise LoadCancelled()
+        except LoadCancelled:
+            self.cancelled = True
+            self.logger.info(f"⏹️ Wczytywanie pliku przerwane: {self.file_path}")
+        except Exception as e:
+            self.error = e
+            self.logger.error(f"❌ Błąd wczytywania pliku w tle: {e}")
+        finally:
+            self.seconds = time.perf_counter() - start
+            self.done.set()
@@ -0,0 +1,148 @@
+"""
+Moduł konfiguracji logowania aplikacji Windykator
+
+Rekordy są przekazywane przez kolejkę (QueueHandler) do osobnego wątku
+(QueueListener), który formatuje je i zapisuje - wątek wysyłki nie czeka na
+zapis do konsoli ani pliku. Tryb strukturalny zapisuje każdy rekord jako jedną
+linię JSON. Zdarzenia oznaczone extra={'event': ...} (np. każda wysłana
+wiadomość) mogą być próbkowane: z N kolejnych zdarzeń zapisywane jest jedno.
+
+Zmienne środowiskowe:
+    WINDYKATOR_LOG_LEVEL   - poziom logowania (domyślnie INFO)
+    WINDYKATOR_LOG_FORMAT  - 'json' włącza logowanie strukturalne
+    WINDYKATOR_LOG_FILE    - dodatkowy plik logu
+"""
+import atexit
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Zdarzenia próbkowane domyślnie (zdarzenie -> zapisuj 1 z N)
+DEFAULT_SAMPLE_RATES = {
+    'email.sent': 100,
+    'sms.sent': 100
+}
+
+# Atrybuty LogRecord, które nie są polami przekazanymi przez extra
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+_listener = None
+_queue_handler = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Formatuje rekord jako jedną linię JSON (z polami przekazanymi przez extra)"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for name, value in record.__dict__.items():
+            if name not in _RECORD_ATTRIBUTES and not name.startswith('_'):
+                entry[name] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Przepuszcza co N-ty rekord dla zdarzeń z extra={'event': ...}.
+
+    Ostrzeżenia i błędy nie są nigdy próbkowane; rekord przepuszczony po
+    pominięciu innych dostaje pole 'sampled' z liczbą reprezentowanych zdarzeń.
+    """
+
+    def __init__(self, sample_rates=None):
+        super().__init__()
+        self.sample_rates = dict(DEFAULT_SAMPLE_RATES if sample_rates is None else sample_rates)
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        event = getattr(record, 'event', None)
+        rate = self.sample_rates.get(event) if event else None
+        if not rate or rate <= 1 or record.levelno >= logging.WARNING:
+            return True
+        with self._lock:
+            counter = self._counters.get(event)
+            if counter is None:
+                counter = self._counters[event] = itertools.count()
+            position = next(counter)
+        if position % rate:
+            return False
+        record.sampled = rate
+        return True
+
+
+def mask_recipient(value):
+    """Maskuje adres email lub numer telefonu do logów (j***@firma.pl, ******2990)"""
+    value = str(value or '')
+    if '@' in value:
+        local, _, domain = value.partition('@')
+        return f"{local[:1]}***@{domain}"
+    return '*' * max(0, len(value) - 4) + value[-4:]
+
+
+def setup_logging(level=None, structured=None, sample_rates=None, log_file=None, force=False):
+    """Konfiguruje logowanie asynchroniczne dla procesu - zwraca QueueListener.
+
+    Parametry pominięte są brane ze zmiennych środowiskowych. Ponowne
+    wywołanie zastępuje poprzednią konfigurację. Jak logging.basicConfig nie
+    zmienia niczego, jeśli logger główny ma już inne handlery (chyba że force=True).
+    """
+    global _listener, _queue_handler
+
+    root = logging.getLogger()
+    foreign_handlers = [handler for handler in root.handlers if handler is not _queue_handler]
+    if foreign_handlers and not force:
+        return None
+
+    level = level or os.environ.get('WINDYKATOR_LOG_LEVEL', 'INFO')
+    if structured is None:
+        structured = os.environ.get('WINDYKATOR_LOG_FORMAT', '').lower() == 'json'
+    log_file = log_file or os.environ.get('WINDYKATOR_LOG_FILE')
+
+    formatter = JsonFormatter() if structured else logging.Formatter(TEXT_FORMAT)
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file, encoding='utf-8'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    stop_logging()
+    for handler in foreign_handlers:
+        root.removeHandler(handler)
+
+    log_queue = queue.SimpleQueue()
+    _queue_handler = logging.handlers.QueueHandler(log_queue)
+    _queue_handler.addFilter(SamplingFilter(sample_rates))
+    root.addHandler(_queue_handler)
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """Zatrzymuje wątek zapisu logów (zapisuje rekordy pozostałe w kolejce)"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+
+
+atexit.register(stop_logging)
@@ -7,36 +7,62 @@ import threading
 import logging
 import glob
 import os
-import time
 
 # Import modułów
 from config import Config
-from data_processor import DataProcessor
+from data_processor import DataProcessor, OVERDUE_BUCKETS
+from excel_reader import detect_file_format, list_sheets
 from email_sender import EmailSender
 from sms_sender import SMSSender
+from sender_pool import build_email_sender, build_sms_sender
+from sending_engine import build_template_data
+from sending_process import SendingProcess, expand_status, default_limits, POLL_INTERVAL_MS as SENDING_POLL_INTERVAL_MS
+from sending_control import MAX_CONCURRENCY
+from editor_history import EditHistory, style_edits, footer_edits, text_index
+from template_preview import PreviewRenderer, html_to_text, sample_row
+from placeholders import PlaceholderRegistry
+from load_job import LoadJob, POLL_INTERVAL_MS, STAGE_LABELS
+from dataset_model import DatasetModel, DISPLAY_FIELDS
+from metrics import metrics, MESSAGES_TOTAL, QUEUE_DEPTH
+from logging_setup import setup_logging
 from ui_components import UIComponents
 
+# Status kanału w trakcie wysyłki i pozycji, której wysyłki nie rozpoczęto (anulowanie, błąd procesu)
+STATUS_SENDING = "⏳ Wysyłanie..."
+STATUS_CANCELLED = "⏹️ Anulowano"
+
 class WindykatorApp:
     """Główna klasa aplikacji Windykator"""
     
     def __init__(self):
         # Konfiguracja logowania
-        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        setup_logging()
         self.logger = logging.getLogger(__name__)
         
         # Inicjalizacja komponentów
         self.config = Config()
         self.data_processor = DataProcessor()
+        self.data_processor.filter_zero_amounts_on_load = self.config.load_filter_zero_amounts_on_load()
         self.email_sender = None
         self.sms_sender = None
         
         # Zmienne aplikacji
         self.preview_items = []
+        # Wspólny model danych podglądu, okna wysyłki i eksportu (klucz wiersza -> rekord i statusy)
+        self.dataset = DatasetModel()
+        self.dataset.subscribe(self._on_dataset_change)
+        self.sending_status_tree = None
+        self.placeholders_data = []
+        self.placeholder_registry = PlaceholderRegistry()  # wspólny dla podglądu i wysyłki
         self.sending_window = None
+        self.sending_process = None  # Wysyłka w procesie potomnym (SendingProcess)
+        self.load_job = None  # Wczytywanie pliku w tle (LoadJob)
+        self.load_progress_window = None
         
-        # Inicjalizacja historii edytora
-        self.editor_history = []
-        self.current_history_index = -1
+        # Inicjalizacja historii edytora (różnice zamiast kopii dokumentu)
+        self.editor_history = EditHistory()
+        self.editor_history_widget = None
+        self.preview_renderer = None
         
         # Tworzenie głównego okna
         self.root = tk.Tk()
@@ -312,6 +338,7 @@ class WindykatorApp:
         # Przyciski wysyłki
         self.sending_widgets['send_btn'].config(command=self.start_sending)
         self.sending_widgets['export_btn'].config(command=self.export_sending_status_to_csv)
+        self.sending_widgets['stats_btn'].config(command=self.show_stats_window)
         
         # Podłącz checkbox trybu testowego
         self.sending_widgets['test_mode_var'].trace('w', self.on_test_mode_change)
@@ -355,6 +382,7 @@ class WindykatorApp:
             email_template = self.config.load_template('email')
             self.templates_widgets['email_editor'].delete(1.0, tk.END)
             self.templates_widgets['email_editor'].insert(1.0, email_template)
+            self._reset_editor_history(self.templates_widgets['email_editor'])
             
             # Podłącz śledzenie zmian w edytorze email
             self.templates_widgets['email_editor'].bind('<KeyRelease>', self.on_editor_change)
@@ -371,8 +399,15 @@ class WindykatorApp:
             print(f"⚠️ Błąd wczytywania szablonów: {str(e)}")
     
     def load_excel_file(self):
-        """Wczytywanie pliku Excel/CSV/TSV"""
+        """Wczytywanie pliku Excel/CSV/TSV (w tle, z postępem i możliwością anulowania)"""
         try:
+            if self.load_job and self.load_job.is_running():
+                messagebox.showwarning("Ostrzeżenie", "Trwa wczytywanie pliku - poczekaj lub je anuluj")
+                return
+            if self.sending_process is not None and not self.sending_process.finished:
+                messagebox.showwarning("Ostrzeżenie", "Trwa wysyłka - nowy plik można wczytać po jej zakończeniu")
+                return
+            
             # Wybierz plik
             file_path = filedialog.askopenfilename(
                 title="Wybierz plik Excel/CSV/TSV",
@@ -387,30 +422,161 @@ class WindykatorApp:
             if not file_path:
                 return
             
-            # Wczytaj dane
-            if self.data_processor.load_excel_file(file_path):
-                # Aktualizuj status
-                row_count = self.data_processor.get_row_count()
-                self.data_mapping_widgets['file_info'].config(
-                    text=f"✅ Wczytano: {row_count} wierszy", 
-                    style='Success.TLabel'
-                )
-                
-                # Aktualizuj comboboxy z kolumnami
-                self.update_column_mapping()
-                
-                # Automatycznie wczytaj mapowanie jeśli istnieje
-                self.load_mapping()
-                
-                self.status_label.config(text=f"✅ Wczytano plik: {os.path.basename(file_path)}")
-                
-            else:
-                messagebox.showerror("Błąd", "Nie udało się wczytać pliku")
+            # Plik trafia do nowego procesora - bieżące dane zostają do końca wczytywania
+            processor = self.data_processor.spawn()
+            
+            # Skoroszyt z kilkoma arkuszami - zapytaj, który wczytać
+            processor.sheet_name = None
+            if file_path.lower().endswith(('.xlsx', '.xls')) and detect_file_format(file_path) != 'text':
+                sheets = list_sheets(file_path)
+                if len(sheets) > 1:
+                    sheet_name = self.ask_sheet_name(sheets)
+                    if sheet_name is None:
+                        return
+                    processor.sheet_name = sheet_name
+            
+            # Wczytaj dane w wątku roboczym - okno pozostaje responsywne
+            self.load_job = LoadJob(processor, file_path).start()
+            self.show_load_progress(self.load_job)
+            self.root.after(POLL_INTERVAL_MS, self._poll_load_job, self.load_job)
                 
         except Exception as e:
             messagebox.showerror("Błąd", f"Błąd wczytywania pliku:\n{str(e)}")
             self.logger.error(f"Błąd wczytywania pliku: {e}")
     
+    def show_load_progress(self, job):
+        """Pokazuje okno postępu wczytywania z przyciskiem anulowania"""
+        window = tk.Toplevel(self.root)
+        window.title("Wczytywanie pliku")
+        window.transient(self.root)
+        window.resizable(False, False)
+        
+        container = ttk.Frame(window, padding="20")
+        container.pack(fill=tk.BOTH, expand=True)
+        
+        ttk.Label(container, text=f"📂 {os.path.basename(job.file_path)}").pack(anchor=tk.W)
+        stage_label = ttk.Label(container, text=STAGE_LABELS['detection'])
+        stage_label.pack(anchor=tk.W, pady=(5, 10))
+        
+        progress_bar = ttk.Progressbar(container, mode='indeterminate', length=360, maximum=100)
+        progress_bar.pack(fill=tk.X, pady=(0, 15))
+        progress_bar.start(15)
+        
+        cancel_btn = ttk.Button(container, text="❌ Anuluj", command=job.cancel)
+        cancel_btn.pack(side=tk.RIGHT)
+        window.protocol("WM_DELETE_WINDOW", job.cancel)
+        
+        window.stage_label = stage_label
+        window.progress_bar = progress_bar
+        window.cancel_btn = cancel_btn
+        self.load_progress_window = window
+    
+    def _update_load_progress(self, job):
+        """Przenosi ostatni postęp zadania do okna postępu (wątek Tk)"""
+        window = self.load_progress_window
+        if window is None or not window.winfo_exists():
+            return
+        stage, current, total = job.progress
+        text = STAGE_LABELS.get(stage, stage)
+        bar = window.progress_bar
+        if stage == 'read' and total:
+            percent = min(100.0, current * 100.0 / total)
+            text = f"{text} {percent:.0f}%"
+            if str(bar.cget('mode')) != 'determinate':
+                bar.stop()
+                bar.config(mode='determinate')
+            bar['value'] = percent
+        elif str(bar.cget('mode')) != 'indeterminate':
+            bar.config(mode='indeterminate')
+            bar.start(15)
+        if job.cancel_requested:
+            text = "⏹️ Anulowanie..."
+            window.cancel_btn.config(state=tk.DISABLED)
+        window.stage_label.config(text=text)
+    
+    def _poll_load_job(self, job):
+        """Odczytuje postęp zadania wczytywania i przejmuje wynik po zakończeniu"""
+        if job is not self.load_job:
+            return
+        if not job.done.is_set():
+            self._update_load_progress(job)
+            self.root.after(POLL_INTERVAL_MS, self._poll_load_job, job)
+            return
+        
+        if self.load_progress_window is not None and self.load_progress_window.winfo_exists():
+            self.load_progress_window.destroy()
+        self.load_progress_window = None
+        
+        if job.success:
+            # Podmiana procesora w wątku Tk - jedno przypisanie, bez stanów pośrednich
+            self.data_processor = job.processor
+            self.logger.info("📂 Wczytano plik w tle w %.2f s", job.seconds)
+            self._on_file_loaded(job.file_path)
+        elif job.cancelled:
+            self.status_label.config(text="⏹️ Wczytywanie pliku przerwane")
+        elif job.error is not None:
+            messagebox.showerror("Błąd", f"Błąd wczytywania pliku:\n{str(job.error)}")
+        else:
+            messagebox.showerror("Błąd", "Nie udało się wczytać pliku")
+    
+    def _on_file_loaded(self, file_path):
+        """Odświeża interfejs po wczytaniu pliku"""
+        # Nowy plik - numeracja wierszy zaczyna się od nowa, więc pozycje i statusy
+        # poprzedniego pliku nie mogą trafić do porównania przy odświeżeniu podglądu
+        self.dataset.clear()
+        self.update_preview_info()
+        
+        # Aktualizuj status
+        row_count = self.data_processor.get_row_count()
+        removed = self.data_processor.removed_on_load
+        self.data_mapping_widgets['file_info'].config(
+            text=f"✅ Wczytano: {row_count} wierszy" + (f" (pominięto {removed} z kwotą ≤ 0)" if removed else ""), 
+            style='Success.TLabel'
+        )
+        
+        # Aktualizuj comboboxy z kolumnami
+        self.update_column_mapping()
+        
+        # Znany układ pliku - pokaż mapowanie z zapisanego profilu,
+        # w przeciwnym razie automatycznie wczytaj mapowanie jeśli istnieje
+        if self.data_processor.active_profile:
+            for field, combo in self.data_mapping_widgets['mapping_fields'].items():
+                combo.set(self.data_processor.column_mapping.get(field, ''))
+        else:
+            self.load_mapping()
+        
+        self.status_label.config(text=f"✅ Wczytano plik: {os.path.basename(file_path)}")
+    
+    def ask_sheet_name(self, sheets):
+        """Pyta o arkusz do wczytania - zwraca nazwę arkusza lub None po anulowaniu"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Wybierz arkusz")
+        dialog.transient(self.root)
+        dialog.grab_set()
+        
+        container = ttk.Frame(dialog, padding="20")
+        container.pack(fill=tk.BOTH, expand=True)
+        
+        ttk.Label(container, text="📑 Plik zawiera kilka arkuszy - wybierz arkusz z danymi:").pack(anchor=tk.W, pady=(0, 10))
+        
+        sheet_var = tk.StringVar(value=sheets[0])
+        combo = ttk.Combobox(container, textvariable=sheet_var, values=sheets, state='readonly', width=40)
+        combo.pack(fill=tk.X, pady=(0, 15))
+        
+        result = {'sheet': None}
+        
+        def confirm():
+            result['sheet'] = sheet_var.get()
+            dialog.destroy()
+        
+        buttons = ttk.Frame(container)
+        buttons.pack(fill=tk.X)
+        ttk.Button(buttons, text="✅ Wczytaj", command=confirm, style='Primary.TButton').pack(side=tk.RIGHT)
+        ttk.Button(buttons, text="Anuluj", command=dialog.destroy).pack(side=tk.RIGHT, padx=(0, 10))
+        
+        self.root.wait_window(dialog)
+        return result['sheet']
+    
     def update_column_mapping(self):
         """Aktualizuje comboboxy z kolumnami"""
         columns = self.data_processor.get_columns()
@@ -438,7 +604,7 @@ class WindykatorApp:
             messagebox.showwarning("Ostrzeżenie", "Najpierw wczytaj plik Excel/CSV")
             return
         
-        print(f"🔄 Generuję podgląd dla {len(self.data_processor.excel_data)} wierszy...")
+        self.logger.debug("🔄 Generuję podgląd dla %d wierszy", len(self.data_processor.excel_data))
         
         # Przygotuj mapowanie kolumn
         mapping = {}
@@ -446,65 +612,64 @@ class WindykatorApp:
             if combo.get():
                 mapping[field] = combo.get()
         
-        # Debug: wyświetl mapowanie
-        print(f"🔍 Mapowanie kolumn: {mapping}")
+        self.logger.debug("🔍 Mapowanie kolumn: %s", mapping)
         
         # Ustaw mapowanie przed walidacją
         self.data_processor.set_column_mapping(mapping)
         
         # Sprawdź czy wszystkie wymagane pola są zmapowane
         required_fields = self.config.get_required_fields()
-        print(f"🔍 Wymagane pola: {required_fields}")
         missing_fields = self.data_processor.validate_mapping(required_fields)
-        print(f"🔍 Brakujące pola: {missing_fields}")
+        self.logger.debug("🔍 Wymagane pola: %s, brakujące: %s", required_fields, missing_fields)
         
         if missing_fields:
             messagebox.showwarning("Ostrzeżenie", 
                                  f"Zmapuj wymagane pola: {', '.join(missing_fields)}")
             return
         
-        # Wyczyść poprzedni podgląd
-        print("🧹 Czyszczę poprzedni podgląd...")
-        old_items = len(self.data_mapping_widgets['preview_tree'].get_children())
-        print(f"🧹 Stary podgląd zawierał: {old_items} pozycji")
-        
-        for item in self.data_mapping_widgets['preview_tree'].get_children():
-            self.data_mapping_widgets['preview_tree'].delete(item)
-        
-        print("🧹 Wyczyszczono poprzedni podgląd")
-        
-        # Dodaj wiersze do podglądu
-        print("📊 Pobieram dane do podglądu...")
-        # Pobierz wszystkie wiersze lub maksymalnie 1000 (zamiast domyślnych 10)
-        max_preview_rows = min(1000, len(self.data_processor.excel_data))
-        # Użyj zmapowanego podglądu zamiast oryginalnych kolumn
-        preview_data = self.data_processor.get_preview_data_mapped(max_rows=max_preview_rows)
-        print(f"📊 Pobrano {len(preview_data)} wierszy do podglądu (maksymalnie {max_preview_rows})")
-        
-        print("📝 Dodaję wiersze do Treeview...")
-        for i, row_data in enumerate(preview_data):
-            # Przygotuj wartości w odpowiedniej kolejności
-            values = (
-                row_data.get('kontrahent', ''),
-                row_data.get('nip', ''),
-                row_data.get('nr_faktury', ''),
-                row_data.get('email', ''),
-                row_data.get('telefon', ''),
-                row_data.get('kwota', ''),
-                row_data.get('dni_po_terminie', '')
-            )
-            self.data_mapping_widgets['preview_tree'].insert('', 'end', values=values, tags=(i,))
+        preview_count = self.refresh_preview()
+        
+        total_rows = len(self.data_processor.excel_data)
+        messagebox.showinfo("Sukces", f"Wygenerowano podgląd: {preview_count} pozycji z {total_rows} dostępnych")
+    
+    def refresh_preview(self, max_rows=1000):
+        """Odświeża podgląd przyrostowo - zwraca liczbę wierszy danych w podglądzie.
         
-        new_items = len(self.data_mapping_widgets['preview_tree'].get_children())
-        print(f"✅ Dodano {len(preview_data)} wierszy do podglądu")
-        print(f"✅ Treeview zawiera teraz: {new_items} pozycji")
+        Model danych (self.dataset) porównuje nowy zbiór z bieżącymi pozycjami
+        po stabilnym id wiersza, więc widoki usuwają, dodają i zmieniają tylko
+        różniące się wiersze. Pozycje dodane ręcznie zostają.
+        """
+        preview_data = self.data_processor.get_preview_data_mapped(max_rows=max_rows)
+        removed, inserted, updated = self.dataset.sync(preview_data)
         
-        # Aktualizuj informację o liczbie pozycji
-        print("ℹ️ Aktualizuję informację o liczbie pozycji...")
+        self.logger.debug("🔄 Podgląd: usunięto %d, dodano %d, zmieniono %d wierszy", removed, inserted, updated)
         self.update_preview_info()
-        
-        total_rows = len(self.data_processor.excel_data)
-        messagebox.showinfo("Sukces", f"Wygenerowano podgląd: {len(preview_data)} pozycji z {total_rows} dostępnych")
+        return len(preview_data)
+    
+    def _on_dataset_change(self, change, keys):
+        """Przenosi zmianę modelu danych do widoków (tylko wyświetlanie)"""
+        if change != 'status':
+            self._apply_dataset_change(self.data_mapping_widgets['preview_tree'], change, keys, False)
+        if self.sending_status_tree is not None:
+            try:
+                self._apply_dataset_change(self.sending_status_tree, change, keys, True)
+            except tk.TclError:
+                # Okno wysyłki zostało zamknięte
+                self.sending_status_tree = None
+    
+    def _apply_dataset_change(self, tree, change, keys, with_status):
+        """Aktualizuje Treeview o iid równych kluczom modelu"""
+        if change == 'clear':
+            tree.delete(*tree.get_children())
+        elif change == 'delete':
+            tree.delete(*keys)
+        elif change == 'insert':
+            # Klucze w kolejności pozycji - każda trafia od razu na docelowe miejsce
+            for key in keys:
+                tree.insert('', self.dataset.position(key), iid=key, values=self.dataset.values(key, with_status))
+        else:
+            for key in keys:
+                tree.item(key, values=self.dataset.values(key, with_status))
     
     def add_preview_item(self):
         """Dodawanie pozycji do podglądu"""
@@ -624,12 +789,9 @@ class WindykatorApp:
     def add_manual_item_to_preview(self, values):
         """Dodaje ręcznie wprowadzoną pozycję do podglądu"""
         # Sprawdź czy pozycja już istnieje
-        existing_items = self.data_mapping_widgets['preview_tree'].get_children()
-        for item in existing_items:
-            item_data = self.data_mapping_widgets['preview_tree'].item(item)
-            if item_data['values'][2] == values[2]:  # Nr Faktury
-                messagebox.showinfo("Informacja", "Ta pozycja już jest w podglądzie")
-                return
+        if self.dataset.find('nr_faktury', values[2]) is not None:
+            messagebox.showinfo("Informacja", "Ta pozycja już jest w podglądzie")
+            return
         
         # Oblicz dni po terminie
         dni_po_terminie = ""
@@ -650,17 +812,17 @@ class WindykatorApp:
                 dni_po_terminie = "Błąd daty"
         
         # Dodaj do podglądu
-        preview_values = (
-            values[0],  # Kontrahent
-            values[1],  # NIP
-            values[2],  # Nr Faktury
-            values[3],  # Email
-            values[4],  # Telefon
-            values[5],  # Kwota
-            dni_po_terminie
-        )
-        
-        self.data_mapping_widgets['preview_tree'].insert('', 'end', values=preview_values, tags=(-1,))
+        self.dataset.add({
+            'kontrahent': values[0],
+            'nip': values[1],
+            'nr_faktury': values[2],
+            'email': values[3],
+            'telefon': values[4],
+            'kwota': values[5],
+            'data_faktury': values[6],
+            'dni_po_terminie': dni_po_terminie,
+            'row_id': -1
+        })
         self.update_preview_info()
     
     def add_item_to_preview(self, index):
@@ -670,32 +832,17 @@ class WindykatorApp:
             return
         
         # Sprawdź czy pozycja już istnieje
-        existing_items = self.data_mapping_widgets['preview_tree'].get_children()
-        for item in existing_items:
-            item_data = self.data_mapping_widgets['preview_tree'].item(item)
-            if item_data['values'][2] == template_data.get('nr_faktury', ''):  # Nr Faktury
-                messagebox.showinfo("Informacja", "Ta pozycja już jest w podglądzie")
-                return
-        
-        # Dodaj do podglądu
-        values = (
-            template_data.get('kontrahent', ''),
-            template_data.get('nip', ''),
-            template_data.get('nr_faktury', ''),
-            template_data.get('email', ''),
-            template_data.get('telefon', ''),
-            template_data.get('kwota', ''),
-            template_data.get('dni_po_terminie', '')
-        )
-        
-        self.data_mapping_widgets['preview_tree'].insert('', 'end', values=values, tags=(index,))
+        if (self.dataset.find('nr_faktury', template_data.get('nr_faktury', '')) is not None or
+                self.dataset.add(template_data) is None):
+            messagebox.showinfo("Informacja", "Ta pozycja już jest w podglądzie")
+            return
         self.update_preview_info()
     
     def remove_selected_preview_item(self):
         """Usuwa wybraną pozycję z podglądu"""
         selection = self.data_mapping_widgets['preview_tree'].selection()
         if selection:
-            self.data_mapping_widgets['preview_tree'].delete(selection[0])
+            self.dataset.remove(selection[0])
             self.update_preview_info()
         else:
             messagebox.showwarning("Ostrzeżenie", "Wybierz pozycję do usunięcia")
@@ -709,7 +856,7 @@ class WindykatorApp:
             return
         
             item = selection[0]
-            values = list(self.data_mapping_widgets['preview_tree'].item(item)['values'])
+            values = list(self.dataset.values(item))
             
             # Okno edycji
             edit_window = tk.Toplevel(self.root)
@@ -787,8 +934,8 @@ class WindykatorApp:
                     return
                 new_values.append(value)
             
-            # Aktualizuj pozycję w podglądzie
-            self.data_mapping_widgets['preview_tree'].item(item, values=new_values)
+            # Aktualizuj pozycję w modelu - podgląd i okno wysyłki odświeżą się same
+            self.dataset.update(item, dict(zip(DISPLAY_FIELDS, new_values)))
             
             # Aktualizuj informacje o podglądzie
             self.update_preview_info()
@@ -805,7 +952,7 @@ class WindykatorApp:
     
     def update_preview_info(self):
         """Aktualizuje informację o liczbie pozycji w podglądzie"""
-        preview_count = len(self.data_mapping_widgets['preview_tree'].get_children())
+        preview_count = len(self.dataset)
         if self.data_processor.excel_data is not None:
             total_count = len(self.data_processor.excel_data)
             self.data_mapping_widgets['preview_info'].config(
@@ -822,6 +969,12 @@ class WindykatorApp:
                 mapping[field] = combo.get()
         
         self.config.save_mapping(mapping)
+        
+        # Zapamiętaj mapowanie dla układu wczytanego pliku
+        if self.data_processor.excel_data is not None:
+            self.data_processor.set_column_mapping(mapping)
+            self.data_processor.save_current_profile()
+        
         messagebox.showinfo("Sukces", "Mapowanie zostało zapisane")
     
     def load_mapping(self):
@@ -1005,8 +1158,16 @@ class WindykatorApp:
             self.email_editor.insert('1.0', default_template)
         
         # Historia edycji
-        self.editor_history = []
-        self.current_history_index = -1
+        self._reset_editor_history(self.email_editor)
+        
+        # Podgląd na żywo (renderowany w tle na przykładowym wierszu danych)
+        live_frame = ttk.LabelFrame(main_frame, text="👁️ Podgląd na żywo", padding=5)
+        live_frame.pack(fill=tk.X, pady=(10, 0))
+        self.live_preview = tk.Text(live_frame, wrap=tk.WORD, height=10,
+                                    font=('Arial', 10), bg='#f8f9fa', fg='black',
+                                    state=tk.DISABLED)
+        self.live_preview.pack(fill=tk.BOTH, expand=True)
+        self._start_live_preview(preview_window)
         
         # Przyciski akcji
         action_frame = ttk.Frame(main_frame)
@@ -1042,17 +1203,16 @@ class WindykatorApp:
                              command=preview_window.destroy)
         close_btn.pack(side=tk.LEFT)
         
-        # Bind events dla historii edycji
-        self.email_editor.bind('<Key>', self.on_editor_change)
-        self.email_editor.bind('<Button-1>', self.on_editor_change)
+        # Bind events dla historii edycji (po zmianie tekstu, nie przed nią)
+        self.email_editor.bind('<KeyRelease>', self.on_editor_change)
+        self.email_editor.bind('<ButtonRelease-1>', self.on_editor_change)
         
         print("✅ Edytor WYSIWYG został otwarty")
     
     def start_sending(self):
         """Rozpoczyna proces wysyłki"""
         # Sprawdź czy są pozycje w podglądzie
-        preview_items = self.data_mapping_widgets['preview_tree'].get_children()
-        if not preview_items:
+        if not len(self.dataset):
             messagebox.showwarning("Ostrzeżenie", "Brak pozycji do wysłania")
             return
         
@@ -1066,6 +1226,7 @@ class WindykatorApp:
     
     def create_sending_window(self):
         """Tworzy okno wysyłki"""
+        self.sending_status_tree = None
         self.sending_window = tk.Toplevel(self.root)
         self.sending_window.title("Wysyłka powiadomień")
         self.sending_window.geometry("1000x600")
@@ -1098,6 +1259,28 @@ class WindykatorApp:
                                    variable=sending_sms_var)
         sms_check.pack(side=tk.LEFT)
         
+        # Limity kampanii - można je zmieniać w trakcie wysyłki
+        limits_frame = ttk.Frame(controls_frame)
+        limits_frame.pack(fill=tk.X, pady=(0, 5))
+        
+        limits = default_limits()
+        per_minute = lambda rate: f"{rate * 60:g}" if rate else ""
+        self.sending_limit_vars = {
+            'concurrency': tk.StringVar(value=str(limits['concurrency'])),
+            'email_rate': tk.StringVar(value=per_minute(limits['email_rate'])),
+            'sms_rate': tk.StringVar(value=per_minute(limits['sms_rate']))
+        }
+        
+        ttk.Label(limits_frame, text="Równoległe wysyłki:").pack(side=tk.LEFT)
+        ttk.Spinbox(limits_frame, from_=1, to=MAX_CONCURRENCY, width=4,
+                    textvariable=self.sending_limit_vars['concurrency']).pack(side=tk.LEFT, padx=(5, 15))
+        ttk.Label(limits_frame, text="📧 Email/min:").pack(side=tk.LEFT)
+        ttk.Entry(limits_frame, width=6, textvariable=self.sending_limit_vars['email_rate']).pack(side=tk.LEFT, padx=(5, 15))
+        ttk.Label(limits_frame, text="📱 SMS/min:").pack(side=tk.LEFT)
+        ttk.Entry(limits_frame, width=6, textvariable=self.sending_limit_vars['sms_rate']).pack(side=tk.LEFT, padx=(5, 15))
+        ttk.Button(limits_frame, text="⚙️ Zastosuj limity", command=self.apply_sending_limits).pack(side=tk.LEFT)
+        ttk.Label(limits_frame, text="(puste - bez limitu)").pack(side=tk.LEFT, padx=(10, 0))
+        
         # Przyciski kontroli
         buttons_frame = ttk.Frame(controls_frame)
         buttons_frame.pack(pady=(10, 0))
@@ -1106,6 +1289,12 @@ class WindykatorApp:
                              style='Primary.TButton', command=lambda: self.start_sending_process(sending_email_var, sending_sms_var))
         send_btn.pack(side=tk.LEFT, padx=(0, 10))
         
+        pause_btn = ttk.Button(buttons_frame, text="⏸️ Wstrzymaj", command=self.toggle_sending_pause)
+        pause_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
+        cancel_btn = ttk.Button(buttons_frame, text="⏹️ Anuluj wysyłkę", command=self.cancel_sending)
+        cancel_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
         export_btn = ttk.Button(buttons_frame, text="📊 Eksportuj status CSV", 
                                command=self.export_sending_status_to_csv)
         export_btn.pack(side=tk.LEFT)
@@ -1145,35 +1334,37 @@ class WindykatorApp:
         status_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         status_tree.configure(yscrollcommand=status_scrollbar.set)
         
-        # Przygotuj dane do wysyłki
+        # Przygotuj dane do wysyłki (tabela obserwuje model danych)
         self.prepare_sending_data(status_tree)
         
         # Zapisz referencje
         self.sending_status_tree = status_tree
+        self.sending_window.bind('<Destroy>', self._on_sending_window_destroy, add='+')
         self.sending_email_var = sending_email_var
         self.sending_sms_var = sending_sms_var
+        self.sending_pause_btn = pause_btn
+        self._update_sending_controls()
     
     def prepare_sending_data(self, status_tree):
         """Przygotowuje dane do wysyłki"""
-        # Wyczyść poprzednie dane
-        for item in status_tree.get_children():
-            status_tree.delete(item)
-        
-        # Pobierz dane z podglądu
-        preview_items = self.data_mapping_widgets['preview_tree'].get_children()
+        # Nowa wysyłka - wszystkie pozycje oczekują
+        self.dataset.reset_statuses()
         
-        for item in preview_items:
-            item_data = self.data_mapping_widgets['preview_tree'].item(item)
-            values = list(item_data['values'])
-            
-            # Dodaj statusy
-            values.extend(['Oczekuje', 'Oczekuje'])
-            
-            # Dodaj do status tree
-            status_tree.insert('', 'end', values=values, tags=item_data['tags'])
+        # Wyświetl pozycje z modelu danych
+        status_tree.delete(*status_tree.get_children())
+        self._apply_dataset_change(status_tree, 'insert', self.dataset.keys(), True)
+    
+    def _on_sending_window_destroy(self, event):
+        """Odłącza tabelę statusu od modelu po zamknięciu okna wysyłki"""
+        if event.widget is self.sending_window:
+            self.sending_status_tree = None
     
     def start_sending_process(self, email_var, sms_var):
         """Rozpoczyna proces wysyłki"""
+        if self.sending_process is not None and not self.sending_process.finished:
+            messagebox.showwarning("Ostrzeżenie", "Wysyłka już trwa - wstrzymaj ją lub anuluj")
+            return
+        
         # Sprawdź czy to tryb testowy
         test_mode = self.sending_widgets['test_mode_var'].get()
         
@@ -1186,7 +1377,15 @@ class WindykatorApp:
                            daemon=True).start()
             return
         
-        # Normalny tryb wysyłki - sprawdź konfigurację
+        # Limity kampanii z okna wysyłki
+        try:
+            limits = self._sending_limits()
+        except ValueError as e:
+            messagebox.showerror("Błąd", f"Nieprawidłowe limity wysyłki:\n{str(e)}")
+            return
+        
+        # Normalny tryb wysyłki - sprawdź konfigurację (przekazywaną do procesu wysyłki)
+        email_config = sms_config = None
         if email_var.get():
             client_id = self.config_widgets['email_vars']['client_id'].get().strip()
             client_secret = self.config_widgets['email_vars']['client_secret'].get().strip()
@@ -1195,7 +1394,13 @@ class WindykatorApp:
                 messagebox.showerror("Błąd", "Skonfiguruj Microsoft 365 API")
                 return
             
-            self.email_sender = EmailSender(client_id, client_secret)
+            # Kilka skrzynek (email_accounts w api_config.json) - pula senderów w procesie wysyłki
+            token_store = self.config.get_token_store_file()
+            strategy = self.config.load_sender_pool_strategy()
+            accounts = self.config.load_sender_accounts('email', {'client_id': client_id, 'client_secret': client_secret})
+            self.email_sender = build_email_sender(accounts, strategy, token_store,
+                                                   self.config.load_circuit_breaker_settings())
+            email_config = {'accounts': accounts, 'strategy': strategy, 'token_store': token_store}
         
         if sms_var.get():
             sms_token = self.config_widgets['sms_vars']['sms_token'].get().strip()
@@ -1212,15 +1417,19 @@ class WindykatorApp:
             # Użyj None jeśli sender_name jest pusty
             if not sender_name:
                 sender_name = None
-            self.sms_sender = SMSSender(sms_token, sender_name, sms_url)
+            accounts = self.config.load_sender_accounts('sms', {'sms_token': sms_token, 'sms_sender': sender_name,
+                                                                'sms_url': sms_url})
+            strategy = self.config.load_sender_pool_strategy()
+            self.sms_sender = build_sms_sender(accounts, strategy, self.config.load_circuit_breaker_settings())
+            sms_config = {'accounts': accounts, 'strategy': strategy}
         
         # Potwierdź wysyłkę
         if not messagebox.askyesno("Potwierdź", "Czy na pewno chcesz rozpocząć wysyłkę?"):
             return
         
-        # Rozpocznij wysyłkę w osobnym wątku
+        # Przygotuj wysyłkę w osobnym wątku (autoryzacja może czekać na użytkownika)
         threading.Thread(target=self.send_reminders_from_window, 
-                       args=(email_var.get(), sms_var.get()), 
+                       args=(email_var.get(), sms_var.get(), email_config, sms_config, limits), 
                        daemon=True).start()
     
     def test_sending_process(self, send_email, send_sms):
@@ -1232,7 +1441,7 @@ class WindykatorApp:
             start_log = "🚀 ROZPOCZYNAM TEST WYSYŁKI\n"
             start_log += f"   📧 Email: {'✅' if send_email else '❌'}\n"
             start_log += f"   📱 SMS: {'✅' if send_sms else '❌'}\n"
-            start_log += f"   📊 Liczba pozycji do przetestowania: {len(self.sending_status_tree.get_children())}\n"
+            start_log += f"   📊 Liczba pozycji do przetestowania: {len(self.dataset)}\n"
             
             self.root.after(0, lambda: self.add_test_log(start_log))
             
@@ -1240,47 +1449,22 @@ class WindykatorApp:
             email_template = self.templates_widgets['email_editor'].get(1.0, tk.END)
             sms_template = self.templates_widgets['sms_editor'].get(1.0, tk.END)
             
-            # Pobierz dane do testowania
-            items = self.sending_status_tree.get_children()
-            
-            for item in items:
-                item_data = self.sending_status_tree.item(item)
-                values = item_data['values']
-                index = item_data['tags'][0]
-                
-                # Przygotuj dane do szablonów
-                template_data = {
-                    'kontrahent': values[0],
-                    'nip': values[1],
-                    'nr_faktury': values[2],
-                    'email': values[3],
-                    'telefon': values[4],
-                    'kwota': values[5],
-                    'dni_po_terminie': values[6],
-                    'data_faktury': ''
-                }
-                
-                # Jeśli to pozycja z Excel (nie ręcznie dodana), pobierz data_faktury
-                if index >= 0 and self.data_processor.excel_data is not None:
-                    try:
-                        row = self.data_processor.excel_data.iloc[index]
-                        if 'data_faktury' in self.data_processor.column_mapping:
-                            data_faktury_col = self.data_processor.column_mapping['data_faktury']
-                            if data_faktury_col in row:
-                                template_data['data_faktury'] = str(row[data_faktury_col])
-                    except Exception as e:
-                        self.logger.error(f"Błąd pobierania data_faktury: {e}")
+            # Pobierz dane do testowania (kopie rekordów z modelu danych)
+            for key in self.dataset.keys():
+                if key not in self.dataset:
+                    continue
+                template_data = self.dataset.template_data(key)
                 
                 # Testuj email
-                if send_email and values[3]:  # Email
+                if send_email and template_data['email']:
                     try:
                         # Przygotuj treść emaila
                         subject = "🧪 TEST - Przypomnienie o płatności"
-                        html_content = email_template.format(**template_data)
+                        html_content = self.placeholder_registry.render(email_template, template_data)
                         
                         # Log testowy
                         test_log = f"🧪 TEST EMAIL:\n"
-                        test_log += f"   📧 Do: {values[0]} <{values[3]}>\n"
+                        test_log += f"   📧 Do: {template_data['kontrahent']} <{template_data['email']}>\n"
                         test_log += f"   📝 Temat: {subject}\n"
                         test_log += f"   📄 Treść: {html_content[:200]}...\n"
                         test_log += f"   ✅ Status: Symulacja wysłania udana\n"
@@ -1288,42 +1472,40 @@ class WindykatorApp:
                         self.logger.info(test_log)
                         
                         # Dodaj log do UI
-                        self.root.after(0, lambda: self.add_test_log(test_log))
+                        self.root.after(0, lambda test_log=test_log: self.add_test_log(test_log))
                         
-                        # Aktualizuj status w UI
-                        status = "🧪 Test OK"
-                        self.root.after(0, lambda: self.update_sending_status(item, status, values[8]))
+                        # Aktualizuj status w modelu
+                        self.root.after(0, lambda key=key: self.update_sending_status(key, "🧪 Test OK", None))
                         
                     except Exception as e:
                         error_msg = str(e)[:30]
                         self.logger.error(f"Błąd testu email: {e}")
-                        self.root.after(0, lambda: self.update_sending_status(item, f"❌ {error_msg}", values[8]))
+                        self.root.after(0, lambda key=key, error_msg=error_msg: self.update_sending_status(key, f"❌ {error_msg}", None))
                 
                 # Testuj SMS
-                if send_sms and values[4]:  # Telefon
+                if send_sms and template_data['telefon']:
                     try:
                         # Przygotuj treść SMS
-                        message = sms_template.format(**template_data)
+                        message = self.placeholder_registry.render(sms_template, template_data)
                         
                         # Log testowy
                         test_log = f"🧪 TEST SMS:\n"
-                        test_log += f"   📱 Do: {values[0]} <{values[4]}>\n"
+                        test_log += f"   📱 Do: {template_data['kontrahent']} <{template_data['telefon']}>\n"
                         test_log += f"   📄 Treść: {message}\n"
                         test_log += f"   ✅ Status: Symulacja wysłania udana\n"
                         
                         self.logger.info(test_log)
                         
                         # Dodaj log do UI
-                        self.root.after(0, lambda: self.add_test_log(test_log))
+                        self.root.after(0, lambda test_log=test_log: self.add_test_log(test_log))
                         
-                        # Aktualizuj status w UI
-                        status = "🧪 Test OK"
-                        self.root.after(0, lambda: self.update_sending_status(item, values[7], status))
+                        # Aktualizuj status w modelu
+                        self.root.after(0, lambda key=key: self.update_sending_status(key, None, "🧪 Test OK"))
                         
                     except Exception as e:
                         error_msg = str(e)[:30]
                         self.logger.error(f"Błąd testu SMS: {e}")
-                        self.root.after(0, lambda: self.update_sending_status(item, values[7], f"❌ {error_msg}"))
+                        self.root.after(0, lambda key=key, error_msg=error_msg: self.update_sending_status(key, None, f"❌ {error_msg}"))
             
             # Dodaj informację o zakończeniu testu
             end_log = "🏁 TEST ZAKOŃCZONY\n"
@@ -1377,15 +1559,8 @@ class WindykatorApp:
         """Pokazuje podsumowanie testu"""
         try:
             # Policz wyniki testów
-            items = self.sending_status_tree.get_children()
-            total_items = len(items)
-            test_ok_count = 0
-            
-            for item in items:
-                item_data = self.sending_status_tree.item(item)
-                values = item_data['values']
-                if '🧪 Test OK' in str(values[7]) or '🧪 Test OK' in str(values[8]):
-                    test_ok_count += 1
+            total_items = len(self.dataset)
+            test_ok_count = self.dataset.count_status('🧪 Test OK')
             
             # Pokaż podsumowanie
             summary = f"🧪 Test zakończony!\n\n"
@@ -1414,121 +1589,197 @@ class WindykatorApp:
         except Exception as e:
             self.logger.error(f"Błąd wyświetlania podsumowania testu: {e}")
     
-    def send_reminders_from_window(self, send_email, send_sms):
-        """Wysyła powiadomienia z okna wysyłki z przerwami między wysyłkami"""
+    def send_reminders_from_window(self, send_email, send_sms, email_config=None, sms_config=None, limits=None):
+        """Wysyła powiadomienia z okna wysyłki - silnik działa w osobnym procesie"""
         try:
             # Pobierz szablony
             email_template = self.templates_widgets['email_editor'].get(1.0, tk.END)
             sms_template = self.templates_widgets['sms_editor'].get(1.0, tk.END)
             
-            # Pobierz dane do wysłania
-            items = self.sending_status_tree.get_children()
+            # Pozycje do wysłania - kopie rekordów z modelu danych
+            records = [(key, self.dataset.get(key)) for key in self.dataset.keys()]
+            keys = [key for key, record in records if record is not None]
+            items = [build_template_data(record) for _, record in records if record is not None]
             total_items = len(items)
             
             self.logger.info(f"🚀 Rozpoczynam wysyłkę {total_items} pozycji")
             self.logger.info(f"📧 Email: {'✅' if send_email else '❌'}, 📱 SMS: {'✅' if send_sms else '❌'}")
             
-            # Ustaw status "Wysyłanie..." dla wszystkich pozycji
-            for item in items:
-                item_data = self.sending_status_tree.item(item)
-                values = item_data['values']
-                
-                # Ustaw status "Wysyłanie..." dla email
-                if send_email and values[3]:  # Email
-                    self.root.after(0, lambda item=item: self.update_sending_status(item, "⏳ Wysyłanie...", values[8]))
-                
-                # Ustaw status "Wysyłanie..." dla SMS
-                if send_sms and values[4]:  # Telefon
-                    self.root.after(0, lambda item=item: self.update_sending_status(item, values[7], "⏳ Wysyłanie..."))
+            # Autoryzacja Microsoft 365 w aplikacji - proces wysyłki korzysta z zapisanego tokenu
+            if send_email and self.email_sender is not None:
+                auth_success, auth_message = self.email_sender.authenticate()
+                if not auth_success:
+                    self.root.after(0, lambda: messagebox.showerror("Błąd", auth_message))
+                    return
             
-            # Rozpocznij wysyłkę w osobnym wątku z przerwami
-            threading.Thread(target=self._send_reminders_with_delays, 
-                           args=(items, send_email, send_sms, email_template, sms_template), 
-                           daemon=True).start()
+            # Ustaw status "Wysyłanie..." dla wszystkich pozycji (w wątku Tk)
+            self.root.after(0, lambda: self._mark_sending(keys, send_email, send_sms))
+            
+            # Uruchom silnik wysyłki w procesie potomnym - własny interpreter i GIL
+            process = SendingProcess({
+                'items': items,
+                'send_email': send_email,
+                'send_sms': send_sms,
+                'email_template': email_template,
+                'sms_template': sms_template,
+                'bucket_templates': self.config.load_bucket_templates(
+                    [name for name, enabled in (('email', send_email), ('sms', send_sms)) if enabled],
+                    [label for label, _, _ in OVERDUE_BUCKETS]),
+                'placeholders': dict(self.placeholder_registry.values),
+                'limits': limits or default_limits(),
+                'priority_weights': self.config.load_priority_weights(),
+                'retry': self.config.load_retry_settings(),
+                'dead_letters': self.config.get_dead_letters_file(),
+                'circuit_breaker': self.config.load_circuit_breaker_settings(),
+                'email_config': email_config if send_email else None,
+                'sms_config': sms_config if send_sms else None
+            }).start()
+            self.root.after(0, lambda: self._watch_sending_process(process, keys))
             
         except Exception as e:
             self.logger.error(f"Błąd podczas przygotowania wysyłki: {e}")
             self.root.after(0, lambda: messagebox.showerror("Błąd", f"Błąd przygotowania wysyłki: {str(e)}"))
     
-    def _send_reminders_with_delays(self, items, send_email, send_sms, email_template, sms_template):
-        """Wysyła powiadomienia z przerwami między wysyłkami"""
+    def _mark_sending(self, keys, send_email, send_sms):
+        """Ustawia status 'Wysyłanie...' dla kanałów z adresem lub telefonem"""
+        for key in keys:
+            record = self.dataset.get(key)
+            if record is None:
+                continue
+            email_status = STATUS_SENDING if send_email and record.get('email') else None
+            sms_status = STATUS_SENDING if send_sms and record.get('telefon') else None
+            if email_status or sms_status:
+                self.dataset.set_status(key, email_status, sms_status)
+    
+    def _watch_sending_process(self, process, keys):
+        """Zaczyna odczytywać komunikaty procesu wysyłki (wątek Tk)"""
+        self.sending_process = process
+        self._update_sending_controls()
+        self._poll_sending_process(process, keys, set())
+    
+    def _poll_sending_process(self, process, keys, received):
+        """Przenosi komunikaty procesu wysyłki do modelu danych i okna wysyłki (received - indeksy z wynikiem)"""
+        for message in process.poll():
+            kind = message[0]
+            if kind == 'result':
+                _, index, email_status, sms_status = message
+                received.add(index)
+                # Pozycje oczekujące - według liczby wyników, bo kolejność wysyłki (priorytety) nie jest kolejnością listy
+                self._record_sending_result(keys[index], expand_status(email_status), expand_status(sms_status),
+                                            len(keys) - len(received))
+            elif kind == 'state':
+                self._update_sending_controls()
+            elif kind == 'warning':
+                messagebox.showwarning("Ostrzeżenie", message[1])
+            elif kind == 'done':
+                _, sent_count, cancelled = message
+                metrics.set(QUEUE_DEPTH, 0)
+                if cancelled:
+                    self._mark_not_sent(keys, received)
+                    self.logger.info(f"⏹️ Wysyłka anulowana po {sent_count} z {len(keys)} pozycji")
+                    self.status_label.config(text=f"⏹️ Wysyłka anulowana po {sent_count} z {len(keys)} pozycji")
+                else:
+                    self.logger.info(f"✅ Wysyłka zakończona dla {sent_count} pozycji")
+                # Zakończ wysyłkę i zapytaj o pobranie CSV
+                self.ask_for_csv_export()
+            elif kind == 'error':
+                self._mark_not_sent(keys, received)
+                self.logger.error(f"❌ Błąd procesu wysyłki: {message[1]}")
+                messagebox.showerror("Błąd", f"Błąd wysyłki: {message[1]}")
+        
+        if process.finished:
+            self._update_sending_controls()
+        else:
+            self.root.after(SENDING_POLL_INTERVAL_MS, self._poll_sending_process, process, keys, received)
+    
+    def _mark_not_sent(self, keys, received):
+        """Ustawia status 'Anulowano' kanałom pozycji bez wyniku, które nadal mają status 'Wysyłanie...'"""
+        for index, key in enumerate(keys):
+            if index in received:
+                continue
+            record = self.dataset.get(key)
+            if record is None:
+                continue
+            email_status = STATUS_CANCELLED if record.get('email_status') == STATUS_SENDING else None
+            sms_status = STATUS_CANCELLED if record.get('sms_status') == STATUS_SENDING else None
+            if email_status or sms_status:
+                self.dataset.set_status(key, email_status, sms_status)
+    
+    def _record_sending_result(self, key, email_status, sms_status, remaining):
+        """Zapisuje wynik pozycji w modelu danych i metrykach aplikacji"""
+        # Metryki procesu potomnego zostają w jego rejestrze - liczniki wiadomości odtwarzane są tutaj (okno statystyk)
+        for channel, status in (('email', email_status), ('sms', sms_status)):
+            if status is not None:
+                metrics.inc(MESSAGES_TOTAL, channel=channel, result='sent' if status['success'] else 'failed')
+        metrics.set(QUEUE_DEPTH, remaining)
+        self.update_sending_status(key, self._format_sending_status(email_status), self._format_sending_status(sms_status))
+    
+    def toggle_sending_pause(self):
+        """Wstrzymuje lub wznawia wysyłkę"""
+        process = self.sending_process
+        if process is None or process.finished:
+            return
+        if process.paused:
+            process.resume()
+            self.status_label.config(text="▶️ Wysyłka wznowiona")
+        else:
+            process.pause()
+            self.status_label.config(text="⏸️ Wysyłka wstrzymana (po bieżącej pozycji)")
+        self._update_sending_controls()
+    
+    def cancel_sending(self):
+        """Anuluje trwającą wysyłkę po bieżącej pozycji"""
+        process = self.sending_process
+        if process is None or process.finished:
+            return
+        if messagebox.askyesno("Potwierdź", "Czy na pewno chcesz anulować wysyłkę?"):
+            process.cancel()
+            self.status_label.config(text="⏹️ Anulowanie wysyłki...")
+    
+    def _sending_limits(self):
+        """Odczytuje limity kampanii z okna wysyłki (tempo w wiadomościach na sekundę)"""
+        values = {name: var.get().strip().replace(',', '.') for name, var in self.sending_limit_vars.items()}
+        concurrency = int(values['concurrency'] or 1)
+        if not 1 <= concurrency <= MAX_CONCURRENCY:
+            raise ValueError(f"Liczba równoległych wysyłek musi być z zakresu 1-{MAX_CONCURRENCY}")
+        limits = {'concurrency': concurrency}
+        for name in ('email_rate', 'sms_rate'):
+            per_minute = float(values[name]) if values[name] else 0.0
+            if per_minute < 0:
+                raise ValueError("Tempo wysyłki nie może być ujemne")
+            limits[name] = per_minute / 60 if per_minute else None
+        return limits
+    
+    def apply_sending_limits(self):
+        """Przekazuje nowe limity do trwającej wysyłki (działają w ciągu sekundy)"""
         try:
-            total_items = len(items)
-            self.logger.info(f"📤 Rozpoczynam wysyłkę z przerwami dla {total_items} pozycji")
-            
-            for i, item in enumerate(items):
-                item_data = self.sending_status_tree.item(item)
-                values = item_data['values']
-                index = item_data['tags'][0]
-                
-                self.logger.info(f"📤 Przetwarzam pozycję {i+1}/{total_items}: {values[0]}")
-                
-                # Przygotuj dane do szablonów
-                template_data = {
-                    'kontrahent': values[0],
-                    'nip': values[1],
-                    'nr_faktury': values[2],
-                    'email': values[3],
-                    'telefon': values[4],
-                    'kwota': values[5],
-                    'dni_po_terminie': values[6],
-                    'data_faktury': ''
-                }
-                
-                # Jeśli to pozycja z Excel, pobierz data_faktury
-                if index >= 0 and self.data_processor.excel_data is not None:
-                    try:
-                        row = self.data_processor.excel_data.iloc[index]
-                        if 'data_faktury' in self.data_processor.column_mapping:
-                            data_faktury_col = self.data_processor.column_mapping['data_faktury']
-                            if data_faktury_col in row:
-                                template_data['data_faktury'] = str(row[data_faktury_col])
-                    except Exception as e:
-                        self.logger.error(f"Błąd pobierania data_faktury: {e}")
-                
-                # Wyślij email
-                if send_email and values[3]:  # Email
-                    try:
-                        self.logger.info(f"📧 Wysyłam email do: {values[3]}")
-                        success, message = self.email_sender.send_reminder_email(
-                            values[3], template_data, email_template
-                        )
-                        status = "✅ Wysłano" if success else f"❌ {message[:30]}"
-                        self.logger.info(f"📧 Email {values[3]}: {status}")
-                        self.root.after(0, lambda item=item, status=status: self.update_sending_status(item, status, values[8]))
-                    except Exception as e:
-                        error_msg = str(e)[:30]
-                        self.logger.error(f"❌ Błąd email {values[3]}: {error_msg}")
-                        self.root.after(0, lambda item=item, error=error_msg: self.update_sending_status(item, f"❌ {error}", values[8]))
-                
-                # Wyślij SMS
-                if send_sms and values[4]:  # Telefon
-                    try:
-                        self.logger.info(f"📱 Wysyłam SMS do: {values[4]}")
-                        success, message = self.sms_sender.send_reminder_sms(
-                            values[4], template_data, sms_template
-                        )
-                        status = "✅ Wysłano" if success else f"❌ {message[:30]}"
-                        self.logger.info(f"📱 SMS {values[4]}: {status}")
-                        self.root.after(0, lambda item=item, status=status: self.update_sending_status(item, values[7], status))
-                    except Exception as e:
-                        error_msg = str(e)[:30]
-                        self.logger.error(f"❌ Błąd SMS {values[4]}: {error_msg}")
-                        self.root.after(0, lambda item=item, error=error_msg: self.update_sending_status(item, values[7], f"❌ {error}"))
-                
-                # PRZERWA między wysyłkami (2 sekundy)
-                if i < total_items - 1:  # Nie czekaj po ostatniej pozycji
-                    self.logger.info(f"⏳ Czekam 2 sekundy przed następną wysyłką...")
-                    time.sleep(2)
-            
-            self.logger.info(f"✅ Wysyłka zakończona dla {total_items} pozycji")
-            
-            # Zakończ wysyłkę i zapytaj o pobranie CSV
-            self.root.after(0, lambda: self.ask_for_csv_export())
-            
-        except Exception as e:
-            self.logger.error(f"❌ Błąd podczas wysyłki z przerwami: {e}")
-            self.root.after(0, lambda: messagebox.showerror("Błąd", f"Błąd wysyłki: {str(e)}"))
+            limits = self._sending_limits()
+        except ValueError as e:
+            messagebox.showerror("Błąd", f"Nieprawidłowe limity wysyłki:\n{str(e)}")
+            return
+        process = self.sending_process
+        if process is None or process.finished:
+            self.status_label.config(text="⚙️ Limity zostaną użyte przy następnej wysyłce")
+            return
+        process.set_limits(**limits)
+        self.logger.info("⚙️ Nowe limity wysyłki: %s", limits)
+        self.status_label.config(text="⚙️ Zastosowano nowe limity wysyłki")
+    
+    def _update_sending_controls(self):
+        """Ustawia przycisk wstrzymania zgodnie ze stanem procesu wysyłki"""
+        button = getattr(self, 'sending_pause_btn', None)
+        if button is None or self.sending_status_tree is None:
+            return
+        process = self.sending_process
+        active = process is not None and not process.finished
+        button.config(text="▶️ Wznów" if active and process.paused else "⏸️ Wstrzymaj",
+                      state=tk.NORMAL if active else tk.DISABLED)
+    
+    def _format_sending_status(self, status):
+        """Zwraca tekst statusu do tabeli wysyłki (None - kanał nie był wysyłany)"""
+        if status is None:
+            return None
+        return "✅ Wysłano" if status['success'] else f"❌ {status['message'][:30]}"
     
     def ask_for_csv_export(self):
         """Pyta użytkownika czy chce pobrać CSV ze statusem wysyłki"""
@@ -1536,22 +1787,12 @@ class WindykatorApp:
             self.export_sending_status_to_csv()
     
     def export_sending_status_to_csv(self):
-        """Eksportuje status wysyłki do pliku CSV"""
+        """Eksportuje status wysyłki do pliku CSV (strumieniowo z modelu danych)"""
         try:
-            # Pobierz wszystkie dane ze status tree
-            all_items = self.sending_status_tree.get_children()
-            if not all_items:
+            if not len(self.dataset):
                 messagebox.showwarning("Ostrzeżenie", "Brak danych do eksportu")
                 return
             
-            # Przygotuj dane do eksportu
-            export_data = []
-            headers = ['Kontrahent', 'NIP', 'Nr Faktury', 'Email', 'Telefon', 'Kwota', 'Dni Po Terminie', 'Email Status', 'SMS Status']
-            
-            for item in all_items:
-                values = list(self.sending_status_tree.item(item)['values'])
-                export_data.append(values)
-            
             # Wybierz miejsce zapisu
             from datetime import datetime
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -1567,12 +1808,9 @@ class WindykatorApp:
             if not file_path:
                 return
             
-            # Zapisz do CSV
-            import csv
+            # Zapisz do CSV wiersz po wierszu
             with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow(headers)
-                writer.writerows(export_data)
+                self.dataset.write_csv(csvfile)
             
             messagebox.showinfo("Sukces", f"Status wysyłki został zapisany do:\n{file_path}")
             
@@ -1580,16 +1818,52 @@ class WindykatorApp:
             messagebox.showerror("Błąd", f"Błąd eksportu CSV:\n{str(e)}")
             self.logger.error(f"Błąd eksportu CSV: {e}")
     
-    def update_sending_status(self, item, email_status, sms_status):
-        """Aktualizuje status wysyłki"""
+    def update_sending_status(self, key, email_status, sms_status):
+        """Aktualizuje status wysyłki w modelu danych (wątek Tk)"""
         try:
-            values = list(self.sending_status_tree.item(item)['values'])
-            values[7] = email_status  # Email Status
-            values[8] = sms_status    # SMS Status
-            self.sending_status_tree.item(item, values=values)
+            # None - pozostaw dotychczasowy status kanału
+            self.dataset.set_status(key, email_status, sms_status)
         except Exception as e:
             self.logger.error(f"Błąd aktualizacji statusu: {e}")
     
+    def show_stats_window(self):
+        """Pokazuje okno statystyk (metryki etapów i wysyłki, odświeżane co sekundę)"""
+        if getattr(self, 'stats_window', None) is not None and self.stats_window.winfo_exists():
+            self.stats_window.lift()
+            return
+        
+        self.stats_window = tk.Toplevel(self.root)
+        self.stats_window.title("📈 Statystyki")
+        self.stats_window.geometry("800x400")
+        
+        frame = ttk.Frame(self.stats_window, padding="10")
+        frame.pack(fill=tk.BOTH, expand=True)
+        
+        if not metrics.enabled:
+            ttk.Label(frame, text="Metryki są wyłączone (WINDYKATOR_METRICS=0)").pack(anchor=tk.W, pady=(0, 10))
+        
+        columns = ('Metryka', 'Etykiety', 'Liczba', 'Średnio / wartość', 'p95')
+        stats_tree = ttk.Treeview(frame, columns=columns, show='headings')
+        for col, width in zip(columns, (260, 200, 80, 120, 80)):
+            stats_tree.heading(col, text=col)
+            stats_tree.column(col, width=width)
+        stats_tree.pack(fill=tk.BOTH, expand=True)
+        
+        def refresh():
+            if not self.stats_window.winfo_exists():
+                return
+            stats_tree.delete(*stats_tree.get_children())
+            for row in metrics.snapshot():
+                labels = ', '.join(f"{name}={value}" for name, value in row['labels'].items())
+                if row['type'] == 'histogram':
+                    values = (row['name'], labels, row['count'], f"{row['avg'] * 1000:.1f} ms", f"≤{row['p95'] * 1000:.0f} ms")
+                else:
+                    values = (row['name'], labels, '', row['value'], '')
+                stats_tree.insert('', 'end', values=values)
+            self.stats_window.after(1000, refresh)
+        
+        refresh()
+    
     def save_email_config(self):
         """Zapisuje konfigurację email"""
         try:
@@ -1613,7 +1887,7 @@ class WindykatorApp:
                 messagebox.showerror("Błąd", "Wypełnij Client ID i Client Secret")
                 return
             
-            email_sender = EmailSender(client_id, client_secret)
+            email_sender = EmailSender(client_id, client_secret, token_store=self.config.get_token_store_file())
             success, message = email_sender.test_connection(test_email)
             
             if success:
@@ -1665,24 +1939,11 @@ class WindykatorApp:
     def apply_font_family(self, font_family):
         """Zmienia rodzinę czcionki w edytorze"""
         try:
-            if hasattr(self, 'email_editor'):
-                # Pobierz aktualny tekst
-                current_text = self.email_editor.get("1.0", "end-1c")
-                
-                # Zastąp style font-family w HTML
-                if 'font-family:' in current_text:
-                    # Zastąp istniejący font-family
-                    import re
-                    pattern = r'font-family:\s*[^;]+;'
-                    replacement = f'font-family: {font_family}, sans-serif;'
-                    new_text = re.sub(pattern, replacement, current_text)
-                else:
-                    # Dodaj font-family do body
-                    new_text = current_text.replace('<body', f'<body style="font-family: {font_family}, sans-serif;"')
-                
-                # Zastąp tekst w edytorze
-                self.email_editor.delete("1.0", "end")
-                self.email_editor.insert("1.0", new_text)
+            editor = self._get_email_editor()
+            if editor:
+                # Zastąp style font-family w HTML (lub dodaj do body) zmianami punktowymi
+                current_text = editor.get("1.0", "end-1c")
+                self._apply_editor_edits(editor, current_text, style_edits(current_text, 'font-family', f'{font_family}, sans-serif'))
                 
                 print(f"✅ Zmieniono czcionkę na: {font_family}")
         except Exception as e:
@@ -1691,24 +1952,11 @@ class WindykatorApp:
     def apply_font_size(self, size):
         """Zmienia rozmiar czcionki w edytorze"""
         try:
-            if hasattr(self, 'email_editor'):
-                # Pobierz aktualny tekst
-                current_text = self.email_editor.get("1.0", "end-1c")
-                
-                # Zastąp style font-size w HTML
-                if 'font-size:' in current_text:
-                    # Zastąp istniejący font-size
-                    import re
-                    pattern = r'font-size:\s*[^;]+;'
-                    replacement = f'font-size: {size}px;'
-                    new_text = re.sub(pattern, replacement, current_text)
-                else:
-                    # Dodaj font-size do body
-                    new_text = current_text.replace('<body', f'<body style="font-size: {size}px;"')
-                
-                # Zastąp tekst w edytorze
-                self.email_editor.delete("1.0", "end")
-                self.email_editor.insert("1.0", new_text)
+            editor = self._get_email_editor()
+            if editor:
+                # Zastąp style font-size w HTML (lub dodaj do body) zmianami punktowymi
+                current_text = editor.get("1.0", "end-1c")
+                self._apply_editor_edits(editor, current_text, style_edits(current_text, 'font-size', f'{size}px'))
                 
                 print(f"✅ Zmieniono rozmiar czcionki na: {size}px")
         except Exception as e:
@@ -1717,10 +1965,11 @@ class WindykatorApp:
     def apply_format(self, format_type):
         """Aplikuje formatowanie tekstu w edytorze"""
         try:
-            if hasattr(self, 'email_editor'):
+            editor = self._get_email_editor()
+            if editor:
                 # Pobierz zaznaczony tekst
                 try:
-                    selected_text = self.email_editor.get("sel.first", "sel.last")
+                    selected_text = editor.get("sel.first", "sel.last")
                     if selected_text:
                         # Formatuj zaznaczony tekst
                         if format_type == "bold":
@@ -1733,8 +1982,7 @@ class WindykatorApp:
                             return
                         
                         # Zastąp zaznaczony tekst
-                        self.email_editor.delete("sel.first", "sel.last")
-                        self.email_editor.insert("insert", formatted_text)
+                        self._replace_selection(editor, formatted_text)
                         print(f"✅ Zastosowano formatowanie: {format_type}")
                     else:
                         print("⚠️ Zaznacz tekst przed formatowaniem")
@@ -1746,7 +1994,8 @@ class WindykatorApp:
     def apply_color(self):
         """Otwiera okno wyboru koloru i aplikuje go do zaznaczonego tekstu"""
         try:
-            if hasattr(self, 'email_editor'):
+            editor = self._get_email_editor()
+            if editor:
                 from tkinter import colorchooser
                 
                 # Otwórz okno wyboru koloru
@@ -1756,14 +2005,13 @@ class WindykatorApp:
                     
                     # Pobierz zaznaczony tekst
                     try:
-                        selected_text = self.email_editor.get("sel.first", "sel.last")
+                        selected_text = editor.get("sel.first", "sel.last")
                         if selected_text:
                             # Formatuj zaznaczony tekst z kolorem
                             formatted_text = f'<span style="color: {hex_color};">{selected_text}</span>'
                             
                             # Zastąp zaznaczony tekst
-                            self.email_editor.delete("sel.first", "sel.last")
-                            self.email_editor.insert("insert", formatted_text)
+                            self._replace_selection(editor, formatted_text)
                             print(f"✅ Zastosowano kolor: {hex_color}")
                         else:
                             print("⚠️ Zaznacz tekst przed zmianą koloru")
@@ -1772,15 +2020,73 @@ class WindykatorApp:
         except Exception as e:
             print(f"Błąd zmiany koloru: {e}")
     
+    def _get_email_editor(self):
+        """Zwraca edytor email, na którym działają przyciski edytora (okno WYSIWYG lub zakładka szablonów)"""
+        editor = getattr(self, 'email_editor', None)
+        if editor is not None and editor.winfo_exists():
+            return editor
+        return getattr(self, 'templates_widgets', {}).get('email_editor')
+    
+    def _reset_editor_history(self, editor):
+        """Czyści historię edycji po wczytaniu tekstu do edytora"""
+        self.editor_history.reset(editor.get("1.0", "end-1c"))
+        self.editor_history_widget = editor
+    
+    def _apply_editor_edits(self, editor, text, edits):
+        """Stosuje zmiany punktowe (początek, koniec, nowy tekst) i zapisuje je jako jedną operację historii"""
+        if not edits:
+            return
+        self.on_editor_change(widget=editor)
+        # Od końca - wcześniejsze pozycje pozostają aktualne
+        for start, end, replacement in sorted(edits, reverse=True):
+            if end > start:
+                editor.delete(text_index(text, start), text_index(text, end))
+            if replacement:
+                editor.insert(text_index(text, start), replacement)
+        self.editor_history.break_coalescing()
+        self.on_editor_change(widget=editor)
+        self.editor_history.break_coalescing()
+    
+    def _replace_selection(self, editor, replacement):
+        """Zastępuje zaznaczenie tekstem i zapisuje to jako jedną operację historii"""
+        self.on_editor_change(widget=editor)
+        editor.delete("sel.first", "sel.last")
+        editor.insert("insert", replacement)
+        self.editor_history.break_coalescing()
+        self.on_editor_change(widget=editor)
+        self.editor_history.break_coalescing()
+    
+    def _insert_at_end(self, editor, text):
+        """Dopisuje tekst na końcu edytora jako jedną operację historii"""
+        self.on_editor_change(widget=editor)
+        editor.insert("end-1c", text)
+        self.editor_history.break_coalescing()
+        self.on_editor_change(widget=editor)
+        self.editor_history.break_coalescing()
+    
+    def _apply_history_edit(self, edit, text):
+        """Stosuje w edytorze zmianę z historii (text - treść przed zmianą)"""
+        editor = self.editor_history_widget
+        start = text_index(text, edit.offset)
+        if edit.removed:
+            editor.delete(start, text_index(text, edit.offset + len(edit.removed)))
+        if edit.inserted:
+            editor.insert(start, edit.inserted)
+        editor.mark_set("insert", f"{start}+{len(edit.inserted)}c")
+        editor.see("insert")
+        self._request_live_preview(editor, self.editor_history.text)
+    
     def undo_action(self):
         """Cofa ostatnią akcję w edytorze"""
         try:
-            if hasattr(self, 'email_editor') and hasattr(self, 'editor_history') and self.editor_history:
-                if self.current_history_index > 0:
-                    self.current_history_index -= 1
-                    previous_text = self.editor_history[self.current_history_index]
-                    self.email_editor.delete("1.0", "end")
-                    self.email_editor.insert("1.0", previous_text)
+            editor = self._get_email_editor()
+            if editor:
+                # Zapisz zmiany, których nie zgłosiło jeszcze zdarzenie klawiatury
+                self.on_editor_change(widget=editor)
+                text = self.editor_history.text
+                edit = self.editor_history.undo()
+                if edit:
+                    self._apply_history_edit(edit, text)
                     print("✅ Cofnięto akcję")
                 else:
                     print("⚠️ Brak akcji do cofnięcia")
@@ -1790,45 +2096,75 @@ class WindykatorApp:
     def redo_action(self):
         """Ponawia ostatnią cofniętą akcję w edytorze"""
         try:
-            if hasattr(self, 'email_editor') and hasattr(self, 'editor_history') and self.editor_history:
-                if self.current_history_index < len(self.editor_history) - 1:
-                    self.current_history_index += 1
-                    next_text = self.editor_history[self.current_history_index]
-                    self.email_editor.delete("1.0", "end")
-                    self.email_editor.insert("1.0", next_text)
+            editor = self._get_email_editor()
+            if editor:
+                self.on_editor_change(widget=editor)
+                text = self.editor_history.text
+                edit = self.editor_history.redo()
+                if edit:
+                    self._apply_history_edit(edit, text)
                     print("✅ Ponowiono akcję")
                 else:
                     print("⚠️ Brak akcji do ponowienia")
         except Exception as e:
             print(f"Błąd ponawiania: {e}")
     
-    def on_editor_change(self, event=None):
-        """Obsługuje zmiany w edytorze i zapisuje historię"""
+    def on_editor_change(self, event=None, widget=None):
+        """Obsługuje zmiany w edytorze i zapisuje historię (tylko różnicę względem poprzedniego stanu)"""
         try:
-            if hasattr(self, 'email_editor') and hasattr(self, 'editor_history'):
-                current_text = self.email_editor.get("1.0", "end-1c")
-                
-                # Dodaj do historii tylko jeśli tekst się zmienił
-                if not self.editor_history or current_text != self.editor_history[-1]:
-                    # Usuń przyszłą historię jeśli cofnięto i zmieniono
-                    if self.current_history_index < len(self.editor_history) - 1:
-                        self.editor_history = self.editor_history[:self.current_history_index + 1]
-                    
-                    # Dodaj nowy stan do historii
-                    self.editor_history.append(current_text)
-                    self.current_history_index = len(self.editor_history) - 1
-                    
-                    # Ogranicz historię do 50 stanów
-                    if len(self.editor_history) > 50:
-                        self.editor_history.pop(0)
-                        self.current_history_index -= 1
+            editor = widget or (event.widget if event is not None else self._get_email_editor())
+            if editor is None:
+                return
+            if editor is not self.editor_history_widget:
+                # Zmiany w innym edytorze - historia dotyczy jednego dokumentu
+                self._reset_editor_history(editor)
+                return
+            if event is not None and event.type == tk.EventType.ButtonRelease:
+                # Przeniesienie kursora kończy bieżącą operację pisania
+                self.editor_history.break_coalescing()
+            current_text = editor.get("1.0", "end-1c")
+            if self.editor_history.record(current_text):
+                self._request_live_preview(editor, current_text)
         except Exception as e:
             print(f"Błąd zapisywania historii: {e}")
     
+    def _start_live_preview(self, window):
+        """Uruchamia renderer podglądu na żywo dla okna edytora WYSIWYG"""
+        self._stop_live_preview()
+        self.preview_sample = sample_row(self.data_processor)
+        self.preview_renderer = PreviewRenderer(
+            lambda generation, text: self.root.after(0, self._show_live_preview, generation, text),
+            transform=html_to_text, registry=self.placeholder_registry
+        )
+        window.bind('<Destroy>', lambda event: self._stop_live_preview() if event.widget is window else None)
+        self._request_live_preview(self.email_editor, self.email_editor.get("1.0", "end-1c"))
+    
+    def _stop_live_preview(self):
+        """Zatrzymuje renderer podglądu na żywo"""
+        if self.preview_renderer is not None:
+            self.preview_renderer.close()
+            self.preview_renderer = None
+    
+    def _request_live_preview(self, editor, text):
+        """Zgłasza nową treść edytora WYSIWYG do renderowania w tle"""
+        if self.preview_renderer is not None and editor is getattr(self, 'email_editor', None):
+            self.preview_renderer.request(text, self.preview_sample)
+    
+    def _show_live_preview(self, generation, text):
+        """Wstawia wynik renderowania do panelu podglądu (wątek Tk, tylko najnowszy wynik)"""
+        renderer = self.preview_renderer
+        if renderer is None or not renderer.is_latest(generation) or not self.live_preview.winfo_exists():
+            return
+        self.live_preview.config(state=tk.NORMAL)
+        self.live_preview.delete("1.0", "end")
+        self.live_preview.insert("1.0", text)
+        self.live_preview.config(state=tk.DISABLED)
+    
     def add_html_footer(self):
         """Dodaje stopkę HTML do edytora"""
         try:
-            if hasattr(self, 'email_editor'):
+            editor = self._get_email_editor()
+            if editor:
                 html_footer = """
                 
                 <div style="border-top: 1px solid #ccc; margin-top: 20px; padding-top: 20px; text-align: center; font-size: 12px; color: #666;">
@@ -1837,7 +2173,7 @@ class WindykatorApp:
                     <p>W razie pytań prosimy o kontakt: windykacja@kpj.pl</p>
                 </div>
                 """
-                self.email_editor.insert("end", html_footer)
+                self._insert_at_end(editor, html_footer)
                 print("✅ Dodano stopkę HTML")
         except Exception as e:
             print(f"Błąd dodawania stopki HTML: {e}")
@@ -1845,7 +2181,8 @@ class WindykatorApp:
     def add_text_footer(self):
         """Dodaje stopkę tekstową do edytora"""
         try:
-            if hasattr(self, 'email_editor'):
+            editor = self._get_email_editor()
+            if editor:
                 text_footer = """
                 
                 ---
@@ -1853,7 +2190,7 @@ class WindykatorApp:
                 © 2024 KPJ.PL - System Windykacji
                 W razie pytań prosimy o kontakt: windykacja@kpj.pl
                 """
-                self.email_editor.insert("end", text_footer)
+                self._insert_at_end(editor, text_footer)
                 print("✅ Dodano stopkę tekstową")
         except Exception as e:
             print(f"Błąd dodawania stopki tekstowej: {e}")
@@ -1861,19 +2198,11 @@ class WindykatorApp:
     def clear_footer(self):
         """Czyści stopkę z edytora"""
         try:
-            if hasattr(self, 'email_editor'):
-                current_text = self.email_editor.get("1.0", "end-1c")
-                # Usuń ostatnie linie zawierające stopkę
-                lines = current_text.split('\n')
-                while lines and ('---' in lines[-1] or '©' in lines[-1] or 'windykacja@kpj.pl' in lines[-1] or 'Wiadomość wygenerowana automatycznie' in lines[-1]):
-                    lines.pop()
-                # Usuń puste linie na końcu
-                while lines and not lines[-1].strip():
-                    lines.pop()
-                
-                new_text = '\n'.join(lines)
-                self.email_editor.delete("1.0", "end")
-                self.email_editor.insert("1.0", new_text)
+            editor = self._get_email_editor()
+            if editor:
+                # Usuń końcowe linie stopki i puste linie jedną zmianą punktową
+                current_text = editor.get("1.0", "end-1c")
+                self._apply_editor_edits(editor, current_text, footer_edits(current_text))
                 print("✅ Stopka została usunięta")
         except Exception as e:
             print(f"Błąd usuwania stopki: {e}")
@@ -1883,6 +2212,7 @@ class WindykatorApp:
         try:
             placeholders = self.config.load_placeholders()
             self.placeholders_data = placeholders
+            self.placeholder_registry.update(placeholders)
             
             # Wyczyść listę
             self.templates_widgets['placeholders_listbox'].delete(0, tk.END)
@@ -1951,10 +2281,9 @@ class WindykatorApp:
                 return
             
             # Sprawdź czy placeholder o takiej nazwie już istnieje
-            for placeholder in self.placeholders_data:
-                if placeholder['name'] == name:
-                    messagebox.showwarning("Ostrzeżenie", f"Placeholder o nazwie '{name}' już istnieje")
-                    return
+            if self.placeholder_registry.get(name) is not None:
+                messagebox.showwarning("Ostrzeżenie", f"Placeholder o nazwie '{name}' już istnieje")
+                return
             
             # Dodaj nowy placeholder
             new_placeholder = {
@@ -1964,6 +2293,7 @@ class WindykatorApp:
             }
             
             self.placeholders_data.append(new_placeholder)
+            self.placeholder_registry.update(self.placeholders_data)
             
             # Dodaj do listy
             display_text = f"{name} = {value}"
@@ -1997,6 +2327,7 @@ class WindykatorApp:
             
             # Usuń stary placeholder
             self.placeholders_data.pop(index)
+            self.placeholder_registry.update(self.placeholders_data)
             self.templates_widgets['placeholders_listbox'].delete(index)
             
             print(f"✅ Przygotowano do edycji placeholder: {placeholder['name']}")
@@ -2019,6 +2350,7 @@ class WindykatorApp:
             if messagebox.askyesno("Potwierdzenie", f"Czy na pewno chcesz usunąć placeholder '{placeholder['name']}'?"):
                 # Usuń z danych
                 self.placeholders_data.pop(index)
+                self.placeholder_registry.update(self.placeholders_data)
                 
                 # Usuń z listy
                 self.templates_widgets['placeholders_listbox'].delete(index)
@@ -2058,10 +2390,7 @@ class WindykatorApp:
     def get_placeholder_value(self, name):
         """Pobiera wartość placeholdera po nazwie"""
         try:
-            for placeholder in self.placeholders_data:
-                if placeholder['name'] == name:
-                    return placeholder['value']
-            return None
+            return self.placeholder_registry.get(name)
         except Exception as e:
             print(f"Błąd pobierania wartości placeholdera '{name}': {e}")
             return None
@@ -2078,47 +2407,38 @@ class WindykatorApp:
             print(f"Błąd zapisywania szablonu: {e}")
     
     def preview_html(self):
-        """Pokazuje podgląd HTML w nowym oknie"""
+        """Pokazuje podgląd HTML w nowym oknie (renderowany w tle na przykładowym wierszu danych)"""
         try:
             html_content = self.email_editor.get("1.0", "end-1c")
             
             preview_window = tk.Toplevel(self.root)
             preview_window.title("👁️ Podgląd HTML")
             preview_window.geometry("600x400")
-            
-            # Konwertuj tekst na HTML
-            html_text = f"""
-            <html>
-            <head>
-                <meta charset="utf-8">
-                <style>
-                    body {{ font-family: Arial, sans-serif; margin: 20px; }}
-                    .footer {{ border-top: 1px solid #ccc; margin-top: 20px; padding-top: 20px; 
-                              font-size: 12px; color: #666; text-align: center; }}
-                </style>
-            </head>
-            <body>
-                {html_content}
-                <div class="footer">
-                    <p>--- Wiadomość wygenerowana automatycznie ---</p>
-                    <p>© 2024 KPJ.PL - System Windykacji</p>
-                    <p>W razie pytań prosimy o kontakt: windykacja@kpj.pl</p>
-                </div>
-            </body>
-            </html>
-            """
-            
             preview_window.configure(bg='white')
-            preview_window.html_text = html_text
             
             # Użyj ttk.Frame z obsługą HTML
             html_frame = ttk.Frame(preview_window)
             html_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
             
-            # Użyj ttk.Label z obsługą HTML
-            html_label = ttk.Label(html_frame, text=html_text, justify=tk.LEFT)
+            # Treść wstawiana po wyrenderowaniu - okno otwiera się od razu
+            html_label = ttk.Label(html_frame, text="⏳ Renderowanie podglądu...", justify=tk.LEFT)
             html_label.pack(fill=tk.BOTH, expand=True)
             
+            def show_result(text):
+                renderer.close()
+                if html_label.winfo_exists():
+                    html_label.config(text=text)
+            
+            renderer = PreviewRenderer(
+                lambda generation, text: self.root.after(0, show_result, text),
+                debounce=0, transform=html_to_text, registry=self.placeholder_registry
+            )
+            footer = ("<p>--- Wiadomość wygenerowana automatycznie ---</p>"
+                      "<p>© 2024 KPJ.PL - System Windykacji</p>"
+                      "<p>W razie pytań prosimy o kontakt: windykacja@kpj.pl</p>")
+            sample = getattr(self, 'preview_sample', None) or sample_row(self.data_processor)
+            renderer.request(html_content + footer, sample)
+            
             # Przycisk zamknięcia
             close_btn = tk.Button(preview_window, text="❌ Zamknij", 
                                  bg=self.config.primary_color,
@@ -2140,31 +2460,13 @@ class WindykatorApp:
             messagebox.showwarning("Ostrzeżenie", "Najpierw wczytaj plik Excel/CSV")
             return
         
-        print(f"🔍 Przed usunięciem: {len(self.data_processor.excel_data)} pozycji")
-        
-        # Sprawdź aktualny stan podglądu
-        current_preview_items = len(self.data_mapping_widgets['preview_tree'].get_children())
-        print(f"🔍 Aktualny podgląd zawiera: {current_preview_items} pozycji")
-        
         # Usuń pozycje rozliczone
         removed_count = self.data_processor.remove_settled_items()
-        
-        print(f"🗑️ Usunięto: {removed_count} pozycji")
-        print(f"📊 Po usunięciu: {len(self.data_processor.excel_data)} pozycji")
+        self.logger.info("🗑️ Usunięto %d pozycji rozliczonych, pozostało %d", removed_count, len(self.data_processor.excel_data))
         
         if removed_count > 0:
-            # Odśwież podgląd
-            print("🔄 Odświeżam podgląd...")
-            self.generate_preview()
-            
-            # Sprawdź nowy stan podglądu
-            new_preview_items = len(self.data_mapping_widgets['preview_tree'].get_children())
-            print(f"🔍 Nowy podgląd zawiera: {new_preview_items} pozycji")
-            
-            if new_preview_items == len(self.data_processor.excel_data):
-                print("✅ Podgląd został poprawnie odświeżony")
-            else:
-                print(f"❌ Błąd: podgląd {new_preview_items} vs dane {len(self.data_processor.excel_data)}")
+            # Odśwież podgląd - usuwane są tylko wiersze rozliczone
+            self.refresh_preview()
             
             messagebox.showinfo("Sukces", f"Usunięto {removed_count} pozycji rozliczonych")
         else:
@@ -0,0 +1,140 @@
+"""
+Moduł profili mapowania kolumn zapamiętanych dla układów plików (eksportów ERP)
+
+Profil jest zapisywany pod odciskiem (fingerprint) wiersza nagłówka i przechowuje
+mapowanie kolumn oraz parametry wczytywania (kodowanie, separator, pominięte wiersze).
+Plik o znanym układzie jest wczytywany od razu z zapisanymi parametrami - bez
+wykrywania separatora/kodowania i bez automatycznego mapowania.
+"""
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+
+from column_mapper import normalize_header
+
+# Maksymalna liczba bajtów czytana przy szukaniu wiersza nagłówka pliku CSV
+HEADER_READ_BYTES = 65536
+
+_BOMS = (b'\xef\xbb\xbf', b'\xff\xfe', b'\xfe\xff')
+
+
+def header_fingerprint(columns):
+    """Zwraca odcisk listy nagłówków (niezależny od wielkości liter i polskich znaków)"""
+    normalized = '\x1f'.join(normalize_header(column) for column in columns)
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+
+def raw_header_fingerprint(file_path, skiprows=0):
+    """Zwraca odcisk surowego wiersza nagłówka pliku tekstowego (przed wykryciem kodowania).
+
+    Zwraca None, jeśli plik nie ma tylu wierszy.
+    """
+    with open(file_path, 'rb') as f:
+        head = f.read(HEADER_READ_BYTES)
+
+    for bom in _BOMS:
+        if head.startswith(bom):
+            head = head[len(bom):]
+            break
+
+    lines = head.split(b'\n', skiprows + 1)
+    if len(lines) <= skiprows:
+        return None
+    header = lines[skiprows].rstrip(b'\r\x00').rstrip(b'\r')
+    if not header.strip():
+        return None
+    return hashlib.sha1(header).hexdigest()
+
+
+class MappingProfileStore:
+    """Klasa przechowująca profile mapowania w pliku JSON (słownik odcisk -> profil)"""
+
+    def __init__(self, profiles_file='mapping_profiles.json'):
+        """Inicjalizuje magazyn profili (plik wczytywany przy pierwszym użyciu)"""
+        self.profiles_file = profiles_file
+        self.logger = logging.getLogger(__name__)
+        self._profiles = None
+
+    @property
+    def profiles(self):
+        """Zwraca słownik profili, wczytując plik przy pierwszym dostępie"""
+        if self._profiles is None:
+            self._profiles = self._load()
+        return self._profiles
+
+    def _load(self):
+        """Wczytuje profile z pliku"""
+        try:
+            with open(self.profiles_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            self.logger.warning(f"⚠️ Błąd wczytywania profili mapowania: {e}")
+            return {}
+
+    def _save(self):
+        """Zapisuje profile do pliku (atomowo - przez plik tymczasowy)"""
+        temp_file = f"{self.profiles_file}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.profiles, f, indent=2, ensure_ascii=False)
+        os.replace(temp_file, self.profiles_file)
+
+    def get(self, fingerprint):
+        """Zwraca profil dla odcisku nagłówka lub None"""
+        if not fingerprint:
+            return None
+        return self.profiles.get(fingerprint)
+
+    def skiprows_options(self):
+        """Zwraca liczby pomijanych wierszy występujące w profilach CSV (zawsze z 0)"""
+        options = {0}
+        for profile in self.profiles.values():
+            if profile.get('file_type') == 'csv':
+                options.add(int(profile.get('skiprows') or 0))
+        return sorted(options)
+
+    def find_csv_profile(self, file_path):
+        """Szuka profilu dla pliku CSV/TSV po surowym wierszu nagłówka - zwraca (odcisk, profil)"""
+        for skiprows in self.skiprows_options():
+            fingerprint = raw_header_fingerprint(file_path, skiprows)
+            profile = self.get(fingerprint)
+            if profile and int(profile.get('skiprows') or 0) == skiprows:
+                return fingerprint, profile
+        return None, None
+
+    def save_profile(self, fingerprint, mapping, file_type, encoding=None, separator=None,
+                     skiprows=0, columns=None, **read_options):
+        """Zapisuje (lub aktualizuje) profil dla odcisku nagłówka - zwraca (sukces, komunikat)"""
+        try:
+            if not fingerprint:
+                return False, "Brak odcisku nagłówka - wczytaj plik"
+
+            profile = {
+                'mapping': dict(mapping),
+                'file_type': file_type,
+                'encoding': encoding,
+                'separator': separator,
+                'skiprows': int(skiprows or 0),
+                'columns': list(columns or []),
+                'updated': datetime.now().isoformat(timespec='seconds')
+            }
+            if read_options:
+                profile['read_options'] = read_options
+            self.profiles[fingerprint] = profile
+            self._save()
+            self.logger.info(f"💾 Zapisano profil mapowania {fingerprint[:10]} ({len(mapping)} pól)")
+            return True, "Profil mapowania został zapisany"
+
+        except Exception as e:
+            self.logger.error(f"❌ Błąd zapisywania profilu mapowania: {e}")
+            return False, f"Błąd zapisywania profilu: {str(e)}"
+
+    def remove_profile(self, fingerprint):
+        """Usuwa profil - zwraca True jeśli istniał"""
+        if self.profiles.pop(fingerprint, None) is None:
+            return False
+        self._save()
+        return True
@@ -0,0 +1,217 @@
+"""
+Moduł metryk aplikacji Windykator (liczniki, histogramy, pomiary czasu)
+
+Metryki są zbierane w pamięci procesu i udostępniane w formacie tekstowym
+Prometheusa (endpoint /metrics aplikacji webowej) oraz jako migawka dla okna
+statystyk aplikacji desktopowej. Zmienna środowiskowa WINDYKATOR_METRICS=0
+wyłącza zbieranie - każde wywołanie kończy się wtedy na sprawdzeniu flagi.
+"""
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Granice przedziałów histogramów czasu (sekundy)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Nazwy metryk
+STAGE_SECONDS = 'windykator_stage_seconds'
+TEMPLATE_RENDER_SECONDS = 'windykator_template_render_seconds'
+PROVIDER_REQUEST_SECONDS = 'windykator_provider_request_seconds'
+MESSAGES_TOTAL = 'windykator_messages_total'
+SEND_RETRIES_TOTAL = 'windykator_send_retries_total'
+QUEUE_DEPTH = 'windykator_queue_depth'
+CIRCUIT_STATE = 'windykator_circuit_state'
+
+
+class _NullTimer:
+    """Pomiar czasu, który nic nie robi (metryki wyłączone)"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    """Pomiar czasu bloku kodu zapisywany do histogramu"""
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.registry.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """Klasa przechowująca metryki (bezpieczna dla wątków)"""
+
+    def __init__(self, enabled=True):
+        """Inicjalizuje rejestr metryk"""
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._definitions = {}
+        self._values = {}
+
+    def define(self, name, metric_type, help_text, buckets=DEFAULT_BUCKETS):
+        """Rejestruje metrykę: 'counter', 'gauge' lub 'histogram'"""
+        if metric_type not in ('counter', 'gauge', 'histogram'):
+            raise ValueError(f"Nieznany typ metryki: {metric_type}")
+        self._definitions[name] = {'type': metric_type, 'help': help_text, 'buckets': tuple(buckets)}
+        self._values.setdefault(name, {})
+
+    def _series(self, name, labels):
+        """Zwraca klucz serii (posortowane etykiety) dla metryki"""
+        if name not in self._definitions:
+            raise KeyError(f"Niezdefiniowana metryka: {name}")
+        return tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        """Zwiększa licznik (lub wskaźnik) o wartość"""
+        if not self.enabled:
+            return
+        key = self._series(name, labels)
+        with self._lock:
+            series = self._values[name]
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        """Ustawia wartość wskaźnika"""
+        if not self.enabled:
+            return
+        key = self._series(name, labels)
+        with self._lock:
+            self._values[name][key] = value
+
+    def observe(self, name, value, **labels):
+        """Zapisuje obserwację w histogramie"""
+        if not self.enabled:
+            return
+        key = self._series(name, labels)
+        buckets = self._definitions[name]['buckets']
+        with self._lock:
+            series = self._values[name]
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = {'counts': [0] * (len(buckets) + 1), 'sum': 0.0, 'count': 0}
+            histogram['counts'][bisect_left(buckets, value)] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def timer(self, name, **labels):
+        """Zwraca kontekst mierzący czas bloku (with metrics.timer(...): ...)"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def timed(self, name, **labels):
+        """Dekorator mierzący czas wywołania funkcji"""
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with _Timer(self, name, labels):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def reset(self):
+        """Zeruje wszystkie zebrane wartości (definicje pozostają)"""
+        with self._lock:
+            for name in self._values:
+                self._values[name] = {}
+
+    def snapshot(self):
+        """Zwraca listę słowników z bieżącymi wartościami wszystkich serii"""
+        rows = []
+        with self._lock:
+            for name, definition in self._definitions.items():
+                for key, value in self._values[name].items():
+                    row = {'name': name, 'type': definition['type'], 'labels': dict(key)}
+                    if definition['type'] == 'histogram':
+                        row.update({
+                            'count': value['count'],
+                            'sum': value['sum'],
+                            'avg': value['sum'] / value['count'] if value['count'] else 0.0,
+                            'p95': self._quantile(definition['buckets'], value['counts'], value['count'], 0.95)
+                        })
+                    else:
+                        row['value'] = value
+                    rows.append(row)
+        return rows
+
+    @staticmethod
+    def _quantile(buckets, counts, total, q):
+        """Szacuje kwantyl z przedziałów histogramu (górna granica przedziału)"""
+        if not total:
+            return 0.0
+        target = q * total
+        cumulative = 0
+        for bound, count in zip(buckets, counts):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return float('inf')
+
+    def render_prometheus(self):
+        """Zwraca metryki w formacie tekstowym Prometheusa"""
+        lines = []
+        with self._lock:
+            for name, definition in self._definitions.items():
+                lines.append(f"# HELP {name} {definition['help']}")
+                lines.append(f"# TYPE {name} {definition['type']}")
+                for key, value in sorted(self._values[name].items()):
+                    if definition['type'] != 'histogram':
+                        lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(definition['buckets'] + (float('inf'),), value['counts']):
+                        cumulative += count
+                        le = '+Inf' if bound == float('inf') else _format_value(bound)
+                        lines.append(f"{name}_bucket{_format_labels(key + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {_format_value(value['sum'])}")
+                    lines.append(f"{name}_count{_format_labels(key)} {value['count']}")
+        return '\n'.join(lines) + '\n'
+
+
+def _escape_label_value(value):
+    """Escapuje wartość etykiety (ukośnik, cudzysłów, nowa linia)"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(key):
+    """Formatuje etykiety serii: {nazwa="wartość",...}"""
+    if not key:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label_value(value)}"' for name, value in key) + '}'
+
+
+def _format_value(value):
+    """Formatuje liczbę jak Prometheus (bez zbędnego .0 dla liczb całkowitych)"""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+# Wspólny rejestr aplikacji
+metrics = MetricsRegistry(enabled=os.environ.get('WINDYKATOR_METRICS', '1') != '0')
+metrics.define(STAGE_SECONDS, 'histogram', 'Czas etapów wczytywania i przetwarzania danych')
+metrics.define(TEMPLATE_RENDER_SECONDS, 'histogram', 'Czas wypełniania szablonu wiadomości')
+metrics.define(PROVIDER_REQUEST_SECONDS, 'histogram', 'Czas żądania do dostawcy wysyłki')
+metrics.define(MESSAGES_TOTAL, 'counter', 'Liczba wysłanych wiadomości według kanału i wyniku')
+metrics.define(SEND_RETRIES_TOTAL, 'counter', 'Liczba ponowień wysyłki według dostawcy')
+metrics.define(QUEUE_DEPTH, 'gauge', 'Liczba pozycji oczekujących w kolejce wysyłki')
+metrics.define(CIRCUIT_STATE, 'gauge', 'Stan obwodu dostawcy (0 - zamknięty, 1 - półotwarty, 2 - otwarty)')
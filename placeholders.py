@@ -0,0 +1,167 @@
+"""
+Moduł rejestru placeholderów szablonów email/SMS
+
+Rejestr łączy pola danych (kontrahent, kwota, ...) z placeholderami stałymi
+(Config.load_placeholders, np. numer_konta) i kompiluje szablon raz: wartości
+placeholderów stałych są wstawiane już przy kompilacji, a pola danych trafiają
+do gotowego wzorca str.format_map - wypełnienie szablonu dla wiadomości to jedno
+przejście bez wyszukiwania. Kompilacja wykrywa też nieznane placeholdery, więc
+szablon jest sprawdzany raz na kampanię, a nie przy każdej wiadomości.
+
+Składnia jak w str.format: {pole}, a {{ i }} oznaczają nawiasy klamrowe.
+Inne nawiasy (np. style CSS w szablonie HTML) pozostają bez zmian.
+"""
+import re
+import threading
+from collections import OrderedDict
+
+# Pola danych przekazywane do szablonów email/SMS
+TEMPLATE_FIELDS = ['kontrahent', 'nip', 'nr_faktury', 'email', 'telefon', 'kwota', 'dni_po_terminie', 'data_faktury']
+
+# Liczba skompilowanych szablonów trzymanych w pamięci podręcznej rejestru
+COMPILED_CACHE_SIZE = 64
+
+_TOKEN = re.compile(r'\{\{|\}\}|\{(\w+)\}')
+
+
+def _escape(text):
+    """Escapuje nawiasy klamrowe tekstu dosłownego we wzorcu str.format"""
+    return text.replace('{', '{{').replace('}', '}}')
+
+
+class _KeepMissing(dict):
+    """Dane podglądu - brakujące pola zostają w tekście jako {pole}"""
+
+    def __missing__(self, key):
+        return '{' + key + '}'
+
+
+class CompiledTemplate:
+    """Skompilowany szablon: wzorzec format_map z wstawionymi placeholderami stałymi"""
+
+    __slots__ = ('source', 'pattern', 'fields', 'unknown')
+
+    def __init__(self, source, pattern, fields, unknown):
+        self.source = source
+        self.pattern = pattern
+        self.fields = fields
+        self.unknown = unknown
+
+    @property
+    def is_valid(self):
+        """Szablon nie zawiera nieznanych placeholderów"""
+        return not self.unknown
+
+    def render(self, data, strict=True):
+        """Wypełnia szablon danymi.
+
+        strict=True zgłasza KeyError dla pola bez wartości (jak str.format);
+        strict=False zostawia {pole} w tekście (podgląd w trakcie edycji).
+        """
+        if strict:
+            return self.pattern.format_map(data)
+        return self.pattern.format_map(_KeepMissing(data))
+
+    def format(self, **data):
+        """Zgodność z szablonem tekstowym (template.format(**dane))"""
+        return self.render(data)
+
+
+class PlaceholderRegistry:
+    """Klasa przechowująca placeholdery (słownik nazwa -> wartość) i kompilująca szablony"""
+
+    def __init__(self, placeholders=(), fields=TEMPLATE_FIELDS):
+        """Inicjalizuje rejestr z listy placeholderów stałych ({'name', 'value', ...})"""
+        self.fields = frozenset(fields)
+        self.values = {}
+        self._compiled = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0
+        self.update(placeholders)
+
+    @classmethod
+    def from_config(cls, config, fields=TEMPLATE_FIELDS):
+        """Tworzy rejestr z placeholderów zapisanych w konfiguracji"""
+        return cls(config.load_placeholders(), fields)
+
+    def update(self, placeholders):
+        """Zastępuje placeholdery stałe (lista słowników lub słownik nazwa -> wartość)"""
+        if isinstance(placeholders, dict):
+            values = dict(placeholders)
+        else:
+            values = {placeholder['name']: placeholder['value'] for placeholder in placeholders}
+        with self._lock:
+            self.values = {str(name): '' if value is None else str(value) for name, value in values.items()}
+            self._compiled.clear()
+            self._version += 1
+
+    def get(self, name, default=None):
+        """Zwraca wartość placeholdera stałego po nazwie"""
+        return self.values.get(name, default)
+
+    def __contains__(self, name):
+        return name in self.fields or name in self.values
+
+    def names(self):
+        """Zwraca wszystkie dostępne nazwy (pola danych i placeholdery stałe)"""
+        return sorted(self.fields | set(self.values))
+
+    def compile(self, template):
+        """Kompiluje szablon (wynik w pamięci podręcznej rejestru)"""
+        with self._lock:
+            compiled = self._compiled.get(template)
+            if compiled is not None:
+                self._compiled.move_to_end(template)
+                return compiled
+            values, version = self.values, self._version
+
+        chunks = []
+        fields = set()
+        unknown = []
+        position = 0
+        for match in _TOKEN.finditer(template):
+            chunks.append(_escape(template[position:match.start()]))
+            position = match.end()
+            name = match.group(1)
+            if name is None:
+                # {{ lub }} - nawias dosłowny, zostaje escapowany
+                chunks.append(match.group(0))
+            elif name in self.fields:
+                fields.add(name)
+                chunks.append('{' + name + '}')
+            elif name in values:
+                chunks.append(_escape(values[name]))
+            else:
+                if name not in unknown:
+                    unknown.append(name)
+                chunks.append('{' + name + '}')
+        chunks.append(_escape(template[position:]))
+
+        compiled = CompiledTemplate(template, ''.join(chunks), frozenset(fields), tuple(unknown))
+        with self._lock:
+            # Placeholdery zmienione w trakcie kompilacji - wynik nie trafia do pamięci podręcznej
+            if version != self._version:
+                return compiled
+            self._compiled[template] = compiled
+            if len(self._compiled) > COMPILED_CACHE_SIZE:
+                self._compiled.popitem(last=False)
+        return compiled
+
+    def validate(self, template):
+        """Zwraca listę nieznanych placeholderów w szablonie (pusta - szablon poprawny)"""
+        return list(self.compile(template).unknown)
+
+    def render(self, template, data, strict=True):
+        """Kompiluje (lub bierze z pamięci podręcznej) i wypełnia szablon danymi"""
+        return self.compile(template).render(data, strict)
+
+
+# Rejestr z samymi polami danych - dla szablonów przekazanych jako tekst
+default_registry = PlaceholderRegistry()
+
+
+def render_message(template, data):
+    """Wypełnia szablon wiadomości (CompiledTemplate lub tekst) danymi pozycji"""
+    if isinstance(template, CompiledTemplate):
+        return template.render(data)
+    return default_registry.render(template, data)
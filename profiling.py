@@ -0,0 +1,146 @@
+"""
+Moduł profilowania żądań aplikacji webowej
+
+Profil jest zbierany na żądanie (parametr ?profile=1, przełącznik w sesji lub
+WINDYKATOR_PROFILE=1) i zapisywany w katalogu profiles/ - przechowywanych jest
+co najwyżej MAX_PROFILES najnowszych plików. Dwa tryby:
+- cprofile - plik .prof (pstats) do otwarcia w snakeviz, flameprof, gprof2dot
+- sampling - próbkowanie stosu wątku co SAMPLE_INTERVAL s, plik .folded
+  (format "stos;funkcji liczba") dla flamegraph.pl i speedscope
+"""
+import cProfile
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+PROFILES_DIR = 'profiles'
+MAX_PROFILES = 30
+SAMPLE_INTERVAL = 0.005
+
+PROFILE_MODES = ('cprofile', 'sampling')
+PROFILE_EXTENSIONS = {'cprofile': 'prof', 'sampling': 'folded'}
+
+# Nazwa pliku: 20240101_120000_123456_upload_file_1234ms.prof
+_PROFILE_NAME = re.compile(r'^(?P<created>\d{8}_\d{6}_\d{6})_(?P<label>[\w.-]+)_(?P<ms>\d+)ms\.(?P<ext>prof|folded)$')
+
+
+class StackSampler:
+    """Próbkuje stos wybranego wątku i zlicza stosy w formacie folded"""
+
+    def __init__(self, thread_id=None, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Uruchamia wątek próbkujący"""
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Zatrzymuje próbkowanie"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def folded(self):
+        """Zwraca próbki w formacie folded (jedna linia na stos)"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class ProfileStore:
+    """Klasa przechowująca profile w ograniczonym katalogu"""
+
+    def __init__(self, directory=PROFILES_DIR, max_profiles=MAX_PROFILES):
+        """Inicjalizuje magazyn profili (katalog tworzony przy pierwszym zapisie)"""
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self.logger = logging.getLogger(__name__)
+
+    def run(self, label, function, *args, mode='cprofile', **kwargs):
+        """Wywołuje funkcję pod profilerem i zapisuje profil - zwraca wynik funkcji"""
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Nieznany tryb profilowania: {mode}")
+
+        start = time.perf_counter()
+        if mode == 'cprofile':
+            profiler = cProfile.Profile()
+            try:
+                return profiler.runcall(function, *args, **kwargs)
+            finally:
+                self._save(label, mode, time.perf_counter() - start, profiler.dump_stats)
+        else:
+            sampler = StackSampler()
+            sampler.start()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                sampler.stop()
+                self._save(label, mode, time.perf_counter() - start, lambda path: self._write_text(path, sampler.folded()))
+
+    @staticmethod
+    def _write_text(path, text):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def _save(self, label, mode, seconds, writer):
+        """Zapisuje profil przez writer(ścieżka) i usuwa najstarsze ponad limit"""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            safe_label = re.sub(r'[^\w.-]', '_', label or 'request')
+            name = f"{datetime.now():%Y%m%d_%H%M%S_%f}_{safe_label}_{int(seconds * 1000)}ms.{PROFILE_EXTENSIONS[mode]}"
+            writer(os.path.join(self.directory, name))
+            self.logger.info("⏱️ Zapisano profil %s", name)
+            self._prune()
+        except Exception as e:
+            self.logger.error(f"❌ Błąd zapisywania profilu: {e}")
+
+    def _prune(self):
+        """Usuwa najstarsze profile ponad limit"""
+        for profile in self.list_profiles()[self.max_profiles:]:
+            os.remove(os.path.join(self.directory, profile['name']))
+
+    def list_profiles(self):
+        """Zwraca listę profili (od najnowszego) jako słowniki"""
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in os.listdir(self.directory):
+            match = _PROFILE_NAME.match(name)
+            if not match:
+                continue
+            profiles.append({
+                'name': name,
+                'label': match.group('label'),
+                'created': datetime.strptime(match.group('created'), '%Y%m%d_%H%M%S_%f'),
+                'milliseconds': int(match.group('ms')),
+                'mode': 'cprofile' if match.group('ext') == 'prof' else 'sampling',
+                'size': os.path.getsize(os.path.join(self.directory, name))
+            })
+        profiles.sort(key=lambda profile: profile['created'], reverse=True)
+        return profiles
+
+    def get_path(self, name):
+        """Zwraca ścieżkę profilu o podanej nazwie lub None (tylko pliki profili z katalogu)"""
+        if not _PROFILE_NAME.match(name or ''):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
@@ -0,0 +1,319 @@
+"""
+Moduł ponowień wysyłki (klasyfikacja błędów, wykładnicze opóźnienia, dead-letter)
+
+Sendery zwracają (False, SendFailure(...)) - komunikat jest zwykłym tekstem
+(jak dotąd), a dodatkowo niesie informację, czy błąd jest przejściowy
+(timeout, błąd połączenia, HTTP 408/425/429/5xx, wewnętrzny błąd SMSAPI)
+i ile sekund dostawca kazał czekać (nagłówek Retry-After).
+
+Silnik wysyłki z RetryPolicy odkłada nieudaną przejściowo wiadomość do
+RetryQueue z czasem kolejnej próby - w tym czasie wysyłane są inne pozycje.
+Wiadomości nieudane (błąd trwały, wyczerpane próby lub kampanię anulowano
+przed kolejną próbą) trafiają do DeadLetterStore, skąd można je ponowić
+zbiorczo - np. po doładowaniu konta SMS albo poprawieniu konfiguracji.
+"""
+import heapq
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+
+from file_lock import FileLock
+
+# Statusy HTTP oznaczające błąd przejściowy (warto ponowić)
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+# Kody błędów SMSAPI oznaczające wewnętrzny błąd dostawcy (przejściowy)
+SMSAPI_RETRYABLE_ERRORS = {201, 999}
+
+# Dostawca kanału (etykieta metryki SEND_RETRIES_TOTAL)
+CHANNEL_PROVIDERS = {'email': 'graph', 'sms': 'smsapi'}
+
+# Domyślne parametry ponowień
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 60.0
+
+# Najdłuższe honorowane Retry-After (sekundy) - dłuższe oczekiwanie kończy próby
+MAX_RETRY_AFTER = 300
+
+# Najdłuższe pojedyncze oczekiwanie na kolejne zadanie (anulowanie działa od razu)
+MAX_WAIT_SECONDS = 0.2
+
+# Domyślny plik wiadomości, których nie udało się wysłać
+DEAD_LETTERS_FILE = 'dead_letters.jsonl'
+
+
+class SendFailure(str):
+    """Komunikat błędu wysyłki z klasyfikacją (retryable, retry_after, status_code)"""
+
+    def __new__(cls, message, retryable=False, retry_after=None, status_code=None):
+        failure = super().__new__(cls, message)
+        failure.retryable = retryable
+        failure.retry_after = retry_after
+        failure.status_code = status_code
+        return failure
+
+
+def parse_retry_after(value, now=None):
+    """Zamienia nagłówek Retry-After (sekundy lub data HTTP) na sekundy (None - brak/błąd)"""
+    if value is None or value == '':
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        moment = parsedate_to_datetime(str(value))
+    except (TypeError, ValueError, IndexError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    return max(0.0, (moment - now).total_seconds())
+
+
+def http_failure(message, status_code, headers=None):
+    """Tworzy SendFailure dla odpowiedzi HTTP"""
+    retry_after = parse_retry_after((headers or {}).get('Retry-After'))
+    return SendFailure(message, retryable=status_code in RETRYABLE_STATUS_CODES,
+                       retry_after=retry_after, status_code=status_code)
+
+
+def exception_failure(message, error):
+    """Tworzy SendFailure dla wyjątku (HTTPError z odpowiedzią, timeout, błąd połączenia)"""
+    response = getattr(error, 'response', None)
+    if response is not None and getattr(response, 'status_code', None) is not None:
+        return http_failure(message, response.status_code, response.headers)
+    retryable = isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError,
+                                   TimeoutError, ConnectionError))
+    return SendFailure(message, retryable=retryable)
+
+
+def is_retryable(status):
+    """Czy status kanału ({'success', 'message', 'retryable'}) opisuje błąd przejściowy"""
+    return bool(status) and not status.get('success') and bool(status.get('retryable'))
+
+
+class RetryPolicy:
+    """Parametry ponowień: liczba prób i wykładnicze opóźnienie z losowym rozrzutem"""
+
+    def __init__(self, max_attempts=DEFAULT_MAX_ATTEMPTS, base_delay=DEFAULT_BASE_DELAY,
+                 max_delay=DEFAULT_MAX_DELAY, rng=None):
+        """Inicjalizuje politykę (max_attempts - łączna liczba prób, co najmniej 1)"""
+        self.max_attempts = int(max_attempts)
+        self.base_delay = float(base_delay)
+        self.max_delay = float(max_delay)
+        if self.max_attempts < 1:
+            raise ValueError("Liczba prób wysyłki musi wynosić co najmniej 1")
+        if self.base_delay < 0 or self.max_delay < 0:
+            raise ValueError("Opóźnienie ponowienia nie może być ujemne")
+        self._random = rng or random.Random()
+
+    @classmethod
+    def from_config(cls, settings):
+        """Tworzy politykę ze słownika ustawień (None lub pusty - bez ponowień)"""
+        if not settings:
+            return None
+        return cls(settings.get('max_attempts', DEFAULT_MAX_ATTEMPTS), settings.get('base_delay', DEFAULT_BASE_DELAY),
+                   settings.get('max_delay', DEFAULT_MAX_DELAY))
+
+    def should_retry(self, status, attempt):
+        """Czy ponowić wiadomość po nieudanej próbie numer attempt (od 1)"""
+        if not is_retryable(status) or attempt >= self.max_attempts:
+            return False
+        retry_after = status.get('retry_after')
+        return retry_after is None or retry_after <= MAX_RETRY_AFTER
+
+    def delay(self, attempt, retry_after=None):
+        """Opóźnienie przed próbą attempt + 1: losowe z [0, base × 2^(attempt-1)], nie krótsze niż Retry-After"""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        delay = self._random.uniform(0, ceiling)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+
+class RetryQueue:
+    """Źródło zadań wysyłki: pozycje w kolejności wysyłki i ponowienia z czasem gotowości.
+
+    Zadanie to słownik {'index', 'item', 'channels', 'attempt'}. next() zwraca
+    najpierw ponowienia, których czas minął, potem kolejne pozycje; gdy pozycji
+    już nie ma, czeka na ponowienia i na zadania w toku (które mogą je dodać).
+    Bezpieczna dla wielu wątków.
+    """
+
+    def __init__(self, source, channels):
+        """Inicjalizuje kolejkę z iteratora par (indeks, pozycja) i kanałów pierwszej próby"""
+        self._source = iter(source)
+        self._channels = tuple(channels)
+        self._delayed = []
+        self._counter = 0
+        self._in_flight = 0
+        self._exhausted = False
+        self._condition = threading.Condition()
+
+    def add_retry(self, task, delay):
+        """Dodaje ponowienie zadania po delay sekundach"""
+        with self._condition:
+            heapq.heappush(self._delayed, (time.monotonic() + delay, self._counter, task))
+            self._counter += 1
+            self._condition.notify_all()
+
+    def task_done(self):
+        """Oznacza zakończenie zadania zwróconego przez next()"""
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def next(self, should_stop=None):
+        """Zwraca kolejne zadanie lub None (wszystko wysłane albo should_stop())"""
+        with self._condition:
+            while True:
+                if should_stop and should_stop():
+                    return None
+                now = time.monotonic()
+                if self._delayed and self._delayed[0][0] <= now:
+                    task = heapq.heappop(self._delayed)[2]
+                    self._in_flight += 1
+                    return task
+                if not self._exhausted:
+                    entry = next(self._source, None)
+                    if entry is not None:
+                        self._in_flight += 1
+                        return {'index': entry[0], 'item': entry[1], 'channels': self._channels, 'attempt': 1}
+                    self._exhausted = True
+                if not self._delayed and not self._in_flight:
+                    return None
+                wait = self._delayed[0][0] - now if self._delayed else MAX_WAIT_SECONDS
+                self._condition.wait(min(wait, MAX_WAIT_SECONDS))
+
+    def drain(self):
+        """Usuwa i zwraca ponowienia, które nie zostały wykonane (np. po anulowaniu)"""
+        with self._condition:
+            tasks = [entry[2] for entry in sorted(self._delayed)]
+            self._delayed = []
+            return tasks
+
+
+class DeadLetterStore:
+    """Klasa przechowująca wiadomości, których nie udało się wysłać (plik JSON Lines).
+
+    Rekord: id, created, channel, item, message, attempts, reason ('permanent' -
+    błąd trwały, 'exhausted' - wyczerpane próby, 'cancelled' - anulowano przed
+    kolejną próbą, 'circuit_open' - pominięto przy niedostępnym dostawcy, zob.
+    circuit_breaker). Wiadomości pominięte to zaległość do wznowienia: replay
+    z reason='circuit_open' wysyła je, gdy dostawca znów działa.
+
+    Do pliku dopisuje wiele procesów (workery aplikacji webowej, proces wysyłki),
+    więc każdy odczyt i zapis odbywa się pod blokadą pliku (path + '.lock').
+    """
+
+    def __init__(self, path=DEAD_LETTERS_FILE):
+        """Inicjalizuje magazyn w pliku path"""
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+        self._lock = FileLock(f'{path}.lock')
+
+    def add(self, channel, item, message, attempts, reason='exhausted'):
+        """Dopisuje wiadomość - zwraca id rekordu"""
+        record = {
+            'id': uuid.uuid4().hex,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'channel': channel,
+            'item': item,
+            'message': str(message),
+            'attempts': attempts,
+            'reason': reason
+        }
+        self._append([record])
+        self.logger.warning(f"📭 Wiadomość {channel} odłożona do ponowienia ({reason}): {message}")
+        return record['id']
+
+    def _append(self, records):
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records))
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return []
+        records = []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    self.logger.warning("⚠️ Pominięto uszkodzony wpis dead-letter")
+        return records
+
+    def _write(self, records):
+        temp_path = f'{self.path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        os.replace(temp_path, self.path)
+
+    @staticmethod
+    def _matches(record, ids, reason):
+        return (ids is None or record['id'] in ids) and (reason is None or record.get('reason') == reason)
+
+    def list(self, reason=None):
+        """Zwraca wszystkie rekordy (reason - tylko z danym powodem)"""
+        with self._lock:
+            return [record for record in self._read() if self._matches(record, None, reason)]
+
+    def take(self, ids=None, reason=None):
+        """Usuwa i zwraca rekordy o podanych id (None - wszystkie) i powodzie reason (None - dowolnym)"""
+        with self._lock:
+            records = self._read()
+            wanted = None if ids is None else set(ids)
+            taken = [record for record in records if self._matches(record, wanted, reason)]
+            if taken:
+                self._write([record for record in records if not self._matches(record, wanted, reason)])
+            return taken
+
+    def replay(self, engine, ids=None, reason=None):
+        """Ponawia rekordy silnikiem wysyłki (osobno dla kanałów) - zwraca (wysłane, nieudane).
+
+        Nieudane wiadomości odkłada ponownie silnik (engine.dead_letters), a
+        nierozpoczęte (np. anulowano kampanię) wracają tu bez zmian - z tym samym
+        id, powodem i liczbą prób.
+        """
+        records = self.take(ids, reason)
+        sent = failed = 0
+        not_started = []
+        for channel in ('email', 'sms'):
+            channel_records = [record for record in records if record['channel'] == channel]
+            if not channel_records:
+                continue
+            statuses = {}
+            engine.run([record['item'] for record in channel_records], send_email=channel == 'email',
+                       send_sms=channel == 'sms',
+                       on_result=lambda index, result: statuses.__setitem__(index, result[f'{channel}_status']))
+            for index, record in enumerate(channel_records):
+                if index not in statuses:
+                    not_started.append(record)
+                    failed += 1
+                elif statuses[index] and statuses[index].get('success'):
+                    sent += 1
+                else:
+                    failed += 1
+        if not_started:
+            self._append(not_started)
+            self.logger.info(f"📭 {len(not_started)} wiadomości nie ponowiono - wróciły do magazynu")
+        self.logger.info(f"🔁 Ponowiono {len(records)} wiadomości: wysłane {sent}, nieudane {failed}")
+        return sent, failed
@@ -0,0 +1,242 @@
+"""
+Moduł pul senderów (kilka skrzynek Microsoft 365 / kilka tokenów SMSAPI)
+
+Limity dostawcy dotyczą pojedynczego konta, więc przepustowość kampanii rośnie
+z liczbą kont: SenderPool ma interfejs sendera (send_reminder_email,
+send_reminder_sms) i każdą wiadomość wysyła przez jedno z kont - najmniej
+obciążone (least_loaded: najwcześniej wolne w swoim tempie, potem najmniej
+wysyłek w toku) albo kolejne (round_robin). Każde konto ma własne tempo
+(wiadomości na sekundę) i własny wyłącznik obwodu (circuit_breaker) - konto
+z przejściowymi błędami jest pomijane, a wiadomość trafia do innego konta.
+
+Konta konfiguruje się w api_config.json (Config.load_sender_accounts):
+"email_accounts": [{"name", "mailbox", "client_id", "client_secret", "rate"}],
+"sms_accounts": [{"name", "sms_token", "sms_sender", "sms_url", "rate"}],
+"sender_pool": {"strategy": "least_loaded"}.
+"""
+import logging
+import threading
+import time
+
+from circuit_breaker import CircuitBreaker, STATE_OPEN
+from send_retry import SendFailure, exception_failure
+
+# Strategie wyboru konta
+STRATEGY_LEAST_LOADED = 'least_loaded'
+STRATEGY_ROUND_ROBIN = 'round_robin'
+STRATEGIES = (STRATEGY_LEAST_LOADED, STRATEGY_ROUND_ROBIN)
+DEFAULT_STRATEGY = STRATEGY_LEAST_LOADED
+
+# Domyślny adres API SMSAPI
+DEFAULT_SMS_URL = "https://api.smsapi.pl/sms.do"
+
+
+def normalize_strategy(strategy):
+    """Sprawdza nazwę strategii (None - domyślna)"""
+    strategy = strategy or DEFAULT_STRATEGY
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Nieznana strategia puli senderów: {strategy} (dostępne: {', '.join(STRATEGIES)})")
+    return strategy
+
+
+def _rate(value):
+    if value is None or value == '':
+        return None
+    value = float(value)
+    if value < 0:
+        raise ValueError("Tempo konta nie może być ujemne")
+    return value or None
+
+
+class PoolMember:
+    """Konto puli: sender, tempo, wyłącznik obwodu i liczniki"""
+
+    def __init__(self, name, sender, rate=None, breaker_settings=None, clock=time.monotonic):
+        """Inicjalizuje konto (rate - wiadomości na sekundę, None - bez limitu)"""
+        self.name = name
+        self.sender = sender
+        self.rate = _rate(rate)
+        self.breaker = CircuitBreaker(name, clock=clock, **(breaker_settings or {}))
+        self.in_flight = 0
+        self.next_slot = 0.0
+        self.sent = 0
+        self.failed = 0
+        self.last_error = None
+
+    def snapshot(self):
+        """Zwraca stan konta jako słownik"""
+        return {
+            'name': self.name,
+            'rate': self.rate,
+            'state': self.breaker.state,
+            'in_flight': self.in_flight,
+            'sent': self.sent,
+            'failed': self.failed,
+            'last_error': self.last_error
+        }
+
+
+class SenderPool:
+    """Klasa rozkładająca wysyłkę na kilka kont dostawcy - bezpieczna dla wielu wątków"""
+
+    def __init__(self, members, strategy=DEFAULT_STRATEGY, provider='pool', clock=time.monotonic, sleep=time.sleep):
+        """Inicjalizuje pulę z listy PoolMember (co najmniej jedno konto)"""
+        if not members:
+            raise ValueError("Pula senderów musi mieć co najmniej jedno konto")
+        names = [member.name for member in members]
+        if len(set(names)) != len(names):
+            raise ValueError("Nazwy kont puli senderów muszą być unikalne")
+        self.members = list(members)
+        self.strategy = normalize_strategy(strategy)
+        self.provider = provider
+        self.logger = logging.getLogger(__name__)
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._next = 0
+
+    @property
+    def rate(self):
+        """Łączne tempo kont (None - co najmniej jedno konto bez limitu)"""
+        rates = [member.rate for member in self.members]
+        return None if None in rates else sum(rates)
+
+    def _choose(self, candidates, now):
+        if self.strategy == STRATEGY_ROUND_ROBIN:
+            count = len(self.members)
+            for offset in range(count):
+                member = self.members[(self._next + offset) % count]
+                if member in candidates:
+                    self._next = (self.members.index(member) + 1) % count
+                    return member
+        return min(candidates, key=lambda member: (max(member.next_slot, now), member.in_flight,
+                                                   self.members.index(member)))
+
+    def _acquire(self, exclude=()):
+        """Rezerwuje konto i jego kolejny termin w tempie - zwraca (konto, sekundy do kolejnej próby)"""
+        with self._lock:
+            now = self._clock()
+            candidates = [member for member in self.members
+                          if member not in exclude and member.breaker.state != STATE_OPEN]
+            while candidates:
+                member = self._choose(candidates, now)
+                # W stanie półotwartym konto przepuszcza tylko wywołania próbne
+                if not member.breaker.allow():
+                    candidates.remove(member)
+                    continue
+                slot = max(now, member.next_slot)
+                if member.rate:
+                    member.next_slot = slot + 1.0 / member.rate
+                member.in_flight += 1
+                break
+            else:
+                waits = [member.breaker.retry_in() for member in self.members if member not in exclude]
+                return None, min(waits) if waits else None
+        if slot > now:
+            self._sleep(slot - now)
+        return member, None
+
+    def _release(self, member, success, message):
+        member.breaker.record(success or not getattr(message, 'retryable', False))
+        with self._lock:
+            member.in_flight -= 1
+            if success:
+                member.sent += 1
+            else:
+                member.failed += 1
+                member.last_error = str(message)
+
+    def _send(self, method, *args):
+        """Wysyła przez wybrane konto; przy błędzie przejściowym próbuje kolejnego konta"""
+        tried = []
+        last = None  # wynik ostatniej próby (błąd przejściowy poprzedniego konta)
+        while True:
+            member, retry_in = self._acquire(tried)
+            if member is None:
+                if last is not None:
+                    return last
+                return False, SendFailure(f"Wszystkie konta puli {self.provider} są niedostępne",
+                                          retryable=True, retry_after=retry_in)
+            try:
+                success, message = getattr(member.sender, method)(*args)
+            except Exception as e:
+                self.logger.error(f"❌ Błąd wysyłki przez konto {member.name}: {e}")
+                success, message = False, exception_failure(f'Błąd wysyłki: {str(e)}', e)
+            self._release(member, success, message)
+            if success or not getattr(message, 'retryable', False):
+                return success, message
+            self.logger.warning(f"🔀 Konto {member.name} zwróciło błąd przejściowy - próbuję innego konta")
+            last = (success, message)
+            tried.append(member)
+
+    def send_reminder_email(self, to_email, template_data, email_template):
+        """Wysyła email przypomnienia przez jedno z kont"""
+        return self._send('send_reminder_email', to_email, template_data, email_template)
+
+    def send_reminder_sms(self, phone_number, template_data, sms_template):
+        """Wysyła SMS przypomnienia przez jedno z kont"""
+        return self._send('send_reminder_sms', phone_number, template_data, sms_template)
+
+    def send_sms(self, phone_number, message):
+        """Wysyła SMS przez jedno z kont"""
+        return self._send('send_sms', phone_number, message)
+
+    def authenticate(self):
+        """Autoryzuje wszystkie konta - sukces, gdy działa co najmniej jedno"""
+        failures = []
+        for member in self.members:
+            success, message = member.sender.authenticate()
+            if not success:
+                failures.append(f"{member.name}: {message}")
+                self.logger.error(f"❌ Autoryzacja konta {member.name} nieudana: {message}")
+        if len(failures) == len(self.members):
+            return False, "; ".join(failures)
+        if failures:
+            return True, f"Autoryzacja udana ({len(self.members) - len(failures)} z {len(self.members)} kont)"
+        return True, "Autoryzacja udana"
+
+    def test_connection(self, *args):
+        """Testuje połączenie wszystkich kont - sukces, gdy działają wszystkie"""
+        messages = []
+        ok = True
+        for member in self.members:
+            success, message = member.sender.test_connection(*args)
+            ok = ok and success
+            messages.append(f"{member.name}: {message}")
+        return ok, "; ".join(messages)
+
+    def snapshot(self):
+        """Zwraca stan puli jako słownik"""
+        with self._lock:
+            members = [member.snapshot() for member in self.members]
+        return {'provider': self.provider, 'strategy': self.strategy, 'rate': self.rate, 'accounts': members}
+
+
+def build_email_sender(accounts, strategy=None, token_store=None, breaker_settings=None):
+    """Tworzy EmailSender (jedno konto bez limitu) lub SenderPool skrzynek z listy kont"""
+    from email_sender import EmailSender
+
+    def create(account):
+        kwargs = {'token_store': token_store} if token_store else {}
+        return EmailSender(account['client_id'], account['client_secret'], mailbox=account.get('mailbox'), **kwargs)
+
+    if len(accounts) == 1 and _rate(accounts[0].get('rate')) is None:
+        return create(accounts[0])
+    members = [PoolMember(account.get('name') or account.get('mailbox') or f'email-{i + 1}', create(account),
+                          account.get('rate'), breaker_settings) for i, account in enumerate(accounts)]
+    return SenderPool(members, strategy, provider='graph')
+
+
+def build_sms_sender(accounts, strategy=None, breaker_settings=None):
+    """Tworzy SMSSender (jedno konto bez limitu) lub SenderPool tokenów SMSAPI z listy kont"""
+    from sms_sender import SMSSender
+
+    def create(account):
+        return SMSSender(account['sms_token'], account.get('sms_sender') or None,
+                         account.get('sms_url') or DEFAULT_SMS_URL)
+
+    if len(accounts) == 1 and _rate(accounts[0].get('rate')) is None:
+        return create(accounts[0])
+    members = [PoolMember(account.get('name') or f'sms-{i + 1}', create(account), account.get('rate'),
+                          breaker_settings) for i, account in enumerate(accounts)]
+    return SenderPool(members, strategy, provider='smsapi')
@@ -0,0 +1,332 @@
+"""
+Moduł sterowania kampanią wysyłki w trakcie jej trwania
+
+SendingControl przechowuje limity kampanii (liczba równoległych wysyłek,
+tempo na kanał) oraz stan wstrzymania i anulowania. Silnik wysyłki
+(SendingEngine z parametrem control) pyta o wolne miejsce przed każdą
+pozycją i o kolej w tempie kanału przed każdym wywołaniem dostawcy; oczekiwanie
+odbywa się na warunku, który jest budzony przy każdej zmianie limitów,
+więc nowe ustawienia działają od razu (najpóźniej po MAX_WAIT_SECONDS).
+Wysyłki już rozpoczęte zawsze kończą się i oddają wynik.
+
+CampaignStore przechowuje stan kampanii aplikacji webowej w plikach JSON
+wspólnych dla wszystkich workerów gunicorn: dowolny worker zmienia limity
+i stan kampanii w pliku, a worker, który ją wysyła, co SYNC_SECONDS przenosi
+je do swojego SendingControl i zapisuje postęp, a po zakończeniu - wyniki.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from file_lock import FileLock
+
+# Domyślna i maksymalna liczba równoległych wysyłek
+DEFAULT_CONCURRENCY = 1
+MAX_CONCURRENCY = 16
+
+# Kanały z osobnym limitem tempa
+CHANNELS = ('email', 'sms')
+
+# Najdłuższe pojedyncze oczekiwanie - nowe limity są sprawdzane co najmniej tak często
+MAX_WAIT_SECONDS = 0.2
+
+# Katalog stanu kampanii aplikacji webowej i odstęp synchronizacji workera wysyłającego (sekundy)
+CAMPAIGNS_DIR = 'campaigns'
+SYNC_SECONDS = 0.5
+
+# Po jakim czasie usuwane są pliki zakończonych kampanii (sekundy)
+FINISHED_TTL_SECONDS = 24 * 3600
+
+# Ustawienia kampanii zmieniane przez API (pozostałe pola stanu zapisuje worker wysyłający)
+SETTINGS = ('concurrency', 'email_rate', 'sms_rate', 'paused', 'cancelled')
+
+_UNCHANGED = object()
+_CAMPAIGN_ID = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+class SendingControl:
+    """Klasa przechowująca limity i stan kampanii - bezpieczna dla wielu wątków.
+
+    Tempo kanału to liczba wiadomości na sekundę (None - bez limitu); kolejne
+    wiadomości kanału są rozłożone równo co 1/tempo sekundy.
+    """
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, email_rate=None, sms_rate=None):
+        """Inicjalizuje sterowanie z limitami początkowymi"""
+        self._condition = threading.Condition()
+        self.concurrency = DEFAULT_CONCURRENCY
+        self.rates = {channel: None for channel in CHANNELS}
+        self.paused = False
+        self.cancelled = False
+        self.active = 0
+        self._last_send = {channel: None for channel in CHANNELS}
+        self.set_limits(concurrency=concurrency, email_rate=email_rate, sms_rate=sms_rate)
+
+    @staticmethod
+    def _rate(value):
+        if value is None or value == '':
+            return None
+        value = float(value)
+        if value < 0:
+            raise ValueError("Tempo wysyłki nie może być ujemne")
+        return value or None
+
+    def set_limits(self, concurrency=_UNCHANGED, email_rate=_UNCHANGED, sms_rate=_UNCHANGED):
+        """Zmienia limity (pominięte pozostają bez zmian, tempo None - bez limitu)"""
+        with self._condition:
+            if concurrency is not _UNCHANGED:
+                concurrency = int(concurrency)
+                if not 1 <= concurrency <= MAX_CONCURRENCY:
+                    raise ValueError(f"Liczba równoległych wysyłek musi być z zakresu 1-{MAX_CONCURRENCY}")
+                self.concurrency = concurrency
+            for channel, rate in (('email', email_rate), ('sms', sms_rate)):
+                if rate is not _UNCHANGED:
+                    self.rates[channel] = self._rate(rate)
+            self._condition.notify_all()
+
+    def pause(self):
+        """Wstrzymuje rozpoczynanie kolejnych wysyłek"""
+        with self._condition:
+            self.paused = True
+            self._condition.notify_all()
+
+    def resume(self):
+        """Wznawia wstrzymaną kampanię"""
+        with self._condition:
+            self.paused = False
+            self._condition.notify_all()
+
+    def cancel(self):
+        """Anuluje kampanię - nowe wysyłki nie są rozpoczynane"""
+        with self._condition:
+            self.cancelled = True
+            self._condition.notify_all()
+
+    def apply(self, action=None, **limits):
+        """Wykonuje akcję ('pause', 'resume', 'cancel') i/lub zmienia limity - zwraca stan"""
+        if action not in (None, '', 'pause', 'resume', 'cancel'):
+            raise ValueError(f"Nieznana akcja: {action}")
+        if limits:
+            self.set_limits(**limits)
+        if action:
+            getattr(self, action)()
+        return self.snapshot()
+
+    def restore(self, state):
+        """Przyjmuje ustawienia ze stanu zapisanego przez snapshot (cofnięcie anulowania jest pomijane)"""
+        self.set_limits(concurrency=state['concurrency'], email_rate=state['email_rate'],
+                        sms_rate=state['sms_rate'])
+        if state['cancelled']:
+            self.cancel()
+        elif state['paused']:
+            self.pause()
+        else:
+            self.resume()
+
+    def snapshot(self):
+        """Zwraca stan kampanii jako słownik"""
+        with self._condition:
+            return {
+                'concurrency': self.concurrency,
+                'email_rate': self.rates['email'],
+                'sms_rate': self.rates['sms'],
+                'paused': self.paused,
+                'cancelled': self.cancelled,
+                'active': self.active
+            }
+
+    def acquire_slot(self):
+        """Czeka na wolne miejsce dla kolejnej pozycji - False, gdy kampanię anulowano"""
+        with self._condition:
+            while not self.cancelled and (self.paused or self.active >= self.concurrency):
+                self._condition.wait(MAX_WAIT_SECONDS)
+            if self.cancelled:
+                return False
+            self.active += 1
+            return True
+
+    def release_slot(self):
+        """Zwalnia miejsce po zakończeniu pozycji"""
+        with self._condition:
+            self.active -= 1
+            self._condition.notify_all()
+
+    def acquire_rate(self, channel):
+        """Czeka na swoją kolej w tempie kanału - False, gdy kampanię anulowano"""
+        with self._condition:
+            while True:
+                if self.cancelled:
+                    return False
+                now = time.monotonic()
+                rate = self.rates.get(channel)
+                if not self.paused:
+                    # Odstęp liczony od ostatniej wiadomości kanału przy bieżącym tempie -
+                    # zmiana tempa działa także dla wiadomości, która już czeka
+                    last = self._last_send[channel]
+                    ready_at = now if rate is None or last is None else last + 1.0 / rate
+                    if now >= ready_at:
+                        self._last_send[channel] = now
+                        return True
+                    wait = min(ready_at - now, MAX_WAIT_SECONDS)
+                else:
+                    wait = MAX_WAIT_SECONDS
+                self._condition.wait(wait)
+
+
+class CampaignStore:
+    """Klasa zapisująca stan kampanii w plikach JSON wspólnych dla procesów serwera.
+
+    Plik kampanii jest zmieniany pod blokadą <id>.state.lock (odczyt, zmiana,
+    zapis atomowy), a blokadę <id>.lock trzyma przez cały czas wysyłki proces,
+    który ją wysyła - po jego awarii kampania nie jest już oznaczona jako trwająca.
+    """
+
+    def __init__(self, directory=CAMPAIGNS_DIR):
+        """Inicjalizuje magazyn w katalogu directory"""
+        self.directory = directory
+
+    def _path(self, campaign_id, extension='.json'):
+        if not _CAMPAIGN_ID.match(str(campaign_id)):
+            raise ValueError(f"Nieprawidłowe id kampanii: {campaign_id}")
+        return os.path.join(self.directory, f'{campaign_id}{extension}')
+
+    def lock(self, campaign_id):
+        """Zwraca blokadę wysyłki kampanii - trzyma ją proces, który ją wysyła"""
+        return FileLock(self._path(campaign_id, '.lock'))
+
+    def is_running(self, campaign_id):
+        """Czy kampanię wysyła jakiś proces (blokada jest założona)"""
+        lock = self.lock(campaign_id)
+        if not lock.acquire(blocking=False):
+            return True
+        lock.release()
+        return False
+
+    def _read(self, campaign_id):
+        try:
+            with open(self._path(campaign_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write(self, state):
+        path = self._path(state['campaign_id'])
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            # default=str - wartości pozycji spoza JSON (daty) zapisywane jako tekst
+            json.dump(state, f, ensure_ascii=False, default=str)
+        os.replace(temp_path, path)
+
+    def _update(self, campaign_id, change):
+        """Zmienia stan kampanii pod blokadą - change(stan) zwraca nowy stan; None, gdy kampanii nie ma"""
+        with FileLock(self._path(campaign_id, '.state.lock')):
+            state = self._read(campaign_id)
+            if state is None:
+                return None
+            state = change(state)
+            self._write(state)
+            return state
+
+    def create(self, campaign_id, control, total):
+        """Zapisuje nową kampanię z ustawieniami control (usuwa stare zakończone kampanie)"""
+        self.prune()
+        os.makedirs(self.directory, exist_ok=True)
+        state = control.snapshot()
+        state.update({'campaign_id': campaign_id, 'total': total, 'completed': 0,
+                      'finished': False, 'finished_at': None, 'results': None, 'message': None, 'error': None,
+                      'pools': {}})
+        with FileLock(self._path(campaign_id, '.state.lock')):
+            self._write(state)
+        return state
+
+    def load(self, campaign_id, results=True):
+        """Wczytuje stan kampanii (z polem running) lub zwraca None, gdy jej nie ma"""
+        state = self._read(campaign_id)
+        if state is None:
+            return None
+        if not results:
+            state.pop('results', None)
+        state['running'] = not state['finished'] and self.is_running(campaign_id)
+        return state
+
+    def list(self):
+        """Zwraca stan trwających kampanii (bez wyników)"""
+        if not os.path.isdir(self.directory):
+            return []
+        campaigns = []
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith('.json'):
+                state = self.load(name[:-len('.json')], results=False)
+                if state is not None and state['running']:
+                    campaigns.append(state)
+        return campaigns
+
+    def apply(self, campaign_id, action=None, **limits):
+        """Wykonuje akcję i/lub zmienia limity trwającej kampanii - zwraca stan lub None.
+
+        Zmiany sprawdza SendingControl (ValueError przy błędnych wartościach);
+        worker wysyłający przyjmuje je przy najbliższej synchronizacji.
+        """
+        def change(state):
+            if state['finished']:
+                return state
+            control = SendingControl()
+            control.restore(state)
+            snapshot = control.apply(action, **limits)
+            state.update({name: snapshot[name] for name in SETTINGS})
+            return state
+
+        state = self._update(campaign_id, change)
+        if state is None or state['finished'] or not self.is_running(campaign_id):
+            return None
+        state.pop('results', None)
+        state['running'] = True
+        return state
+
+    def sync(self, campaign_id, control, completed):
+        """Przenosi ustawienia z pliku do control i zapisuje postęp (worker wysyłający)"""
+        def change(state):
+            control.restore(state)
+            state.update({'completed': completed, 'active': control.snapshot()['active']})
+            return state
+
+        return self._update(campaign_id, change)
+
+    def follow(self, campaign_id, control, progress, stop_event, interval=SYNC_SECONDS):
+        """Synchronizuje kampanię co interval sekund do ustawienia stop_event (progress() - liczba pozycji)"""
+        while not stop_event.wait(interval):
+            try:
+                self.sync(campaign_id, control, progress())
+            except (OSError, ValueError) as e:
+                logging.getLogger(__name__).warning(f"⚠️ Synchronizacja kampanii {campaign_id} nieudana: {e}")
+
+    def finish(self, campaign_id, results, message, pools=None, error=None):
+        """Zapisuje wyniki zakończonej kampanii (error - komunikat błędu, który przerwał wysyłkę)"""
+        def change(state):
+            state.update({'finished': True, 'finished_at': time.time(), 'completed': len(results), 'active': 0,
+                          'results': results, 'message': message, 'error': error, 'pools': pools or {}})
+            return state
+
+        return self._update(campaign_id, change)
+
+    def prune(self, max_age=FINISHED_TTL_SECONDS):
+        """Usuwa pliki kampanii zakończonych dawniej niż max_age sekund temu"""
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            campaign_id = name[:-len('.json')]
+            try:
+                state = self._read(campaign_id)
+            except (ValueError, OSError):
+                continue
+            if state and state.get('finished') and time.time() - state['finished_at'] > max_age:
+                for extension in ('.json', '.lock', '.state.lock'):
+                    try:
+                        os.remove(self._path(campaign_id, extension))
+                    except FileNotFoundError:
+                        pass
@@ -0,0 +1,386 @@
+"""
+Moduł wspólnego silnika wysyłki przypomnień (email + SMS)
+
+Z silnika korzystają aplikacja webowa (/api/real_sending) i aplikacja desktopowa
+(proces wysyłki sending_process.SendingProcess), dzięki czemu obie ścieżki wysyłki
+przygotowują dane szablonów, wybierają szablony dla przedziałów zaległości
+i raportują statusy w ten sam sposób - a benchmark wysyłki mierzy dokładnie ten kod.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dispatch_queue import DispatchQueue
+from metrics import metrics, MESSAGES_TOTAL, QUEUE_DEPTH, SEND_RETRIES_TOTAL
+from placeholders import PlaceholderRegistry, TEMPLATE_FIELDS
+from sending_control import MAX_CONCURRENCY
+from send_retry import RetryQueue, exception_failure, is_retryable, CHANNEL_PROVIDERS
+from circuit_breaker import SKIPPED_REASON
+
+# Domyślna przerwa między kolejnymi pozycjami (sekundy)
+DEFAULT_SEND_DELAY = 2
+
+# Pole pozycji z adresem kanału
+CHANNEL_FIELDS = {'email': 'email', 'sms': 'telefon'}
+
+
+def build_template_data(item):
+    """Przygotowuje dane do szablonów z pozycji (słownika pól zmapowanych)"""
+    return {field: item.get(field, '') for field in TEMPLATE_FIELDS}
+
+
+def result_label(status):
+    """Etykieta wyniku wiadomości dla metryki MESSAGES_TOTAL"""
+    if status.get('cancelled'):
+        return 'cancelled'
+    if status.get('skipped'):
+        return 'skipped'
+    return 'sent' if status['success'] else 'failed'
+
+
+def provider_status(success, message, seconds):
+    """Status kanału z wyniku sendera - z klasyfikacją błędu (SendFailure), gdy jest dostępna"""
+    status = {'success': success, 'message': message, 'seconds': seconds}
+    if not success:
+        status['retryable'] = bool(getattr(message, 'retryable', False))
+        status['retry_after'] = getattr(message, 'retry_after', None)
+    return status
+
+
+class SendingEngine:
+    """Klasa wysyłająca przypomnienia dla listy pozycji przez skonfigurowane sendery"""
+
+    def __init__(self, email_sender=None, sms_sender=None, email_template='', sms_template='',
+                 template_loader=None, delay=DEFAULT_SEND_DELAY, placeholders=None, control=None,
+                 priority_weights=None, retry_policy=None, dead_letters=None, breakers=None):
+        """Inicjalizuje silnik.
+
+        template_loader(typ, przedział) zwraca szablon dedykowany dla przedziału
+        zaległości (np. Config.load_template); bez niego używane są szablony domyślne.
+        placeholders - PlaceholderRegistry z placeholderami stałymi (domyślnie tylko pola danych).
+        control - SendingControl: równoległość, tempo kanałów, wstrzymanie i anulowanie
+        zmieniane w trakcie kampanii (zastępuje stałą przerwę delay).
+        priority_weights - wagi przedziałów zaległości (dispatch_queue); z nimi pozycje
+        są wysyłane od najwyższego priorytetu kwota × waga, bez nich w kolejności listy.
+        retry_policy - RetryPolicy (send_retry): wiadomości z błędem przejściowym są
+        ponawiane z opóźnieniem, a w tym czasie wysyłane są kolejne pozycje.
+        dead_letters - DeadLetterStore na wiadomości, których nie udało się wysłać.
+        breakers - CircuitBreakers (circuit_breaker): przy otwartym obwodzie dostawcy
+        wiadomości są pomijane bez wywołania i odkładane do dead_letters ('circuit_open').
+        """
+        self.email_sender = email_sender
+        self.sms_sender = sms_sender
+        self.email_template = email_template
+        self.sms_template = sms_template
+        self.template_loader = template_loader
+        self.delay = delay
+        self.placeholders = placeholders or PlaceholderRegistry()
+        self.control = control
+        self.priority_weights = priority_weights
+        self.retry_policy = retry_policy
+        self.dead_letters = dead_letters
+        self.breakers = breakers
+        self.logger = logging.getLogger(__name__)
+        self._bucket_templates = {}
+        self._compiled_templates = {}
+
+    def get_template(self, template_type, bucket=None):
+        """Zwraca szablon dla typu i przedziału zaległości (z pamięcią podręczną)"""
+        default_template = self.email_template if template_type == 'email' else self.sms_template
+        if not bucket or not self.template_loader:
+            return default_template
+        key = (template_type, bucket)
+        if key not in self._bucket_templates:
+            self._bucket_templates[key] = self.template_loader(template_type, bucket)
+        return self._bucket_templates[key]
+
+    def get_compiled_template(self, template_type, bucket=None):
+        """Zwraca skompilowany szablon - kompilacja i sprawdzenie raz na kampanię dla typu i przedziału"""
+        key = (template_type, bucket)
+        compiled = self._compiled_templates.get(key)
+        if compiled is None:
+            compiled = self.placeholders.compile(self.get_template(template_type, bucket))
+            if compiled.unknown:
+                self.logger.error(f"❌ Nieznane placeholdery w szablonie {template_type}"
+                                  f"{f' ({bucket})' if bucket else ''}: {', '.join(compiled.unknown)}")
+            self._compiled_templates[key] = compiled
+        return compiled
+
+    def _template_error(self, compiled):
+        """Status błędu dla szablonu z nieznanymi placeholderami (bez wywołania dostawcy)"""
+        return {'success': False, 'message': f"Błąd szablonu: nieznane placeholdery {', '.join(compiled.unknown)}",
+                'seconds': 0.0}
+
+    def _wait_for_channel(self, channel):
+        """Czeka na kolej w tempie kanału - zwraca status anulowania lub None"""
+        if self.control is None or self.control.acquire_rate(channel):
+            return None
+        return {'success': False, 'message': 'Anulowano przed wysłaniem', 'seconds': 0.0, 'cancelled': True}
+
+    def _call_provider(self, channel, call):
+        """Wywołuje dostawcę kanału (call() -> (success, message)) - z wyłącznikiem obwodu i tempem kanału"""
+        breaker = self.breakers.get(CHANNEL_PROVIDERS[channel]) if self.breakers is not None else None
+        # Przy otwartym obwodzie wiadomość jest pomijana od razu - bez czekania na kolej w tempie kanału
+        if breaker is not None and not breaker.allow():
+            return breaker.skipped_status()
+
+        cancelled = self._wait_for_channel(channel)
+        if cancelled:
+            if breaker is not None:
+                breaker.release()
+            return cancelled
+
+        label = 'email' if channel == 'email' else 'SMS'
+        start = time.perf_counter()
+        try:
+            success, message = call()
+        except Exception as e:
+            self.logger.error(f"❌ Błąd wysyłania {label}: {e}")
+            success, message = False, exception_failure(f'Błąd wysyłania {label}: {str(e)}', e)
+        status = provider_status(success, message, round(time.perf_counter() - start, 4))
+        if breaker is not None:
+            breaker.record(not is_retryable(status))
+        return status
+
+    def send_email(self, item, template_data):
+        """Wysyła email dla pozycji - zwraca słownik statusu"""
+        if not self.email_sender:
+            return {'success': False, 'message': 'Błąd: Email sender nie został zainicjalizowany'}
+
+        compiled = self.get_compiled_template('email', item.get('przedzial_zaleglosci'))
+        if compiled.unknown:
+            return self._template_error(compiled)
+
+        return self._call_provider('email', lambda: self.email_sender.send_reminder_email(
+            item.get('email'), template_data, compiled))
+
+    def send_sms(self, item, template_data):
+        """Wysyła SMS dla pozycji - zwraca słownik statusu"""
+        if not self.sms_sender:
+            return {'success': False, 'message': 'Błąd: SMS sender nie został zainicjalizowany'}
+
+        compiled = self.get_compiled_template('sms', item.get('przedzial_zaleglosci'))
+        if compiled.unknown:
+            return self._template_error(compiled)
+
+        return self._call_provider('sms', lambda: self.sms_sender.send_reminder_sms(
+            item.get('telefon'), template_data, compiled))
+
+    def send_channel(self, item, channel, template_data=None, record=True):
+        """Wysyła jedną wiadomość kanału ('email' lub 'sms') dla pozycji (record - licz w metrykach)"""
+        if template_data is None:
+            template_data = build_template_data(item)
+        status = self.send_email(item, template_data) if channel == 'email' else self.send_sms(item, template_data)
+        if record:
+            metrics.inc(MESSAGES_TOTAL, channel=channel, result=result_label(status))
+        return status
+
+    @staticmethod
+    def _new_result(item):
+        return {
+            'kontrahent': item.get('kontrahent', ''),
+            'email': item.get('email', ''),
+            'telefon': item.get('telefon', ''),
+            'email_status': None,
+            'sms_status': None
+        }
+
+    def send_item(self, item, send_email=True, send_sms=True):
+        """Wysyła email i/lub SMS dla jednej pozycji - zwraca słownik wyniku"""
+        result = self._new_result(item)
+        template_data = build_template_data(item)
+
+        if send_email and item.get('email'):
+            result['email_status'] = self.send_channel(item, 'email', template_data)
+        if send_sms and item.get('telefon'):
+            result['sms_status'] = self.send_channel(item, 'sms', template_data)
+        return result
+
+    def _park(self, channel, item, status, attempts, reason=None):
+        """Odkłada nieudaną wiadomość do dead_letters (jeśli ustawiono)"""
+        if self.dead_letters is None:
+            return
+        if reason is None:
+            reason = 'exhausted' if status.get('retryable') else 'permanent'
+        try:
+            self.dead_letters.add(channel, item, status.get('message', ''), attempts, reason)
+        except Exception as e:
+            self.logger.error(f"❌ Błąd zapisu dead-letter: {e}")
+
+    def _attempt(self, task, partial, queue):
+        """Wysyła kanały zadania (próba task['attempt']).
+
+        Kanały z błędem przejściowym, dla których polityka pozwala na kolejną próbę,
+        wracają do kolejki z opóźnieniem - wtedy zwraca None, a wynik pozycji czeka
+        w partial. Zwraca kompletny wynik pozycji.
+        """
+        index, item, attempt = task['index'], task['item'], task['attempt']
+        result = partial.pop(index, None) or self._new_result(item)
+        template_data = build_template_data(item)
+        retry_channels = []
+        retry_after = None
+        for channel in task['channels']:
+            if not item.get(CHANNEL_FIELDS[channel]):
+                continue
+            status = self.send_channel(item, channel, template_data, record=False)
+            result[f'{channel}_status'] = status
+            if self.retry_policy is not None and self.retry_policy.should_retry(status, attempt):
+                retry_channels.append(channel)
+                if status.get('retry_after') is not None:
+                    retry_after = max(retry_after or 0.0, status['retry_after'])
+                metrics.inc(SEND_RETRIES_TOTAL, provider=CHANNEL_PROVIDERS[channel])
+                continue
+            metrics.inc(MESSAGES_TOTAL, channel=channel, result=result_label(status))
+            if status.get('skipped'):
+                # Dostawca niedostępny - wiadomość czeka w dead_letters na wznowienie
+                self._park(channel, item, status, attempt - 1, reason=SKIPPED_REASON)
+            elif not status['success'] and not status.get('cancelled'):
+                self._park(channel, item, status, attempt)
+
+        if retry_channels:
+            delay = self.retry_policy.delay(attempt, retry_after)
+            self.logger.info(f"🔁 Ponowienie pozycji {index} ({', '.join(retry_channels)}) "
+                             f"za {delay:.1f} s - próba {attempt + 1}")
+            partial[index] = result
+            queue.add_retry({'index': index, 'item': item, 'channels': tuple(retry_channels),
+                             'attempt': attempt + 1}, delay)
+            return None
+        return result
+
+    def _finish_pending_retries(self, queue, partial, results, on_result):
+        """Kończy pozycje czekające na ponowienie (przerwana wysyłka) - ostatni błąd trafia do dead_letters"""
+        for task in queue.drain():
+            result = partial.pop(task['index'], None)
+            if result is None:
+                continue
+            for channel in task['channels']:
+                status = result[f'{channel}_status']
+                metrics.inc(MESSAGES_TOTAL, channel=channel, result=result_label(status))
+                self._park(channel, task['item'], status, task['attempt'] - 1, reason='cancelled')
+            results[task['index']] = result
+            if on_result:
+                on_result(task['index'], result)
+
+    def dispatch(self, items):
+        """Zwraca pary (indeks, pozycja) w kolejności wysyłki"""
+        if self.priority_weights is None:
+            return enumerate(items)
+        queue = DispatchQueue(self.priority_weights)
+        queue.push_many(items)
+        return iter(queue.pop, None)
+
+    def run(self, items, send_email=True, send_sms=True, on_result=None, should_stop=None):
+        """Wysyła przypomnienia dla wszystkich pozycji z przerwą między nimi.
+
+        on_result(indeks, wynik) jest wywoływany po każdej pozycji (indeks w liście
+        items, także przy kolejności według priorytetu), a should_stop() pozwala
+        przerwać wysyłkę przed kolejną pozycją. Zwraca listę wyników wysłanych
+        pozycji w kolejności listy items. Z ustawionym control pozycje są wysyłane
+        równolegle według jego limitów (zob. _run_controlled). Z retry_policy
+        wiadomości z błędem przejściowym są ponawiane (_attempt), a wynik pozycji
+        jest zgłaszany po ostatniej próbie.
+        """
+        total = len(items)
+        self.logger.info(f"📤 Rozpoczynam wysyłkę dla {total} pozycji")
+
+        # Szablony są sprawdzane raz na kampanię (przedziały - przy pierwszym użyciu)
+        self._compiled_templates = {}
+        if send_email:
+            self.get_compiled_template('email')
+        if send_sms:
+            self.get_compiled_template('sms')
+
+        if self.control is not None:
+            return self._run_controlled(items, send_email, send_sms, on_result, should_stop)
+
+        results = [None] * total
+        partial = {}
+        queue = self._retry_queue(items, send_email, send_sms)
+        position = 0
+        previous = False
+        while True:
+            task = queue.next(should_stop)
+            if task is None:
+                break
+            # Przerwa między kolejnymi wysyłkami (nie po ostatniej)
+            if previous and self.delay:
+                time.sleep(self.delay)
+            previous = True
+            if task['attempt'] == 1:
+                metrics.set(QUEUE_DEPTH, total - position)
+                position += 1
+            try:
+                result = self._attempt(task, partial, queue)
+            finally:
+                queue.task_done()
+            if result is not None:
+                results[task['index']] = result
+                if on_result:
+                    on_result(task['index'], result)
+
+        if position < total:
+            self.logger.info(f"⏹️ Wysyłka przerwana po {position} z {total} pozycji")
+        self._finish_pending_retries(queue, partial, results, on_result)
+        metrics.set(QUEUE_DEPTH, 0)
+        results = [result for result in results if result is not None]
+        self.logger.info(f"✅ Wysyłka zakończona dla {len(results)} pozycji")
+        return results
+
+    def _retry_queue(self, items, send_email, send_sms):
+        channels = [channel for channel, enabled in (('email', send_email), ('sms', send_sms)) if enabled]
+        return RetryQueue(self.dispatch(items), channels)
+
+    def _run_controlled(self, items, send_email, send_sms, on_result, should_stop):
+        """Wysyła pozycje w puli wątków według limitów self.control.
+
+        Przed każdą pozycją czeka na wolne miejsce (równoległość, wstrzymanie),
+        a przed każdym wywołaniem dostawcy na kolej w tempie kanału. Po anulowaniu
+        nowe pozycje nie są rozpoczynane, a rozpoczęte kończą się i oddają wynik.
+        Pozycje są rozpoczynane w kolejności dispatch(), ponowienia - gdy minie ich
+        opóźnienie; zwraca wyniki rozpoczętych pozycji w kolejności listy items.
+        """
+        total = len(items)
+        results = [None] * total
+        partial = {}
+        queue = self._retry_queue(items, send_email, send_sms)
+        callback_lock = threading.Lock()
+
+        def stopped():
+            return (should_stop is not None and should_stop()) or self.control.cancelled
+
+        def send(task):
+            try:
+                result = self._attempt(task, partial, queue)
+                if result is not None:
+                    results[task['index']] = result
+                    if on_result:
+                        with callback_lock:
+                            on_result(task['index'], result)
+            except Exception as e:
+                self.logger.error(f"❌ Błąd wysyłki pozycji {task['index']}: {e}")
+            finally:
+                queue.task_done()
+                self.control.release_slot()
+
+        position = 0
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY, thread_name_prefix='sending') as executor:
+            while True:
+                if stopped() or not self.control.acquire_slot():
+                    break
+                task = queue.next(stopped)
+                if task is None:
+                    self.control.release_slot()
+                    break
+                if task['attempt'] == 1:
+                    metrics.set(QUEUE_DEPTH, total - position)
+                    position += 1
+                executor.submit(send, task)
+
+        if position < total:
+            self.logger.info(f"⏹️ Wysyłka przerwana po {position} z {total} pozycji")
+        self._finish_pending_retries(queue, partial, results, on_result)
+        metrics.set(QUEUE_DEPTH, 0)
+        results = [result for result in results if result is not None]
+        self.logger.info(f"✅ Wysyłka zakończona dla {len(results)} pozycji")
+        return results
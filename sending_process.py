@@ -0,0 +1,233 @@
+"""
+Moduł wysyłki w osobnym procesie (aplikacja desktopowa)
+
+SendingProcess uruchamia SendingEngine w procesie potomnym, dzięki czemu
+renderowanie szablonów, zapytania do dostawców i logowanie wysyłki nie
+konkurują z interfejsem Tk o GIL. Proces potomny dostaje opis zadania
+(pozycje, szablony, placeholdery i konfigurację senderów - same dane, bez
+obiektów), tworzy własne sendery i odsyła krótkie komunikaty przez kolejkę:
+
+    ('result', indeks, status_email, status_sms)  - status: None lub (sukces, komunikat)
+    ('state', stan)  - stan sterowania po poleceniu (SendingControl.snapshot)
+    ('done', liczba_pozycji, przerwano)
+    ('error', komunikat)  - błąd kończący wysyłkę
+    ('warning', komunikat)  - odrzucone polecenie (wysyłka trwa dalej)
+
+Polecenia 'pause', 'resume', 'cancel' i ('limits', {limity}) trafiają do procesu
+osobną kolejką i są stosowane od razu przez SendingControl silnika - rozpoczęte
+wysyłki kończą się i oddają wynik.
+"""
+import logging
+import multiprocessing
+import queue
+import threading
+
+from sending_engine import SendingEngine, DEFAULT_SEND_DELAY
+from sending_control import SendingControl
+from placeholders import PlaceholderRegistry
+from send_retry import RetryPolicy, DeadLetterStore
+from circuit_breaker import CircuitBreakers
+
+# Co ile milisekund okno odczytuje komunikaty procesu wysyłki
+POLL_INTERVAL_MS = 100
+
+# Maksymalna liczba komunikatów przetwarzanych w jednym odczycie (okno pozostaje responsywne)
+MAX_MESSAGES_PER_POLL = 500
+
+COMMANDS = ('pause', 'resume', 'cancel')
+
+
+def default_limits(delay=DEFAULT_SEND_DELAY):
+    """Limity początkowe odpowiadające stałej przerwie między pozycjami"""
+    rate = 1.0 / delay if delay else None
+    return {'concurrency': 1, 'email_rate': rate, 'sms_rate': rate}
+
+
+def compact_status(status):
+    """Zamienia status kanału ({'success', 'message'}) na krotkę komunikatu"""
+    if status is None:
+        return None
+    return (bool(status['success']), str(status['message']))
+
+
+def expand_status(status):
+    """Zamienia krotkę komunikatu na status kanału w formacie silnika wysyłki"""
+    if status is None:
+        return None
+    return {'success': status[0], 'message': status[1]}
+
+
+def build_senders(job):
+    """Tworzy sendery z konfiguracji zadania (w procesie potomnym)"""
+    from email_sender import EmailSender
+    from sms_sender import SMSSender
+    from sender_pool import build_email_sender, build_sms_sender
+    from token_store import TOKEN_STORE_FILE
+
+    email_sender = sms_sender = None
+    email_config = job.get('email_config')
+    # accounts - kilka kont kanału (pula senderów, zob. sender_pool)
+    if email_config and email_config.get('accounts'):
+        email_sender = build_email_sender(email_config['accounts'], email_config.get('strategy'),
+                                          email_config.get('token_store'), job.get('circuit_breaker'))
+    elif email_config:
+        email_sender = EmailSender(email_config['client_id'], email_config['client_secret'],
+                                   token_store=email_config.get('token_store') or TOKEN_STORE_FILE)
+    sms_config = job.get('sms_config')
+    if sms_config and sms_config.get('accounts'):
+        sms_sender = build_sms_sender(sms_config['accounts'], sms_config.get('strategy'), job.get('circuit_breaker'))
+    elif sms_config:
+        sms_sender = SMSSender(sms_config['api_token'], sms_config.get('sender_name'),
+                               sms_config.get('api_url') or "https://api.smsapi.pl/sms.do")
+    return email_sender, sms_sender
+
+
+def _listen(commands, events, control):
+    """Stosuje polecenia z kolejki do sterowania kampanią (wątek procesu potomnego)"""
+    while True:
+        command = commands.get()
+        if command is None:
+            control.cancel()
+            return
+        try:
+            if isinstance(command, tuple) and command[0] == 'limits':
+                control.set_limits(**command[1])
+            elif command in COMMANDS:
+                getattr(control, command)()
+        except (TypeError, ValueError) as e:
+            events.put(('warning', f"Nieprawidłowe polecenie: {e}"))
+        events.put(('state', control.snapshot()))
+        if command == 'cancel':
+            return
+
+
+def bucket_template_loader(job):
+    """Zwraca template_loader silnika z szablonów przedziałów zadania (brak szablonu - szablon domyślny)"""
+    templates = job.get('bucket_templates') or {}
+    defaults = {'email': job.get('email_template', ''), 'sms': job.get('sms_template', '')}
+
+    def load_template(template_type, bucket=None):
+        return templates.get((template_type, bucket), defaults[template_type])
+    return load_template
+
+
+def run_child(job, commands, events, sender_factory=None):
+    """Punkt wejścia procesu potomnego - wysyła pozycje zadania i raportuje statusy"""
+    from logging_setup import setup_logging
+    setup_logging()
+    logger = logging.getLogger(__name__)
+
+    try:
+        email_sender, sms_sender = (sender_factory or build_senders)(job)
+        control = SendingControl(**(job.get('limits') or default_limits(job.get('delay', DEFAULT_SEND_DELAY))))
+        engine = SendingEngine(email_sender, sms_sender, job.get('email_template', ''), job.get('sms_template', ''),
+                               template_loader=bucket_template_loader(job),
+                               placeholders=PlaceholderRegistry(job.get('placeholders') or {}), control=control,
+                               priority_weights=job.get('priority_weights'),
+                               retry_policy=RetryPolicy.from_config(job.get('retry')),
+                               dead_letters=DeadLetterStore(job['dead_letters']) if job.get('dead_letters') else None,
+                               breakers=CircuitBreakers.from_config(job.get('circuit_breaker')))
+        threading.Thread(target=_listen, args=(commands, events, control), name='sending-commands', daemon=True).start()
+        events.put(('state', control.snapshot()))
+
+        def on_result(index, result):
+            events.put(('result', index, compact_status(result['email_status']), compact_status(result['sms_status'])))
+
+        results = engine.run(job['items'], job.get('send_email', True), job.get('send_sms', True), on_result=on_result)
+        events.put(('done', len(results), control.snapshot()['cancelled']))
+    except Exception as e:
+        logger.error(f"❌ Błąd procesu wysyłki: {e}")
+        events.put(('error', str(e)))
+
+
+class SendingProcess:
+    """Klasa uruchamiająca silnik wysyłki w procesie potomnym i sterująca nim"""
+
+    def __init__(self, job, sender_factory=None):
+        """Inicjalizuje proces wysyłki.
+
+        job - słownik: items, send_email, send_sms, email_template, sms_template,
+        bucket_templates ({(typ, przedział): szablon} - szablony dedykowane przedziałom zaległości),
+        placeholders (nazwa -> wartość), limits (concurrency, email_rate, sms_rate)
+        lub delay (stała przerwa), priority_weights (kolejność według priorytetu,
+        zob. dispatch_queue), retry (ustawienia RetryPolicy), dead_letters (plik
+        DeadLetterStore), circuit_breaker (ustawienia CircuitBreakers), email_config, sms_config.
+        sender_factory(job) -> (email_sender, sms_sender) musi być funkcją modułu
+        (przekazywaną do procesu potomnego); domyślnie build_senders.
+        """
+        self.job = job
+        self.sender_factory = sender_factory
+        self.logger = logging.getLogger(__name__)
+        self.finished = False
+        self.paused = False
+        self.state = None  # ostatni stan sterowania zgłoszony przez proces
+        context = multiprocessing.get_context('spawn')
+        self._commands = context.Queue()
+        self._events = context.Queue()
+        self.process = context.Process(target=run_child, name='windykator-sending', daemon=True,
+                                       args=(job, self._commands, self._events, sender_factory))
+
+    def start(self):
+        """Uruchamia proces potomny"""
+        self.process.start()
+        self.logger.info(f"🚀 Uruchomiono proces wysyłki (pid {self.process.pid}) dla {len(self.job['items'])} pozycji")
+        return self
+
+    def _command(self, command):
+        if not self.finished:
+            self._commands.put(command)
+
+    def pause(self):
+        """Wstrzymuje wysyłkę przed kolejną pozycją"""
+        self.paused = True
+        self._command('pause')
+
+    def resume(self):
+        """Wznawia wstrzymaną wysyłkę"""
+        self.paused = False
+        self._command('resume')
+
+    def cancel(self):
+        """Anuluje wysyłkę - rozpoczęte pozycje zostaną dokończone"""
+        self._command('cancel')
+
+    def set_limits(self, **limits):
+        """Zmienia limity kampanii (concurrency, email_rate, sms_rate - wiadomości na sekundę)"""
+        self._command(('limits', limits))
+
+    def poll(self, max_messages=MAX_MESSAGES_PER_POLL):
+        """Zwraca komunikaty procesu bez czekania (z wątku Tk, np. przez root.after).
+
+        Gdy proces zakończy się bez komunikatu 'done' lub 'error', zwracany jest
+        komunikat 'error' z kodem wyjścia.
+        """
+        alive = self.process.is_alive()
+        messages = []
+        while len(messages) < max_messages:
+            try:
+                message = self._events.get_nowait()
+            except queue.Empty:
+                break
+            messages.append(message)
+            if message[0] == 'state':
+                self.state = message[1]
+                self.paused = self.state['paused']
+            elif message[0] in ('done', 'error'):
+                self.finished = True
+
+        if not alive and not self.finished and len(messages) < max_messages:
+            self.finished = True
+            messages.append(('error', f"Proces wysyłki zakończył się nieoczekiwanie (kod {self.process.exitcode})"))
+        return messages
+
+    def join(self, timeout=None):
+        """Czeka na zakończenie procesu potomnego"""
+        self.process.join(timeout)
+        return not self.process.is_alive()
+
+    def terminate(self):
+        """Kończy proces potomny (np. przy zamykaniu aplikacji)"""
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(1)
+        self.finished = True
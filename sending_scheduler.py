@@ -0,0 +1,582 @@
+"""
+Moduł planowania wysyłki w oknach doręczeń z równomiernym rozłożeniem domen
+
+Zamiast wysyłać od razu, kampania jest układana w harmonogram: każda wiadomość
+dostaje termin wysyłki, tak aby
+- mieścił się w oknie doręczeń kanału (np. SMS tylko w dni robocze 8:00-20:00),
+- kanał nie przekraczał tempa (wiadomości na sekundę),
+- do jednej domeny email nie trafiało więcej wiadomości, niż pozwala jej kubełek
+  tokenów (tempo i seria) - pozostałe domeny wypełniają w tym czasie wolne miejsca,
+- pozycje o wyższym priorytecie (dispatch_queue) wychodziły wcześniej.
+
+Harmonogram jest zapisywany w pliku JSON (ScheduleStore), więc kampania może
+trwać kilka dni i przetrwać ponowne uruchomienie aplikacji. Wysyła go jeden
+proces naraz - ten, który trzyma blokadę harmonogramu (ScheduleStore.lock);
+inne procesy anulują go przez plik znacznika (ScheduleStore.request_cancel). Gdy wysyłka kanału
+nie nadąża za planem (wolny dostawca, przestój, aplikacja była wyłączona),
+zaległe terminy kanału są przesuwane o opóźnienie z zachowaniem odstępów planu -
+zaległość wychodzi w tempie kanału i kubełków domen, a nie naraz. Terminy, które
+po przesunięciu wypadają poza okno doręczeń, są układane od nowa od otwarcia okna.
+"""
+import heapq
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+
+from dispatch_queue import dispatch_order
+from file_lock import FileLock
+from metrics import metrics, MESSAGES_TOTAL, SEND_RETRIES_TOTAL
+from send_retry import CHANNEL_PROVIDERS
+from sending_engine import DEFAULT_SEND_DELAY, result_label
+
+# Domyślne okna doręczeń kanałów (None - bez ograniczeń; dni: 0 = poniedziałek)
+DEFAULT_WINDOWS = {
+    'email': None,
+    'sms': {'days': [0, 1, 2, 3, 4], 'start': '08:00', 'end': '20:00'}
+}
+
+# Domyślne tempo kanału (wiadomości na sekundę) - jak przerwa w wysyłce natychmiastowej
+DEFAULT_CHANNEL_RATE = 1.0 / DEFAULT_SEND_DELAY
+
+# Domyślny kubełek tokenów domeny email: tempo (wiadomości na sekundę) i seria
+DEFAULT_DOMAIN_RATE = 0.2
+DEFAULT_DOMAIN_BURST = 10
+
+# Opóźnienie kanału względem planu, po którym zaległe terminy są przesuwane (sekundy)
+LATE_TOLERANCE_SECONDS = 1.0
+
+# Opóźnienie zgłaszane w logu na poziomie info (mniejsze - debug)
+LATE_NOTICE_SECONDS = 300
+
+# Najdłuższe oczekiwanie wątku wysyłki na kolejny termin (sekundy) - anulowanie w tym procesie
+# działa od razu, a zgłoszone przez inny proces jest widoczne najpóźniej po tym czasie
+MAX_IDLE_SECONDS = 5
+
+# Najczęstszy zapis harmonogramu w trakcie wysyłki (sekundy)
+SAVE_INTERVAL_SECONDS = 2
+
+# Katalog zapisanych harmonogramów
+SCHEDULES_DIR = 'schedules'
+
+# Statusy wiadomości w harmonogramie
+STATUS_PENDING = 'pending'
+STATUS_SENT = 'sent'
+STATUS_FAILED = 'failed'
+STATUS_CANCELLED = 'cancelled'
+
+ALL_DAYS = (0, 1, 2, 3, 4, 5, 6)
+CHANNEL_FIELDS = {'email': 'email', 'sms': 'telefon'}
+_CAMPAIGN_ID = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+def _minutes(value):
+    """Zamienia 'HH:MM' na minuty od północy (dopuszczalne '24:00')"""
+    hours, minutes = str(value).split(':')
+    total = int(hours) * 60 + int(minutes)
+    if not 0 <= int(minutes) < 60 or not 0 <= total <= 24 * 60:
+        raise ValueError(f"Nieprawidłowa godzina: {value}")
+    return total
+
+
+class DeliveryWindow:
+    """Okno doręczeń - dni tygodnia i godziny, w których kanał może wysyłać"""
+
+    def __init__(self, days=ALL_DAYS, start='00:00', end='24:00'):
+        """Inicjalizuje okno (dni 0-6 od poniedziałku, godziny 'HH:MM', koniec bez tej minuty)"""
+        self.days = sorted({int(day) for day in days})
+        if not self.days or any(not 0 <= day <= 6 for day in self.days):
+            raise ValueError("Okno doręczeń wymaga dni tygodnia z zakresu 0-6")
+        self.start = _minutes(start)
+        self.end = _minutes(end)
+        if self.start >= self.end:
+            raise ValueError("Początek okna doręczeń musi być przed jego końcem")
+
+    @classmethod
+    def from_config(cls, config):
+        """Tworzy okno ze słownika konfiguracji (None - bez ograniczeń)"""
+        if not config:
+            return None
+        return cls(config.get('days', ALL_DAYS), config.get('start', '00:00'), config.get('end', '24:00'))
+
+    def _bounds(self, day):
+        midnight = datetime(day.year, day.month, day.day)
+        return midnight + timedelta(minutes=self.start), midnight + timedelta(minutes=self.end)
+
+    def contains(self, moment):
+        """Czy chwila mieści się w oknie"""
+        opens, closes = self._bounds(moment.date())
+        return moment.weekday() in self.days and opens <= moment < closes
+
+    def next_open(self, moment):
+        """Zwraca najbliższą chwilę w oknie (moment, jeśli okno jest otwarte)"""
+        for offset in range(8):
+            day = moment.date() + timedelta(days=offset)
+            if day.weekday() not in self.days:
+                continue
+            opens, closes = self._bounds(day)
+            if moment < closes:
+                return max(moment, opens)
+        raise ValueError("Okno doręczeń nie ma otwartych dni")
+
+
+class DomainBucket:
+    """Kubełek tokenów domeny w czasie wirtualnym (GCRA): tempo i dopuszczalna seria"""
+
+    def __init__(self, rate=None, burst=1):
+        """Inicjalizuje kubełek (rate - wiadomości na sekundę, None - bez limitu)"""
+        self.interval = 1.0 / rate if rate else 0.0
+        self.tolerance = (max(int(burst), 1) - 1) * self.interval
+        self.tat = None  # teoretyczny czas kolejnego tokenu
+
+    def ready_at(self, moment):
+        """Najwcześniejsza chwila (znacznik czasu) wysłania kolejnej wiadomości od moment"""
+        if self.tat is None:
+            return moment
+        return max(moment, self.tat - self.tolerance)
+
+    def take(self, moment):
+        """Zużywa token w chwili moment"""
+        self.tat = max(self.tat if self.tat is not None else moment, moment) + self.interval
+
+
+def email_domain(address):
+    """Zwraca domenę adresu email małymi literami ('' dla pustego adresu)"""
+    address = str(address or '').strip().lower()
+    return address.rpartition('@')[2] if '@' in address else ''
+
+
+def normalize_settings(settings=None):
+    """Zwraca ustawienia harmonogramu uzupełnione o domyślne i sprawdzone.
+
+    Klucze: windows (kanał -> okno lub None), email_rate, sms_rate, domain_rate,
+    domain_burst oraz domain_limits (domena -> {'rate', 'burst'}).
+    """
+    settings = dict(settings or {})
+    windows = dict(DEFAULT_WINDOWS)
+    windows.update(settings.get('windows') or {})
+    for window in windows.values():
+        DeliveryWindow.from_config(window)  # walidacja
+    result = {
+        'windows': windows,
+        'email_rate': settings.get('email_rate', DEFAULT_CHANNEL_RATE),
+        'sms_rate': settings.get('sms_rate', DEFAULT_CHANNEL_RATE),
+        'domain_rate': settings.get('domain_rate', DEFAULT_DOMAIN_RATE),
+        'domain_burst': int(settings.get('domain_burst', DEFAULT_DOMAIN_BURST)),
+        'domain_limits': {str(domain).lower(): dict(limit)
+                          for domain, limit in (settings.get('domain_limits') or {}).items()}
+    }
+    for name in ('email_rate', 'sms_rate', 'domain_rate'):
+        if result[name] is not None:
+            result[name] = float(result[name])
+            if result[name] < 0:
+                raise ValueError(f"Tempo {name} nie może być ujemne")
+            result[name] = result[name] or None
+    if result['domain_burst'] < 1:
+        raise ValueError("Seria domeny musi wynosić co najmniej 1")
+    return result
+
+
+def plan_channel(messages, start, rate=None, window=None, bucket_factory=None):
+    """Układa wiadomości kanału w czasie - zwraca listę (indeks, znacznik czasu).
+
+    messages - krotki (ranga, indeks, domena) w dowolnej kolejności (niższa ranga
+    wychodzi wcześniej). W każdej chwili wysyłana jest wiadomość o najniższej
+    randze spośród domen, które mają token; gdy żadna go nie ma, zegar przeskakuje
+    do najbliższego tokenu, a poza oknem doręczeń - do jego otwarcia.
+    """
+    interval = 1.0 / rate if rate else 0.0
+    queues = {}
+    for rank, index, domain in sorted(messages):
+        queues.setdefault(domain, deque()).append((rank, index))
+    buckets = {domain: (bucket_factory(domain) if bucket_factory else DomainBucket()) for domain in queues}
+
+    moment = start.timestamp()
+    ready = [(queue[0][0], domain) for domain, queue in queues.items()]
+    heapq.heapify(ready)
+    waiting = []
+    plan = []
+    while ready or waiting:
+        if window is not None:
+            moment = window.next_open(datetime.fromtimestamp(moment)).timestamp()
+        while waiting and waiting[0][0] <= moment:
+            _, domain = heapq.heappop(waiting)
+            heapq.heappush(ready, (queues[domain][0][0], domain))
+        if not ready:
+            moment = waiting[0][0]
+            continue
+
+        _, domain = heapq.heappop(ready)
+        _, index = queues[domain].popleft()
+        bucket = buckets[domain]
+        bucket.take(moment)
+        plan.append((index, moment))
+        if queues[domain]:
+            heapq.heappush(waiting, (bucket.ready_at(moment), domain))
+        moment += interval
+    return plan
+
+
+def _format_due(timestamp):
+    return datetime.fromtimestamp(timestamp).isoformat(timespec='milliseconds')
+
+
+class CampaignSchedule:
+    """Harmonogram kampanii - pozycje, terminy wiadomości i ich statusy (bezpieczny dla wątków)"""
+
+    def __init__(self, items, entries=None, send_email=True, send_sms=True, settings=None,
+                 campaign_id=None, created=None, cancelled=False):
+        """Inicjalizuje harmonogram (zwykle przez build lub from_dict)"""
+        self.items = list(items)
+        self.entries = list(entries or [])
+        self.send_email = send_email
+        self.send_sms = send_sms
+        self.settings = normalize_settings(settings)
+        self.campaign_id = campaign_id or uuid.uuid4().hex
+        self.created = created or datetime.now().isoformat(timespec='seconds')
+        self.cancelled = cancelled
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.RLock()
+        self._lag = {}  # kanał -> opóźnienie wysyłki względem zapisanych terminów (sekundy)
+
+    @classmethod
+    def build(cls, items, send_email=True, send_sms=True, settings=None, start=None,
+              priority_weights=None, campaign_id=None):
+        """Tworzy harmonogram dla pozycji - kolejność według priorytetu (priority_weights) lub listy"""
+        schedule = cls(items, send_email=send_email, send_sms=send_sms, settings=settings, campaign_id=campaign_id)
+        order = dispatch_order(schedule.items, priority_weights) if priority_weights is not None \
+            else range(len(schedule.items))
+        channels = [channel for channel, enabled in (('email', send_email), ('sms', send_sms)) if enabled]
+        for rank, index in enumerate(order):
+            item = schedule.items[index]
+            for channel in channels:
+                if item.get(CHANNEL_FIELDS[channel]):
+                    schedule.entries.append({'index': index, 'channel': channel, 'rank': rank,
+                                             'due': None, 'status': STATUS_PENDING, 'message': ''})
+        schedule.plan(start or datetime.now())
+        return schedule
+
+    def _bucket_factory(self, channel):
+        if channel != 'email':
+            return None
+        settings = self.settings
+
+        def factory(domain):
+            limit = settings['domain_limits'].get(domain, {})
+            return DomainBucket(limit.get('rate', settings['domain_rate']), limit.get('burst', settings['domain_burst']))
+        return factory
+
+    def plan(self, start, channels=CHANNEL_FIELDS):
+        """Układa terminy oczekujących wiadomości kanałów od chwili start"""
+        with self._lock:
+            for channel in channels:
+                self._lag.pop(channel, None)
+                pending = [entry for entry in self.entries
+                           if entry['channel'] == channel and entry['status'] == STATUS_PENDING]
+                if not pending:
+                    continue
+                messages = [(entry['rank'], position,
+                             email_domain(self.items[entry['index']].get('email')) if channel == 'email' else '')
+                            for position, entry in enumerate(pending)]
+                plan = plan_channel(messages, start, self.settings[f'{channel}_rate'],
+                                    DeliveryWindow.from_config(self.settings['windows'].get(channel)),
+                                    self._bucket_factory(channel))
+                for position, timestamp in plan:
+                    pending[position]['due'] = _format_due(timestamp)
+            self.entries.sort(key=lambda entry: (entry['due'] or '', entry['rank']))
+
+    def pending(self):
+        """Zwraca oczekujące wiadomości w kolejności terminów"""
+        with self._lock:
+            return [entry for entry in self.entries if entry['status'] == STATUS_PENDING]
+
+    def _effective_due(self, entry):
+        """Termin wiadomości przesunięty o opóźnienie jej kanału"""
+        return datetime.fromisoformat(entry['due']) + timedelta(seconds=self._lag.get(entry['channel'], 0.0))
+
+    @staticmethod
+    def _heads(pending):
+        """Pierwsza oczekująca wiadomość każdego kanału"""
+        heads = {}
+        for entry in pending:
+            heads.setdefault(entry['channel'], entry)
+            if len(heads) == len(CHANNEL_FIELDS):
+                break
+        return heads
+
+    def next_due(self):
+        """Zwraca termin najbliższej oczekującej wiadomości (None - brak)"""
+        if self.cancelled:
+            return None
+        with self._lock:
+            heads = self._heads(self.pending())
+            return min((self._effective_due(entry) for entry in heads.values()), default=None)
+
+    def _catch_up(self, pending, now):
+        """Przesuwa terminy kanałów, które nie nadążają za planem - zwraca pierwsze wiadomości kanałów.
+
+        Wszystkie oczekujące wiadomości kanału przesuwają się o to samo opóźnienie,
+        więc zaległość wychodzi z odstępami planu (tempo kanału, kubełki domen).
+        """
+        heads = self._heads(pending)
+        for channel, entry in heads.items():
+            late = (now - self._effective_due(entry)).total_seconds()
+            if late <= LATE_TOLERANCE_SECONDS:
+                continue
+            with self._lock:
+                self._lag[channel] = self._lag.get(channel, 0.0) + late
+            log = self.logger.info if late > LATE_NOTICE_SECONDS else self.logger.debug
+            log(f"🕒 Harmonogram {self.campaign_id}: kanał {channel} opóźniony o {late:.0f} s - przesuwam zaległe terminy")
+        return heads
+
+    @property
+    def finished(self):
+        """Czy harmonogram jest zakończony (wszystko wysłane lub anulowano)"""
+        return self.cancelled or not self.pending()
+
+    def cancel(self):
+        """Anuluje harmonogram - oczekujące wiadomości nie zostaną wysłane"""
+        with self._lock:
+            self.cancelled = True
+            for entry in self.entries:
+                if entry['status'] == STATUS_PENDING:
+                    entry['status'] = STATUS_CANCELLED
+                    entry['message'] = 'Anulowano harmonogram'
+
+    def run_due(self, send_entry, now=None, should_stop=None, on_entry=None, retry_policy=None, dead_letters=None):
+        """Wysyła wiadomości z terminem do now - zwraca liczbę wysłanych prób.
+
+        send_entry(kanał, pozycja) zwraca status kanału ({'success', 'message'}),
+        on_entry(wpis) jest wywoływany po każdej wiadomości (np. zapis harmonogramu).
+        Z retry_policy wiadomość z błędem przejściowym dostaje nowy termin (w oknie
+        doręczeń), a nieudane ostatecznie trafiają do dead_letters. Wiadomość pominięta
+        przy otwartym obwodzie dostawcy (status 'skipped') dostaje nowy termin po
+        czasie do próby półotwartej - bez zużycia próby.
+        """
+        now = now or datetime.now()
+        pending = self.pending()
+        heads = self._catch_up(pending, now)
+        windows = {channel: DeliveryWindow.from_config(self.settings['windows'].get(channel))
+                   for channel in CHANNEL_FIELDS}
+
+        count = 0
+        retried = False
+        blocked = set()  # kanały, których kolejny termin jeszcze nie nadszedł
+        for entry in pending:
+            if self.cancelled or (should_stop and should_stop()) or len(blocked) == len(heads):
+                break
+            channel = entry['channel']
+            if channel in blocked or entry['status'] != STATUS_PENDING:
+                continue
+            due = self._effective_due(entry)
+            if due > now:
+                blocked.add(channel)
+                continue
+            window = windows[channel]
+            if window is not None and not window.contains(due):
+                # Przesunięty termin wypadł poza okno doręczeń - kanał układany od nowa od otwarcia okna
+                self.logger.info(f"🕒 Harmonogram {self.campaign_id}: kanał {channel} układany od nowa od otwarcia okna")
+                self.plan(window.next_open(now), [channel])
+                blocked.add(channel)
+                continue
+            attempt = entry.get('attempts', 0) + 1
+            try:
+                status = send_entry(channel, self.items[entry['index']])
+            except Exception as e:
+                self.logger.error(f"❌ Błąd wysyłki z harmonogramu: {e}")
+                status = {'success': False, 'message': f'Błąd wysyłki: {str(e)}'}
+            retry_at = None
+            with self._lock:
+                entry['message'] = str(status.get('message', ''))
+                if status.get('skipped'):
+                    retry_at = now + timedelta(seconds=status.get('retry_after') or 0)
+                else:
+                    entry['attempts'] = attempt
+                    entry['sent_at'] = datetime.now().isoformat(timespec='seconds')
+                    if retry_policy is not None and retry_policy.should_retry(status, attempt):
+                        retry_at = now + timedelta(seconds=retry_policy.delay(attempt, status.get('retry_after')))
+                if retry_at is not None:
+                    # Zapisany termin bez opóźnienia kanału - wiadomość wyjdzie o retry_at
+                    retry_at = window.next_open(retry_at) if window else retry_at
+                    retry_at -= timedelta(seconds=self._lag.get(channel, 0.0))
+                    entry['due'] = retry_at.isoformat(timespec='milliseconds')
+                    retried = True
+                elif status.get('cancelled'):
+                    entry['status'] = STATUS_CANCELLED
+                else:
+                    entry['status'] = STATUS_SENT if status.get('success') else STATUS_FAILED
+            if status.get('skipped'):
+                metrics.inc(MESSAGES_TOTAL, channel=channel, result=result_label(status))
+            elif entry['status'] == STATUS_PENDING:
+                metrics.inc(SEND_RETRIES_TOTAL, provider=CHANNEL_PROVIDERS[channel])
+            else:
+                metrics.inc(MESSAGES_TOTAL, channel=channel, result=result_label(status))
+            if entry['status'] == STATUS_FAILED and dead_letters is not None:
+                dead_letters.add(channel, self.items[entry['index']], entry['message'], attempt,
+                                 'exhausted' if status.get('retryable') else 'permanent')
+            count += 1
+            if on_entry:
+                on_entry(entry)
+        if retried:
+            with self._lock:
+                self.entries.sort(key=lambda entry: (entry['due'] or '', entry['rank']))
+        return count
+
+    def summary(self):
+        """Zwraca podsumowanie harmonogramu (liczby statusów, najbliższy i ostatni termin)"""
+        with self._lock:
+            counts = {status: 0 for status in (STATUS_PENDING, STATUS_SENT, STATUS_FAILED, STATUS_CANCELLED)}
+            for entry in self.entries:
+                counts[entry['status']] += 1
+            pending = [entry for entry in self.entries if entry['status'] == STATUS_PENDING]
+            next_due = self.next_due()
+            last_due = max((self._effective_due(entry) for entry in self._heads(reversed(pending)).values()),
+                           default=None)
+            return {
+                'campaign_id': self.campaign_id,
+                'created': self.created,
+                'cancelled': self.cancelled,
+                'finished': self.finished,
+                'total': len(self.entries),
+                'counts': counts,
+                'next_due': next_due.isoformat(timespec='milliseconds') if next_due else None,
+                'last_due': last_due.isoformat(timespec='milliseconds') if last_due else None
+            }
+
+    def to_dict(self):
+        """Zwraca harmonogram jako słownik do zapisu"""
+        with self._lock:
+            return {
+                'campaign_id': self.campaign_id,
+                'created': self.created,
+                'cancelled': self.cancelled,
+                'send_email': self.send_email,
+                'send_sms': self.send_sms,
+                'settings': self.settings,
+                'items': self.items,
+                'entries': [dict(entry) for entry in self.entries]
+            }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Odtwarza harmonogram ze słownika"""
+        return cls(data['items'], data.get('entries'), data.get('send_email', True), data.get('send_sms', True),
+                   data.get('settings'), data.get('campaign_id'), data.get('created'), data.get('cancelled', False))
+
+
+class ScheduleStore:
+    """Klasa zapisująca harmonogramy kampanii w plikach JSON (zapis atomowy)"""
+
+    def __init__(self, directory=SCHEDULES_DIR):
+        """Inicjalizuje magazyn w katalogu directory"""
+        self.directory = directory
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+
+    def _path(self, campaign_id, extension='.json'):
+        if not _CAMPAIGN_ID.match(str(campaign_id)):
+            raise ValueError(f"Nieprawidłowe id kampanii: {campaign_id}")
+        return os.path.join(self.directory, f'{campaign_id}{extension}')
+
+    def lock(self, campaign_id):
+        """Zwraca blokadę wysyłki harmonogramu - trzyma ją proces, który go wysyła"""
+        return FileLock(self._path(campaign_id, '.lock'))
+
+    def is_running(self, campaign_id):
+        """Czy harmonogram wysyła jakiś proces (blokada jest założona)"""
+        lock = self.lock(campaign_id)
+        if not lock.acquire(blocking=False):
+            return True
+        lock.release()
+        return False
+
+    def request_cancel(self, campaign_id):
+        """Zgłasza anulowanie harmonogramu procesowi, który go wysyła"""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(campaign_id, '.cancel'), 'w', encoding='utf-8'):
+            pass
+
+    def cancel_requested(self, campaign_id):
+        """Czy zgłoszono anulowanie harmonogramu"""
+        return os.path.exists(self._path(campaign_id, '.cancel'))
+
+    def clear_cancel(self, campaign_id):
+        """Usuwa zgłoszenie anulowania (po anulowaniu harmonogramu)"""
+        try:
+            os.remove(self._path(campaign_id, '.cancel'))
+        except FileNotFoundError:
+            pass
+
+    def save(self, schedule):
+        """Zapisuje harmonogram (plik tymczasowy i podmiana - bez uszkodzenia przy awarii)"""
+        path = self._path(schedule.campaign_id)
+        data = schedule.to_dict()
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            temp_path = f'{path}.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, path)
+
+    def load(self, campaign_id):
+        """Wczytuje harmonogram lub zwraca None, gdy go nie ma"""
+        try:
+            with open(self._path(campaign_id), 'r', encoding='utf-8') as f:
+                return CampaignSchedule.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+
+    def list(self):
+        """Zwraca wszystkie zapisane harmonogramy (pomija uszkodzone pliki)"""
+        if not os.path.isdir(self.directory):
+            return []
+        schedules = []
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith('.json'):
+                continue
+            try:
+                schedule = self.load(name[:-len('.json')])
+            except Exception as e:
+                self.logger.warning(f"⚠️ Pominięto harmonogram {name}: {e}")
+                continue
+            if schedule is not None:
+                schedules.append(schedule)
+        return schedules
+
+
+def run_schedule(schedule, store, send_entry, stop_event, clock=datetime.now, retry_policy=None, dead_letters=None):
+    """Wysyła harmonogram do końca (lub do stop_event) - czeka na kolejne terminy.
+
+    Harmonogram jest zapisywany po każdej porcji wysyłki i nie częściej niż co
+    SAVE_INTERVAL_SECONDS w jej trakcie. Anulowanie zgłoszone przez inny proces
+    (store.request_cancel) zatrzymuje wysyłkę i anuluje harmonogram.
+    """
+    last_save = [time.monotonic()]
+
+    def stopped():
+        return stop_event.is_set() or store.cancel_requested(schedule.campaign_id)
+
+    def on_entry(entry):
+        if time.monotonic() - last_save[0] >= SAVE_INTERVAL_SECONDS:
+            store.save(schedule)
+            last_save[0] = time.monotonic()
+
+    while not schedule.finished and not stopped():
+        if schedule.run_due(send_entry, clock(), should_stop=stopped, on_entry=on_entry,
+                            retry_policy=retry_policy, dead_letters=dead_letters):
+            store.save(schedule)
+            last_save[0] = time.monotonic()
+        next_due = schedule.next_due()
+        if next_due is None:
+            break
+        stop_event.wait(min(max((next_due - clock()).total_seconds(), 0), MAX_IDLE_SECONDS))
+    if store.cancel_requested(schedule.campaign_id):
+        schedule.cancel()
+        store.clear_cancel(schedule.campaign_id)
+    store.save(schedule)
+    return schedule.summary()
@@ -6,6 +6,11 @@ import logging
 import re
 from datetime import datetime
 
+from metrics import metrics, TEMPLATE_RENDER_SECONDS, PROVIDER_REQUEST_SECONDS
+from logging_setup import mask_recipient
+from placeholders import render_message
+from send_retry import SendFailure, http_failure, exception_failure, SMSAPI_RETRYABLE_ERRORS
+
 class SMSSender:
     """Klasa do wysyłania SMS przez SMS API"""
     
@@ -39,26 +44,28 @@ class SMSSender:
                 payload['from'] = self.sender_name
             
             # Wyślij żądanie
-            response = requests.post(self.api_url, data=payload, headers=headers, timeout=30)
+            with metrics.timer(PROVIDER_REQUEST_SECONDS, provider='smsapi'):
+                response = requests.post(self.api_url, data=payload, headers=headers, timeout=30)
             
             if response.status_code == 200:
                 try:
                     result = response.json()
-                    self.logger.info(f"📄 Odpowiedź SMSAPI: {result}")
+                    self.logger.debug("📄 Odpowiedź SMSAPI: %s", result)
                     
                     # Sprawdź różne możliwe formaty odpowiedzi SMSAPI
                     if result.get('error') == 0:
-                        self.logger.info(f"SMS wysłany do: {phone_number}")
+                        self.logger.info("📱 SMS wysłany do: %s", mask_recipient(phone_number), extra={'event': 'sms.sent'})
                         return True, "SMS wysłany pomyślnie"
                     elif 'list' in result and len(result['list']) > 0:
                         # SMSAPI zwraca sukces w formacie {"count":1,"list":[...]}
-                        self.logger.info(f"SMS wysłany do: {phone_number}")
+                        self.logger.info("📱 SMS wysłany do: %s", mask_recipient(phone_number), extra={'event': 'sms.sent'})
                         return True, "SMS wysłany pomyślnie"
                     elif result.get('error') and result.get('error') != 0:
                         # SMSAPI zwrócił błąd
                         error_msg = result.get('message', 'Nieznany błąd SMS API')
                         self.logger.error(f"Błąd SMS API: {error_msg}")
-                        return False, f"Błąd SMS API: {error_msg}"
+                        return False, SendFailure(f"Błąd SMS API: {error_msg}",
+                                                  retryable=result.get('error') in SMSAPI_RETRYABLE_ERRORS)
                     else:
                         # Nieznany format odpowiedzi
                         self.logger.warning(f"Nieznany format odpowiedzi SMSAPI: {result}")
@@ -70,11 +77,11 @@ class SMSSender:
             else:
                 self.logger.error(f"Błąd HTTP: {response.status_code}")
                 self.logger.error(f"Odpowiedź: {response.text}")
-                return False, f"Błąd HTTP: {response.status_code}"
+                return False, http_failure(f"Błąd HTTP: {response.status_code}", response.status_code, response.headers)
                 
         except requests.exceptions.RequestException as e:
             self.logger.error(f"Błąd połączenia SMS API: {e}")
-            return False, f"Błąd połączenia: {str(e)}"
+            return False, exception_failure(f"Błąd połączenia: {str(e)}", e)
         except Exception as e:
             self.logger.error(f"Błąd wysyłania SMS do {phone_number}: {e}")
             return False, f"Błąd wysyłania SMS: {str(e)}"
@@ -82,14 +89,13 @@ class SMSSender:
     def send_reminder_sms(self, phone_number, template_data, sms_template):
         """Wysyła SMS przypomnienia"""
         try:
-            # Debug: wyświetl dane szablonu
-            self.logger.info(f"📱 Przygotowywanie SMS dla {phone_number}")
-            self.logger.info(f"📱 Template data: {template_data}")
-            self.logger.info(f"📱 SMS template: {sms_template}")
+            # Dane szablonu tylko w trybie debug (formatowane leniwie - zawierają dane osobowe)
+            self.logger.debug("📱 Przygotowywanie SMS dla %s, dane szablonu: %s", phone_number, template_data)
             
             # Przygotuj treść SMS
-            message = sms_template.format(**template_data)
-            self.logger.info(f"📱 Przygotowana wiadomość: {message}")
+            with metrics.timer(TEMPLATE_RENDER_SECONDS, channel='sms'):
+                message = render_message(sms_template, template_data)
+            self.logger.debug("📱 Przygotowana wiadomość: %s", message)
             
             # Wyślij SMS
             success, message_result = self.send_sms(phone_number, message)
@@ -124,7 +130,7 @@ class SMSSender:
             if response.status_code == 200:
                 try:
                     result = response.json()
-                    self.logger.info(f"📄 Odpowiedź test_connection: {result}")
+                    self.logger.debug("📄 Odpowiedź test_connection: %s", result)
                     
                     # Sprawdź czy SMS został wysłany pomyślnie
                     if result.get('error') == 0 or ('list' in result and len(result['list']) > 0):
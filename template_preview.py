@@ -0,0 +1,144 @@
+"""
+Moduł podglądu szablonów na żywo (renderowanie w tle z opóźnieniem)
+
+Edycja szablonu zgłasza żądanie podglądu do PreviewRenderer; wątek roboczy
+czeka, aż użytkownik przestanie pisać przez DEBOUNCE_SECONDS, i renderuje tylko
+najnowszą wersję szablonu na przykładowym wierszu danych. Szablon jest
+kompilowany przez rejestr placeholderów (placeholders.PlaceholderRegistry)
+i trzymany w jego pamięci podręcznej, więc kolejne podglądy tego samego
+szablonu tylko podstawiają wartości. Wynik trafia do callbacku - w aplikacji desktopowej przez root.after,
+dzięki czemu wątek Tk nigdy nie czeka na renderowanie.
+"""
+import html
+import logging
+import re
+import threading
+import time
+
+from placeholders import PlaceholderRegistry
+from sending_engine import build_template_data
+
+# Czas bez zmian w edytorze, po którym renderowany jest podgląd (sekundy)
+DEBOUNCE_SECONDS = 0.15
+
+# Przykładowe dane, gdy nie wczytano jeszcze pliku
+SAMPLE_DATA = {
+    'kontrahent': 'Przykładowa Firma Sp. z o.o.',
+    'nip': '1234567890',
+    'nr_faktury': 'FV/2025/001',
+    'email': 'kontakt@przyklad.pl',
+    'telefon': '48500100200',
+    'kwota': '1,250.00 PLN',
+    'dni_po_terminie': '15',
+    'data_faktury': '15.07.2025'
+}
+
+_HIDDEN_BLOCKS = re.compile(r'<(head|style|script)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+_LINE_BREAKS = re.compile(r'<br\s*/?>|</(p|div|h[1-6]|li|tr)\s*>', re.IGNORECASE)
+_TAGS = re.compile(r'<[^>]+>')
+_BLANK_LINES = re.compile(r'\n\s*\n\s*(\n\s*)+')
+
+# Rejestr bez placeholderów stałych - gdy renderer nie dostał własnego
+_preview_registry = PlaceholderRegistry()
+
+
+def render_template(template, data, registry=None):
+    """Wypełnia szablon danymi; nieznane placeholdery zostają w tekście bez zmian"""
+    return (registry or _preview_registry).render(template, data, strict=False)
+
+
+def html_to_text(content):
+    """Zamienia HTML na czytelny tekst do podglądu w widżecie tk.Text"""
+    content = _HIDDEN_BLOCKS.sub('', content)
+    content = _LINE_BREAKS.sub('\n', content)
+    content = html.unescape(_TAGS.sub('', content))
+    lines = [line.strip() for line in content.splitlines()]
+    return _BLANK_LINES.sub('\n\n', '\n'.join(lines)).strip()
+
+
+def sample_row(data_processor=None):
+    """Zwraca dane przykładowego wiersza: pierwszy wiersz danych lub SAMPLE_DATA"""
+    data = dict(SAMPLE_DATA)
+    if data_processor is not None and data_processor.excel_data is not None:
+        rows = data_processor.get_preview_data_mapped(max_rows=1)
+        if rows:
+            data.update({field: value for field, value in build_template_data(rows[0]).items() if value != ''})
+    return data
+
+
+class PreviewRenderer:
+    """Klasa renderująca podgląd szablonu w wątku w tle z opóźnieniem (debounce)"""
+
+    def __init__(self, on_result, debounce=DEBOUNCE_SECONDS, transform=None, registry=None):
+        """Inicjalizuje renderer.
+
+        on_result(numer_żądania, wynik) jest wywoływany z wątku roboczego tylko dla
+        najnowszego żądania - w Tk należy przekazać wynik dalej przez root.after.
+        transform (np. html_to_text) jest stosowany do wypełnionego szablonu,
+        a registry (PlaceholderRegistry) dostarcza placeholdery stałe.
+        """
+        self.on_result = on_result
+        self.debounce = debounce
+        self.transform = transform
+        self.registry = registry
+        self.logger = logging.getLogger(__name__)
+        self._condition = threading.Condition()
+        self._pending = None
+        self._generation = 0
+        self._requested_at = 0.0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='template-preview', daemon=True)
+        self._thread.start()
+
+    def request(self, template, data):
+        """Zgłasza nową wersję szablonu do podglądu - zwraca numer żądania"""
+        with self._condition:
+            self._generation += 1
+            self._pending = (self._generation, template, data)
+            self._requested_at = time.monotonic()
+            self._condition.notify()
+            return self._generation
+
+    def is_latest(self, generation):
+        """Sprawdza, czy żądanie jest najnowsze (starsze wyniki są pomijane)"""
+        with self._condition:
+            return generation == self._generation
+
+    def close(self):
+        """Zatrzymuje wątek roboczy (oczekujące żądanie jest porzucane)"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join(timeout=1)
+
+    def _next_job(self):
+        """Czeka na żądanie, które nie zmieniło się przez czas debounce"""
+        with self._condition:
+            while not self._closed:
+                if self._pending is None:
+                    self._condition.wait()
+                    continue
+                remaining = self._requested_at + self.debounce - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+                job, self._pending = self._pending, None
+                return job
+            return None
+
+    def _run(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            generation, template, data = job
+            try:
+                result = render_template(template, data, self.registry)
+                if self.transform:
+                    result = self.transform(result)
+            except Exception as e:
+                self.logger.error(f"❌ Błąd renderowania podglądu: {e}")
+                result = f"Błąd renderowania podglądu: {e}"
+            # Wynik starszego żądania nie jest już potrzebny
+            if self.is_latest(generation):
+                self.on_result(generation, result)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test parsowania kwot w formatach PL/EU do groszy
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+
+from amount_parser import parse_amounts, format_grosze
+from data_processor import DataProcessor
+
+def test_parse_amounts():
+    """Testuje parsowanie różnych formatów kwot"""
+    print("🧪 Test parsowania kwot")
+    print("=" * 60)
+
+    cases = [
+        ('1 234,56', 123456),
+        ('1 234,56 zł', 123456),
+        ('1.234,56', 123456),
+        ('1,234.56', 123456),
+        ('1234.5', 123450),
+        ('12,50 PLN', 1250),
+        ('-12,5', -1250),
+        ('(100,00)', -10000),
+        ('100,00-', -10000),
+        ('1.234', 123400),
+        ('12 345 678,90', 1234567890),
+        ('€5,5', 550),
+        ('0,00', 0),
+        (15, 1500),
+        (3.14, 314),
+    ]
+
+    values = pd.Series([value for value, _ in cases], dtype=object)
+    grosze, report = parse_amounts(values)
+
+    for (value, expected), result in zip(cases, grosze):
+        print(f"   {value!r:>20} -> {result}")
+        assert result == expected, f"{value!r}: oczekiwano {expected}, otrzymano {result}"
+
+    assert report['invalid'] == 0
+    print("✅ Wszystkie formaty sparsowane poprawnie")
+
+def test_invalid_amounts_report():
+    """Testuje raport z nieczytelnych komórek"""
+    print("🧪 Test raportu błędnych kwot")
+
+    values = pd.Series(['100,00', 'abc', '', None, '1234,567', '0,125'], dtype=object)
+    grosze, report = parse_amounts(values)
+
+    print(f"📊 Raport: {report}")
+    assert report['total'] == 6
+    assert report['parsed'] == 1
+    assert report['empty'] == 2
+    assert report['invalid'] == 3
+    assert report['invalid_rows'] == [1, 4, 5]
+    assert grosze.isna().sum() == 5
+    print("✅ Raport poprawny")
+
+def test_filter_zero_amount_rows():
+    """Testuje usuwanie pozycji rozliczonych z kwotami z separatorem tysięcy"""
+    print("🧪 Test filtrowania pozycji z kwotą ≤ 0")
+
+    processor = DataProcessor()
+    processor.excel_data = pd.DataFrame({
+        'Kontrahent': ['A', 'B', 'C', 'D', 'E'],
+        'Netto': ['1 234,56', '0,00', '-50,00', '1.500,00 zł', 'brak']
+    })
+    processor.column_mapping = {'kwota': 'Netto'}
+
+    removed_count = processor.filter_zero_amount_rows()
+
+    print(f"🗑️ Usunięto: {removed_count}")
+    assert removed_count == 3
+    assert list(processor.excel_data['Kontrahent']) == ['A', 'D']
+    assert processor.amount_report['invalid'] == 1
+    assert format_grosze(123456) == '1 234,56'
+    print("✅ Filtrowanie poprawne")
+
+if __name__ == "__main__":
+    test_parse_amounts()
+    test_invalid_amounts_report()
+    test_filter_zero_amount_rows()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test generatora należności i benchmarku wczytywania
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+
+from amount_parser import parse_amounts
+from column_mapper import ColumnMapper
+from example_data import generate_receivables
+from benchmark_loader import run_benchmark, compare_results
+
+def test_generate_receivables():
+    """Testuje powtarzalność i realizm generowanych danych"""
+    print("🧪 Test generatora należności")
+
+    data = generate_receivables(3000, seed=7)
+    pd.testing.assert_frame_equal(data, generate_receivables(3000, seed=7))
+    assert not data.equals(generate_receivables(3000, seed=8))
+
+    grosze, report = parse_amounts(data['Netto'])
+    settled = (grosze <= 0).mean()
+    print(f"📊 Rozliczone: {settled:.1%}, błędne kwoty: {report['invalid']}")
+    assert report['invalid'] == 0
+    assert 0.15 < settled < 0.25
+
+    mapper = ColumnMapper()
+    assert mapper._is_nip(data['NIP'].drop_duplicates()).all()
+    assert data['Kontrahent'].nunique() < len(data)
+    print("✅ Dane poprawne")
+
+def test_run_benchmark():
+    """Testuje przebieg benchmarku i wykrywanie spowolnień"""
+    print("🧪 Test benchmarku wczytywania")
+
+    results = run_benchmark([500], ['utf16_tsv', 'cp1250_csv'], measure_memory=False)
+    for case in results['cases']:
+        print(f"📊 {case['format']}: {case['stages']}")
+        assert case['rows_after_filter'] < 500
+        assert set(case['stages']) == {'load_excel_file', 'clean_data', 'mapping',
+                                       'filter_zero_amount_rows', 'get_mapped_data'}
+
+    slower = {'cases': [{'format': 'utf8_csv', 'rows': 10, 'stages': {'mapping': {'seconds': 1.0}}}]}
+    faster = {'cases': [{'format': 'utf8_csv', 'rows': 10, 'stages': {'mapping': {'seconds': 0.5}}}]}
+    assert compare_results(slower, faster) and not compare_results(faster, slower)
+    print("✅ Benchmark poprawny")
+
+if __name__ == "__main__":
+    test_generate_receivables()
+    test_run_benchmark()
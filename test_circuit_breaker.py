@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test wyłącznika obwodu dostawców (otwarcie, próby półotwarte, zaległość do wznowienia)
+"""
+
+import sys
+import os
+import json
+import tempfile
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from circuit_breaker import (CircuitBreaker, CircuitBreakers, STATE_CLOSED, STATE_OPEN, STATE_HALF_OPEN,
+                             SKIPPED_REASON)
+from send_retry import SendFailure, DeadLetterStore
+from sending_control import SendingControl
+from sending_engine import SendingEngine
+from sending_scheduler import CampaignSchedule, STATUS_PENDING, STATUS_SENT
+from config import Config
+
+class FakeClock:
+    """Zegar sterowany w teście"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class DeadProvider:
+    """Sender symulujący niedostępnego dostawcę (timeout), dopóki down = True"""
+
+    def __init__(self):
+        self.down = True
+        self.calls = 0
+
+    def send_reminder_email(self, recipient, template_data, template):
+        self.calls += 1
+        if self.down:
+            return False, SendFailure("Błąd połączenia: timeout", retryable=True)
+        return True, "Wysłano"
+
+def make_items(count):
+    return [{'kontrahent': f'Firma {i}', 'email': f'k{i}@firma.pl', 'telefon': ''} for i in range(count)]
+
+def test_state_machine():
+    """Testuje otwarcie po progu błędów, próbę półotwartą i ponowne otwarcie"""
+    print("🧪 Test stanów obwodu")
+    clock = FakeClock()
+    breaker = CircuitBreaker('smsapi', failure_rate=0.5, min_calls=4, window_size=4, open_seconds=30, clock=clock)
+    for success in (True, False, True):
+        assert breaker.allow()
+        breaker.record(success)
+    assert breaker.state == STATE_CLOSED  # za mało wywołań
+    breaker.record(False)
+    assert breaker.state == STATE_OPEN and not breaker.allow()
+    assert breaker.retry_in() == 30
+
+    clock.now = 30
+    assert breaker.state == STATE_HALF_OPEN
+    assert breaker.allow() and not breaker.allow()  # jedna próba naraz
+    breaker.record(False)
+    assert breaker.state == STATE_OPEN
+
+    clock.now = 60
+    assert breaker.allow()
+    breaker.release()  # anulowano przed wywołaniem - próba wraca
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == STATE_CLOSED and breaker.snapshot()['calls'] == 0
+    for bad in ({'failure_rate': 0}, {'min_calls': 5, 'window_size': 4}, {'half_open_probes': 0}):
+        try:
+            CircuitBreaker('x', **bad)
+            assert False, f"Oczekiwano ValueError dla {bad}"
+        except ValueError:
+            pass
+    print("✅ Obwód otwiera się, próbuje i zamyka")
+
+def test_engine_fails_fast_into_backlog():
+    """Testuje pomijanie wiadomości przy otwartym obwodzie i wznowienie zaległości"""
+    print("🧪 Test zaległości przy awarii dostawcy")
+    with tempfile.TemporaryDirectory() as directory:
+        store = DeadLetterStore(os.path.join(directory, 'dead_letters.jsonl'))
+        for control in (None, SendingControl(concurrency=1)):
+            provider = DeadProvider()
+            breakers = CircuitBreakers({'min_calls': 3, 'window_size': 5, 'open_seconds': 60})
+            engine = SendingEngine(provider, None, 'Dla {kontrahent}', '', delay=0, control=control,
+                                   dead_letters=store, breakers=breakers)
+            results = engine.run(make_items(10), True, False)
+
+            # Tylko 3 wywołania czekały na timeout - pozostałe pominięte od razu
+            assert provider.calls == 3 and len(results) == 10
+            skipped = [result['email_status'] for result in results if result['email_status'].get('skipped')]
+            assert len(skipped) == 7 and all(status['seconds'] == 0.0 for status in skipped)
+            assert 'niedostępny' in skipped[0]['message']
+            assert breakers.snapshot()[0]['state'] == STATE_OPEN
+
+            backlog = store.list(SKIPPED_REASON)
+            assert len(backlog) == 7 and all(record['attempts'] == 0 for record in backlog)
+            assert len(store.list()) == 10
+
+            # Dostawca znów działa - wznowienie zaległości (nowy silnik bez otwartego obwodu)
+            provider.down = False
+            resumed = SendingEngine(provider, None, 'Dla {kontrahent}', '', delay=0, dead_letters=store,
+                                    breakers=CircuitBreakers())
+            assert store.replay(resumed, reason=SKIPPED_REASON) == (7, 0)
+            assert store.list(SKIPPED_REASON) == [] and len(store.take()) == 3
+    print("✅ Pominięte wiadomości wznowione po powrocie dostawcy")
+
+def test_schedule_postpones_skipped():
+    """Testuje przesunięcie terminu wiadomości pominiętej w harmonogramie (bez zużycia próby)"""
+    clock = FakeClock()
+    breakers = CircuitBreakers({'min_calls': 1, 'window_size': 1, 'open_seconds': 120}, clock=clock)
+    provider = DeadProvider()
+    engine = SendingEngine(provider, None, 'Dla {kontrahent}', '', delay=0, breakers=breakers)
+    start = datetime(2025, 3, 3, 10, 0)
+    schedule = CampaignSchedule.build(make_items(2), True, False, settings={'email_rate': 100, 'domain_rate': 100},
+                                      start=start)
+    send_entry = lambda channel, item: engine.send_channel(item, channel, record=False)
+
+    schedule.run_due(send_entry, start + timedelta(seconds=0.5))
+    first, second = sorted(schedule.entries, key=lambda entry: entry['index'])
+    assert provider.calls == 1 and first['attempts'] == 1
+    assert second['status'] == STATUS_PENDING and second.get('attempts', 0) == 0
+    assert datetime.fromisoformat(second['due']) == start + timedelta(seconds=120.5)
+
+    provider.down = False
+    clock.now = 120
+    schedule.run_due(send_entry, start + timedelta(seconds=120.5))
+    assert second['status'] == STATUS_SENT and breakers.get('graph').state == STATE_CLOSED
+
+def test_config_settings():
+    """Testuje ustawienia wyłączników z api_config.json"""
+    config = Config()
+    with tempfile.TemporaryDirectory() as directory:
+        config.config_file = os.path.join(directory, 'api_config.json')
+        assert config.load_circuit_breaker_settings()['open_seconds'] == 30.0
+        with open(config.config_file, 'w', encoding='utf-8') as f:
+            json.dump({'circuit_breaker': {'open_seconds': 5}}, f)
+        assert CircuitBreakers.from_config(config.load_circuit_breaker_settings()).get('graph').open_seconds == 5
+        with open(config.config_file, 'w', encoding='utf-8') as f:
+            json.dump({'circuit_breaker': None}, f)
+        assert CircuitBreakers.from_config(config.load_circuit_breaker_settings()) is None
+
+if __name__ == "__main__":
+    test_state_machine()
+    test_engine_fails_fast_into_backlog()
+    test_schedule_postpones_skipped()
+    test_config_settings()
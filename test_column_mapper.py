@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test silnika automatycznego mapowania kolumn
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+
+from column_mapper import ColumnMapper, normalize_header, assign_max_score
+from data_processor import DataProcessor
+
+def sample_export():
+    """Zwraca przykładowy eksport z ERP z mylącymi nagłówkami"""
+    return pd.DataFrame({
+        'Lp': [1, 2],
+        'Nr pozycji': ['1', '2'],
+        'Kontrahent': ['ABC Sp. z o.o.', 'XYZ S.A.'],
+        'NIP': ['5260250274', 'PL 526-025-02-74'],
+        'E-mail': ['biuro@abc.pl', 'kontakt@xyz.com'],
+        'Telefon komórkowy': ['600 100 200', '+48 501234567'],
+        'Data wystawienia': ['2024-01-01', '2024-02-01'],
+        'Termin płatności': ['2024-01-15', '2024-02-15'],
+        'Netto': ['100,00', '2 000,50'],
+        'Numer': ['FV/1/2024', 'FV/2/2024'],
+        'Dni po terminie': [10, 20]
+    })
+
+def test_normalize_header():
+    """Testuje normalizację nagłówków"""
+    print("🧪 Test normalizacji nagłówków")
+    assert normalize_header('Telefon  Komórkowy') == 'telefon komorkowy'
+    assert normalize_header('Termin_PŁATNOŚCI') == 'termin platnosci'
+    assert normalize_header('E-mail:') == 'e mail'
+    print("✅ Normalizacja poprawna")
+
+def test_suggest_mapping():
+    """Testuje globalne mapowanie kolumn"""
+    print("🧪 Test mapowania kolumn")
+    print("=" * 60)
+
+    mapping = ColumnMapper().suggest_mapping(sample_export())
+    for target, column in mapping.items():
+        print(f"   {target:>18} -> {column}")
+
+    assert mapping == {
+        'kontrahent': 'Kontrahent',
+        'nip': 'NIP',
+        'nr_faktury': 'Numer',
+        'email': 'E-mail',
+        'telefon': 'Telefon komórkowy',
+        'kwota': 'Netto',
+        'data_faktury': 'Data wystawienia',
+        'termin_platnosci': 'Termin płatności',
+        'dni_po_terminie': 'Dni po terminie'
+    }
+    print("✅ Mapowanie poprawne")
+
+def test_value_patterns():
+    """Testuje rozpoznawanie kolumn po wartościach (bez pasujących nagłówków)"""
+    print("🧪 Test rozpoznawania po wartościach")
+
+    data = pd.DataFrame({
+        'Identyfikator': ['5260250274', '7740001454'],
+        'Kontakt': ['a@b.pl', 'c@d.com'],
+        'Uwagi': ['brak', 'pilne']
+    })
+    mapping = ColumnMapper().suggest_mapping(data)
+    print(f"📋 Mapowanie: {mapping}")
+    assert mapping == {'nip': 'Identyfikator', 'email': 'Kontakt'}
+    print("✅ Wartości rozpoznane poprawnie")
+
+def test_assign_max_score():
+    """Testuje przypisanie globalne zamiast zachłannego"""
+    print("🧪 Test przypisania globalnego")
+
+    scores = np.array([[0.9, 0.8], [0.85, 0.1]])
+    assert assign_max_score(scores) == [(0, 1), (1, 0)]
+    print("✅ Przypisanie poprawne")
+
+def test_data_processor_keeps_manual_mapping():
+    """Testuje, że mapowanie automatyczne nie nadpisuje ręcznego"""
+    print("🧪 Test zachowania ręcznego mapowania")
+
+    processor = DataProcessor()
+    processor.excel_data = sample_export()
+    processor.column_mapping = {'nr_faktury': 'Nr pozycji', 'kwota': 'Usunięta kolumna'}
+
+    processor.force_smart_mapping_for_specific_data()
+    assert processor.column_mapping['nr_faktury'] == 'Nr pozycji'
+    assert processor.column_mapping['kwota'] == 'Netto'
+    print("✅ Ręczne mapowanie zachowane")
+
+if __name__ == "__main__":
+    test_normalize_header()
+    test_suggest_mapping()
+    test_value_patterns()
+    test_assign_max_score()
+    test_data_processor_keeps_manual_mapping()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test wspólnego modelu danych (podgląd, okno wysyłki, eksport)
+"""
+
+import sys
+import os
+import io
+import csv
+import logging
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from dataset_model import DatasetModel, EXPORT_HEADERS, STATUS_PENDING
+from main import WindykatorApp
+from test_preview_refresh import RecordingTree
+
+def make_rows(count):
+    """Zwraca wiersze w formacie DataProcessor.get_preview_data_mapped"""
+    return [{'kontrahent': f'Firma {i}', 'nip': '5260250274', 'nr_faktury': f'F/{i}',
+             'email': f'k{i}@firma.pl' if i % 2 == 0 else '', 'telefon': '48500100200',
+             'kwota': f'{i + 1},00', 'data_faktury': '2025-01-15', 'dni_po_terminie': str(i),
+             'row_id': i} for i in range(count)]
+
+class ViewsHost:
+    """Minimalny obiekt z podglądem i tabelą wysyłki obserwującymi model"""
+
+    _on_dataset_change = WindykatorApp._on_dataset_change
+    _apply_dataset_change = WindykatorApp._apply_dataset_change
+    prepare_sending_data = WindykatorApp.prepare_sending_data
+    update_sending_status = WindykatorApp.update_sending_status
+
+    def __init__(self):
+        self.data_mapping_widgets = {'preview_tree': RecordingTree()}
+        self.sending_status_tree = None
+        self.dataset = DatasetModel()
+        self.dataset.subscribe(self._on_dataset_change)
+        self.logger = logging.getLogger(__name__)
+
+def test_model_sync_and_manual_items():
+    """Testuje synchronizację z plikiem i pozycje dodane ręcznie"""
+    print("🧪 Test synchronizacji modelu")
+    model = DatasetModel()
+    changes = []
+    model.subscribe(lambda change, keys: changes.append((change, list(keys))))
+
+    assert model.sync(make_rows(5)) == (0, 5, 0)
+    manual = model.add({'kontrahent': 'Ręczna', 'nr_faktury': 'R/1', 'row_id': -1})
+    assert manual == 'manual1'
+    assert model.add(make_rows(1)[0]) is None  # wiersz już w modelu
+    assert model.find('nr_faktury', 'F/3') == 'row3'
+
+    rows = make_rows(5)[1:]
+    rows[0]['kwota'] = '99,00'
+    changes.clear()
+    assert model.sync(rows) == (1, 0, 1)
+    assert changes == [('delete', ['row0']), ('update', ['row1'])]
+    assert model.keys() == ['row1', 'row2', 'row3', 'row4', 'manual1']
+    assert model.position('manual1') == 4
+    assert model.values('row1')[5] == '99,00'
+    assert model.template_data('row1')['data_faktury'] == '2025-01-15'
+    print("✅ Model zmienia tylko różniące się pozycje")
+
+def test_views_observe_statuses_and_export():
+    """Testuje widoki obserwujące model, statusy wysyłki i eksport strumieniowy"""
+    print("🧪 Test widoków i eksportu")
+    host = ViewsHost()
+    preview = host.data_mapping_widgets['preview_tree']
+    host.dataset.sync(make_rows(4))
+    assert preview.order == ['row0', 'row1', 'row2', 'row3']
+
+    status_tree = RecordingTree()
+    host.prepare_sending_data(status_tree)
+    host.sending_status_tree = status_tree
+    assert status_tree.rows['row2'][-2:] == (STATUS_PENDING, STATUS_PENDING)
+
+    # Status z wątku wysyłki - zmienia tylko tabelę wysyłki, podgląd bez operacji
+    preview.operations = {'insert': 0, 'delete': 0, 'item': 0}
+    status_tree.operations = {'insert': 0, 'delete': 0, 'item': 0}
+    host.update_sending_status('row2', '✅ Wysłano', None)
+    assert preview.operations == {'insert': 0, 'delete': 0, 'item': 0}
+    assert status_tree.operations == {'insert': 0, 'delete': 0, 'item': 1}
+    assert status_tree.rows['row2'][-2:] == ('✅ Wysłano', STATUS_PENDING)
+
+    # Edycja pozycji - oba widoki
+    host.dataset.update('row1', {'kontrahent': 'Nowa nazwa'})
+    assert preview.rows['row1'][0] == 'Nowa nazwa' and status_tree.rows['row1'][0] == 'Nowa nazwa'
+    assert host.dataset.count_status('✅ Wysłano') == 1
+
+    output = io.StringIO()
+    assert host.dataset.write_csv(output) == 4
+    rows = list(csv.reader(io.StringIO(output.getvalue())))
+    assert tuple(rows[0]) == EXPORT_HEADERS
+    assert rows[3][0] == 'Firma 2' and rows[3][7] == '✅ Wysłano'
+
+    # Nowa wysyłka - statusy od nowa
+    host.prepare_sending_data(status_tree)
+    assert host.dataset.count_status('✅ Wysłano') == 0
+    print("✅ Widoki obserwują wspólny model")
+
+if __name__ == "__main__":
+    test_model_sync_and_manual_items()
+    test_views_observe_statuses_and_export()
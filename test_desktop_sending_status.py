@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test statusów wysyłki aplikacji desktopowej po anulowaniu i błędzie procesu wysyłki
+"""
+
+import sys
+import os
+import logging
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import main
+from main import WindykatorApp, STATUS_SENDING, STATUS_CANCELLED
+from dataset_model import DatasetModel
+from metrics import metrics, QUEUE_DEPTH
+
+class FinishedProcess:
+    """Proces wysyłki, który już się zakończył i oddaje zapisane komunikaty"""
+
+    finished = True
+
+    def __init__(self, messages):
+        self.messages = messages
+
+    def poll(self):
+        messages, self.messages = self.messages, []
+        return messages
+
+class Label:
+    def config(self, **kwargs):
+        self.options = kwargs
+
+class SendingHost:
+    """Minimalny obiekt z atrybutami używanymi przez WindykatorApp._poll_sending_process"""
+
+    _poll_sending_process = WindykatorApp._poll_sending_process
+    _mark_sending = WindykatorApp._mark_sending
+    _mark_not_sent = WindykatorApp._mark_not_sent
+    _record_sending_result = WindykatorApp._record_sending_result
+    _format_sending_status = WindykatorApp._format_sending_status
+    update_sending_status = WindykatorApp.update_sending_status
+
+    def __init__(self, count):
+        self.dataset = DatasetModel()
+        self.dataset.sync([{'row_id': i, 'kontrahent': f'Firma {i}', 'email': f'k{i}@firma.pl', 'telefon': ''}
+                           for i in range(count)])
+        self.keys = self.dataset.keys()
+        self.status_label = Label()
+        self.logger = logging.getLogger(__name__)
+        self.exported = False
+
+    def ask_for_csv_export(self):
+        self.exported = True
+
+    def _update_sending_controls(self):
+        pass
+
+def result(index):
+    return ('result', index, (True, 'Wysłano'), None)
+
+def test_cancel_marks_unsent_rows():
+    """Testuje, że pozycje bez wyniku po anulowaniu nie zostają ze statusem 'Wysyłanie...'"""
+    print("🧪 Test statusów po anulowaniu wysyłki")
+    host = SendingHost(4)
+    host._mark_sending(host.keys, True, True)
+    host._poll_sending_process(FinishedProcess([result(2), result(0), ('done', 2, True)]), host.keys, set())
+
+    statuses = [host.dataset.get(key)['email_status'] for key in host.keys]
+    assert statuses == ["✅ Wysłano", STATUS_CANCELLED, "✅ Wysłano", STATUS_CANCELLED], statuses
+    # Kanał bez telefonu nie był wysyłany - jego status się nie zmienia
+    assert host.dataset.get(host.keys[1])['sms_status'] != STATUS_CANCELLED
+    assert host.exported
+    print("✅ Pozycje bez wyniku oznaczone jako anulowane")
+
+def test_error_marks_unsent_rows():
+    """Testuje statusy pozycji po błędzie procesu wysyłki"""
+    host = SendingHost(2)
+    host._mark_sending(host.keys, True, False)
+    errors = []
+    showerror = main.messagebox.showerror
+    main.messagebox.showerror = lambda title, message: errors.append(message)
+    try:
+        host._poll_sending_process(FinishedProcess([result(0), ('error', 'Brak połączenia')]), host.keys, set())
+    finally:
+        main.messagebox.showerror = showerror
+    assert errors and [host.dataset.get(key)['email_status'] for key in host.keys] == ["✅ Wysłano", STATUS_CANCELLED]
+
+def test_queue_depth_follows_received_results():
+    """Testuje głębokość kolejki przy wynikach w kolejności priorytetu, a nie listy"""
+    host = SendingHost(4)
+    depths = []
+    gauge = metrics.set
+
+    def record_depth(name, value, **labels):
+        if name == QUEUE_DEPTH:
+            depths.append(value)
+        gauge(name, value, **labels)
+
+    metrics.set = record_depth
+    try:
+        process = FinishedProcess([result(3), result(0), result(2), result(1)])
+        process.finished = False
+        host.root = type('Root', (), {'after': lambda self, *args: None})()
+        host._poll_sending_process(process, host.keys, set())
+    finally:
+        del metrics.set
+    assert depths == [3, 2, 1, 0], depths
+
+if __name__ == "__main__":
+    test_cancel_marks_unsent_rows()
+    test_error_marks_unsent_rows()
+    test_queue_depth_follows_received_results()
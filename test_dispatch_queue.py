@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test kolejki wysyłki według priorytetu (kwota × przedział zaległości)
+"""
+
+import sys
+import os
+import json
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from dispatch_queue import DispatchQueue, priority_scores, dispatch_order, normalize_weights, DEFAULT_BUCKET_WEIGHTS
+from sending_control import SendingControl
+from sending_engine import SendingEngine
+from config import Config
+
+class RecordingSender:
+    """Sender zapisujący kolejność wysyłki"""
+
+    def __init__(self):
+        self.recipients = []
+
+    def send_reminder_email(self, recipient, template_data, template):
+        self.recipients.append(recipient)
+        return True, "Wysłano"
+
+def make_items():
+    return [
+        {'kontrahent': 'Mała', 'email': 'a@firma.pl', 'kwota': '100,00', 'dni_po_terminie': '10'},
+        {'kontrahent': 'Stara', 'email': 'b@firma.pl', 'kwota': '1 000,00 zł', 'dni_po_terminie': '120'},
+        {'kontrahent': 'Duża', 'email': 'c@firma.pl', 'kwota': '3.000,00', 'dni_po_terminie': '5'},
+        {'kontrahent': 'Korekta', 'email': 'd@firma.pl', 'kwota': '-50,00', 'dni_po_terminie': '200'},
+        {'kontrahent': 'Przedział', 'email': 'e@firma.pl', 'kwota': '500', 'przedzial_zaleglosci': '61-90'},
+        {'kontrahent': 'Brak', 'email': 'f@firma.pl', 'kwota': '', 'dni_po_terminie': 'Błąd daty'},
+    ]
+
+def test_priority_scores():
+    """Testuje wektorowe wyliczenie priorytetów"""
+    print("🧪 Test priorytetów")
+    scores = priority_scores(make_items())
+    assert scores.tolist() == [100.0, 4000.0, 3000.0, 0.0, 1500.0, 0.0]
+    assert dispatch_order(make_items()) == [1, 2, 4, 0, 3, 5]
+    # Same kwoty - wagi przedziałów równe
+    flat = {bucket: 1 for bucket in DEFAULT_BUCKET_WEIGHTS}
+    assert dispatch_order(make_items(), flat) == [2, 1, 4, 0, 3, 5]
+    assert priority_scores([]).tolist() == []
+    try:
+        normalize_weights({'90+': -1})
+        assert False, "Oczekiwano ValueError"
+    except ValueError:
+        pass
+    print("✅ Priorytety wyliczone")
+
+def test_queue_order_and_push():
+    """Testuje kolejność wydawania z kopca i dokładanie pozycji"""
+    queue = DispatchQueue()
+    queue.push_many(make_items())
+    assert len(queue) == 6 and queue.peek_score() == 4000.0
+    assert queue.pop()[0] == 1
+    queue.push(10, {'kwota': '9 999,00', 'dni_po_terminie': '95'})
+    assert [queue.pop()[0] for _ in range(len(queue))] == [10, 2, 4, 0, 3, 5]
+    assert queue.pop() is None and queue.peek_score() is None
+
+def test_engine_sends_by_priority():
+    """Testuje wysyłkę od najwyższego priorytetu i indeksy wyników"""
+    print("🧪 Test kolejności wysyłki")
+    for control in (None, SendingControl(concurrency=1)):
+        sender = RecordingSender()
+        engine = SendingEngine(sender, None, 'Dla {kontrahent}', '', delay=0, control=control,
+                               priority_weights=DEFAULT_BUCKET_WEIGHTS)
+        reported = []
+        results = engine.run(make_items(), True, False, on_result=lambda i, result: reported.append(i))
+        assert sender.recipients == ['b@firma.pl', 'c@firma.pl', 'e@firma.pl', 'a@firma.pl', 'd@firma.pl', 'f@firma.pl']
+        assert reported == [1, 2, 4, 0, 3, 5]
+        # Wyniki w kolejności listy pozycji
+        assert [result['email'] for result in results] == [item['email'] for item in make_items()]
+
+    # Przerwanie po dwóch pozycjach - wysłane są największe
+    sender = RecordingSender()
+    engine = SendingEngine(sender, None, 'Dla {kontrahent}', '', delay=0, priority_weights={})
+    results = engine.run(make_items(), True, False, should_stop=lambda: len(sender.recipients) >= 2)
+    assert [result['kontrahent'] for result in results] == ['Stara', 'Duża']
+    print("✅ Najpierw największe i najstarsze długi")
+
+def test_config_priority_weights():
+    """Testuje wagi priorytetu z api_config.json"""
+    config = Config()
+    with tempfile.TemporaryDirectory() as directory:
+        config.config_file = os.path.join(directory, 'api_config.json')
+        assert config.load_priority_weights() == DEFAULT_BUCKET_WEIGHTS
+        with open(config.config_file, 'w', encoding='utf-8') as f:
+            json.dump({'priority_weights': {'90+': 10}}, f)
+        assert config.load_priority_weights()['90+'] == 10.0
+        with open(config.config_file, 'w', encoding='utf-8') as f:
+            json.dump({'priority_weights': None}, f)
+        assert config.load_priority_weights() is None
+
+if __name__ == "__main__":
+    test_priority_scores()
+    test_queue_order_and_push()
+    test_engine_sends_by_priority()
+    test_config_priority_weights()
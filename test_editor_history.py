@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test historii edycji edytora email (różnice, łączenie operacji, budżet)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from editor_history import EditHistory, diff_text, text_index, style_edits, footer_edits
+
+TEMPLATE = """<html>
+<body style="font-family: Arial, sans-serif; line-height: 1.6;">
+    <p style="font-size: 14px;">Szanowni Państwo {kontrahent},</p>
+</body>
+</html>"""
+
+def apply_edits(text, edits):
+    """Stosuje zmiany punktowe od końca (jak WindykatorApp._apply_editor_edits)"""
+    for start, end, replacement in sorted(edits, reverse=True):
+        text = text[:start] + replacement + text[end:]
+    return text
+
+def test_diff_and_index():
+    """Testuje wyznaczanie różnicy i indeksów tk.Text"""
+    print("🧪 Test różnicy tekstu")
+    edit = diff_text("abcdef", "abXYef")
+    assert (edit.offset, edit.removed, edit.inserted) == (2, 'cd', 'XY')
+    edit = diff_text("aaaa", "aaaaa")
+    assert (edit.offset, edit.removed, edit.inserted) == (4, '', 'a')
+    assert diff_text("same", "same") is None
+    assert text_index("ab\ncd\nef", 0) == "1.0"
+    assert text_index("ab\ncd\nef", 4) == "2.1"
+    assert text_index("ab\ncd\nef", 6) == "3.0"
+    print("✅ Różnice i indeksy poprawne")
+
+def test_typing_is_coalesced_and_undone():
+    """Testuje łączenie wpisywanych znaków i cofanie/ponawianie"""
+    print("🧪 Test łączenia operacji pisania")
+    history = EditHistory(TEMPLATE)
+    text = TEMPLATE
+    position = text.index('{kontrahent}')
+    for i, char in enumerate("Drogi "):
+        text = text[:position + i] + char + text[position + i:]
+        history.record(text, timestamp=i * 0.1)
+    for i, char in enumerate("kliencie"):
+        offset = position + 6 + i
+        text = text[:offset] + char + text[offset:]
+        history.record(text, timestamp=1 + i * 0.1)
+    # Backspace trzy razy
+    for i in range(3):
+        offset = position + 13 - i
+        text = text[:offset] + text[offset + 1:]
+        history.record(text, timestamp=2 + i * 0.1)
+
+    assert len(history.undo_stack) == 3, history.undo_stack
+    assert history.text == text
+
+    undo_text = history.text
+    edit = history.undo()
+    undo_text = edit.apply(undo_text)
+    assert 'Drogi kliencie' in undo_text
+    edit = history.undo()
+    undo_text = edit.apply(undo_text)
+    edit = history.undo()
+    undo_text = edit.apply(undo_text)
+    assert undo_text == TEMPLATE == history.text
+    assert history.undo() is None
+
+    redo_text = history.text
+    for _ in range(3):
+        redo_text = history.redo().apply(redo_text)
+    assert redo_text == text == history.text
+    print("✅ Pisanie łączone w słowa, cofanie i ponawianie odtwarza tekst")
+
+def test_byte_budget():
+    """Testuje ograniczenie rozmiaru historii"""
+    print("🧪 Test budżetu bajtów historii")
+    history = EditHistory('', byte_budget=1000)
+    text = ''
+    for i in range(200):
+        text += f"linia {i}\n"
+        history.record(text)
+        history.break_coalescing()
+    assert history.size <= 1000
+    assert history.size == sum(edit.size for edit in history.undo_stack)
+    assert len(history.undo_stack) < 200
+    print(f"✅ Historia: {len(history.undo_stack)} operacji, {history.size} B")
+
+def test_targeted_formatting_edits():
+    """Testuje zmiany punktowe stylów i stopki"""
+    print("🧪 Test zmian punktowych formatowania")
+    edits = style_edits(TEMPLATE, 'font-family', 'Verdana, sans-serif')
+    assert len(edits) == 1
+    assert edits[0][1] - edits[0][0] < 40
+    assert 'font-family: Verdana, sans-serif;' in apply_edits(TEMPLATE, edits)
+    assert style_edits(apply_edits(TEMPLATE, edits), 'font-family', 'Verdana, sans-serif') == []
+
+    plain = "<html><body><p>x</p></body></html>"
+    assert apply_edits(plain, style_edits(plain, 'font-size', '16px')) == \
+        '<html><body style="font-size: 16px;"><p>x</p></body></html>'
+
+    footer = "\n\n---\nWiadomość wygenerowana automatycznie\n© 2024 KPJ.PL - System Windykacji\n    \n"
+    text = "Treść wiadomości\nPozdrawiam" + footer
+    edits = footer_edits(text)
+    assert apply_edits(text, edits) == "Treść wiadomości\nPozdrawiam"
+    assert footer_edits("Treść wiadomości") == []
+    print("✅ Formatowanie zmienia tylko potrzebne fragmenty")
+
+if __name__ == "__main__":
+    test_diff_and_index()
+    test_typing_is_coalesced_and_undone()
+    test_byte_budget()
+    test_targeted_formatting_edits()
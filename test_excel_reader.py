@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test wczytywania plików Excel z wyborem silnika po sygnaturze pliku
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+
+import excel_reader
+from excel_reader import detect_file_format, list_sheets, read_excel_file, rows_to_dataframe
+from data_processor import DataProcessor
+
+def write_workbook(directory):
+    """Zapisuje skoroszyt z arkuszem pomocniczym i arkuszem z danymi"""
+    path = os.path.join(directory, 'naleznosci.xlsx')
+    data = pd.DataFrame({
+        'Kontrahent': ['ABC Sp. z o.o.', 'XYZ S.A.'],
+        'Email': ['biuro@abc.pl', 'kontakt@xyz.pl'],
+        'Kwota': [1234.56, 99.0]
+    })
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        pd.DataFrame({'Info': ['Raport z ERP']}).to_excel(writer, sheet_name='Opis', index=False)
+        data.to_excel(writer, sheet_name='Dane', index=False)
+    return path, data
+
+def test_detect_file_format():
+    """Testuje rozpoznawanie formatu po sygnaturze"""
+    print("🧪 Test sygnatur plików")
+
+    with tempfile.TemporaryDirectory() as directory:
+        xlsx_path, _ = write_workbook(directory)
+        xls_path = os.path.join(directory, 'stary.xls')
+        with open(xls_path, 'wb') as f:
+            f.write(b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1' + b'\0' * 504)
+        text_path = os.path.join(directory, 'eksport.xls')
+        with open(text_path, 'w', encoding='utf-8') as f:
+            f.write("Kontrahent;Email;Kwota\nABC;biuro@abc.pl;10,00\n")
+
+        assert detect_file_format(xlsx_path) == 'xlsx'
+        assert detect_file_format(xls_path) == 'xls'
+        assert detect_file_format(text_path) == 'text'
+
+        # Plik tekstowy z rozszerzeniem .xls trafia do ścieżki CSV
+        processor = DataProcessor()
+        assert processor.load_excel_file(text_path)
+        assert processor.load_params['file_type'] == 'csv'
+        assert list(processor.excel_data['Kontrahent']) == ['ABC']
+        print("✅ Formaty rozpoznane poprawnie")
+
+def test_sheet_chooser():
+    """Testuje wybór arkusza w obu silnikach"""
+    print("🧪 Test wyboru arkusza")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path, expected = write_workbook(directory)
+        assert list_sheets(path) == ['Opis', 'Dane']
+
+        calamine_available = excel_reader.CALAMINE_AVAILABLE
+        try:
+            for use_calamine in {False, calamine_available}:
+                excel_reader.CALAMINE_AVAILABLE = use_calamine
+                data, info = read_excel_file(path, sheet_name='Dane')
+                print(f"📊 Silnik {info['engine']}: {len(data)} wierszy z arkusza {info['sheet']}")
+                pd.testing.assert_frame_equal(data, expected, check_dtype=False)
+        finally:
+            excel_reader.CALAMINE_AVAILABLE = calamine_available
+
+        processor = DataProcessor()
+        processor.sheet_name = 'Dane'
+        assert processor.load_excel_file(path)
+        assert processor.sheet_names == ['Opis', 'Dane']
+        assert processor.column_mapping['email'] == 'Email'
+        print("✅ Arkusz wybrany poprawnie")
+
+def test_rows_to_dataframe():
+    """Testuje budowanie tabeli z wierszy o różnej długości"""
+    print("🧪 Test budowania tabeli z wierszy")
+
+    rows = [(None, None), ('Kwota', 'Kwota', None), (1, 2), (3, 4, 'x'), (None, None, None)]
+    data = rows_to_dataframe(rows)
+    assert list(data.columns) == ['Kwota', 'Kwota.1', 'Unnamed: 2']
+    assert data.shape == (2, 3)
+    print("✅ Tabela zbudowana poprawnie")
+
+if __name__ == "__main__":
+    test_detect_file_format()
+    test_sheet_chooser()
+    test_rows_to_dataframe()
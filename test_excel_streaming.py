@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test strumieniowego wczytywania dużych plików xlsx
+"""
+
+import sys
+import os
+import tempfile
+from functools import partial
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from openpyxl import Workbook
+
+import data_processor
+from data_processor import DataProcessor
+from excel_reader import iter_xlsx_batches
+
+def write_workbook(directory):
+    """Zapisuje arkusz z pustymi wierszami w środku danych"""
+    path = os.path.join(directory, 'duzy.xlsx')
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.append(['Kontrahent', 'Email', 'Kwota', 'Uwagi'])
+    for i in range(10):
+        worksheet.append([f'Firma {i}', f'k{i}@example.com', f'{i * 10},00', None])
+        if i % 4 == 0:
+            worksheet.append([None, None, None, None])
+    workbook.save(path)
+    return path
+
+def test_iter_batches():
+    """Testuje paczki, pomijanie pustych wierszy i postęp"""
+    print("🧪 Test paczek strumieniowych")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = write_workbook(directory)
+        progress = []
+        batches = list(iter_xlsx_batches(path, batch_size=4,
+                                         progress_callback=lambda stage, current, total: progress.append((stage, current, total))))
+
+        print(f"📦 Paczki: {[len(batch) for batch in batches]}, postęp: {progress}")
+        assert [len(batch) for batch in batches] == [4, 4, 2]
+        assert list(batches[0].columns) == ['Kontrahent', 'Email', 'Kwota', 'Uwagi']
+        assert batches[2]['Kontrahent'].tolist() == ['Firma 8', 'Firma 9']
+        assert progress[-1] == ('read', 14, 14)
+        assert progress[0] == ('read', 6, 14)
+        print("✅ Paczki poprawne")
+
+def test_streaming_load():
+    """Testuje wczytanie strumieniowe z mapowaniem, czyszczeniem i filtrowaniem w paczkach"""
+    print("🧪 Test wczytywania strumieniowego")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = write_workbook(directory)
+        threshold = data_processor.STREAM_MIN_FILE_SIZE
+        data_processor.STREAM_MIN_FILE_SIZE = 0
+        # Kilka paczek - wiersze rozliczone i puste trafiają do różnych paczek
+        data_processor.iter_xlsx_batches = partial(iter_xlsx_batches, batch_size=3)
+        try:
+            processor = DataProcessor()
+            processor.filter_zero_amounts_on_load = True
+            assert processor.load_excel_file(path)
+            unfiltered = DataProcessor()
+            assert unfiltered.load_excel_file(path)
+        finally:
+            data_processor.STREAM_MIN_FILE_SIZE = threshold
+            data_processor.iter_xlsx_batches = iter_xlsx_batches
+
+        assert processor.column_mapping['kwota'] == 'Kwota'
+        assert len(processor.excel_data) == 9 and len(unfiltered.excel_data) == 10
+        assert processor.excel_data['Kontrahent'].iloc[0] == 'Firma 1'
+        # Pusta kolumna usunięta, indeks ciągły po złożeniu paczek
+        assert list(processor.excel_data.columns) == ['Kontrahent', 'Email', 'Kwota']
+        assert list(processor.excel_data.index) == list(range(9))
+        print("✅ Wczytywanie strumieniowe poprawne")
+
+def test_filter_same_for_all_paths():
+    """Testuje, że pozycje z kwotą ≤ 0 są usuwane tak samo z małego xlsx, dużego xlsx i CSV"""
+    print("🧪 Test filtrowania we wszystkich ścieżkach wczytywania")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = write_workbook(directory)
+        csv_path = os.path.join(directory, 'duzy.csv')
+        with open(csv_path, 'w', encoding='utf-8') as f:
+            f.write("Kontrahent;Email;Kwota\n")
+            for i in range(10):
+                f.write(f"Firma {i};k{i}@example.com;{i * 10},00\n")
+
+        counts = {}
+        threshold = data_processor.STREAM_MIN_FILE_SIZE
+        for name, file_path, stream_threshold in (('xlsx', path, threshold), ('stream', path, 0), ('csv', csv_path, threshold)):
+            data_processor.STREAM_MIN_FILE_SIZE = stream_threshold
+            try:
+                processor = DataProcessor()
+                processor.filter_zero_amounts_on_load = True
+                assert processor.load_excel_file(file_path)
+            finally:
+                data_processor.STREAM_MIN_FILE_SIZE = threshold
+            counts[name] = (processor.get_row_count(), processor.removed_on_load)
+        assert counts == {'xlsx': (9, 1), 'stream': (9, 1), 'csv': (9, 1)}, counts
+        print("✅ Wszystkie ścieżki usuwają te same pozycje")
+
+def test_wide_rows_same_columns():
+    """Testuje, że wiersz szerszy od nagłówka daje te same kolumny przy wczytaniu zwykłym i strumieniowym"""
+    print("🧪 Test wierszy szerszych od nagłówka")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'szeroki.xlsx')
+        workbook = Workbook()
+        worksheet = workbook.active
+        worksheet.append(['Kontrahent', 'Email', 'Kwota'])
+        for i in range(8):
+            worksheet.append([f'Firma {i}', f'k{i}@example.com', f'{i + 1}0,00'] + (['uwaga'] if i == 5 else []))
+        workbook.save(path)
+
+        loaded = {}
+        threshold = data_processor.STREAM_MIN_FILE_SIZE
+        for name, stream_threshold in (('xlsx', threshold), ('stream', 0)):
+            data_processor.STREAM_MIN_FILE_SIZE = stream_threshold
+            data_processor.iter_xlsx_batches = partial(iter_xlsx_batches, batch_size=3)
+            try:
+                processor = DataProcessor()
+                assert processor.load_excel_file(path)
+            finally:
+                data_processor.STREAM_MIN_FILE_SIZE = threshold
+                data_processor.iter_xlsx_batches = iter_xlsx_batches
+            loaded[name] = processor.excel_data
+
+        assert list(loaded['stream'].columns) == list(loaded['xlsx'].columns) == ['Kontrahent', 'Email', 'Kwota', 'Unnamed: 3']
+        assert loaded['stream']['Unnamed: 3'].fillna('').tolist() == loaded['xlsx']['Unnamed: 3'].fillna('').tolist()
+        assert loaded['stream']['Unnamed: 3'].iloc[5] == 'uwaga' and len(loaded['stream']) == 8
+        print("✅ Kolumny zgodne w obu ścieżkach")
+
+if __name__ == "__main__":
+    test_iter_batches()
+    test_streaming_load()
+    test_filter_same_for_all_paths()
+    test_wide_rows_same_columns()
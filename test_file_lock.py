@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test blokady pliku między procesami i wątkami
+"""
+
+import sys
+import os
+import tempfile
+import threading
+import multiprocessing
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from file_lock import FileLock
+
+def hold_lock(path, locked, release):
+    """Proces trzymający blokadę do sygnału release"""
+    with FileLock(path):
+        locked.set()
+        release.wait(10)
+
+def test_lock_between_processes():
+    """Testuje, że blokady trzymanej przez inny proces nie da się założyć, a po jego zakończeniu - tak"""
+    print("🧪 Test blokady pliku")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'kampania.lock')
+        locked, release = multiprocessing.Event(), multiprocessing.Event()
+        holder = multiprocessing.Process(target=hold_lock, args=(path, locked, release))
+        holder.start()
+        try:
+            assert locked.wait(10)
+            lock = FileLock(path)
+            assert not lock.acquire(blocking=False)
+            assert not lock.acquire(timeout=0.1)
+        finally:
+            release.set()
+            holder.join(10)
+        assert lock.acquire(timeout=5) and lock.locked
+        lock.release()
+        assert not lock.locked
+    print("✅ Blokada wyłączna między procesami")
+
+def test_lock_between_threads():
+    """Testuje blokadę jednej instancji używanej przez kilka wątków"""
+    with tempfile.TemporaryDirectory() as directory:
+        lock = FileLock(os.path.join(directory, 'plik.lock'))
+        counter = {'value': 0}
+
+        def increment():
+            for _ in range(200):
+                with lock:
+                    value = counter['value']
+                    counter['value'] = value + 1
+
+        threads = [threading.Thread(target=increment) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert counter['value'] == 800
+        with lock:
+            assert not lock.acquire(blocking=False)
+
+if __name__ == "__main__":
+    test_lock_between_processes()
+    test_lock_between_threads()
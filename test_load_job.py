@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test wczytywania pliku w tle (LoadJob) z postępem i anulowaniem
+"""
+
+import sys
+import os
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from data_processor import DataProcessor, LoadCancelled
+from load_job import LoadJob
+from config import Config
+
+def write_csv(directory, rows):
+    """Zapisuje przykładowy plik CSV z danymi windykacyjnymi"""
+    path = os.path.join(directory, 'dane.csv')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("Kontrahent;NIP;Nr faktury;Email;Telefon;Kwota;Termin płatności\n")
+        for i in range(rows):
+            f.write(f"Firma {i};{1000000000 + i};FV/{i};k{i}@firma.pl;48500{i:06d};{i + 1},50;2025-01-15\n")
+    return path
+
+def test_load_job_reports_progress():
+    """Testuje wczytanie w tle z etapami postępu i wynikiem jak przy wczytaniu synchronicznym"""
+    print("🧪 Test wczytywania w tle")
+    with tempfile.TemporaryDirectory() as directory:
+        path = write_csv(directory, 20000)
+        stages = []
+        job = LoadJob(DataProcessor(), path)
+        original = job._on_progress
+        job._on_progress = lambda stage, current, total: (stages.append((stage, current, total)), original(stage, current, total))
+        job.start()
+        assert job.wait(60), "Wczytywanie nie zakończyło się"
+
+        assert job.success and not job.cancelled and job.error is None
+        assert not job.is_running()
+        names = [stage for stage, _, _ in stages]
+        for stage in ('detection', 'read', 'cleaning', 'mapping', 'dates'):
+            assert stage in names, (stage, names)
+        reads = [(current, total) for stage, current, total in stages if stage == 'read' and total]
+        assert reads and all(total == os.path.getsize(path) for _, total in reads)
+        assert reads[-1][0] == os.path.getsize(path)
+
+        synchronous = DataProcessor()
+        assert synchronous.load_excel_file(path)
+        assert job.processor.get_row_count() == synchronous.get_row_count() == 20000
+        assert job.processor.excel_data.equals(synchronous.excel_data)
+    print("✅ Postęp zgłaszany, wynik zgodny z wczytaniem synchronicznym")
+
+def test_load_job_cancel_keeps_current_data():
+    """Testuje anulowanie w trakcie odczytu - bieżący procesor pozostaje bez zmian"""
+    print("🧪 Test anulowania wczytywania")
+    with tempfile.TemporaryDirectory() as directory:
+        current = DataProcessor()
+        assert current.load_excel_file(write_csv(directory, 10))
+        big_path = os.path.join(directory, 'duzy')
+        os.makedirs(big_path)
+        big_path = write_csv(big_path, 50000)
+
+        job = LoadJob(current.spawn(), big_path)
+        original = job._on_progress
+
+        def cancel_during_read(stage, position, total):
+            original(stage, position, total)
+            if stage == 'read' and position:
+                job.cancel()
+
+        job._on_progress = cancel_during_read
+        job.start()
+        assert job.wait(60)
+        assert job.cancelled and not job.success and job.error is None
+        assert job.cancel_requested
+        assert job.progress[0] == 'read' and job.progress[1] < job.progress[2]
+        assert current.get_row_count() == 10
+    print("✅ Anulowane wczytywanie nie zmienia bieżących danych")
+
+def test_cancel_event_stops_synchronous_load():
+    """Testuje, że ustawione zdarzenie anulowania przerywa load_excel_file wyjątkiem LoadCancelled"""
+    print("🧪 Test zdarzenia anulowania")
+    with tempfile.TemporaryDirectory() as directory:
+        processor = DataProcessor()
+        cancel_event = threading.Event()
+        cancel_event.set()
+        try:
+            processor.load_excel_file(write_csv(directory, 10), cancel_event=cancel_event)
+            assert False, "Oczekiwano LoadCancelled"
+        except LoadCancelled:
+            pass
+        assert processor.excel_data is None
+        # Kolejne wczytanie bez zdarzenia działa normalnie
+        assert processor.load_excel_file(os.path.join(directory, 'dane.csv'))
+    print("✅ Wczytywanie przerwane przed odczytem")
+
+def test_spawn_copies_settings():
+    """Testuje, że nowy procesor przejmuje ustawienia wczytywania"""
+    print("🧪 Test ustawień nowego procesora")
+    processor = DataProcessor()
+    processor.payment_terms_days = 30
+    processor.sheet_name = 'Arkusz2'
+    processor.filter_zero_amounts_on_load = True
+    spawned = processor.spawn()
+    assert spawned is not processor
+    assert spawned.payment_terms_days == 30
+    assert spawned.sheet_name == 'Arkusz2'
+    assert spawned.filter_zero_amounts_on_load is True
+    assert spawned.reference_date == processor.reference_date
+    assert spawned.column_mapper is processor.column_mapper
+    assert spawned.excel_data is None
+    print("✅ Ustawienia skopiowane")
+
+def test_filter_zero_amounts_on_load():
+    """Testuje usuwanie pozycji z kwotą ≤ 0 przy wczytywaniu CSV (ustawienie z api_config.json, domyślnie wyłączone)"""
+    config = Config()
+    with tempfile.TemporaryDirectory() as directory:
+        config.config_file = os.path.join(directory, 'api_config.json')
+        assert config.load_filter_zero_amounts_on_load() is False
+        path = write_csv(directory, 3)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write("Firma Z;1999999999;FV/Z;z@firma.pl;48500999999;0,00;2025-01-15\n")
+        processor = DataProcessor()
+        processor.filter_zero_amounts_on_load = config.load_filter_zero_amounts_on_load()
+        assert processor.load_excel_file(path) and processor.get_row_count() == 4
+        assert processor.removed_on_load == 0
+        with open(config.config_file, 'w', encoding='utf-8') as f:
+            f.write('{"filter_zero_amounts_on_load": true}')
+        processor.filter_zero_amounts_on_load = config.load_filter_zero_amounts_on_load()
+        assert processor.load_excel_file(path) and processor.get_row_count() == 3
+        assert processor.removed_on_load == 1
+
+if __name__ == "__main__":
+    test_load_job_reports_progress()
+    test_load_job_cancel_keeps_current_data()
+    test_cancel_event_stops_synchronous_load()
+    test_spawn_copies_settings()
+    test_filter_zero_amounts_on_load()
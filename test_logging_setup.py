@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test logowania asynchronicznego, strukturalnego i próbkowanego
+"""
+
+import sys
+import os
+import json
+import logging
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from logging_setup import SamplingFilter, JsonFormatter, mask_recipient, setup_logging, stop_logging
+from sms_sender import SMSSender
+
+class ListHandler(logging.Handler):
+    """Handler zbierający rekordy w liście"""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+def test_sampling_and_json():
+    """Testuje próbkowanie zdarzeń, format JSON i maskowanie odbiorców"""
+    print("🧪 Test próbkowania i formatu JSON")
+
+    sampling = SamplingFilter({'sms.sent': 10})
+    logger = logging.getLogger('test_sampling')
+    handler = ListHandler()
+    handler.addFilter(sampling)
+    logger.addHandler(handler)
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    try:
+        for i in range(25):
+            logger.info("SMS %d", i, extra={'event': 'sms.sent'})
+        logger.error("Błąd SMS", extra={'event': 'sms.sent'})
+        logger.info("Bez zdarzenia")
+    finally:
+        logger.removeHandler(handler)
+
+    messages = [record.getMessage() for record in handler.records]
+    print(f"📊 Zapisane: {messages}")
+    assert messages == ['SMS 0', 'SMS 10', 'SMS 20', 'Błąd SMS', 'Bez zdarzenia']
+    assert handler.records[0].sampled == 10
+
+    entry = json.loads(JsonFormatter().format(handler.records[1]))
+    assert entry['message'] == 'SMS 10' and entry['event'] == 'sms.sent' and entry['level'] == 'INFO'
+
+    assert mask_recipient('jan.kowalski@firma.pl') == 'j***@firma.pl'
+    assert mask_recipient('48501332990') == '*******2990'
+    print("✅ Próbkowanie i JSON działają poprawnie")
+
+def test_setup_logging_queue():
+    """Testuje zapis logów przez kolejkę do pliku i brak danych szablonu na poziomie INFO"""
+    print("🧪 Test logowania przez kolejkę")
+
+    root = logging.getLogger()
+    saved_handlers, saved_level = list(root.handlers), root.level
+    with tempfile.TemporaryDirectory() as directory:
+        log_file = os.path.join(directory, 'windykator.log')
+        try:
+            assert setup_logging(level='INFO', structured=True, log_file=log_file, force=True)
+            sender = SMSSender(None)
+            sender.send_reminder_sms('48501332990', {'kontrahent': 'Tajna Firma'}, "SMS dla {kontrahent}")
+            logging.getLogger('test_queue').info("Kampania", extra={'campaign': 'K1'})
+        finally:
+            stop_logging()
+            for handler in saved_handlers:
+                root.addHandler(handler)
+            root.setLevel(saved_level)
+
+        with open(log_file, 'r', encoding='utf-8') as f:
+            entries = [json.loads(line) for line in f]
+
+    print(f"📊 Wpisy: {entries}")
+    assert any(entry['message'] == 'Kampania' and entry['campaign'] == 'K1' for entry in entries)
+    assert not any('Tajna Firma' in entry['message'] for entry in entries)
+    print("✅ Logowanie przez kolejkę działa poprawnie")
+
+if __name__ == "__main__":
+    test_sampling_and_json()
+    test_setup_logging_queue()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test profili mapowania zapamiętanych dla układu pliku
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from data_processor import DataProcessor
+from mapping_profiles import MappingProfileStore, raw_header_fingerprint
+
+CSV_CONTENT = (
+    "Odbiorca;Identyfikator;Dokument;Kontakt;Komórka;Saldo\n"
+    "ABC Sp. z o.o.;5260250274;FV/1/2024;biuro@abc.pl;600100200;1 234,56\n"
+    "XYZ S.A.;7740001454;FV/2/2024;kontakt@xyz.pl;501234567;99,00\n"
+)
+
+def write_csv(directory, name, content=CSV_CONTENT, encoding='windows-1250'):
+    """Zapisuje plik CSV w podanym kodowaniu"""
+    path = os.path.join(directory, name)
+    with open(path, 'w', encoding=encoding, newline='') as f:
+        f.write(content)
+    return path
+
+def test_profile_roundtrip():
+    """Testuje zapis profilu i jego użycie przy kolejnym wczytaniu tego samego układu"""
+    print("🧪 Test profilu mapowania")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as directory:
+        store_file = os.path.join(directory, 'profiles.json')
+        manual_mapping = {
+            'kontrahent': 'Odbiorca', 'nip': 'Identyfikator', 'nr_faktury': 'Dokument',
+            'email': 'Kontakt', 'telefon': 'Komórka', 'kwota': 'Saldo'
+        }
+
+        processor = DataProcessor()
+        processor.profile_store = MappingProfileStore(store_file)
+        assert processor.load_excel_file(write_csv(directory, 'eksport_1.csv'))
+        assert processor.active_profile is None
+
+        processor.set_column_mapping(manual_mapping)
+        success, message = processor.save_current_profile()
+        print(f"💾 {message}")
+        assert success
+
+        # Nowy proces - ten sam układ, inne dane
+        processor = DataProcessor()
+        processor.profile_store = MappingProfileStore(store_file)
+
+        def fail_detection(path):
+            raise AssertionError("Wykrywanie parametrów nie powinno być wywołane")
+
+        processor._detect_file_separator = fail_detection
+        other_rows = CSV_CONTENT.replace('XYZ S.A.', 'QWE Sp. j.')
+        assert processor.load_excel_file(write_csv(directory, 'eksport_2.csv', other_rows))
+
+        print(f"📋 Mapowanie z profilu: {processor.column_mapping}")
+        assert processor.active_profile is not None
+        assert processor.column_mapping == manual_mapping
+        assert processor.load_params['encoding'] == processor.active_profile['encoding']
+        assert list(processor.excel_data['Odbiorca']) == ['ABC Sp. z o.o.', 'QWE Sp. j.']
+        print("✅ Profil zastosowany bez wykrywania")
+
+def test_fingerprint_skiprows():
+    """Testuje odcisk nagłówka z pominięciem wierszy i BOM"""
+    print("🧪 Test odcisku nagłówka")
+
+    with tempfile.TemporaryDirectory() as directory:
+        plain = write_csv(directory, 'a.csv', encoding='utf-8')
+        with_bom = write_csv(directory, 'b.csv', encoding='utf-8-sig')
+        with_title = write_csv(directory, 'c.csv', 'Raport należności\n' + CSV_CONTENT, encoding='utf-8')
+
+        assert raw_header_fingerprint(plain) == raw_header_fingerprint(with_bom)
+        assert raw_header_fingerprint(with_title, skiprows=1) == raw_header_fingerprint(plain)
+        assert raw_header_fingerprint(with_title) != raw_header_fingerprint(plain)
+        print("✅ Odcisk nagłówka poprawny")
+
+if __name__ == "__main__":
+    test_profile_roundtrip()
+    test_fingerprint_skiprows()
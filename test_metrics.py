@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test metryk (liczniki, histogramy, format Prometheusa, endpoint /metrics)
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from metrics import MetricsRegistry, metrics, STAGE_SECONDS
+from data_processor import DataProcessor
+
+def test_metrics_registry():
+    """Testuje liczniki, histogramy i wyłączenie metryk"""
+    print("🧪 Test rejestru metryk")
+
+    registry = MetricsRegistry()
+    registry.define('test_total', 'counter', 'Licznik testowy')
+    registry.define('test_depth', 'gauge', 'Wskaźnik testowy')
+    registry.define('test_seconds', 'histogram', 'Histogram testowy', buckets=(0.1, 1.0))
+
+    registry.inc('test_total', channel='sms')
+    registry.inc('test_total', 2, channel='sms')
+    registry.set('test_depth', 7)
+    for value in (0.05, 0.5, 5.0):
+        registry.observe('test_seconds', value, stage='load')
+
+    @registry.timed('test_seconds', stage='decorated')
+    def work():
+        return 42
+    assert work() == 42
+
+    text = registry.render_prometheus()
+    print(text)
+    assert '# TYPE test_total counter' in text
+    assert 'test_total{channel="sms"} 3' in text
+    assert 'test_depth 7' in text
+    assert 'test_seconds_bucket{stage="load",le="0.1"} 1' in text
+    assert 'test_seconds_bucket{stage="load",le="1"} 2' in text
+    assert 'test_seconds_bucket{stage="load",le="+Inf"} 3' in text
+    assert 'test_seconds_count{stage="load"} 3' in text
+    assert 'test_seconds_count{stage="decorated"} 1' in text
+
+    rows = {(row['name'], tuple(row['labels'].items())): row for row in registry.snapshot()}
+    assert rows[('test_seconds', (('stage', 'load'),))]['p95'] == float('inf')
+    assert rows[('test_total', (('channel', 'sms'),))]['value'] == 3
+
+    # Wyłączone metryki nic nie zapisują
+    registry.reset()
+    registry.enabled = False
+    registry.inc('test_total')
+    with registry.timer('test_seconds'):
+        pass
+    assert work() == 42
+    assert registry.snapshot() == []
+    print("✅ Rejestr metryk działa poprawnie")
+
+def test_metrics_endpoint():
+    """Testuje metryki etapów wczytywania i endpoint /metrics"""
+    print("🧪 Test endpointu /metrics")
+
+    metrics.reset()
+    with tempfile.TemporaryDirectory() as directory:
+        file_path = os.path.join(directory, 'dane.csv')
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write("Kontrahent;NIP;Numer;Kwota\nFirma A;5260250274;F/1;100,00\n")
+        processor = DataProcessor()
+        assert processor.load_excel_file(file_path)
+
+    stages = {row['labels'].get('stage') for row in metrics.snapshot() if row['name'] == STAGE_SECONDS}
+    print(f"📊 Zmierzone etapy: {sorted(stages)}")
+    assert {'load', 'detection', 'cleaning', 'mapping', 'dates'} <= stages
+
+    from web_app import app
+    response = app.test_client().get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    body = response.get_data(as_text=True)
+    assert 'windykator_stage_seconds_count{stage="load"} 1' in body
+    assert '# TYPE windykator_messages_total counter' in body
+    print("✅ Endpoint /metrics działa poprawnie")
+
+if __name__ == "__main__":
+    test_metrics_registry()
+    test_metrics_endpoint()
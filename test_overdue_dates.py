@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test wyliczania dni po terminie i przedziałów zaległości z dat
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+
+from data_processor import DataProcessor
+
+def test_overdue_from_due_date():
+    """Testuje wyliczanie dni po terminie z kolumny terminu płatności"""
+    print("🧪 Test dni po terminie z terminu płatności")
+    print("=" * 60)
+
+    processor = DataProcessor()
+    processor.excel_data = pd.DataFrame({
+        'Kontrahent': ['A', 'B', 'C', 'D', 'E'],
+        'Termin': ['01.06.2024', '15.05.2024', '10.04.2024', '01.01.2024', 'brak']
+    })
+    processor.column_mapping = {'kontrahent': 'Kontrahent', 'termin_platnosci': 'Termin'}
+    processor.reference_date = '2024-06-11'
+
+    assert processor.apply_date_stage()
+
+    days = processor.excel_data['dni_po_terminie'].tolist()
+    buckets = processor.excel_data['przedzial_zaleglosci'].tolist()
+    print(f"📅 Dni: {days}")
+    print(f"📊 Przedziały: {buckets}")
+    assert days[:4] == [10, 27, 62, 162]
+    assert pd.isna(days[4])
+    assert buckets[:4] == ['0-30', '0-30', '61-90', '90+']
+    assert processor._date_format_cache[(None, 'Termin')] == '%d.%m.%Y'
+    assert 'dni_po_terminie' not in processor.get_columns()
+    print("✅ Dni po terminie wyliczone poprawnie")
+
+def test_overdue_from_invoice_date():
+    """Testuje wyliczanie z daty faktury z terminem płatności w dniach"""
+    print("🧪 Test dni po terminie z daty faktury")
+
+    processor = DataProcessor()
+    processor.excel_data = pd.DataFrame({
+        'Data': ['2024-05-01', '2024-03-01', '2024-06-10'],
+        'Serial': [45413, 45352, 45453]
+    })
+    processor.column_mapping = {'data_faktury': 'Data'}
+    processor.payment_terms_days = 14
+
+    processor.compute_overdue_days(reference_date='2024-06-11')
+    assert processor.excel_data['dni_po_terminie'].tolist() == [27, 88, -13]
+    assert processor.excel_data['przedzial_zaleglosci'].tolist()[:2] == ['0-30', '61-90']
+    assert pd.isna(processor.excel_data['przedzial_zaleglosci'].iloc[2])
+
+    # Daty zapisane jako liczby Excela
+    processor.column_mapping = {'data_faktury': 'Serial'}
+    processor.compute_overdue_days(reference_date='2024-06-11')
+    assert processor.excel_data['dni_po_terminie'].tolist() == [27, 88, -13]
+
+    removed_count = processor.filter_by_overdue_buckets(['61-90', '90+'])
+    assert removed_count == 2
+    assert processor.excel_data['Data'].tolist() == ['2024-03-01']
+    print("✅ Wyliczanie z daty faktury poprawne")
+
+def test_mapped_overdue_column_kept():
+    """Testuje, że zmapowana kolumna z pliku nie jest nadpisywana"""
+    print("🧪 Test zachowania kolumny dni po terminie z pliku")
+
+    processor = DataProcessor()
+    processor.excel_data = pd.DataFrame({'Data': ['2024-05-01'], 'Dni': [5]})
+    processor.column_mapping = {'data_faktury': 'Data', 'dni_po_terminie': 'Dni'}
+
+    assert not processor.apply_date_stage()
+    assert 'przedzial_zaleglosci' not in processor.excel_data.columns
+    print("✅ Kolumna z pliku zachowana")
+
+if __name__ == "__main__":
+    test_overdue_from_due_date()
+    test_overdue_from_invoice_date()
+    test_mapped_overdue_column_kept()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test rejestru placeholderów i kompilowanych szablonów
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from placeholders import PlaceholderRegistry, CompiledTemplate, render_message
+from sending_engine import SendingEngine
+
+PLACEHOLDERS = [
+    {'name': 'numer_konta', 'value': 'PL12 3456', 'description': 'Numer konta bankowego'},
+    {'name': 'nazwa_firmy', 'value': 'KPJ {PL}', 'description': 'Nazwa firmy'}
+]
+
+class RecordingSender:
+    """Sender zapisujący wypełnione wiadomości (bez połączenia z dostawcą)"""
+
+    def __init__(self):
+        self.messages = []
+
+    def _send(self, recipient, template_data, template):
+        self.messages.append(render_message(template, template_data))
+        return True, "Wysłano"
+
+    send_reminder_email = _send
+    send_reminder_sms = _send
+
+def test_registry_lookup_and_compile():
+    """Testuje wyszukiwanie placeholderów i kompilację szablonu"""
+    print("🧪 Test rejestru placeholderów")
+    registry = PlaceholderRegistry(PLACEHOLDERS)
+    assert registry.get('numer_konta') == 'PL12 3456'
+    assert registry.get('brak') is None
+    assert 'kontrahent' in registry and 'nazwa_firmy' in registry and 'imie' not in registry
+
+    template = "<style>p { color: red; }</style>{kontrahent}: {kwota} zł na {numer_konta}, {nazwa_firmy} {{x}}"
+    compiled = registry.compile(template)
+    assert isinstance(compiled, CompiledTemplate)
+    assert registry.compile(template) is compiled
+    assert compiled.fields == {'kontrahent', 'kwota'}
+    assert compiled.is_valid
+    assert compiled.render({'kontrahent': 'ABC', 'kwota': '10,00'}) == \
+        "<style>p { color: red; }</style>ABC: 10,00 zł na PL12 3456, KPJ {PL} {x}"
+    # Zgodność z szablonem tekstowym
+    assert compiled.format(kontrahent='A', kwota='1') == compiled.render({'kontrahent': 'A', 'kwota': '1'})
+
+    # Zmiana placeholderów unieważnia skompilowane szablony
+    registry.update({'numer_konta': 'PL99', 'nazwa_firmy': 'X'})
+    assert registry.render(template, {'kontrahent': 'A', 'kwota': '1'}).endswith("na PL99, X {x}")
+    print("✅ Rejestr i kompilacja działają")
+
+def test_validation_and_render_message():
+    """Testuje wykrywanie nieznanych placeholderów"""
+    print("🧪 Test walidacji szablonu")
+    registry = PlaceholderRegistry(PLACEHOLDERS)
+    assert registry.validate("Szanowny/a {imie} {nazwisko}, {kwota} {imie}") == ['imie', 'nazwisko']
+    assert registry.render("{imie} {kwota}", {'kwota': '5'}, strict=False) == "{imie} 5"
+
+    # Szablon tekstowy w senderze - tylko pola danych, jak dotychczas str.format
+    assert render_message("{kontrahent} {{ok}}", {'kontrahent': 'A'}) == "A {ok}"
+    try:
+        render_message("{numer_konta}", {'kontrahent': 'A'})
+        assert False, "Oczekiwano KeyError"
+    except KeyError:
+        pass
+    print("✅ Nieznane placeholdery wykrywane")
+
+def test_engine_validates_once_per_campaign():
+    """Testuje, że silnik sprawdza szablon raz i nie wysyła z błędnym szablonem"""
+    print("🧪 Test walidacji szablonu w kampanii")
+    registry = PlaceholderRegistry(PLACEHOLDERS)
+    items = [{'kontrahent': f'Firma {i}', 'email': f'k{i}@firma.pl', 'telefon': '48500100200', 'kwota': '10'}
+             for i in range(5)]
+
+    email_sender, sms_sender = RecordingSender(), RecordingSender()
+    engine = SendingEngine(email_sender, sms_sender, "Dla {kontrahent}: konto {numer_konta}",
+                           "SMS {kontrahent} {imie}", delay=0, placeholders=registry)
+    compile_calls = []
+    original_compile = registry.compile
+    registry.compile = lambda template: compile_calls.append(template) or original_compile(template)
+
+    results = engine.run(items)
+    assert len(compile_calls) == 2, compile_calls
+    assert email_sender.messages[0] == "Dla Firma 0: konto PL12 3456"
+    assert len(email_sender.messages) == 5
+    # Szablon SMS z nieznanym placeholderem - brak wywołań dostawcy
+    assert sms_sender.messages == []
+    assert all(not result['sms_status']['success'] for result in results)
+    assert 'imie' in results[0]['sms_status']['message']
+    print("✅ Szablony sprawdzane raz na kampanię")
+
+if __name__ == "__main__":
+    test_registry_lookup_and_compile()
+    test_validation_and_render_message()
+    test_engine_validates_once_per_campaign()
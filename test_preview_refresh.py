@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test przyrostowego odświeżania podglądu (stabilne id wierszy)
+"""
+
+import sys
+import os
+import logging
+import tempfile
+import pandas as pd
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from data_processor import DataProcessor
+from main import WindykatorApp
+from dataset_model import DatasetModel
+
+class RecordingTree:
+    """Zastępuje Treeview podglądu i zlicza operacje na wierszach"""
+
+    def __init__(self):
+        self.rows = {}
+        self.order = []
+        self.operations = {'insert': 0, 'delete': 0, 'item': 0}
+
+    def insert(self, parent, index, iid=None, values=(), tags=()):
+        self.operations['insert'] += 1
+        self.rows[iid] = values
+        self.order.insert(len(self.order) if index == 'end' else index, iid)
+
+    def delete(self, *iids):
+        self.operations['delete'] += len(iids)
+        for iid in iids:
+            del self.rows[iid]
+            self.order.remove(iid)
+
+    def item(self, iid, values=None):
+        self.operations['item'] += 1
+        self.rows[iid] = values
+
+    def get_children(self):
+        return tuple(self.order)
+
+class PreviewHost:
+    """Minimalny obiekt z atrybutami używanymi przez WindykatorApp.refresh_preview"""
+
+    refresh_preview = WindykatorApp.refresh_preview
+    _on_dataset_change = WindykatorApp._on_dataset_change
+    _apply_dataset_change = WindykatorApp._apply_dataset_change
+
+    def __init__(self, data_processor):
+        self.data_processor = data_processor
+        self.data_mapping_widgets = {'preview_tree': RecordingTree()}
+        self.sending_status_tree = None
+        self.dataset = DatasetModel()
+        self.dataset.subscribe(self._on_dataset_change)
+        self.logger = logging.getLogger(__name__)
+
+    def update_preview_info(self):
+        pass
+
+def test_incremental_preview_refresh():
+    """Testuje, że usunięcie rozliczonych pozycji zmienia tylko usunięte wiersze"""
+    print("🧪 Test przyrostowego odświeżania podglądu")
+
+    with tempfile.TemporaryDirectory() as directory:
+        file_path = os.path.join(directory, 'dane.csv')
+        lines = ["Kontrahent;NIP;Numer;Kwota;Dni po terminie"]
+        for i in range(200):
+            amount = "-5,00" if i % 10 == 0 else f"{100 + i},00"
+            lines.append(f"Firma {i};5260250274;F/{i};{amount};{i}")
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+
+        processor = DataProcessor()
+        assert processor.load_excel_file(file_path)
+
+    host = PreviewHost(processor)
+    tree = host.data_mapping_widgets['preview_tree']
+    assert host.refresh_preview() == len(processor.excel_data)
+    assert tree.operations['insert'] == len(processor.excel_data)
+    first_ids = list(processor.excel_data.index)
+
+    # Ponowne odświeżenie bez zmian - brak operacji na Treeview
+    tree.operations = {'insert': 0, 'delete': 0, 'item': 0}
+    host.refresh_preview()
+    assert tree.operations == {'insert': 0, 'delete': 0, 'item': 0}
+
+    # Filtr przedziałów usuwa wiersze bez przenumerowania pozostałych
+    processor.excel_data = processor.excel_data.iloc[::2]
+    host.refresh_preview()
+    print(f"📊 Operacje po filtrze: {tree.operations}")
+    assert tree.operations == {'insert': 0, 'delete': len(first_ids) - len(processor.excel_data), 'item': 0}
+    assert tree.order == [f"row{row_id}" for row_id in processor.excel_data.index]
+
+    # Zmieniona wartość jednego wiersza - jedna aktualizacja
+    tree.operations = {'insert': 0, 'delete': 0, 'item': 0}
+    row_id = processor.excel_data.index[3]
+    processor.excel_data.loc[row_id, processor.column_mapping['kontrahent']] = 'Nowa nazwa'
+    host.refresh_preview()
+    assert tree.operations == {'insert': 0, 'delete': 0, 'item': 1}
+    assert tree.rows[f"row{row_id}"][0] == 'Nowa nazwa'
+    print("✅ Podgląd odświeżany przyrostowo")
+
+def test_remove_settled_keeps_row_ids():
+    """Testuje usuwanie rozliczonych pozycji ze stabilnymi id wierszy"""
+    print("🧪 Test usuwania rozliczonych ze stabilnymi id")
+
+    processor = DataProcessor()
+    processor.excel_data = pd.DataFrame({
+        'Kontrahent': ['A', 'B', 'C', 'D'],
+        'Kwota': ['10,00', '0,00', '-3,00', '7,50']
+    })
+    processor.column_mapping = {'kontrahent': 'Kontrahent', 'kwota': 'Kwota'}
+
+    assert processor.remove_settled_items() == 2
+    assert list(processor.excel_data.index) == [0, 3]
+    assert processor.process_row(3)['kontrahent'] == 'D'
+    assert processor.process_row(1) is None
+    assert [item['row_id'] for item in processor.get_preview_data_mapped(10)] == [0, 3]
+    print("✅ Id wierszy pozostają stabilne")
+
+if __name__ == "__main__":
+    test_incremental_preview_refresh()
+    test_remove_settled_keeps_row_ids()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test profilowania żądań (cProfile, próbkowanie stosu, limit katalogu, strona /profiles)
+"""
+
+import sys
+import os
+import pstats
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from profiling import ProfileStore
+
+def busy_work(seconds):
+    """Zajmuje procesor przez podany czas"""
+    end = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < end:
+        total += sum(range(100))
+    return total
+
+def test_profile_store():
+    """Testuje zapis profili obu trybów i usuwanie najstarszych"""
+    print("🧪 Test magazynu profili")
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = ProfileStore(directory, max_profiles=3)
+
+        assert store.run('upload_file', busy_work, 0.05) > 0
+        profile = store.list_profiles()[0]
+        assert profile['mode'] == 'cprofile' and profile['label'] == 'upload_file'
+        stats = pstats.Stats(store.get_path(profile['name']))
+        assert any(function[2] == 'busy_work' for function in stats.stats)
+
+        store.run('real_sending', busy_work, 0.1, mode='sampling')
+        profile = store.list_profiles()[0]
+        assert profile['mode'] == 'sampling' and profile['name'].endswith('.folded')
+        with open(store.get_path(profile['name']), 'r', encoding='utf-8') as f:
+            folded = f.read()
+        print(f"📊 Stosy: {folded.splitlines()[:2]}")
+        assert 'test_profiling.py:busy_work' in folded
+
+        for _ in range(3):
+            store.run('preview', busy_work, 0.001)
+        profiles = store.list_profiles()
+        assert len(profiles) == 3 and all(profile['label'] == 'preview' for profile in profiles)
+
+        # Tylko pliki profili z katalogu
+        assert store.get_path('../test_profiling.py') is None
+    print("✅ Magazyn profili działa poprawnie")
+
+def test_profiles_page():
+    """Testuje profilowanie żądania parametrem ?profile=1 i pobieranie profilu"""
+    print("🧪 Test strony profili")
+
+    import web_app
+    with tempfile.TemporaryDirectory() as directory:
+        original_store = web_app.profile_store
+        web_app.profile_store = ProfileStore(directory)
+        try:
+            client = web_app.app.test_client()
+            assert client.get('/upload?profile=1').status_code == 200
+            profiles = web_app.profile_store.list_profiles()
+            assert len(profiles) == 1 and profiles[0]['label'] == 'upload_file'
+            # Jawne wyłączenie nie profiluje żądania
+            client.get('/upload?profile=0')
+            client.get('/upload?profile=false')
+            assert len(web_app.profile_store.list_profiles()) == 1
+
+            page = client.get('/profiles').get_data(as_text=True)
+            assert profiles[0]['name'] in page
+
+            response = client.get(f"/profiles/{profiles[0]['name']}")
+            assert response.status_code == 200 and response.data
+            assert client.get('/profiles/nieistniejacy.prof').status_code == 404
+
+            # Przełącznik w sesji profiluje kolejne żądania bez parametru
+            client.post('/profiles', data={'mode': 'sampling'})
+            client.get('/upload')
+            assert web_app.profile_store.list_profiles()[0]['mode'] == 'sampling'
+            client.get('/upload?profile=0')
+            assert len(web_app.profile_store.list_profiles()) == 2
+            client.post('/profiles', data={'mode': ''})
+            client.get('/upload')
+            assert len(web_app.profile_store.list_profiles()) == 2
+            client.get('/upload?profile=true')
+            assert len(web_app.profile_store.list_profiles()) == 3
+        finally:
+            web_app.profile_store = original_store
+    print("✅ Strona profili działa poprawnie")
+
+def test_campaign_profiled_in_background():
+    """Testuje profil wysyłki kampanii w wątku tła (osobny od profilu żądania)"""
+    import web_app
+    from sending_control import SendingControl, CampaignStore
+    from sending_engine import SendingEngine
+
+    class Sender:
+        def send_reminder_email(self, recipient, template_data, template):
+            busy_work(0.01)
+            return True, "Wysłano"
+
+    with tempfile.TemporaryDirectory() as directory:
+        original_profiles, original_campaigns = web_app.profile_store, web_app.campaign_store
+        web_app.profile_store = ProfileStore(os.path.join(directory, 'profiles'))
+        web_app.campaign_store = CampaignStore(os.path.join(directory, 'campaigns'))
+        try:
+            control = SendingControl()
+            engine = SendingEngine(Sender(), None, 'Dla {kontrahent}', '', control=control)
+            items = [{'kontrahent': 'Firma', 'email': 'k@firma.pl', 'telefon': '', 'kwota': '10'}]
+            web_app.campaign_store.create('profil-1', control, 1)
+            lock = web_app.campaign_store.lock('profil-1')
+            assert lock.acquire(blocking=False)
+            web_app._run_campaign('profil-1', lock, engine, control, items, [0], True, False, None, None, 'cprofile')
+            profiles = web_app.profile_store.list_profiles()
+            assert [profile['label'] for profile in profiles] == ['real_sending_campaign']
+            assert web_app.campaign_store.load('profil-1')['completed'] == 1
+        finally:
+            web_app.profile_store, web_app.campaign_store = original_profiles, original_campaigns
+
+if __name__ == "__main__":
+    test_profile_store()
+    test_profiles_page()
+    test_campaign_profiled_in_background()
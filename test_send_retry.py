@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test ponowień wysyłki (klasyfikacja błędów, Retry-After, backoff, dead-letter)
+"""
+
+import sys
+import os
+import json
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+
+from send_retry import (SendFailure, RetryPolicy, DeadLetterStore, parse_retry_after, http_failure,
+                        exception_failure, MAX_RETRY_AFTER)
+from sending_control import SendingControl
+from sending_engine import SendingEngine
+from sms_sender import SMSSender
+from metrics import metrics, SEND_RETRIES_TOTAL
+
+class FlakySender:
+    """Sender zwracający błędy przejściowe dla wybranych odbiorców przez określoną liczbę prób"""
+
+    def __init__(self, failures=None, permanent=()):
+        self.failures = dict(failures or {})
+        self.permanent = permanent
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def _send(self, recipient, template_data, template):
+        with self.lock:
+            self.calls.append(recipient)
+            if recipient in self.permanent:
+                return False, SendFailure("Błąd HTTP: 400", status_code=400)
+            if self.failures.get(recipient, 0) > 0:
+                self.failures[recipient] -= 1
+                return False, SendFailure("Błąd HTTP: 503", retryable=True, status_code=503)
+        return True, "Wysłano"
+
+    send_reminder_email = _send
+    send_reminder_sms = _send
+
+def make_items(count=3):
+    return [{'kontrahent': f'Firma {i}', 'email': f'k{i}@firma.pl', 'telefon': '', 'kwota': '10'}
+            for i in range(count)]
+
+def retry_count():
+    return sum(row['value'] for row in metrics.snapshot() if row['name'] == SEND_RETRIES_TOTAL)
+
+def test_classification_and_retry_after():
+    """Testuje klasyfikację błędów i nagłówek Retry-After"""
+    print("🧪 Test klasyfikacji błędów")
+    assert parse_retry_after('7') == 7.0 and parse_retry_after(None) is None and parse_retry_after('jutro') is None
+    now = datetime(2025, 3, 3, 10, 0, tzinfo=timezone.utc)
+    assert parse_retry_after(format_datetime(now + timedelta(seconds=30), usegmt=True), now=now) == 30.0
+
+    throttled = http_failure("Błąd HTTP: 429", 429, {'Retry-After': '3'})
+    assert throttled == "Błąd HTTP: 429" and throttled.retryable and throttled.retry_after == 3.0
+    assert not http_failure("Błąd HTTP: 401", 401).retryable
+    assert exception_failure("Timeout", requests.exceptions.ReadTimeout()).retryable
+    assert not exception_failure("Błąd", KeyError('x')).retryable
+
+    response = requests.Response()
+    response.status_code = 503
+    response.headers['Retry-After'] = '2'
+    failure = exception_failure("Graph", requests.exceptions.HTTPError(response=response))
+    assert failure.retryable and failure.status_code == 503 and failure.retry_after == 2.0
+    print("✅ Błędy sklasyfikowane")
+
+def test_policy_backoff():
+    """Testuje wykładnicze opóźnienie z rozrzutem i limit prób"""
+    policy = RetryPolicy(max_attempts=3, base_delay=1, max_delay=5, rng=random.Random(1))
+    for attempt, ceiling in ((1, 1), (2, 2), (3, 4), (4, 5), (10, 5)):
+        delays = [policy.delay(attempt) for _ in range(50)]
+        assert all(0 <= delay <= ceiling for delay in delays) and len(set(delays)) > 1
+    assert policy.delay(1, retry_after=9) == 9
+    status = {'success': False, 'message': 'x', 'retryable': True, 'retry_after': None}
+    assert policy.should_retry(status, 1) and policy.should_retry(status, 2) and not policy.should_retry(status, 3)
+    assert not policy.should_retry(dict(status, retryable=False), 1)
+    assert not policy.should_retry(dict(status, retry_after=MAX_RETRY_AFTER + 1), 1)
+    assert RetryPolicy.from_config(None) is None
+    try:
+        RetryPolicy(max_attempts=0)
+        assert False, "Oczekiwano ValueError"
+    except ValueError:
+        pass
+
+def test_engine_retries_without_blocking():
+    """Testuje ponowienia w silniku - inne pozycje są wysyłane w czasie oczekiwania"""
+    print("🧪 Test ponowień w silniku")
+    for control in (None, SendingControl(concurrency=1)):
+        sender = FlakySender(failures={'k0@firma.pl': 2})
+        engine = SendingEngine(sender, None, 'Dla {kontrahent}', '', delay=0, control=control,
+                               retry_policy=RetryPolicy(max_attempts=3, base_delay=0.05))
+        reported = []
+        before = retry_count()
+        results = engine.run(make_items(), True, False, on_result=lambda i, result: reported.append(i))
+
+        assert sender.calls[:3] == ['k0@firma.pl', 'k1@firma.pl', 'k2@firma.pl']
+        assert sender.calls.count('k0@firma.pl') == 3
+        assert sorted(reported) == [0, 1, 2] and reported[-1] == 0
+        assert all(result['email_status']['success'] for result in results)
+        assert retry_count() - before == 2
+    print("✅ Błąd przejściowy ponowiony bez blokowania kolejki")
+
+def test_dead_letters_and_replay():
+    """Testuje odkładanie nieudanych wiadomości i ich zbiorcze ponowienie"""
+    print("🧪 Test dead-letter")
+    with tempfile.TemporaryDirectory() as directory:
+        store = DeadLetterStore(os.path.join(directory, 'dead_letters.jsonl'))
+        sender = FlakySender(failures={'k0@firma.pl': 5}, permanent=('k1@firma.pl',))
+        engine = SendingEngine(sender, None, 'Dla {kontrahent}', '', delay=0,
+                               retry_policy=RetryPolicy(max_attempts=2, base_delay=0.01), dead_letters=store)
+        results = engine.run(make_items(), True, False)
+        assert [result['email_status']['success'] for result in results] == [False, False, True]
+
+        records = {record['item']['email']: record for record in store.list()}
+        assert records['k0@firma.pl']['reason'] == 'exhausted' and records['k0@firma.pl']['attempts'] == 2
+        assert records['k1@firma.pl']['reason'] == 'permanent'
+        assert records['k0@firma.pl']['message'] == "Błąd HTTP: 503"
+
+        # Anulowana kampania - nierozpoczęte rekordy wracają bez zmian (id, powód, liczba prób)
+        before = sorted(store.list(), key=lambda record: record['id'])
+        control = SendingControl()
+        control.cancel()
+        cancelled = SendingEngine(FlakySender(), None, 'Dla {kontrahent}', '', control=control, dead_letters=store)
+        assert store.replay(cancelled) == (0, 2)
+        assert sorted(store.list(), key=lambda record: record['id']) == before
+
+        # Dostawca działa ponownie, dane kontrahenta poprawione - ponowienie zbiorcze
+        fixed = SendingEngine(FlakySender(), None, 'Dla {kontrahent}', '', delay=0, dead_letters=store)
+        assert store.replay(fixed) == (2, 0)
+        assert store.list() == []
+    print("✅ Wiadomości odłożone i ponowione")
+
+def add_dead_letters(path, worker, count):
+    store = DeadLetterStore(path)
+    for i in range(count):
+        store.add('email', {'email': f'k{worker}-{i}@firma.pl'}, "Błąd HTTP: 503", 1)
+
+def test_dead_letters_from_many_processes():
+    """Testuje dopisywanie do magazynu z kilku procesów naraz (blokada pliku)"""
+    import multiprocessing
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'dead_letters.jsonl')
+        workers = [multiprocessing.Process(target=add_dead_letters, args=(path, worker, 100)) for worker in range(4)]
+        for worker in workers:
+            worker.start()
+        store = DeadLetterStore(path)
+        taken = []
+        while any(worker.is_alive() for worker in workers):
+            taken += store.take()
+        for worker in workers:
+            worker.join()
+        taken += store.take()
+        assert len(taken) == 400 and len({record['id'] for record in taken}) == 400
+        assert store.list() == []
+
+def test_cancel_with_pending_retry():
+    """Testuje anulowanie, gdy wiadomość czeka na ponowienie"""
+    with tempfile.TemporaryDirectory() as directory:
+        store = DeadLetterStore(os.path.join(directory, 'dead_letters.jsonl'))
+        control = SendingControl(concurrency=2)
+        engine = SendingEngine(FlakySender(failures={'k0@firma.pl': 5}), None, 'Dla {kontrahent}', '',
+                               control=control, retry_policy=RetryPolicy(max_attempts=5, base_delay=30),
+                               dead_letters=store)
+        reported = []
+        thread = threading.Thread(target=lambda: engine.run(make_items(2), True, False,
+                                                            on_result=lambda i, result: reported.append(i)))
+        thread.start()
+        deadline = time.monotonic() + 5
+        while reported != [1]:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        control.cancel()
+        thread.join(5)
+        assert not thread.is_alive() and sorted(reported) == [0, 1]
+        assert [record['reason'] for record in store.list()] == ['cancelled']
+
+def test_scheduled_retry():
+    """Testuje ponowienie wiadomości z harmonogramu (nowy termin zamiast natychmiastowej próby)"""
+    from sending_scheduler import CampaignSchedule, STATUS_PENDING, STATUS_SENT
+    sender = FlakySender(failures={'k0@firma.pl': 1})
+    engine = SendingEngine(sender, None, 'Dla {kontrahent}', '', delay=0)
+    start = datetime(2025, 3, 3, 10, 0)
+    schedule = CampaignSchedule.build(make_items(1), True, False, start=start)
+    policy = RetryPolicy(max_attempts=2, base_delay=10, rng=random.Random(3))
+    send_entry = lambda channel, item: engine.send_channel(item, channel, record=False)
+
+    assert schedule.run_due(send_entry, start, retry_policy=policy) == 1
+    entry = schedule.entries[0]
+    assert entry['status'] == STATUS_PENDING and entry['attempts'] == 1
+    assert start < schedule.next_due() <= start + timedelta(seconds=10)
+    schedule.run_due(send_entry, schedule.next_due(), retry_policy=policy)
+    assert entry['status'] == STATUS_SENT and entry['attempts'] == 2
+
+class ProviderHandler(BaseHTTPRequestHandler):
+    """Atrapa SMSAPI: pierwsze żądanie 429 z Retry-After, kolejne - sukces"""
+    requests_seen = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        ProviderHandler.requests_seen += 1
+        if ProviderHandler.requests_seen == 1:
+            body, status, headers = b'{"error":429}', 429, {'Retry-After': '0'}
+        elif ProviderHandler.requests_seen == 2:
+            body, status, headers = json.dumps({'error': 999, 'message': 'Wewnętrzny błąd'}).encode(), 200, {}
+        else:
+            body, status, headers = b'{"count":1,"list":[{"id":"1"}]}', 200, {}
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def test_sms_sender_with_retries():
+    """Testuje klasyfikację odpowiedzi SMSAPI i ponowienie w silniku"""
+    print("🧪 Test ponowień SMSAPI")
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ProviderHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        ProviderHandler.requests_seen = 0
+        sender = SMSSender('token', None, f'http://127.0.0.1:{server.server_address[1]}/sms.do')
+        success, message = sender.send_sms('48500100200', 'Test')
+        assert not success and message.retryable and message.retry_after == 0.0
+        success, message = sender.send_sms('48500100200', 'Test')
+        assert not success and message.retryable
+
+        ProviderHandler.requests_seen = 0
+        engine = SendingEngine(None, sender, '', 'SMS {kontrahent}', delay=0,
+                               retry_policy=RetryPolicy(max_attempts=3, base_delay=0.01))
+        results = engine.run([{'kontrahent': 'A', 'telefon': '48500100200'}], False, True)
+        assert results[0]['sms_status']['success'] and ProviderHandler.requests_seen == 3
+    finally:
+        server.shutdown()
+    print("✅ SMSAPI ponowione po 429 i błędzie wewnętrznym")
+
+if __name__ == "__main__":
+    test_classification_and_retry_after()
+    test_policy_backoff()
+    test_engine_retries_without_blocking()
+    test_dead_letters_and_replay()
+    test_dead_letters_from_many_processes()
+    test_cancel_with_pending_retry()
+    test_scheduled_retry()
+    test_sms_sender_with_retries()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test pul senderów (kilka kont, wybór konta, tempo i stan kont)
+"""
+
+import sys
+import os
+import json
+import tempfile
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sender_pool import (SenderPool, PoolMember, build_sms_sender, normalize_strategy, STRATEGY_ROUND_ROBIN)
+from circuit_breaker import STATE_OPEN
+from send_retry import SendFailure
+from sending_control import SendingControl
+from sending_engine import SendingEngine
+from sending_process import build_senders
+from sms_sender import SMSSender
+from config import Config
+
+class FakeClock:
+    """Zegar sterowany w teście - sleep przesuwa czas"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+class AccountSender:
+    """Sender jednego konta zapisujący wysłane wiadomości"""
+
+    def __init__(self, name, failing=False, latency=0.0):
+        self.name = name
+        self.failing = failing
+        self.latency = latency
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def send_reminder_sms(self, phone_number, template_data, template):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failing:
+            return False, SendFailure("Błąd HTTP: 503", retryable=True, status_code=503)
+        with self.lock:
+            self.sent.append(phone_number)
+        return True, f"Wysłano przez {self.name}"
+
+def make_pool(senders, strategy=None, rate=None, clock=None):
+    clock = clock or FakeClock()
+    members = [PoolMember(sender.name, sender, rate, {'min_calls': 2, 'window_size': 2, 'open_seconds': 60}, clock)
+               for sender in senders]
+    return SenderPool(members, strategy, provider='smsapi', clock=clock, sleep=clock.sleep), clock
+
+def test_least_loaded_with_rates():
+    """Testuje rozłożenie wiadomości na konta według ich tempa"""
+    print("🧪 Test puli - najmniej obciążone konto")
+    senders = [AccountSender(name) for name in ('a', 'b', 'c')]
+    pool, clock = make_pool(senders, rate=1)
+    for i in range(6):
+        assert pool.send_reminder_sms(f'4850010020{i}', {}, None)[0]
+    assert [len(sender.sent) for sender in senders] == [2, 2, 2]
+    # Trzy konta po 1 wiad./s - 6 wiadomości w 1 s zamiast 5 s
+    assert clock.now == 1.0 and pool.rate == 3
+    print("✅ Wiadomości rozłożone na konta")
+
+def test_round_robin():
+    """Testuje wybór kolejnego konta"""
+    senders = [AccountSender(name) for name in ('a', 'b', 'c')]
+    pool, _ = make_pool(senders, STRATEGY_ROUND_ROBIN)
+    for i in range(4):
+        pool.send_reminder_sms(str(i), {}, None)
+    assert [sender.sent for sender in senders] == [['0', '3'], ['1'], ['2']]
+    try:
+        normalize_strategy('losowo')
+        assert False, "Oczekiwano ValueError"
+    except ValueError:
+        pass
+
+def test_health_and_failover():
+    """Testuje przełączenie na inne konto i pomijanie konta z otwartym obwodem"""
+    print("🧪 Test stanu kont puli")
+    broken, healthy = AccountSender('a', failing=True), AccountSender('b')
+    pool, clock = make_pool([broken, healthy], STRATEGY_ROUND_ROBIN)
+    for i in range(4):
+        success, message = pool.send_reminder_sms(str(i), {}, None)
+        assert success and message == "Wysłano przez b"
+    accounts = {account['name']: account for account in pool.snapshot()['accounts']}
+    assert accounts['a']['state'] == STATE_OPEN and accounts['a']['failed'] == 2
+    assert accounts['b']['sent'] == 4 and accounts['a']['last_error'] == "Błąd HTTP: 503"
+
+    # Żadne konto nie działa - błąd przejściowy z czasem do próby półotwartej
+    healthy.failing = True
+    pool.send_reminder_sms('x', {}, None)
+    pool.send_reminder_sms('y', {}, None)
+    success, message = pool.send_reminder_sms('z', {}, None)
+    assert not success and message.retryable and message.retry_after == 60
+    print("✅ Konto z błędami pominięte")
+
+def test_throughput_scales_with_accounts():
+    """Testuje przepustowość kampanii rosnącą z liczbą kont"""
+    print("🧪 Test skalowania przepustowości")
+    items = [{'kontrahent': f'Firma {i}', 'telefon': f'48500{i:06d}'} for i in range(24)]
+    elapsed = {}
+    for count in (1, 4):
+        members = [PoolMember(f'konto-{i}', AccountSender(f'konto-{i}', latency=0.01), rate=20) for i in range(count)]
+        pool = SenderPool(members)
+        engine = SendingEngine(None, pool, '', 'SMS {kontrahent}', control=SendingControl(concurrency=count))
+        start = time.perf_counter()
+        results = engine.run(items, False, True)
+        elapsed[count] = time.perf_counter() - start
+        assert all(result['sms_status']['success'] for result in results)
+        assert sum(member.sent for member in pool.members) == 24
+    assert elapsed[1] / elapsed[4] > 2.5, elapsed
+    print(f"✅ 1 konto: {elapsed[1]:.2f} s, 4 konta: {elapsed[4]:.2f} s")
+
+def test_config_accounts():
+    """Testuje konta z api_config.json i budowanie senderów"""
+    config = Config()
+    with tempfile.TemporaryDirectory() as directory:
+        config.config_file = os.path.join(directory, 'api_config.json')
+        with open(config.config_file, 'w', encoding='utf-8') as f:
+            json.dump({'client_id': 'app', 'client_secret': 'tajne', 'sms_token': 'token-1',
+                       'email_accounts': [{'name': 'biuro', 'mailbox': 'biuro@firma.pl', 'rate': 2},
+                                          {'mailbox': 'windykacja@firma.pl', 'client_id': 'app-2'}],
+                       'sms_accounts': [{'name': 'glowne'}, {'name': 'zapasowe', 'sms_token': 'token-2'},
+                                        {'name': 'puste', 'sms_token': ''}],
+                       'sender_pool': {'strategy': 'round_robin'}}, f)
+        email = config.load_sender_accounts('email')
+        assert [(account['client_id'], account['client_secret']) for account in email] == [('app', 'tajne'),
+                                                                                         ('app-2', 'tajne')]
+        sms = config.load_sender_accounts('sms')
+        assert [account['sms_token'] for account in sms] == ['token-1', 'token-2', 'token-1']
+        assert config.load_sender_pool_strategy() == STRATEGY_ROUND_ROBIN
+
+        pool = build_sms_sender(sms[:2], STRATEGY_ROUND_ROBIN)
+        assert isinstance(pool, SenderPool) and [member.name for member in pool.members] == ['glowne', 'zapasowe']
+        assert isinstance(build_sms_sender(sms[:1]), SMSSender)
+
+        _, sms_sender = build_senders({'sms_config': {'accounts': sms[:2], 'strategy': 'least_loaded'}})
+        assert isinstance(sms_sender, SenderPool) and sms_sender.strategy == 'least_loaded'
+
+if __name__ == "__main__":
+    test_least_loaded_with_rates()
+    test_round_robin()
+    test_health_and_failover()
+    test_throughput_scales_with_accounts()
+    test_config_accounts()
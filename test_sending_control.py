@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test sterowania kampanią w trakcie wysyłki (równoległość, tempo, wstrzymanie, anulowanie)
+"""
+
+import sys
+import os
+import tempfile
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sending_control import SendingControl, CampaignStore
+from sending_engine import SendingEngine
+
+class SlowSender:
+    """Sender symulujący czas odpowiedzi dostawcy i mierzący równoległość"""
+
+    def __init__(self, seconds=0.05):
+        self.seconds = seconds
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.sent_at = []
+
+    def _send(self, recipient, template_data, template):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            self.sent_at.append(time.monotonic())
+        time.sleep(self.seconds)
+        with self.lock:
+            self.active -= 1
+        return True, "Wysłano"
+
+    send_reminder_email = _send
+    send_reminder_sms = _send
+
+def make_items(count):
+    return [{'kontrahent': f'Firma {i}', 'email': f'k{i}@firma.pl', 'telefon': '', 'kwota': '10'}
+            for i in range(count)]
+
+def run_in_thread(engine, items, results):
+    thread = threading.Thread(target=lambda: results.extend(engine.run(items, True, False)), daemon=True)
+    thread.start()
+    return thread
+
+def test_control_validation():
+    """Testuje walidację i zmianę limitów"""
+    control = SendingControl(concurrency=2, email_rate=5)
+    assert control.snapshot()['email_rate'] == 5.0 and control.snapshot()['sms_rate'] is None
+    control.set_limits(sms_rate=0)  # 0 - bez limitu
+    assert control.snapshot()['sms_rate'] is None and control.snapshot()['email_rate'] == 5.0
+    for bad in ({'concurrency': 0}, {'concurrency': 100}, {'email_rate': -1}):
+        try:
+            control.set_limits(**bad)
+            assert False, f"Oczekiwano ValueError dla {bad}"
+        except ValueError:
+            pass
+    try:
+        control.apply('stop')
+        assert False, "Oczekiwano ValueError"
+    except ValueError:
+        pass
+    assert control.apply('pause', concurrency=3) == dict(control.snapshot(), paused=True, concurrency=3)
+
+def test_concurrency_change_during_campaign():
+    """Testuje zwiększenie równoległości w trakcie kampanii"""
+    print("🧪 Test zmiany równoległości")
+    sender = SlowSender(0.05)
+    control = SendingControl(concurrency=1)
+    engine = SendingEngine(sender, None, 'Dla {kontrahent}', '', control=control)
+    results = []
+    thread = run_in_thread(engine, make_items(40), results)
+
+    time.sleep(0.2)
+    assert sender.max_active == 1
+    control.set_limits(concurrency=4)
+    thread.join(10)
+    assert not thread.is_alive()
+    assert sender.max_active == 4
+    assert len(results) == 40 and all(result['email_status']['success'] for result in results)
+    assert [result['kontrahent'] for result in results] == [f'Firma {i}' for i in range(40)]
+    print(f"✅ Równoległość zmieniona w trakcie (max {sender.max_active})")
+
+def test_rate_change_picked_up_within_second():
+    """Testuje, że nowe tempo działa także dla wiadomości, która już czeka"""
+    print("🧪 Test zmiany tempa")
+    sender = SlowSender(0)
+    control = SendingControl(concurrency=1, email_rate=0.2)  # co 5 s
+    engine = SendingEngine(sender, None, 'Dla {kontrahent}', '', control=control)
+    results = []
+    thread = run_in_thread(engine, make_items(5), results)
+
+    time.sleep(0.3)
+    assert len(sender.sent_at) == 1
+    changed_at = time.monotonic()
+    control.set_limits(email_rate=50)
+    thread.join(5)
+    assert len(results) == 5
+    assert sender.sent_at[1] - changed_at < 1.0
+    print("✅ Nowe tempo zastosowane w ciągu sekundy")
+
+def test_pause_resume_and_cancel_keep_in_flight_results():
+    """Testuje wstrzymanie i anulowanie bez utraty rozpoczętych wysyłek"""
+    print("🧪 Test wstrzymania i anulowania")
+    sender = SlowSender(0.2)
+    control = SendingControl(concurrency=3)
+    engine = SendingEngine(sender, None, 'Dla {kontrahent}', '', control=control)
+    reported = []
+    results = []
+    thread = threading.Thread(target=lambda: results.extend(
+        engine.run(make_items(30), True, False, on_result=lambda i, result: reported.append(i))), daemon=True)
+    thread.start()
+
+    time.sleep(0.1)
+    control.pause()
+    time.sleep(0.3)  # rozpoczęte wysyłki kończą się
+    paused_count = len(sender.sent_at)
+    time.sleep(0.3)
+    assert len(sender.sent_at) == paused_count == 3
+
+    control.resume()
+    time.sleep(0.1)
+    control.cancel()
+    thread.join(5)
+    assert not thread.is_alive()
+    started = len(sender.sent_at)
+    assert 3 < started < 30
+    # Każda rozpoczęta wysyłka oddała wynik
+    assert len(results) == len(reported) == started
+    assert all(result['email_status']['success'] for result in results)
+    print(f"✅ Anulowano po {started} pozycjach bez utraty wyników")
+
+def test_cancel_while_waiting_for_rate():
+    """Testuje pozycję czekającą na tempo kanału w chwili anulowania"""
+    sender = SlowSender(0)
+    control = SendingControl(concurrency=2, email_rate=0.1)
+    engine = SendingEngine(sender, None, 'Dla {kontrahent}', '', control=control)
+    results = []
+    thread = run_in_thread(engine, make_items(3), results)
+    time.sleep(0.3)
+    control.cancel()
+    thread.join(2)
+    assert not thread.is_alive()
+    assert len(sender.sent_at) == 1
+    statuses = [result['email_status'] for result in results]
+    assert statuses[0]['success'] and statuses[1].get('cancelled') and not statuses[1]['success']
+
+def run_campaign_worker(directory, campaign_id, started, finish):
+    """Proces wysyłający kampanię (inny worker niż ten, który obsługuje API)"""
+    store = CampaignStore(directory)
+    control = SendingControl()
+    with store.lock(campaign_id):
+        store.create(campaign_id, control, 10)
+        stop_sync = threading.Event()
+        sync = threading.Thread(target=store.follow, args=(campaign_id, control, lambda: 4, stop_sync, 0.05))
+        sync.start()
+        started.set()
+        # Kampania trwa do sygnału finish i kończy się z ustawieniami przyjętymi z pliku
+        finish.wait(10)
+        stop_sync.set()
+        sync.join()
+        state = control.snapshot()
+        store.finish(campaign_id, [{'email_status': {'success': True}}], f"paused={state['paused']}")
+
+def test_web_sending_control_api():
+    """Testuje API sterowania kampanią wysyłaną przez inny proces"""
+    print("🧪 Test API sterowania kampanią")
+    import multiprocessing
+    import web_app
+    store = web_app.campaign_store
+    client = web_app.app.test_client()
+    with tempfile.TemporaryDirectory() as directory:
+        web_app.campaign_store = CampaignStore(directory)
+        started, finish = multiprocessing.Event(), multiprocessing.Event()
+        worker = multiprocessing.Process(target=run_campaign_worker,
+                                         args=(directory, 'test-kampania', started, finish))
+        worker.start()
+        try:
+            assert started.wait(10)
+            response = client.post('/api/sending_control/test-kampania',
+                                   json={'action': 'pause', 'concurrency': 3, 'sms_rate': 0.5})
+            campaign = response.get_json()['campaign']
+            assert campaign['paused'] and campaign['concurrency'] == 3 and campaign['sms_rate'] == 0.5
+            assert campaign['total'] == 10 and campaign['running']
+
+            assert client.post('/api/sending_control/test-kampania', json={'concurrency': 0}).status_code == 400
+            assert client.post('/api/sending_control/zle%20id', json={}).status_code == 400
+            listed = client.get('/api/sending_control').get_json()['campaigns']
+            assert [campaign['campaign_id'] for campaign in listed] == ['test-kampania']
+            assert client.get('/api/sending_control/brak').status_code == 404
+
+            # Postęp zapisuje worker wysyłający
+            deadline = time.monotonic() + 5
+            while client.get('/api/sending_control/test-kampania').get_json()['campaign']['completed'] != 4:
+                assert time.monotonic() < deadline
+                time.sleep(0.05)
+        finally:
+            time.sleep(0.2)
+            finish.set()
+            worker.join(10)
+            web_app.campaign_store = store
+
+            campaign = CampaignStore(directory).load('test-kampania')
+        # Wstrzymanie z API przyjął worker wysyłający; po zakończeniu są wyniki, a sterowanie - nie
+        assert campaign['finished'] and not campaign['running'] and campaign['message'] == 'paused=True'
+        assert campaign['results'] == [{'email_status': {'success': True}}] and campaign['completed'] == 1
+        assert CampaignStore(directory).apply('test-kampania', 'resume') is None
+        assert CampaignStore(directory).list() == []
+    print("✅ API sterowania działa")
+
+class CancellingSender(SlowSender):
+    """Sender anulujący kampanię przez API po drugiej wiadomości"""
+
+    def __init__(self, client, campaign_id):
+        super().__init__(0.05)
+        self.client = client
+        self.campaign_id = campaign_id
+        self.recipients = []
+
+    def send_reminder_email(self, recipient, template_data, template):
+        self.recipients.append(recipient)
+        result = self._send(recipient, template_data, template)
+        if len(self.recipients) == 2:
+            self.client.post(f'/api/sending_control/{self.campaign_id}', json={'action': 'cancel'})
+            # Worker wysyłający przyjmuje anulowanie przy najbliższej synchronizacji
+            time.sleep(0.7)
+        return result
+
+def test_web_real_sending_returns_at_once():
+    """Testuje, że /api/real_sending zwraca id kampanii od razu, a wyniki mają wiersze podglądu"""
+    import web_app
+    store, create_senders = web_app.campaign_store, web_app._create_senders
+    load_template = web_app.config.load_template
+    client = web_app.app.test_client()
+    sender = CancellingSender(client, 'web-1')
+    preview = make_items(5)
+    for item, amount in zip(preview, ('5', '10', '1000', '20', '500')):
+        item['kwota'] = amount
+    with tempfile.TemporaryDirectory() as directory:
+        web_app.campaign_store = CampaignStore(directory)
+        web_app._create_senders = lambda send_email, send_sms: (sender, None, None)
+        web_app.config.load_template = lambda *args, **kwargs: 'Dla {kontrahent}'
+        try:
+            with client.session_transaction() as session:
+                session['preview_data'] = preview
+            start = time.monotonic()
+            data = client.post('/api/real_sending', json={'send_email': True, 'campaign_id': 'web-1',
+                                                          'selected_rows': [1, 2, 3, 4], 'concurrency': 1,
+                                                          'email_rate': None}).get_json()
+            assert data['success'] and data['campaign_id'] == 'web-1' and data['total'] == 4
+            assert time.monotonic() - start < 0.4
+            assert not client.post('/api/real_sending', json={'send_email': True, 'campaign_id': 'web-1'}).get_json()['success']
+
+            deadline = time.monotonic() + 10
+            while not (campaign := client.get('/api/sending_control/web-1').get_json()['campaign'])['finished']:
+                assert time.monotonic() < deadline
+                time.sleep(0.05)
+        finally:
+            web_app.campaign_store, web_app._create_senders = store, create_senders
+            web_app.config.load_template = load_template
+    assert campaign['cancelled'] and not campaign['error'] and campaign['completed'] == 2
+    # Wysłane pozycje (według priorytetu kwoty) wskazują swoje wiersze podglądu, nie pierwsze wiersze tabeli
+    assert [preview[result['row']]['email'] for result in campaign['results']] == sorted(sender.recipients)
+    assert [result['row'] for result in campaign['results']] == [2, 4]
+    assert all(result['email_status']['success'] for result in campaign['results'])
+
+def test_finished_campaigns_pruned():
+    """Testuje usuwanie plików dawno zakończonych kampanii"""
+    with tempfile.TemporaryDirectory() as directory:
+        store = CampaignStore(directory)
+        store.create('stara', SendingControl(), 1)
+        store.finish('stara', [], 'Wysyłka zakończona dla 0 pozycji')
+        store.create('trwa', SendingControl(), 1)
+        store.prune(max_age=3600)
+        assert store.load('stara') is not None
+        store.prune(max_age=-1)
+        assert store.load('stara') is None and store.load('trwa') is not None
+
+if __name__ == "__main__":
+    test_control_validation()
+    test_concurrency_change_during_campaign()
+    test_rate_change_picked_up_within_second()
+    test_pause_resume_and_cancel_keep_in_flight_results()
+    test_cancel_while_waiting_for_rate()
+    test_web_sending_control_api()
+    test_web_real_sending_returns_at_once()
+    test_finished_campaigns_pruned()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test wspólnego silnika wysyłki i benchmarku wysyłki na atrapach dostawców
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sending_engine import SendingEngine, build_template_data
+from benchmark_sending import start_mock_providers, prepare_items, run_campaign, percentile
+
+class RecordingSender:
+    """Sender zapisujący wywołania (bez połączenia z dostawcą)"""
+
+    def __init__(self, fail_for=()):
+        self.calls = []
+        self.fail_for = fail_for
+
+    def _send(self, recipient, template_data, template):
+        self.calls.append((recipient, template.format(**template_data)))
+        if recipient in self.fail_for:
+            return False, "Błąd HTTP: 503"
+        return True, "Wysłano"
+
+    send_reminder_email = _send
+    send_reminder_sms = _send
+
+def test_sending_engine():
+    """Testuje wysyłkę pozycji, szablony przedziałów i przerwanie"""
+    print("🧪 Test silnika wysyłki")
+
+    items = [
+        {'kontrahent': 'A', 'email': 'a@firma.pl', 'telefon': '48500100200', 'nr_faktury': 'F/1', 'przedzial_zaleglosci': '90+'},
+        {'kontrahent': 'B', 'email': 'b@firma.pl', 'telefon': '', 'nr_faktury': 'F/2'},
+        {'kontrahent': 'C', 'email': '', 'telefon': '48500100300', 'nr_faktury': 'F/3'}
+    ]
+    assert build_template_data(items[1])['telefon'] == ''
+
+    email_sender = RecordingSender(fail_for={'b@firma.pl'})
+    sms_sender = RecordingSender()
+    loaded = []
+
+    def template_loader(template_type, bucket):
+        loaded.append((template_type, bucket))
+        return f"{template_type} {bucket} {{nr_faktury}}"
+
+    engine = SendingEngine(email_sender, sms_sender, "email {nr_faktury}", "sms {nr_faktury}",
+                           template_loader=template_loader, delay=0)
+    reported = []
+    results = engine.run(items, on_result=lambda i, result: reported.append(i))
+
+    assert reported == [0, 1, 2]
+    assert email_sender.calls == [('a@firma.pl', 'email 90+ F/1'), ('b@firma.pl', 'email F/2')]
+    assert sms_sender.calls == [('48500100200', 'sms 90+ F/1'), ('48500100300', 'sms F/3')]
+    assert results[1]['email_status']['success'] is False and results[1]['sms_status'] is None
+    assert results[2]['email_status'] is None and results[2]['sms_status']['success']
+    assert loaded == [('email', '90+'), ('sms', '90+')]
+
+    # Brak sendera dla włączonego kanału
+    result = SendingEngine(None, None, delay=0).send_item(items[0])
+    assert not result['email_status']['success'] and 'nie został zainicjalizowany' in result['sms_status']['message']
+
+    # Przerwanie przed drugą pozycją
+    results = engine.run(items, send_sms=False, should_stop=lambda: len(email_sender.calls) >= 3)
+    assert len(results) == 1
+    print("✅ Silnik wysyłki działa poprawnie")
+
+def test_benchmark_sending():
+    """Testuje benchmark kampanii na atrapach SMSAPI i Graph"""
+    print("🧪 Test benchmarku wysyłki")
+
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+
+    items = prepare_items(40)
+    assert len(items) == 40 and items[0]['email'] and items[0]['nr_faktury']
+
+    process, sms_url, graph_url = start_mock_providers(latency_ms=1, jitter_ms=0, error_rate=0.2, throttle_rate=0.1)
+    try:
+        campaign = run_campaign(items, sms_url, graph_url)
+    finally:
+        process.terminate()
+        process.join()
+
+    print(f"📊 {campaign['messages_per_second']} wiad./s, kanały: {campaign['channels']}")
+    email = campaign['channels']['email']
+    assert email['messages'] == sum(1 for item in items if item['email'])
+    assert email['sent'] + email['failed'] == email['messages']
+    assert 0 < email['failed'] < email['messages']
+    assert campaign['retries'] == 0
+    assert email['latency']['p50_ms'] <= email['latency']['p99_ms']
+    print("✅ Benchmark wysyłki poprawny")
+
+if __name__ == "__main__":
+    test_sending_engine()
+    test_benchmark_sending()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test wysyłki w procesie potomnym (komunikaty, wstrzymanie, anulowanie)
+"""
+
+import sys
+import os
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sending_process import SendingProcess, compact_status, expand_status
+from config import Config
+
+class FakeSender:
+    """Sender bez połączenia z dostawcą (tworzony w procesie potomnym)"""
+
+    def __init__(self, fail_for=()):
+        self.fail_for = fail_for
+
+    def _send(self, recipient, template_data, template):
+        if recipient in self.fail_for:
+            return False, "Odrzucono"
+        return True, "Wysłano"
+
+    send_reminder_email = _send
+    send_reminder_sms = _send
+
+def fake_senders(job):
+    """Fabryka senderów przekazywana do procesu potomnego"""
+    return FakeSender(fail_for=('k1@firma.pl',)), FakeSender()
+
+class RenderingSender:
+    """Sender odsyłający wyrenderowaną treść jako komunikat (sprawdzenie użytego szablonu)"""
+
+    def send_reminder_email(self, recipient, template_data, template):
+        return True, template.render(template_data)
+
+def rendering_senders(job):
+    return RenderingSender(), None
+
+def make_job(count, delay=0):
+    items = [{'kontrahent': f'Firma {i}', 'email': f'k{i}@firma.pl', 'telefon': '' if i == 2 else '48500100200',
+              'kwota': '10'} for i in range(count)]
+    return {'items': items, 'email_template': 'Dla {kontrahent}: {numer_konta}', 'sms_template': 'SMS {kontrahent}',
+            'placeholders': {'numer_konta': 'PL12'}, 'delay': delay}
+
+def collect(process, timeout=30):
+    """Odczytuje komunikaty aż do zakończenia procesu"""
+    messages = []
+    deadline = time.monotonic() + timeout
+    while not process.finished:
+        assert time.monotonic() < deadline, "Proces wysyłki nie zakończył się"
+        messages.extend(process.poll())
+        time.sleep(0.02)
+    return messages
+
+def test_compact_status_roundtrip():
+    """Testuje krótkie komunikaty statusu"""
+    assert compact_status(None) is None and expand_status(None) is None
+    status = {'success': False, 'message': 'Błąd', 'extra': 1}
+    assert expand_status(compact_status(status)) == {'success': False, 'message': 'Błąd'}
+
+def test_child_process_sends_and_reports():
+    """Testuje wysyłkę w procesie potomnym i komunikaty wyników"""
+    print("🧪 Test wysyłki w procesie potomnym")
+    process = SendingProcess(make_job(4), sender_factory=fake_senders).start()
+    messages = collect(process)
+    assert process.join(5)
+    assert process.process.pid != os.getpid()
+
+    results = {message[1]: message for message in messages if message[0] == 'result'}
+    assert sorted(results) == [0, 1, 2, 3]
+    assert results[0][2] == (True, "Wysłano") and results[0][3] == (True, "Wysłano")
+    assert results[1][2] == (False, "Odrzucono")
+    assert results[2][3] is None  # brak numeru telefonu - SMS nie był wysyłany
+    assert messages[-1] == ('done', 4, False)
+    print("✅ Wyniki przekazane z procesu potomnego")
+
+def test_pause_resume_and_cancel():
+    """Testuje wstrzymanie, zmianę limitów, wznowienie i anulowanie wysyłki"""
+    print("🧪 Test wstrzymania i anulowania")
+    process = SendingProcess(make_job(50, delay=0.05), sender_factory=fake_senders).start()
+    assert process.job.get('limits') is None  # limity z przerwy delay (20 wiadomości/s)
+    messages = []
+    while not any(message[0] == 'result' for message in messages):
+        messages.extend(process.poll())
+        time.sleep(0.01)
+
+    process.pause()
+    while not process.paused or not any(message[0] == 'state' and message[1]['paused'] for message in messages):
+        messages.extend(process.poll())
+        time.sleep(0.01)
+    time.sleep(0.1)
+    messages.extend(process.poll())
+    paused_count = sum(1 for message in messages if message[0] == 'result')
+    time.sleep(0.3)
+    messages.extend(process.poll())
+    assert sum(1 for message in messages if message[0] == 'result') == paused_count
+
+    # Nowe limity działają w trakcie wysyłki
+    process.set_limits(concurrency=2, sms_rate=None)
+    process.resume()
+    while process.paused or process.state['concurrency'] != 2:
+        messages.extend(process.poll())
+        time.sleep(0.01)
+    assert process.state['sms_rate'] is None
+    process.cancel()
+    messages.extend(collect(process))
+
+    done = messages[-1]
+    assert done[0] == 'done' and done[2] is True
+    assert paused_count <= done[1] < 50
+    print(f"✅ Wysyłka anulowana po {done[1]} pozycjach")
+
+def test_bucket_templates_in_child():
+    """Testuje szablony dedykowane przedziałom zaległości w procesie potomnym"""
+    job = make_job(3)
+    for item, bucket in zip(job['items'], ('90+', '0-30', None)):
+        item['przedzial_zaleglosci'] = bucket
+    job.update({'send_sms': False, 'bucket_templates': {('email', '90+'): 'Pilne {kontrahent}'}})
+    process = SendingProcess(job, sender_factory=rendering_senders).start()
+    messages = collect(process)
+    texts = {message[1]: message[2][1] for message in messages if message[0] == 'result'}
+    assert texts == {0: 'Pilne Firma 0', 1: 'Dla Firma 1: PL12', 2: 'Dla Firma 2: PL12'}, texts
+
+    # Zadanie aplikacji desktopowej dostaje tylko istniejące szablony przedziałów
+    config = Config()
+    with tempfile.TemporaryDirectory() as directory:
+        config.email_template_file = os.path.join(directory, 'email_template.txt')
+        config.sms_template_file = os.path.join(directory, 'sms_template.txt')
+        with open(os.path.join(directory, 'email_template_90plus.txt'), 'w', encoding='utf-8') as f:
+            f.write('Pilne {kontrahent}')
+        templates = config.load_bucket_templates(['email', 'sms'], ['0-30', '90+'])
+    assert templates == {('email', '90+'): 'Pilne {kontrahent}'}
+
+def crashing_senders(job):
+    """Fabryka kończąca proces potomny bez komunikatu (jak awaria interpretera)"""
+    os._exit(3)
+
+def test_crashed_child_reports_error():
+    """Testuje komunikat błędu, gdy proces potomny zakończy się bez wyniku"""
+    print("🧪 Test awarii procesu wysyłki")
+    process = SendingProcess(make_job(1), sender_factory=crashing_senders).start()
+    messages = collect(process)
+    assert messages[-1][0] == 'error' and '3' in messages[-1][1]
+    print("✅ Awaria procesu zgłoszona jako błąd")
+
+if __name__ == "__main__":
+    test_compact_status_roundtrip()
+    test_child_process_sends_and_reports()
+    test_pause_resume_and_cancel()
+    test_bucket_templates_in_child()
+    test_crashed_child_reports_error()
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test harmonogramu wysyłki (okna doręczeń, limity domen, zapis i wznowienie)
+"""
+
+import sys
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sending_scheduler import (DeliveryWindow, DomainBucket, CampaignSchedule, ScheduleStore, plan_channel,
+                               run_schedule, email_domain, normalize_settings, STATUS_SENT, STATUS_PENDING,
+                               STATUS_CANCELLED)
+
+# Poniedziałek 19:59 - okno SMS zamyka się o 20:00
+MONDAY_EVENING = datetime(2025, 3, 3, 19, 59)
+
+def make_items():
+    items = []
+    for i in range(6):
+        items.append({'kontrahent': f'Korpo {i}', 'email': f'k{i}@korpo.pl', 'telefon': '48500100200',
+                      'kwota': f'{(i + 1) * 100},00', 'dni_po_terminie': '10'})
+    items.append({'kontrahent': 'Mała', 'email': 'biuro@mala.pl', 'telefon': '', 'kwota': '10,00',
+                  'dni_po_terminie': '10'})
+    return items
+
+def test_delivery_window():
+    """Testuje okno doręczeń (dni robocze, godziny)"""
+    window = DeliveryWindow([0, 1, 2, 3, 4], '08:00', '20:00')
+    assert window.contains(MONDAY_EVENING)
+    assert not window.contains(datetime(2025, 3, 3, 20, 0))
+    assert window.next_open(datetime(2025, 3, 3, 20, 30)) == datetime(2025, 3, 4, 8, 0)
+    # Piątek wieczorem -> poniedziałek rano
+    assert window.next_open(datetime(2025, 3, 7, 21, 0)) == datetime(2025, 3, 10, 8, 0)
+    assert DeliveryWindow.from_config(None) is None
+    for bad in (([], '08:00', '20:00'), ([0], '20:00', '08:00'), ([7], '08:00', '20:00')):
+        try:
+            DeliveryWindow(*bad)
+            assert False, f"Oczekiwano ValueError dla {bad}"
+        except ValueError:
+            pass
+
+def test_domain_bucket_and_fair_plan():
+    """Testuje kubełek domeny i rozłożenie wiadomości jednej domeny w czasie"""
+    print("🧪 Test limitów domen")
+    bucket = DomainBucket(rate=0.1, burst=2)
+    assert bucket.ready_at(0) == 0
+    bucket.take(0)
+    assert bucket.ready_at(0) == 0  # seria 2
+    bucket.take(0)
+    assert bucket.ready_at(0) == 10
+    assert email_domain(' Jan@Korpo.PL ') == 'korpo.pl' and email_domain('') == ''
+
+    start = datetime(2025, 3, 3, 10, 0)
+    messages = [(rank, rank, 'korpo.pl') for rank in range(4)] + [(4, 4, 'mala.pl')]
+    plan = dict(plan_channel(messages, start, rate=1.0,
+                             bucket_factory=lambda domain: DomainBucket(0.1, 2)))
+    offsets = {index: timestamp - start.timestamp() for index, timestamp in plan.items()}
+    # Dwie z korpo.pl od razu, potem mała domena, kolejne korpo.pl co 10 s
+    assert [offsets[i] for i in (0, 1, 4)] == [0.0, 1.0, 2.0]
+    assert offsets[2] == 10.0 and offsets[3] == 20.0
+    print("✅ Domena rozłożona w czasie, inne domeny wypełniają przerwy")
+
+def test_schedule_windows_and_priority():
+    """Testuje harmonogram kampanii z oknem SMS i kolejnością według priorytetu"""
+    print("🧪 Test harmonogramu kampanii")
+    settings = {'email_rate': 1, 'sms_rate': 1, 'domain_rate': 0.5, 'domain_burst': 1}
+    schedule = CampaignSchedule.build(make_items(), True, True, settings=settings, start=MONDAY_EVENING,
+                                      priority_weights={})
+    email = [entry for entry in schedule.entries if entry['channel'] == 'email']
+    sms = [entry for entry in schedule.entries if entry['channel'] == 'sms']
+    assert len(email) == 7 and len(sms) == 6
+
+    # Najwyższa kwota pierwsza, mała domena nie czeka na korpo.pl
+    assert [entry['index'] for entry in email[:3]] == [5, 6, 4]
+    # SMS: wszystkie mieszczą się przed 20:00 przy tempie 1/s - przy 0.01/s część przechodzi na wtorek
+    assert all(entry['due'].startswith('2025-03-03T19:59') for entry in sms)
+    slow = CampaignSchedule.build(make_items(), False, True, settings={'sms_rate': 0.01}, start=MONDAY_EVENING)
+    dues = [datetime.fromisoformat(entry['due']) for entry in slow.entries]
+    assert dues[0] == MONDAY_EVENING and dues[1] == datetime(2025, 3, 4, 8, 0)
+    assert all(DeliveryWindow([0, 1, 2, 3, 4], '08:00', '20:00').contains(due) for due in dues)
+    print("✅ Terminy w oknach doręczeń")
+
+def test_run_persist_and_resume():
+    """Testuje wysyłkę terminów, zapis harmonogramu, wznowienie i anulowanie"""
+    print("🧪 Test zapisu i wznowienia harmonogramu")
+    sent = []
+
+    def send_entry(channel, item):
+        sent.append((channel, item['kontrahent']))
+        return {'success': True, 'message': 'Wysłano'}
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = ScheduleStore(directory)
+        start = datetime(2025, 3, 3, 10, 0)
+        schedule = CampaignSchedule.build(make_items(), True, False, settings={'email_rate': 1, 'domain_burst': 1},
+                                          start=start, campaign_id='kampania-1')
+        assert schedule.run_due(send_entry, start + timedelta(seconds=1)) == 2  # korpo.pl i mala.pl
+        store.save(schedule)
+
+        restored = store.load('kampania-1')
+        assert restored.summary()['counts'][STATUS_SENT] == 2
+        assert restored.summary()['counts'][STATUS_PENDING] == 5
+        # Aplikacja była wyłączona - zaległe terminy układane od teraz
+        later = start + timedelta(hours=5)
+        assert restored.run_due(send_entry, later) == 1
+        assert restored.next_due() > later
+
+        restored.cancel()
+        assert restored.finished and restored.summary()['counts'][STATUS_CANCELLED] == 4
+        store.save(restored)
+        assert [item.campaign_id for item in store.list()] == ['kampania-1']
+        try:
+            store.load('../etc')
+            assert False, "Oczekiwano ValueError"
+        except ValueError:
+            pass
+    print("✅ Harmonogram zapisany i wznowiony")
+
+def test_late_backlog_keeps_pace():
+    """Testuje zaległość po przestoju - wychodzi w tempie kanału i domen, a nie naraz"""
+    print("🧪 Test zaległości harmonogramu")
+    sent = []
+    start = datetime(2025, 3, 3, 10, 0)
+    schedule = CampaignSchedule.build(make_items(), True, False, start=start,
+                                      settings={'email_rate': 1, 'domain_rate': 0.2, 'domain_burst': 1})
+    stall = start + timedelta(seconds=60)
+    now = stall
+    assert schedule.run_due(lambda channel, item: sent.append((now, item['email'])) or {'success': True}, now) == 1
+    while not schedule.finished:
+        now += timedelta(seconds=0.5)
+        schedule.run_due(lambda channel, item: sent.append((now, item['email'])) or {'success': True}, now)
+    assert len(sent) == 7 and sent[0][0] == stall
+    moments = [moment for moment, _ in sent]
+    assert all((b - a).total_seconds() >= 1 for a, b in zip(moments, moments[1:]))
+    korpo = [moment for moment, email in sent if email.endswith('@korpo.pl')]
+    assert all((b - a).total_seconds() >= 5 for a, b in zip(korpo, korpo[1:]))
+
+    # Przesunięty termin SMS wypada po zamknięciu okna - kanał układany od otwarcia okna
+    sms = CampaignSchedule.build(make_items(), False, True, start=MONDAY_EVENING - timedelta(seconds=30))
+    sms.run_due(lambda channel, item: {'success': True}, MONDAY_EVENING + timedelta(seconds=58))
+    sms.run_due(lambda channel, item: {'success': True}, MONDAY_EVENING + timedelta(seconds=60))
+    assert sms.next_due() == datetime(2025, 3, 4, 8, 0)
+    print("✅ Zaległość wysłana w tempie planu")
+
+def test_run_schedule_until_done():
+    """Testuje wątek wysyłki harmonogramu aż do ostatniego terminu"""
+    sent = []
+    with tempfile.TemporaryDirectory() as directory:
+        store = ScheduleStore(directory)
+        schedule = CampaignSchedule.build(make_items()[:3], True, False,
+                                          settings={'email_rate': 20, 'domain_rate': 20, 'domain_burst': 1})
+        summary = run_schedule(schedule, store, lambda channel, item: sent.append(item) or {'success': True},
+                               threading.Event())
+        assert summary['finished'] and summary['counts'][STATUS_SENT] == 3 and len(sent) == 3
+        assert store.load(schedule.campaign_id).finished
+
+def hold_schedule_lock(directory, campaign_id, locked, release):
+    """Proces innego workera wysyłający harmonogram (trzyma jego blokadę)"""
+    with ScheduleStore(directory).lock(campaign_id):
+        locked.set()
+        release.wait(10)
+
+def test_cancel_from_other_process():
+    """Testuje anulowanie harmonogramu zgłoszone przez inny proces (plik znacznika)"""
+    import sending_scheduler
+    with tempfile.TemporaryDirectory() as directory:
+        store = ScheduleStore(directory)
+        schedule = CampaignSchedule.build(make_items(), True, False, start=datetime.now() + timedelta(days=1),
+                                          campaign_id='kampania-2')
+        store.save(schedule)
+        idle = sending_scheduler.MAX_IDLE_SECONDS
+        sending_scheduler.MAX_IDLE_SECONDS = 0.05
+        try:
+            thread = threading.Thread(target=run_schedule,
+                                      args=(schedule, store, lambda channel, item: {'success': True},
+                                            threading.Event()))
+            thread.start()
+            ScheduleStore(directory).request_cancel('kampania-2')
+            thread.join(5)
+        finally:
+            sending_scheduler.MAX_IDLE_SECONDS = idle
+        assert not thread.is_alive()
+        assert store.load('kampania-2').cancelled and not store.cancel_requested('kampania-2')
+
+def test_web_resume_takes_schedule_lock():
+    """Testuje wznawianie harmonogramów przez jeden proces naraz (blokada harmonogramu)"""
+    import multiprocessing
+    import web_app
+    with tempfile.TemporaryDirectory() as directory:
+        original_store = web_app.schedule_store
+        original_create = web_app._create_senders
+        web_app.schedule_store = ScheduleStore(directory)
+        web_app._create_senders = lambda send_email, send_sms: (None, None, None)
+        web_app.schedule_store.save(CampaignSchedule.build(make_items(), True, False, campaign_id='web-2',
+                                                           start=datetime.now() + timedelta(days=1)))
+        locked, release = multiprocessing.Event(), multiprocessing.Event()
+        worker = multiprocessing.Process(target=hold_schedule_lock, args=(directory, 'web-2', locked, release))
+        worker.start()
+        try:
+            assert locked.wait(10)
+            web_app.resume_scheduled_campaigns()
+            assert 'web-2' not in web_app.scheduled_campaigns
+            client = web_app.app.test_client()
+            assert client.get('/api/schedules/web-2').get_json()['schedule']['running']
+
+            release.set()
+            worker.join(10)
+            web_app.resume_scheduled_campaigns()
+            assert 'web-2' in web_app.scheduled_campaigns
+            web_app.resume_scheduled_campaigns()  # ponowne wywołanie nie uruchamia drugiego wątku
+            assert client.post('/api/schedules/web-2/cancel').get_json()['schedule']['cancelled']
+            deadline = time.monotonic() + 5
+            while 'web-2' in web_app.scheduled_campaigns:
+                assert time.monotonic() < deadline, "Wątek harmonogramu nie zakończył się"
+                time.sleep(0.01)
+            assert not web_app.schedule_store.is_running('web-2')
+        finally:
+            release.set()
+            worker.join(10)
+            with web_app.scheduled_campaigns_lock:
+                running = web_app.scheduled_campaigns.pop('web-2', None)
+            if running:
+                running['stop'].set()
+            web_app.schedule_store = original_store
+            web_app._create_senders = original_create
+
+def test_settings_validation():
+    """Testuje ustawienia harmonogramu"""
+    settings = normalize_settings({'windows': {'email': {'days': [5, 6]}}, 'sms_rate': 0})
+    assert settings['windows']['email'] == {'days': [5, 6]} and settings['sms_rate'] is None
+    assert settings['windows']['sms']['start'] == '08:00'
+    for bad in ({'domain_burst': 0}, {'email_rate': -1}, {'windows': {'sms': {'start': '25:00'}}}):
+        try:
+            normalize_settings(bad)
+            assert False, f"Oczekiwano ValueError dla {bad}"
+        except ValueError:
+            pass
+
+def test_web_schedule_api():
+    """Testuje API harmonogramu w aplikacji webowej"""
+    print("🧪 Test API harmonogramu")
+    import web_app
+    with tempfile.TemporaryDirectory() as directory:
+        original_store = web_app.schedule_store
+        original_create = web_app._create_senders
+        web_app.schedule_store = ScheduleStore(directory)
+        web_app._create_senders = lambda send_email, send_sms: (None, None, None)
+        try:
+            client = web_app.app.test_client()
+            with client.session_transaction() as session:
+                session['preview_data'] = make_items()
+            # Start w przyszłości - nic nie zostanie wysłane w trakcie testu
+            response = client.post('/api/schedule_sending', json={
+                'send_email': True, 'send_sms': True, 'campaign_id': 'web-1',
+                'start': (datetime.now() + timedelta(days=1)).isoformat()})
+            data = response.get_json()
+            assert data['success'], data
+            assert data['schedule']['total'] == 13 and data['schedule']['running']
+
+            assert client.get('/api/schedules/web-1').get_json()['schedule']['counts'][STATUS_PENDING] == 13
+            # Id istniejącego harmonogramu - odmowa bez nadpisania pliku
+            response = client.post('/api/schedule_sending', json={'send_email': True, 'campaign_id': 'web-1',
+                                                                  'selected_rows': [0]})
+            assert response.status_code == 409 and not response.get_json()['success']
+            assert web_app.schedule_store.load('web-1').summary()['total'] == 13
+            cancelled = client.post('/api/schedules/web-1/cancel').get_json()['schedule']
+            assert cancelled['cancelled'] and cancelled['counts'][STATUS_CANCELLED] == 13
+            # Wątek harmonogramu kończy się po anulowaniu
+            deadline = time.monotonic() + 5
+            while 'web-1' in web_app.scheduled_campaigns:
+                assert time.monotonic() < deadline, "Wątek harmonogramu nie zakończył się"
+                time.sleep(0.01)
+            listed = client.get('/api/schedules').get_json()['schedules']
+            assert [state['campaign_id'] for state in listed] == ['web-1']
+            # Zakończony harmonogram też nie jest nadpisywany
+            response = client.post('/api/schedule_sending', json={'send_email': True, 'campaign_id': 'web-1'})
+            assert response.status_code == 409 and web_app.schedule_store.load('web-1').cancelled
+            assert client.get('/api/schedules/brak').status_code == 404
+        finally:
+            with web_app.scheduled_campaigns_lock:
+                running = web_app.scheduled_campaigns.pop('web-1', None)
+            if running:
+                running['stop'].set()
+            web_app.schedule_store = original_store
+            web_app._create_senders = original_create
+    print("✅ API harmonogramu działa")
+
+if __name__ == "__main__":
+    test_delivery_window()
+    test_domain_bucket_and_fair_plan()
+    test_schedule_windows_and_priority()
+    test_run_persist_and_resume()
+    test_late_backlog_keeps_pace()
+    test_run_schedule_until_done()
+    test_cancel_from_other_process()
+    test_web_resume_takes_schedule_lock()
+    test_settings_validation()
+    test_web_schedule_api()
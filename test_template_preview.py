@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test podglądu szablonów na żywo (kompilacja, renderowanie w tle, debounce)
+"""
+
+import sys
+import os
+import threading
+import time
+import pandas as pd
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from data_processor import DataProcessor
+from placeholders import PlaceholderRegistry
+from template_preview import PreviewRenderer, render_template, html_to_text, sample_row, SAMPLE_DATA
+
+TEMPLATE = """<html><head><style>body { color: #333; }</style></head>
+<body><p>Szanowni Państwo {kontrahent},</p>
+<p>kwota {kwota} PLN, konto {numer_konta}, {nieznany}</p></body></html>"""
+
+def test_compiled_template_render():
+    """Testuje wypełnianie szablonu w podglądzie (z placeholderami stałymi rejestru)"""
+    print("🧪 Test renderowania szablonu w podglądzie")
+    registry = PlaceholderRegistry([{'name': 'numer_konta', 'value': 'PL00'}])
+    rendered = render_template(TEMPLATE, {'kontrahent': 'ABC', 'kwota': 10}, registry)
+    # Nawiasy CSS i nieznane placeholdery nie psują podglądu
+    assert 'body { color: #333; }' in rendered
+    assert 'Szanowni Państwo ABC,' in rendered and 'konto PL00, {nieznany}' in rendered
+    assert registry.compile(TEMPLATE) is registry.compile(TEMPLATE)
+
+    text = html_to_text(rendered)
+    assert text == "Szanowni Państwo ABC,\n\nkwota 10 PLN, konto PL00, {nieznany}", text
+    print("✅ Szablon poprawnie wypełniany w podglądzie")
+
+def test_sample_row_from_data():
+    """Testuje przykładowy wiersz z wczytanych danych"""
+    print("🧪 Test przykładowego wiersza")
+    assert sample_row() == SAMPLE_DATA
+
+    processor = DataProcessor()
+    processor.excel_data = pd.DataFrame({'Kontrahent': ['Firma X'], 'Kwota': ['99,50']})
+    processor.column_mapping = {'kontrahent': 'Kontrahent', 'kwota': 'Kwota'}
+    data = sample_row(processor)
+    assert data['kontrahent'] == 'Firma X'
+    assert data['nr_faktury'] == SAMPLE_DATA['nr_faktury']
+    print("✅ Przykładowy wiersz z danych")
+
+def test_renderer_debounces_in_background():
+    """Testuje, że seria zmian daje jedno renderowanie najnowszej wersji w wątku w tle"""
+    print("🧪 Test renderowania w tle z debounce")
+    results = []
+    done = threading.Event()
+
+    def on_result(generation, text):
+        results.append((generation, text, threading.current_thread().name))
+        done.set()
+
+    renderer = PreviewRenderer(on_result, debounce=0.05)
+    try:
+        start = time.perf_counter()
+        for i in range(20):
+            generation = renderer.request(f"Wersja {i} dla {{kontrahent}}", {'kontrahent': 'ABC'})
+        # Zgłoszenie żądań nie czeka na renderowanie
+        assert time.perf_counter() - start < 0.05
+        assert done.wait(2)
+        time.sleep(0.1)
+    finally:
+        renderer.close()
+
+    assert results == [(generation, "Wersja 19 dla ABC", 'template-preview')], results
+    assert renderer.is_latest(generation)
+    print("✅ Wyrenderowano tylko najnowszą wersję")
+
+def test_web_template_preview():
+    """Testuje endpoint podglądu szablonu aplikacji webowej"""
+    print("🧪 Test endpointu /api/template_preview")
+    import web_app
+    client = web_app.app.test_client()
+    response = client.post('/api/template_preview', json={'template': 'Firma {kontrahent}: {kwota}'})
+    data = response.get_json()
+    assert data['success'], data
+    assert data['content'].startswith('Firma ')
+    assert '{kontrahent}' not in data['content']
+    print("✅ Endpoint podglądu działa")
+
+if __name__ == "__main__":
+    test_compiled_template_render()
+    test_sample_row_from_data()
+    test_renderer_debounces_in_background()
+    test_web_template_preview()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test trwałego magazynu tokenów Microsoft 365 (szyfrowanie, współdzielenie, odświeżanie)
+"""
+
+import sys
+import os
+import json
+import sqlite3
+import tempfile
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import token_store
+from token_store import SQLiteTokenBackend, get_token_backend, TOKEN_KEY_ENV, LEGACY_TOKEN_FILE
+from email_sender import EmailSender
+
+def make_cache(access_secret='at-secret', expires_in=3600):
+    """Pamięć tokenów w formacie MSAL (token dostępu, token odświeżania, konto)"""
+    return {
+        'AccessToken': {'at': {'credential_type': 'AccessToken', 'secret': access_secret, 'home_account_id': 'h',
+                               'expires_on': str(int(time.time()) + expires_in), 'target': 'Mail.Send'}},
+        'RefreshToken': {'rt': {'credential_type': 'RefreshToken', 'secret': 'rt-secret', 'home_account_id': 'h',
+                                'target': 'Mail.Send'}},
+        'Account': {'a': {'home_account_id': 'h', 'username': 'windykacja@firma.pl'}}
+    }
+
+def store_token(backend, **kwargs):
+    backend._cache = make_cache(**kwargs)
+    assert backend.save_token(force=True)
+
+def test_encrypted_roundtrip():
+    """Testuje zapis zaszyfrowanego tokenu i odczyt w innym procesie (nowej instancji)"""
+    print("🧪 Test zapisu tokenu")
+    os.environ.pop(TOKEN_KEY_ENV, None)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'tokens.db')
+        store_token(SQLiteTokenBackend(path, 'app'))
+
+        with sqlite3.connect(path) as connection:
+            raw = connection.execute('SELECT data FROM tokens').fetchone()[0]
+        assert b'rt-secret' not in raw and b'windykacja' not in raw
+
+        restored = SQLiteTokenBackend(path, 'app')
+        assert restored.load_token() and restored.get_refresh_token()['secret'] == 'rt-secret'
+        assert not SQLiteTokenBackend(path, 'inna-aplikacja').load_token()
+
+        # Inny klucz - token nieczytelny, wymagana ponowna autoryzacja
+        other = SQLiteTokenBackend(path, 'app', key_file=os.path.join(directory, 'inny.key'))
+        assert not other.load_token()
+        if os.name == 'posix':
+            assert os.stat(os.path.join(directory, token_store.TOKEN_KEY_FILE)).st_mode & 0o077 == 0
+    print("✅ Token zaszyfrowany i odczytany")
+
+def test_shared_backend_and_sender():
+    """Testuje jeden backend dla wszystkich EmailSender i autoryzację bez logowania"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'tokens.db')
+        store_token(SQLiteTokenBackend(path, 'app-shared'))
+
+        first = EmailSender('app-shared', 'secret', token_store=path)
+        second = EmailSender('app-shared', 'secret', token_store=path)
+        assert first.account.con.token_backend is second.account.con.token_backend
+        assert get_token_backend('app-shared', path) is first.account.con.token_backend
+        assert first.authenticate() == (True, "Autoryzacja udana")
+        assert first.account.con.username == 'windykacja@firma.pl'
+
+def test_refresh_coordination():
+    """Testuje dzierżawę odświeżenia - drugi proces czeka i wczytuje nowy token"""
+    print("🧪 Test odświeżania tokenu przez wiele procesów")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'tokens.db')
+        worker_a = SQLiteTokenBackend(path, 'app')
+        store_token(worker_a, access_secret='stary', expires_in=-60)
+        worker_b = SQLiteTokenBackend(path, 'app')
+        assert worker_b.load_token() and worker_b.token_is_expired()
+
+        assert worker_a.should_refresh_token() is True  # dzierżawa dla A
+
+        def refresh():
+            time.sleep(0.3)
+            store_token(worker_a, access_secret='nowy')
+
+        thread = threading.Thread(target=refresh)
+        thread.start()
+        assert worker_b.should_refresh_token() is False
+        thread.join()
+        assert worker_b.get_access_token()['secret'] == 'nowy'
+
+        # Dzierżawa zwolniona przy zapisie - kolejne odświeżenie bez czekania
+        start = time.monotonic()
+        assert worker_b.should_refresh_token() is True and time.monotonic() - start < 1
+    print("✅ Token odświeżony raz, pozostałe procesy go wczytały")
+
+def test_legacy_token_import():
+    """Testuje przeniesienie tokenu z pliku O365 do bazy"""
+    with tempfile.TemporaryDirectory() as directory:
+        legacy_file = os.path.join(directory, LEGACY_TOKEN_FILE)
+        with open(legacy_file, 'w') as f:
+            json.dump(make_cache(), f)
+        backend = get_token_backend('app-legacy', os.path.join(directory, 'tokens.db'))
+        assert backend.check_token() and not os.path.exists(legacy_file)
+        assert SQLiteTokenBackend(backend.path, 'app-legacy').load_token()
+
+if __name__ == "__main__":
+    test_encrypted_roundtrip()
+    test_shared_backend_and_sender()
+    test_refresh_coordination()
+    test_legacy_token_import()
@@ -0,0 +1,274 @@
+"""
+Moduł trwałego magazynu tokenów Microsoft 365 (O365)
+
+Tokeny są zapisywane w bazie SQLite (jeden wiersz na aplikację Azure - client_id)
+zaszyfrowane kluczem Fernet, więc po restarcie aplikacji desktopowej i w każdym
+żądaniu aplikacji webowej EmailSender korzysta z zapisanego tokenu - bez
+ponownej autoryzacji w przeglądarce i bez żądania do Microsoft przy starcie kampanii.
+
+Z jednej bazy korzysta wiele procesów (workery gunicorn, proces wysyłki):
+zapis odbywa się w transakcji, a odświeżenie wygasłego tokenu wykonuje tylko
+jeden proces (dzierżawa odświeżenia) - pozostałe wczytują nowy token z bazy.
+W obrębie procesu wszystkie instancje EmailSender dzielą jeden backend
+(get_token_backend).
+
+Klucz szyfrowania: zmienna środowiskowa WINDYKATOR_TOKEN_KEY (klucz Fernet)
+albo plik klucza tworzony przy pierwszym użyciu obok bazy (uprawnienia 0600).
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from O365.utils.token import BaseTokenBackend
+
+# Domyślny plik bazy tokenów i plik klucza szyfrowania
+TOKEN_STORE_FILE = 'o365_tokens.db'
+TOKEN_KEY_FILE = 'o365_token.key'
+
+# Plik tokenu zapisywany wcześniej przez O365 (FileSystemTokenBackend) - przenoszony do bazy
+LEGACY_TOKEN_FILE = 'o365_token.txt'
+
+# Zmienna środowiskowa z kluczem szyfrowania (ma pierwszeństwo przed plikiem klucza)
+TOKEN_KEY_ENV = 'WINDYKATOR_TOKEN_KEY'
+
+# Czas dzierżawy odświeżenia tokenu (sekundy) - po nim inny proces może odświeżyć token
+REFRESH_LEASE_SECONDS = 30
+
+# Odstęp sprawdzania, czy inny proces odświeżył już token
+REFRESH_POLL_SECONDS = 0.2
+
+# Czas oczekiwania na blokadę bazy (sekundy)
+SQLITE_TIMEOUT = 10
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def load_key(key_file):
+    """Zwraca klucz szyfrowania: ze zmiennej środowiskowej lub z pliku (tworzonego przy pierwszym użyciu)"""
+    from cryptography.fernet import Fernet
+
+    key = os.environ.get(TOKEN_KEY_ENV)
+    if key:
+        return key.encode('ascii')
+    if not os.path.exists(key_file):
+        directory = os.path.dirname(key_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Klucz zapisany do pliku tymczasowego i dowiązany - przy wyścigu procesów wygrywa jeden klucz
+        temp_path = f'{key_file}.{os.getpid()}.tmp'
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(Fernet.generate_key())
+            try:
+                os.link(temp_path, key_file)
+            except FileExistsError:
+                pass
+        finally:
+            os.remove(temp_path)
+    with open(key_file, 'rb') as f:
+        return f.read().strip()
+
+
+class TokenCipher:
+    """Szyfrowanie tokenów kluczem Fernet (menedżer kryptografii backendu O365)"""
+
+    def __init__(self, key):
+        """Inicjalizuje szyfrowanie kluczem key (bajty base64)"""
+        from cryptography.fernet import Fernet
+        self._fernet = Fernet(key)
+
+    def encrypt(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        return self._fernet.encrypt(data)
+
+    def decrypt(self, data):
+        if isinstance(data, str):
+            data = data.encode('ascii')
+        return self._fernet.decrypt(data).decode('utf-8')
+
+
+class SQLiteTokenBackend(BaseTokenBackend):
+    """Backend tokenów O365 w bazie SQLite, szyfrowany i współdzielony przez procesy"""
+
+    def __init__(self, path, client_id, key_file=None, mailbox=None):
+        """Inicjalizuje backend dla aplikacji client_id w bazie path.
+
+        key_file - plik klucza szyfrowania (domyślnie TOKEN_KEY_FILE obok bazy).
+        mailbox - skrzynka, gdy jedna aplikacja wysyła z kilku skrzynek (osobny token każdej).
+        """
+        super().__init__()
+        self.path = path
+        self.client_id = client_id
+        self.mailbox = mailbox
+        # Klucz wiersza w bazie: aplikacja lub aplikacja i skrzynka
+        self.token_id = f'{client_id}:{mailbox.lower()}' if mailbox else client_id
+        self.logger = logging.getLogger(__name__)
+        if key_file is None:
+            key_file = os.path.join(os.path.dirname(path), TOKEN_KEY_FILE)
+        self.cryptography_manager = TokenCipher(load_key(key_file))
+        self._version = 0
+        self._init_db()
+
+    def __repr__(self):
+        return f'SQLiteTokenBackend({self.path})'
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=SQLITE_TIMEOUT, isolation_level=None)
+
+    def _init_db(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connect()
+        try:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS tokens (client_id TEXT PRIMARY KEY, data BLOB, '
+                               'version INTEGER NOT NULL DEFAULT 0, refresh_until REAL)')
+        finally:
+            connection.close()
+
+    def _row(self, connection):
+        return connection.execute('SELECT data, version, refresh_until FROM tokens WHERE client_id = ?',
+                                  (self.token_id,)).fetchone()
+
+    def stored_version(self):
+        """Zwraca wersję tokenu zapisanego w bazie (0 - brak tokenu)"""
+        connection = self._connect()
+        try:
+            row = self._row(connection)
+        finally:
+            connection.close()
+        return row[1] if row else 0
+
+    def load_token(self):
+        """Wczytuje token z bazy do pamięci - False, gdy brak tokenu lub nie da się go odszyfrować"""
+        connection = self._connect()
+        try:
+            row = self._row(connection)
+        finally:
+            connection.close()
+        if not row or not row[0]:
+            return False
+        try:
+            cache = self.deserialize(row[0])
+        except Exception as e:
+            # Np. zmieniony klucz szyfrowania - wymagana ponowna autoryzacja
+            self.logger.warning(f"⚠️ Nie udało się odczytać zapisanego tokenu Microsoft 365: {e}")
+            return False
+        with self._lock:
+            self._cache = cache
+        self._version = row[1]
+        self.logger.debug(f"Token Microsoft 365 wczytany z {self.path} (wersja {row[1]})")
+        return True
+
+    def save_token(self, force=False):
+        """Zapisuje token do bazy (nowa wersja, zwolnienie dzierżawy odświeżenia)"""
+        if not self._cache:
+            return False
+        if force is False and self._has_state_changed is False:
+            return True
+        data = self.serialize()
+        connection = self._connect()
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            row = self._row(connection)
+            version = (row[1] if row else 0) + 1
+            connection.execute('INSERT OR REPLACE INTO tokens (client_id, data, version, refresh_until) '
+                               'VALUES (?, ?, ?, NULL)', (self.token_id, data, version))
+            connection.execute('COMMIT')
+        except Exception as e:
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            self.logger.error(f"❌ Błąd zapisu tokenu Microsoft 365: {e}")
+            return False
+        finally:
+            connection.close()
+        self._version = version
+        return True
+
+    def delete_token(self):
+        """Usuwa token z bazy"""
+        connection = self._connect()
+        try:
+            deleted = connection.execute('DELETE FROM tokens WHERE client_id = ?', (self.token_id,)).rowcount
+        finally:
+            connection.close()
+        with self._lock:
+            self._cache = {}
+        self._version = 0
+        return bool(deleted)
+
+    def check_token(self):
+        """Czy w bazie jest token"""
+        return self.stored_version() > 0
+
+    def import_file(self, token_file):
+        """Przenosi token z pliku O365 (niezaszyfrowanego) do bazy i usuwa plik - zwraca True po przeniesieniu"""
+        from O365.utils.token import FileSystemTokenBackend
+
+        legacy = FileSystemTokenBackend(token_path=token_file)
+        try:
+            if not legacy.load_token():
+                return False
+        except Exception as e:
+            self.logger.warning(f"⚠️ Pominięto plik tokenu {token_file}: {e}")
+            return False
+        with self._lock:
+            self._cache = legacy._cache
+        if not self.save_token(force=True):
+            return False
+        legacy.delete_token()
+        self.logger.info(f"🔐 Token Microsoft 365 przeniesiony z {token_file} do zaszyfrowanej bazy")
+        return True
+
+    def should_refresh_token(self, con=None, *, username=None):
+        """Odświeżenie tokenu przez jeden proces naraz (dzierżawa w bazie).
+
+        Zwraca True, gdy ten proces ma odświeżyć token, albo False, gdy inny
+        proces już go odświeżył (nowy token wczytany z bazy).
+        """
+        deadline = time.monotonic() + REFRESH_LEASE_SECONDS
+        while True:
+            connection = self._connect()
+            try:
+                connection.execute('BEGIN IMMEDIATE')
+                row = self._row(connection)
+                now = time.time()
+                newer = row is not None and row[1] > self._version
+                leased = row is not None and row[2] is not None and row[2] > now
+                if not newer and not leased and row is not None:
+                    connection.execute('UPDATE tokens SET refresh_until = ? WHERE client_id = ?',
+                                       (now + REFRESH_LEASE_SECONDS, self.token_id))
+                connection.execute('COMMIT')
+            except sqlite3.Error as e:
+                # Baza niedostępna - odświeżenie bez koordynacji jest lepsze niż brak wysyłki
+                self.logger.warning(f"⚠️ Błąd dzierżawy odświeżenia tokenu: {e}")
+                return True
+            finally:
+                connection.close()
+
+            if newer and self.load_token() and not self.token_is_expired(username=username):
+                self.logger.debug("Token Microsoft 365 odświeżony przez inny proces")
+                return False
+            if not leased or time.monotonic() >= deadline:
+                return True
+            time.sleep(REFRESH_POLL_SECONDS)
+
+
+def get_token_backend(client_id, path=TOKEN_STORE_FILE, key_file=None, mailbox=None):
+    """Zwraca backend tokenów wspólny dla wszystkich EmailSender procesu (dla bazy i client_id)"""
+    key = (os.path.abspath(path), client_id, (mailbox or '').lower())
+    with _backends_lock:
+        backend = _backends.get(key)
+        if backend is None:
+            backend = SQLiteTokenBackend(path, client_id, key_file, mailbox)
+            legacy_file = os.path.join(os.path.dirname(path), LEGACY_TOKEN_FILE)
+            if not mailbox and os.path.exists(legacy_file) and not backend.check_token():
+                backend.import_file(legacy_file)
+            _backends[key] = backend
+        return backend
@@ -483,6 +483,15 @@ class UIComponents:
                                cursor='hand2')
         export_btn.pack(side=tk.LEFT)
         
+        stats_btn = tk.Button(buttons_frame, text="📈 Statystyki", 
+                              bg=self.config.primary_color,
+                              fg=self.config.white_color,
+                              relief='flat',
+                              borderwidth=0,
+                              font=('Arial', 10, 'bold'),
+                              cursor='hand2')
+        stats_btn.pack(side=tk.LEFT, padx=(10, 0))
+        
         # Sekcja statusu wysyłki
         status_frame = ttk.LabelFrame(main_frame, text="📊 Status wysyłki", padding="10")
         status_frame.pack(fill=tk.BOTH, expand=True)
@@ -514,6 +523,7 @@ class UIComponents:
             'test_mode_var': test_mode_var,
             'send_btn': send_btn,
             'export_btn': export_btn,
+            'stats_btn': stats_btn,
             'status_tree': status_tree
         }
     
@@ -1,33 +1,92 @@
 """
 Aplikacja webowa Windykator - interfejs przeglądarkowy
 """
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session, Response, send_file, abort
+import functools
 import os
 import logging
+import threading
+import uuid
 from datetime import datetime
 import json
-import time
 
 # Import istniejących modułów
 from config import Config
 from data_processor import DataProcessor
-from email_sender import EmailSender
 from sms_sender import SMSSender
+from sending_engine import SendingEngine, DEFAULT_SEND_DELAY
+from sending_control import SendingControl, CampaignStore, MAX_CONCURRENCY
+from sending_scheduler import CampaignSchedule, ScheduleStore, run_schedule
+from send_retry import RetryPolicy, DeadLetterStore
+from circuit_breaker import CircuitBreakers, SKIPPED_REASON
+from sender_pool import SenderPool, build_email_sender, build_sms_sender
+from metrics import metrics
+from logging_setup import setup_logging
+from profiling import ProfileStore, PROFILE_MODES
+from template_preview import render_template as render_message_template, sample_row
+from placeholders import PlaceholderRegistry
 
 # Konfiguracja Flask
 app = Flask(__name__)
 app.secret_key = 'windykator_web_secret_key_2024'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+# Profilowanie wszystkich profilowanych żądań: WINDYKATOR_PROFILE=1 (tryb: WINDYKATOR_PROFILER=cprofile|sampling)
+app.config['PROFILING'] = os.environ.get('WINDYKATOR_PROFILE') == '1'
+app.config['PROFILER_MODE'] = os.environ.get('WINDYKATOR_PROFILER', 'cprofile')
 
-# Konfiguracja logowania
-logging.basicConfig(level=logging.INFO)
+# Konfiguracja logowania (asynchroniczna kolejka, WINDYKATOR_LOG_FORMAT=json - logi strukturalne)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # Inicjalizacja komponentów
 config = Config()
 data_processor = DataProcessor()
+data_processor.filter_zero_amounts_on_load = config.load_filter_zero_amounts_on_load()
 email_sender = None
 sms_sender = None
+profile_store = ProfileStore()
+# Placeholdery stałe (odświeżane z konfiguracji przed kampanią i na stronie szablonów)
+placeholder_registry = PlaceholderRegistry.from_config(config)
+# Stan kampanii wspólny dla workerów gunicorn - sterowany przez /api/sending_control z dowolnego workera
+campaign_store = CampaignStore()
+# Harmonogramy kampanii zapisane na dysku i wysyłane w tle (id kampanii -> {'schedule', 'stop'})
+schedule_store = ScheduleStore()
+scheduled_campaigns = {}
+scheduled_campaigns_lock = threading.Lock()
+# Wiadomości, których nie udało się wysłać (ponawiane zbiorczo przez /api/dead_letters/replay)
+dead_letter_store = DeadLetterStore(config.get_dead_letters_file())
+# Wyłączniki obwodu dostawców - wspólne dla wszystkich kampanii (stan dostawcy nie zależy od kampanii)
+circuit_breakers = CircuitBreakers.from_config(config.load_circuit_breaker_settings())
+
+# Wartości parametru ?profile= włączające i wyłączające profilowanie żądania
+PROFILE_ON_FLAGS = ('1', 'true', 'on', 'yes')
+PROFILE_OFF_FLAGS = ('0', 'false', 'off', 'no')
+
+def _profiling_mode():
+    """Tryb profilowania bieżącego żądania lub None, gdy profilowanie jest wyłączone.
+
+    Parametr ?profile=1/true (lub nazwa trybu, np. ?profile=sampling) włącza,
+    a ?profile=0/false wyłącza profilowanie żądania; bez parametru decyduje
+    przełącznik w sesji (strona /profiles) albo app.config['PROFILING'].
+    """
+    flag = request.args.get('profile', '').strip().lower()
+    if flag in PROFILE_OFF_FLAGS:
+        return None
+    if flag in PROFILE_MODES:
+        return flag
+    if flag in PROFILE_ON_FLAGS or session.get('profiling') or app.config['PROFILING']:
+        return session.get('profiling') or app.config['PROFILER_MODE']
+    return None
+
+def profiled(view):
+    """Dekorator profilujący widok, gdy profilowanie jest włączone dla żądania (zob. _profiling_mode)"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        mode = _profiling_mode()
+        if mode:
+            return profile_store.run(request.endpoint, view, *args, mode=mode, **kwargs)
+        return view(*args, **kwargs)
+    return wrapper
 
 # Globalne zmienne sesji
 @app.before_request
@@ -48,6 +107,7 @@ def index():
                          preview_count=len(session.get('preview_data', [])))
 
 @app.route('/upload', methods=['GET', 'POST'])
+@profiled
 def upload_file():
     """Wczytywanie pliku CSV/TSV/Excel"""
     if request.method == 'POST':
@@ -109,7 +169,10 @@ def upload_file():
                         flash(f'Błąd przetwarzania danych: {str(e)}', 'error')
                         return redirect(request.url)
                     
-                    flash(f'Plik {filename} został wczytany pomyślnie! Wczytano {len(preview_data)} wierszy.', 'success')
+                    message = f'Plik {filename} został wczytany pomyślnie! Wczytano {len(preview_data)} wierszy.'
+                    if data_processor.removed_on_load:
+                        message += f' Pominięto {data_processor.removed_on_load} pozycji z kwotą ≤ 0 lub nieczytelną.'
+                    flash(message, 'success')
                     return render_template('upload.html', 
                                         columns=columns,
                                         mapping_fields=config.get_mapping_fields())
@@ -144,6 +207,11 @@ def column_mapping():
         data_processor.set_column_mapping(mapping)
         session['column_mapping'] = mapping
         
+        # Zapamiętaj mapowanie dla układu wczytanego pliku
+        success, message = data_processor.save_current_profile()
+        if not success:
+            logger.warning(f"⚠️ Nie zapisano profilu mapowania: {message}")
+        
         flash('Mapowanie kolumn zostało zapisane', 'success')
         return redirect(url_for('preview'))
     
@@ -157,6 +225,7 @@ def column_mapping():
                          current_mapping=current_mapping)
 
 @app.route('/preview')
+@profiled
 def preview():
     """Podgląd danych"""
     if not session.get('data_loaded', False):
@@ -183,6 +252,7 @@ def templates():
         # Wczytaj szablony
         email_template = config.load_template('email')
         sms_template = config.load_template('sms')
+        placeholder_registry.update(config.load_placeholders())
         
         return render_template('templates.html',
                              email_template=email_template,
@@ -194,6 +264,17 @@ def templates():
                              email_template='',
                              sms_template='')
 
+@app.route('/api/template_preview', methods=['POST'])
+def template_preview():
+    """API podglądu szablonu na przykładowym wierszu danych (szablon kompilowany raz, z pamięci podręcznej)"""
+    try:
+        data = request.get_json() or {}
+        content = render_message_template(data.get('template', ''), sample_row(data_processor), placeholder_registry)
+        return jsonify({'success': True, 'content': content, 'length': len(content)})
+    except Exception as e:
+        logger.error(f"Błąd podglądu szablonu: {e}")
+        return jsonify({'success': False, 'message': f'Błąd podglądu szablonu: {str(e)}'})
+
 @app.route('/save_template', methods=['POST'])
 def save_template():
     """Zapisywanie szablonu"""
@@ -229,6 +310,7 @@ def sending():
                          data_count=len(session.get('preview_data', [])))
 
 @app.route('/api/test_sending', methods=['POST'])
+@profiled
 def test_sending():
     """API do testowania wysyłki"""
     try:
@@ -242,6 +324,7 @@ def test_sending():
         # Pobierz szablony
         email_template = config.load_template('email')
         sms_template = config.load_template('sms')
+        placeholder_registry.update(config.load_placeholders())
         
         # Pobierz wybrane wiersze (domyślnie wszystkie jeśli nie podano)
         selected_rows = data.get('selected_rows', [])
@@ -312,10 +395,10 @@ def test_sending():
                                 'data_faktury': item.get('data_faktury', '')
                             }
                             
-                            # Wyślij SMS testowy (z prefiksem TEST)
+                            # Wyślij SMS testowy (z prefiksem TEST) - placeholdery stałe z rejestru
                             test_template = f"🧪 TEST: {sms_template}"
                             success, message = sms_sender.send_reminder_sms(
-                                item.get('telefon'), template_data, test_template
+                                item.get('telefon'), template_data, placeholder_registry.compile(test_template)
                             )
                             
                             result['sms_test'] = {
@@ -346,55 +429,128 @@ def test_sending():
         logger.error(f"Błąd testowania wysyłki: {e}")
         return jsonify({'success': False, 'message': f'Błąd testowania: {str(e)}'})
 
+def _create_senders(send_email, send_sms):
+    """Tworzy sendery z konfiguracji API - zwraca (email_sender, sms_sender, błąd)"""
+    email_sender = None
+    sms_sender = None
+    # Kilka kont kanału (email_accounts / sms_accounts) - pula senderów z własnym tempem i stanem kont
+    strategy = config.load_sender_pool_strategy()
+    breaker_settings = config.load_circuit_breaker_settings()
+    
+    if send_email:
+        accounts = config.load_sender_accounts('email')
+        if not accounts:
+            return None, None, 'Skonfiguruj Microsoft 365 API'
+        
+        email_sender = build_email_sender(accounts, strategy, config.get_token_store_file(), breaker_settings)
+    
+    if send_sms:
+        accounts = config.load_sender_accounts('sms')
+        logger.debug("📱 Konfiguracja SMS: %d kont, sender=%s", len(accounts),
+                     accounts[0].get('sms_sender') or 'BRAK' if accounts else 'BRAK')
+        
+        if not accounts:
+            logger.error("❌ Brak tokenu SMS API")
+            return None, None, 'Skonfiguruj SMS API'
+        
+        sms_sender = build_sms_sender(accounts, strategy, breaker_settings)
+    
+    return email_sender, sms_sender, None
+
+def _pool_defaults(email_sender, sms_sender, default_rate):
+    """Domyślne limity kampanii - dla puli senderów łączne tempo kont i równoległość równa liczbie kont"""
+    limits = {'concurrency': 1, 'email_rate': default_rate, 'sms_rate': default_rate}
+    for channel, sender in (('email', email_sender), ('sms', sms_sender)):
+        if isinstance(sender, SenderPool):
+            limits[f'{channel}_rate'] = sender.rate
+            limits['concurrency'] = min(MAX_CONCURRENCY, max(limits['concurrency'], len(sender.members)))
+    return limits
+
+def _run_campaign(campaign_id, lock, engine, control, items, rows, send_email, send_sms, email_sender, sms_sender,
+                  profile_mode=None):
+    """Wysyła kampanię w wątku tła i zapisuje jej wyniki w campaign_store (zwalnia blokadę kampanii).
+
+    rows[i] to wiersz podglądu pozycji items[i] - każdy wynik ma go w polu 'row',
+    bo przy kolejności według priorytetu i anulowaniu wyniki mają luki.
+    Z profile_mode wysyłka jest profilowana osobno od żądania, które ją rozpoczęło
+    (profil 'real_sending_campaign').
+    """
+    received = {}  # indeks pozycji -> wynik
+    
+    def on_result(index, result):
+        received[index] = result
+    
+    stop_sync = threading.Event()
+    sync = threading.Thread(target=campaign_store.follow,
+                            args=(campaign_id, control, lambda: len(received), stop_sync),
+                            name=f'campaign-sync-{campaign_id}', daemon=True)
+    sync.start()
+    sending_results = []
+    message = error = None
+    try:
+        if profile_mode:
+            profile_store.run('real_sending_campaign', engine.run, items, send_email, send_sms,
+                              mode=profile_mode, on_result=on_result)
+        else:
+            engine.run(items, send_email, send_sms, on_result=on_result)
+        sending_results = [dict(received[index], row=rows[index]) for index in sorted(received)]
+        
+        # Podsumowanie wyników (szczegóły pozycji są w stanie kampanii, nie w logu)
+        summary = {}
+        for result in sending_results:
+            for channel in ('email', 'sms'):
+                status = result.get(f'{channel}_status')
+                if status:
+                    key = f"{channel}_{'ok' if status.get('success') else 'error'}"
+                    summary[key] = summary.get(key, 0) + 1
+        logger.info("📊 Wyniki wysyłki kampanii %s dla %d pozycji: %s", campaign_id, len(sending_results), summary)
+        
+        if control.snapshot()['cancelled']:
+            message = f'Wysyłka anulowana po {len(sending_results)} z {len(items)} pozycji'
+        else:
+            message = f'Wysyłka zakończona dla {len(sending_results)} pozycji'
+    except Exception as e:
+        logger.error(f"❌ Błąd wysyłki kampanii {campaign_id}: {e}")
+        message = error = f'Błąd wysyłki: {str(e)}'
+    finally:
+        stop_sync.set()
+        sync.join()
+        pools = {channel: sender.snapshot() for channel, sender in (('email', email_sender), ('sms', sms_sender))
+                 if isinstance(sender, SenderPool)}
+        try:
+            campaign_store.finish(campaign_id, sending_results, message, pools, error)
+        finally:
+            lock.release()
+
 @app.route('/api/real_sending', methods=['POST'])
+@profiled
 def real_sending():
-    """API do rzeczywistej wysyłki"""
+    """API do rzeczywistej wysyłki.
+
+    Żądanie tylko rozpoczyna kampanię w tle - jego profil obejmuje przygotowanie,
+    a samą wysyłkę profiluje _run_campaign (profil 'real_sending_campaign').
+    """
     try:
         data = request.get_json()
         send_email = data.get('send_email', False)
         send_sms = data.get('send_sms', False)
         
-        logger.info(f"🚀 Rozpoczynam rzeczywistą wysyłkę")
-        logger.info(f"📧 Send email: {send_email} (typ: {type(send_email)})")
-        logger.info(f"📱 Send SMS: {send_sms} (typ: {type(send_sms)})")
-        logger.info(f"📋 Surowe dane: {data}")
+        logger.info("🚀 Rozpoczynam rzeczywistą wysyłkę (email: %s, SMS: %s)", send_email, send_sms)
+        logger.debug("📋 Surowe dane: %s", data)
         
         if not session.get('preview_data', []):
             return jsonify({'success': False, 'message': 'Brak danych do wysłania'})
         
         # Sprawdź konfigurację i zainicjalizuj sendery
-        email_sender = None
-        sms_sender = None
-        
-        if send_email:
-            api_config = config.load_api_config()
-            if not api_config.get('client_id') or not api_config.get('client_secret'):
-                return jsonify({'success': False, 'message': 'Skonfiguruj Microsoft 365 API'})
-            
-            email_sender = EmailSender(api_config['client_id'], api_config['client_secret'])
-        
-        if send_sms:
-            api_config = config.load_api_config()
-            logger.info(f"📱 Konfiguracja SMS: token={api_config.get('sms_token', 'BRAK')[:10]}..., sender={api_config.get('sms_sender', 'BRAK')}, url={api_config.get('sms_url', 'BRAK')}")
-            
-            if not api_config.get('sms_token'):
-                logger.error("❌ Brak tokenu SMS API")
-                return jsonify({'success': False, 'message': 'Skonfiguruj SMS API'})
-            
-            sms_sender = SMSSender(api_config.get('sms_token'), 
-                                 api_config.get('sms_sender'),
-                                 api_config.get('sms_url', 'https://api.smsapi.pl/sms.do'))
-            logger.info(f"✅ SMS sender zainicjalizowany: {sms_sender}")
-            logger.info(f"✅ Typ SMS sender: {type(sms_sender)}")
-            logger.info(f"✅ SMS sender ma metodę send_reminder_sms: {hasattr(sms_sender, 'send_reminder_sms')}")
+        email_sender, sms_sender, error = _create_senders(send_email, send_sms)
+        if error:
+            return jsonify({'success': False, 'message': error})
         
         # Pobierz szablony
         email_template = config.load_template('email')
         sms_template = config.load_template('sms')
         
-        logger.info(f"📧 Szablon email: {len(email_template)} znaków")
-        logger.info(f"📱 Szablon SMS: {len(sms_template)} znaków")
-        logger.info(f"📱 Szablon SMS treść: {sms_template}")
+        logger.debug("📧 Szablon email: %d znaków, szablon SMS: %d znaków", len(email_template), len(sms_template))
         
         # Pobierz wybrane wiersze (domyślnie wszystkie jeśli nie podano)
         selected_rows = data.get('selected_rows', [])
@@ -404,129 +560,327 @@ def real_sending():
         if not selected_rows:
             selected_rows = list(range(len(preview_data)))
         
-        logger.info(f"📋 Przetwarzam {len(selected_rows)} wybranych wierszy z {len(preview_data)} dostępnych")
+        logger.info("📋 Przetwarzam %d wybranych wierszy z %d dostępnych", len(selected_rows), len(preview_data))
         
-        sending_results = []
+        # Szablony dedykowane dla przedziałów zaległości (np. email_template_90plus.txt)
+        # wybiera silnik wysyłki przez config.load_template
+        # Placeholdery stałe wczytywane raz na kampanię; szablony są sprawdzane przed wysyłką
+        placeholder_registry.update(config.load_placeholders())
+        rows = [row_index for row_index in selected_rows if row_index < len(preview_data)]
+        items = [preview_data[row_index] for row_index in rows]
         
-        for i, row_index in enumerate(selected_rows):
-            if row_index < len(preview_data):
-                item = preview_data[row_index]
-            logger.info(f"📋 Przetwarzam item {i+1}/{len(selected_rows)}: {item}")
-            
-            result = {
-                'kontrahent': item.get('kontrahent', ''),
-                'email': item.get('email', ''),
-                'telefon': item.get('telefon', ''),
-                'email_status': None,
-                'sms_status': None
-            }
-            
-            # Wyślij email
-            if send_email and item.get('email') and email_sender:
-                try:
-                    logger.info(f"📧 Wysyłam email do: {item.get('email')}")
-                    
-                    template_data = {
-                        'kontrahent': item.get('kontrahent', ''),
-                        'nip': item.get('nip', ''),
-                        'nr_faktury': item.get('nr_faktury', ''),
-                        'email': item.get('email', ''),
-                        'telefon': item.get('telefon', ''),
-                        'kwota': item.get('kwota', ''),
-                        'dni_po_terminie': item.get('dni_po_terminie', ''),
-                        'data_faktury': item.get('data_faktury', '')
-                    }
-                    
-                    success, message = email_sender.send_reminder_email(
-                        item.get('email'), template_data, email_template
-                    )
-                    
-                    logger.info(f"📧 Email {item.get('email')}: {'✅' if success else '❌'} {message}")
-                    
-                    result['email_status'] = {
-                        'success': success,
-                        'message': message
-                    }
-                except Exception as e:
-                    logger.error(f"❌ Błąd wysyłania email: {e}")
-                    result['email_status'] = {
-                        'success': False,
-                        'message': f'Błąd wysyłania email: {str(e)}'
-                    }
-            elif send_email and item.get('email') and not email_sender:
-                result['email_status'] = {
-                    'success': False,
-                    'message': 'Błąd: Email sender nie został zainicjalizowany'
-                }
-            
-            # Wyślij SMS
-            logger.info(f"📱 Sprawdzam warunki SMS: send_sms={send_sms}, telefon={item.get('telefon')}, sms_sender={sms_sender}")
-            
-            if send_sms and item.get('telefon') and sms_sender:
-                try:
-                    logger.info(f"📱 Wysyłam SMS do: {item.get('telefon')} dla: {item.get('kontrahent')}")
-                    
-                    template_data = {
-                        'kontrahent': item.get('kontrahent', ''),
-                        'nip': item.get('nip', ''),
-                        'nr_faktury': item.get('nr_faktury', ''),
-                        'email': item.get('email', ''),
-                        'telefon': item.get('telefon', ''),
-                        'kwota': item.get('kwota', ''),
-                        'dni_po_terminie': item.get('dni_po_terminie', ''),
-                        'data_faktury': item.get('data_faktury', '')
-                    }
-                    
-                    logger.info(f"📱 Template data: {template_data}")
-                    
-                    success, message = sms_sender.send_reminder_sms(
-                        item.get('telefon'), template_data, sms_template
-                    )
-                    
-                    logger.info(f"📱 SMS {item.get('telefon')}: {'✅' if success else '❌'} {message}")
-                    
-                    result['sms_status'] = {
-                        'success': success,
-                        'message': message
-                    }
-                except Exception as e:
-                    logger.error(f"❌ Błąd wysyłania SMS: {e}")
-                    result['sms_status'] = {
-                        'success': False,
-                        'message': f'Błąd wysyłania SMS: {str(e)}'
-                    }
-            elif send_sms and item.get('telefon') and not sms_sender:
-                result['sms_status'] = {
-                    'success': False,
-                    'message': 'Błąd: SMS sender nie został zainicjalizowany'
-                }
-            
-            sending_results.append(result)
-            
-            # PRZERWA między wysyłkami (2 sekundy) - tylko jeśli to nie ostatnia pozycja
-            if i < len(selected_rows) - 1:
-                logger.info(f"⏳ Czekam 2 sekundy przed następną wysyłką...")
-                time.sleep(2)
-        
-        # Logowanie wyników
-        logger.info(f"📊 Wyniki wysyłki:")
-        for i, result in enumerate(sending_results):
-            logger.info(f"  Pozycja {i}: {result.get('kontrahent', 'N/A')}")
-            if result.get('email_status'):
-                logger.info(f"    Email: {result['email_status'].get('success', False)} - {result['email_status'].get('message', 'N/A')}")
-            if result.get('sms_status'):
-                logger.info(f"    SMS: {result['sms_status'].get('success', False)} - {result['sms_status'].get('message', 'N/A')}")
+        # Limity kampanii (tempo w wiadomościach na sekundę) - zmieniane w trakcie przez /api/sending_control
+        defaults = _pool_defaults(email_sender, sms_sender, 1.0 / DEFAULT_SEND_DELAY)
+        control = SendingControl(concurrency=data.get('concurrency', defaults['concurrency']),
+                                 email_rate=data.get('email_rate', defaults['email_rate']),
+                                 sms_rate=data.get('sms_rate', defaults['sms_rate']))
+        campaign_id = str(data.get('campaign_id') or uuid.uuid4().hex)
+        lock = campaign_store.lock(campaign_id)
+        if not lock.acquire(blocking=False):
+            return jsonify({'success': False, 'message': 'Kampania o podanym id już trwa'})
+        
+        engine = SendingEngine(email_sender, sms_sender, email_template, sms_template,
+                               template_loader=config.load_template, placeholders=placeholder_registry,
+                               control=control, priority_weights=config.load_priority_weights(),
+                               retry_policy=RetryPolicy.from_config(config.load_retry_settings()),
+                               dead_letters=dead_letter_store, breakers=circuit_breakers)
+        try:
+            campaign_store.create(campaign_id, control, len(items))
+        except Exception:
+            lock.release()
+            raise
+        
+        # Wysyłka w tle - odpowiedź wraca od razu, postęp i wyniki podaje /api/sending_control/<id>
+        threading.Thread(target=_run_campaign,
+                         args=(campaign_id, lock, engine, control, items, rows, send_email, send_sms,
+                               email_sender, sms_sender, _profiling_mode()),
+                         name=f'campaign-{campaign_id}', daemon=True).start()
         
         return jsonify({
             'success': True,
-            'results': sending_results,
-            'message': f'Wysyłka zakończona dla {len(sending_results)} pozycji'
+            'campaign_id': campaign_id,
+            'total': len(items),
+            'message': f'Wysyłka rozpoczęta dla {len(items)} pozycji'
         })
         
     except Exception as e:
         logger.error(f"Błąd rzeczywistej wysyłki: {e}")
         return jsonify({'success': False, 'message': f'Błąd wysyłki: {str(e)}'})
 
+@app.route('/api/sending_control', methods=['GET'])
+def sending_campaigns():
+    """Lista trwających kampanii z limitami i postępem"""
+    return jsonify({'success': True, 'campaigns': campaign_store.list()})
+
+@app.route('/api/sending_control/<campaign_id>', methods=['GET', 'POST'])
+def sending_control(campaign_id):
+    """Stan kampanii (GET - po zakończeniu z wynikami w polu results) lub zmiana w trakcie wysyłki (POST).
+
+    POST JSON: action ('pause', 'resume', 'cancel') i/lub limity concurrency,
+    email_rate, sms_rate (wiadomości na sekundę, null - bez limitu).
+    Stan jest wspólny dla workerów - zmianę przyjmuje worker, który wysyła kampanię.
+    """
+    try:
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or {}
+            limits = {name: data[name] for name in ('concurrency', 'email_rate', 'sms_rate') if name in data}
+            campaign = campaign_store.apply(campaign_id, data.get('action'), **limits)
+            if campaign is not None:
+                logger.info("⚙️ Kampania %s: akcja=%s, limity=%s", campaign_id, data.get('action'), limits)
+        else:
+            campaign = campaign_store.load(campaign_id)
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    if campaign is None:
+        return jsonify({'success': False, 'message': 'Brak trwającej kampanii o podanym id'}), 404
+    
+    return jsonify({'success': True, 'campaign': campaign})
+
+def _start_scheduled_campaign(schedule, lock):
+    """Uruchamia wątek wysyłający harmonogram w jego terminach - zwraca komunikat błędu lub None.
+
+    lock to założona już blokada harmonogramu - wątek trzyma ją do końca wysyłki,
+    więc z kilku workerów gunicorn harmonogram wysyła tylko jeden. Przy błędzie
+    blokada zostaje założona, a zwalnia ją wywołujący.
+    """
+    email_sender, sms_sender, error = _create_senders(schedule.send_email, schedule.send_sms)
+    if error:
+        return error
+    
+    placeholder_registry.update(config.load_placeholders())
+    engine = SendingEngine(email_sender, sms_sender, config.load_template('email'), config.load_template('sms'),
+                           template_loader=config.load_template, placeholders=placeholder_registry,
+                           breakers=circuit_breakers)
+    stop_event = threading.Event()
+    
+    def run():
+        try:
+            summary = run_schedule(schedule, schedule_store,
+                                   lambda channel, item: engine.send_channel(item, channel, record=False),
+                                   stop_event, retry_policy=RetryPolicy.from_config(config.load_retry_settings()),
+                                   dead_letters=dead_letter_store)
+            logger.info("📅 Harmonogram %s zakończony: %s", schedule.campaign_id, summary['counts'])
+        except Exception as e:
+            logger.error(f"❌ Błąd harmonogramu {schedule.campaign_id}: {e}")
+        finally:
+            with scheduled_campaigns_lock:
+                scheduled_campaigns.pop(schedule.campaign_id, None)
+            lock.release()
+    
+    with scheduled_campaigns_lock:
+        scheduled_campaigns[schedule.campaign_id] = {'schedule': schedule, 'stop': stop_event}
+    threading.Thread(target=run, name=f'schedule-{schedule.campaign_id}', daemon=True).start()
+    return None
+
+def resume_scheduled_campaigns():
+    """Wznawia niezakończone harmonogramy zapisane na dysku (przy starcie każdego procesu serwera).
+
+    Harmonogram wysyłany już przez inny proces (worker gunicorn) jest pomijany -
+    wznawia go ten proces, któremu uda się założyć blokadę harmonogramu.
+    """
+    for saved in schedule_store.list():
+        if saved.finished:
+            schedule_store.clear_cancel(saved.campaign_id)
+            continue
+        lock = schedule_store.lock(saved.campaign_id)
+        if not lock.acquire(blocking=False):
+            logger.debug("Harmonogram %s wysyła inny proces", saved.campaign_id)
+            continue
+        # Stan zapisany przez poprzedni proces - wczytany ponownie pod blokadą
+        schedule = schedule_store.load(saved.campaign_id)
+        if schedule is None or schedule.finished:
+            lock.release()
+            continue
+        error = _start_scheduled_campaign(schedule, lock)
+        if error:
+            lock.release()
+            logger.error("❌ Nie wznowiono harmonogramu %s: %s", schedule.campaign_id, error)
+        else:
+            logger.info("📅 Wznowiono harmonogram %s (%d oczekujących)", schedule.campaign_id, len(schedule.pending()))
+
+def _schedule_state(schedule):
+    state = schedule.summary()
+    with scheduled_campaigns_lock:
+        running_here = schedule.campaign_id in scheduled_campaigns
+    state['running'] = running_here or (not state['finished'] and schedule_store.is_running(schedule.campaign_id))
+    return state
+
+@app.route('/api/schedule_sending', methods=['POST'])
+def schedule_sending():
+    """Planuje wysyłkę wybranych pozycji w oknach doręczeń z limitami domen.
+
+    POST JSON: send_email, send_sms, selected_rows, email_rate, sms_rate
+    (wiadomości na sekundę), start (ISO, domyślnie teraz).
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        send_email = data.get('send_email', False)
+        send_sms = data.get('send_sms', False)
+        preview_data = session.get('preview_data', [])
+        if not preview_data:
+            return jsonify({'success': False, 'message': 'Brak danych do wysłania'})
+        
+        selected_rows = data.get('selected_rows') or list(range(len(preview_data)))
+        items = [preview_data[row_index] for row_index in selected_rows if row_index < len(preview_data)]
+        settings = config.load_schedule_settings()
+        settings.update({name: data[name] for name in ('email_rate', 'sms_rate') if name in data})
+        start = datetime.fromisoformat(data['start']) if data.get('start') else None
+        
+        schedule = CampaignSchedule.build(items, send_email, send_sms, settings=settings, start=start,
+                                          priority_weights=config.load_priority_weights(),
+                                          campaign_id=data.get('campaign_id'))
+        # Blokada przed zapisem - istniejący harmonogram (wysyłany lub oczekujący) nie jest nadpisywany
+        lock = schedule_store.lock(schedule.campaign_id)
+        if not lock.acquire(blocking=False):
+            return jsonify({'success': False, 'message': 'Harmonogram jest już wysyłany przez inny proces'}), 409
+        try:
+            if schedule_store.load(schedule.campaign_id) is not None:
+                lock.release()
+                return jsonify({'success': False, 'message': 'Harmonogram o podanym id już istnieje'}), 409
+            schedule_store.save(schedule)
+            error = _start_scheduled_campaign(schedule, lock)
+        except Exception:
+            lock.release()
+            raise
+        if error:
+            schedule.cancel()
+            schedule_store.save(schedule)
+            lock.release()
+            return jsonify({'success': False, 'message': error})
+        
+        state = _schedule_state(schedule)
+        logger.info("📅 Zaplanowano kampanię %s: %d wiadomości do %s", schedule.campaign_id, state['total'], state['last_due'])
+        return jsonify({'success': True, 'schedule': state,
+                        'message': f"Zaplanowano {state['total']} wiadomości (do {state['last_due'] or '-'})"})
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'message': f'Błędne ustawienia harmonogramu: {str(e)}'}), 400
+    except Exception as e:
+        logger.error(f"Błąd planowania wysyłki: {e}")
+        return jsonify({'success': False, 'message': f'Błąd planowania wysyłki: {str(e)}'})
+
+@app.route('/api/schedules', methods=['GET'])
+def schedules():
+    """Lista zapisanych harmonogramów z postępem"""
+    return jsonify({'success': True, 'schedules': [_schedule_state(schedule) for schedule in schedule_store.list()]})
+
+def _find_schedule(campaign_id):
+    with scheduled_campaigns_lock:
+        running = scheduled_campaigns.get(campaign_id)
+    if running:
+        return running['schedule'], running['stop']
+    try:
+        return schedule_store.load(campaign_id), None
+    except ValueError:
+        return None, None
+
+@app.route('/api/schedules/<campaign_id>', methods=['GET'])
+def schedule_state(campaign_id):
+    """Stan harmonogramu kampanii"""
+    schedule, _ = _find_schedule(campaign_id)
+    if schedule is None:
+        return jsonify({'success': False, 'message': 'Brak harmonogramu o podanym id'}), 404
+    return jsonify({'success': True, 'schedule': _schedule_state(schedule)})
+
+@app.route('/api/schedules/<campaign_id>/cancel', methods=['POST'])
+def cancel_schedule(campaign_id):
+    """Anuluje oczekujące wiadomości harmonogramu"""
+    schedule, stop_event = _find_schedule(campaign_id)
+    if schedule is None:
+        return jsonify({'success': False, 'message': 'Brak harmonogramu o podanym id'}), 404
+    schedule.cancel()
+    if stop_event is not None:
+        stop_event.set()
+    elif schedule_store.is_running(campaign_id):
+        # Harmonogram wysyła inny worker - anuluje go po odczytaniu zgłoszenia
+        schedule_store.request_cancel(campaign_id)
+    schedule_store.save(schedule)
+    logger.info("⏹️ Anulowano harmonogram %s", campaign_id)
+    return jsonify({'success': True, 'schedule': _schedule_state(schedule)})
+
+@app.route('/api/dead_letters', methods=['GET'])
+def dead_letters():
+    """Lista wiadomości, których nie udało się wysłać (?reason=circuit_open - zaległość po awarii dostawcy)"""
+    records = dead_letter_store.list(request.args.get('reason') or None)
+    return jsonify({'success': True, 'count': len(records), 'dead_letters': records})
+
+@app.route('/api/dead_letters/replay', methods=['POST'])
+@profiled
+def replay_dead_letters():
+    """Ponawia zbiorczo wiadomości z dead-letter (POST JSON: ids - domyślnie wszystkie, reason - np. circuit_open)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        ids = data.get('ids')
+        records = dead_letter_store.list(data.get('reason') or None)
+        if ids is not None:
+            records = [record for record in records if record['id'] in set(ids)]
+        if not records:
+            return jsonify({'success': False, 'message': 'Brak wiadomości do ponowienia'})
+        
+        channels = {record['channel'] for record in records}
+        email_sender, sms_sender, error = _create_senders('email' in channels, 'sms' in channels)
+        if error:
+            return jsonify({'success': False, 'message': error})
+        
+        placeholder_registry.update(config.load_placeholders())
+        default_rate = 1.0 / DEFAULT_SEND_DELAY
+        engine = SendingEngine(email_sender, sms_sender, config.load_template('email'), config.load_template('sms'),
+                               template_loader=config.load_template, placeholders=placeholder_registry,
+                               control=SendingControl(email_rate=default_rate, sms_rate=default_rate),
+                               retry_policy=RetryPolicy.from_config(config.load_retry_settings()),
+                               dead_letters=dead_letter_store, breakers=circuit_breakers)
+        sent, failed = dead_letter_store.replay(engine, [record['id'] for record in records])
+        return jsonify({'success': True, 'sent': sent, 'failed': failed,
+                        'message': f'Ponowiono {len(records)} wiadomości: wysłane {sent}, nieudane {failed}'})
+    except Exception as e:
+        logger.error(f"Błąd ponawiania wiadomości: {e}")
+        return jsonify({'success': False, 'message': f'Błąd ponawiania: {str(e)}'})
+
+@app.route('/api/circuit_breakers', methods=['GET'])
+def circuit_breaker_states():
+    """Stan wyłączników obwodu dostawców i liczba wiadomości pominiętych przy awarii"""
+    return jsonify({'success': True, 'enabled': circuit_breakers is not None,
+                    'breakers': circuit_breakers.snapshot() if circuit_breakers is not None else [],
+                    'backlog': len(dead_letter_store.list(SKIPPED_REASON))})
+
+@app.route('/api/dead_letters/delete', methods=['POST'])
+def delete_dead_letters():
+    """Usuwa wiadomości z dead-letter (POST JSON: ids - domyślnie wszystkie)"""
+    data = request.get_json(silent=True) or {}
+    removed = dead_letter_store.take(data.get('ids'))
+    return jsonify({'success': True, 'removed': len(removed)})
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Metryki aplikacji w formacie tekstowym Prometheusa"""
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/profiles', methods=['GET', 'POST'])
+def profiles():
+    """Lista zapisanych profili i przełącznik profilowania żądań w sesji"""
+    if request.method == 'POST':
+        mode = request.form.get('mode', '')
+        if mode in PROFILE_MODES:
+            session['profiling'] = mode
+            flash(f'Profilowanie żądań włączone (tryb: {mode})', 'success')
+        else:
+            session.pop('profiling', None)
+            flash('Profilowanie żądań wyłączone', 'info')
+        return redirect(url_for('profiles'))
+    
+    return render_template('profiles.html',
+                         profiles=profile_store.list_profiles(),
+                         profiling=session.get('profiling'),
+                         profiling_global=app.config['PROFILING'],
+                         modes=PROFILE_MODES)
+
+@app.route('/profiles/<name>')
+def download_profile(name):
+    """Pobieranie pliku profilu"""
+    path = profile_store.get_path(name)
+    if not path:
+        abort(404)
+    return send_file(os.path.abspath(path), as_attachment=True, download_name=name)
+
 @app.route('/config')
 def configuration():
     """Strona konfiguracji"""
@@ -697,6 +1051,10 @@ def internal_error(error):
     """Obsługa błędu 500"""
     return render_template('500.html'), 500
 
+# Serwery WSGI bez haka startu workera (np. waitress): WINDYKATOR_RESUME_SCHEDULES=1 wznawia harmonogramy przy imporcie
+if __name__ != '__main__' and os.environ.get('WINDYKATOR_RESUME_SCHEDULES') == '1':
+    resume_scheduled_campaigns()
+
 if __name__ == '__main__':
     # Utwórz folder temp jeśli nie istnieje
     os.makedirs('temp', exist_ok=True)
@@ -706,4 +1064,13 @@ if __name__ == '__main__':
     print("🖥️  Aplikacja desktopowa pozostaje nienaruszona")
     print("=" * 60)
     
-    app.run(debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
+    # Tryb debug z przeładowaniem (domyślnie) - WINDYKATOR_DEBUG=0 go wyłącza
+    debug = os.environ.get('WINDYKATOR_DEBUG', '1') != '0'
+    
+    # Harmonogramy wznawia proces obsługujący żądania - w trybie debug jest nim proces
+    # potomny przeładowania (WERKZEUG_RUN_MAIN), a nie proces nadzorujący.
+    # Pod gunicorn harmonogramy wznawia każdy worker (gunicorn.conf.py).
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        resume_scheduled_campaigns()
+    
+    app.run(debug=debug, host='0.0.0.0', port=5000) 
\ No newline at end of file